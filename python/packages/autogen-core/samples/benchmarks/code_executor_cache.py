@@ -0,0 +1,60 @@
+"""Measure the latency of rerunning deterministic code blocks with and without a result cache.
+
+A small set of snippets, such as package checks, is run over and over, as benchmark
+harnesses and agents do. The snippets are marked as pure, so that with a cache only
+the first run of each executes.
+
+Usage:
+
+    python code_executor_cache.py --num-runs 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+from autogen_core.base import CancellationToken
+from autogen_core.components.code_executor import (
+    CodeBlock,
+    CodeResultCache,
+    InMemoryCodeResultCache,
+    LocalCommandLineCodeExecutor,
+)
+
+SNIPPETS = [
+    "import importlib.util; print(importlib.util.find_spec('json') is not None)",
+    "import sys; print(sys.version_info[:2])",
+    "import json; print(json.dumps({'a': 1}))",
+]
+
+
+async def run(cache: Optional[CodeResultCache], num_runs: int) -> List[float]:
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        executor = LocalCommandLineCodeExecutor(work_dir=work_dir, result_cache=cache)
+        for i in range(num_runs):
+            code_block = CodeBlock(code=SNIPPETS[i % len(SNIPPETS)], language="python", pure=True)
+            start = time.perf_counter()
+            result = await executor.execute_code_blocks([code_block], CancellationToken())
+            latencies.append(time.perf_counter() - start)
+            assert result.exit_code == 0, result.output
+    return latencies
+
+
+async def main(num_runs: int) -> None:
+    print(f"{'mode':<16}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for mode, cache in (("no cache", None), ("in-memory cache", InMemoryCodeResultCache())):
+        latencies = sorted(await run(cache, num_runs))
+        p50 = statistics.median(latencies) * 1e3
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1e3
+        print(f"{mode:<16}{p50:>10.2f}{p95:>10.2f}{sum(latencies):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Result cache benchmark for LocalCommandLineCodeExecutor.")
+    parser.add_argument("--num-runs", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.num_runs))
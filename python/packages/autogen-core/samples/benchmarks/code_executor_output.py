@@ -0,0 +1,78 @@
+"""Measure the memory used by LocalCommandLineCodeExecutor for a code block that writes a lot of output.
+
+The code block writes ``--size-mb`` megabytes to stdout. The reference row reads the
+output with ``communicate()`` and decodes it, which is what the executor did before
+output was streamed and capped. Each mode runs in its own process, so that the peak
+resident memory of each is reported separately.
+
+Usage:
+
+    python code_executor_output.py --size-mb 1024
+"""
+
+import argparse
+import asyncio
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from autogen_core.base import CancellationToken
+from autogen_core.components.code_executor import CodeBlock, LocalCommandLineCodeExecutor
+
+MODES = ["communicate", "executor", "executor pool"]
+
+
+def producer(size_mb: int) -> str:
+    return f"import sys\nline = 'x' * 1023 + '\\n'\nfor _ in range({size_mb} * 1024):\n    sys.stdout.write(line)\n"
+
+
+async def reference(work_dir: str, size_mb: int) -> int:
+    file = Path(work_dir) / "producer.py"
+    file.write_text(producer(size_mb))
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(file), cwd=work_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    return len(stderr.decode() + stdout.decode())
+
+
+async def run_executor(work_dir: str, size_mb: int, worker_pool_size: int) -> int:
+    executor = LocalCommandLineCodeExecutor(timeout=600, work_dir=work_dir, worker_pool_size=worker_pool_size)
+    code_blocks = [CodeBlock(code=producer(size_mb), language="python")]
+    result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+    await executor.stop()
+    assert result.exit_code == 0, result.output[-1000:]
+    return len(result.output)
+
+
+async def run_mode(mode: str, size_mb: int) -> None:
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        if mode == "communicate":
+            captured = await reference(work_dir, size_mb)
+        else:
+            captured = await run_executor(work_dir, size_mb, 1 if mode == "executor pool" else 0)
+        seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    print(f"{mode:<16}{seconds:>10.2f}{peak:>14.1f}{captured / 2**20:>14.1f}")
+
+
+def main(size_mb: int) -> None:
+    print(f"{'mode':<16}{'seconds':>10}{'peak RSS MiB':>14}{'kept MiB':>14}", flush=True)
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, "--size-mb", str(size_mb), "--mode", mode], check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Output size benchmark for LocalCommandLineCodeExecutor.")
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--mode", choices=MODES, help="Run a single mode in this process.")
+    args = parser.parse_args()
+    if args.mode is None:
+        main(args.size_mb)
+    else:
+        asyncio.run(run_mode(args.mode, args.size_mb))
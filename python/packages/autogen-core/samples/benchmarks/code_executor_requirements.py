@@ -0,0 +1,60 @@
+"""Measure how long a new LocalCommandLineCodeExecutor takes to set up functions that require packages.
+
+Each run creates a new executor with the same functions, as agents and benchmark
+tasks do, and runs its first code block. Without a requirements cache, pip runs for
+every executor, even when the packages are installed. With a cache, the virtual
+environment is created by the first executor and found by its hash afterwards.
+
+Usage:
+
+    python code_executor_requirements.py --num-executors 5 --packages pytest
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+from autogen_core.base import CancellationToken
+from autogen_core.components.code_executor import CodeBlock, LocalCommandLineCodeExecutor, with_requirements
+
+
+def add_two_numbers(a: int, b: int) -> int:
+    """Add two numbers together."""
+    return a + b
+
+
+async def run(packages: List[str], num_executors: int, cache_dir: Optional[str]) -> List[float]:
+    function = with_requirements(python_packages=packages)(add_two_numbers)
+    code_block = CodeBlock(
+        code="from functions import add_two_numbers; print(add_two_numbers(1, 2))", language="python"
+    )
+    latencies: List[float] = []
+    for _ in range(num_executors):
+        with tempfile.TemporaryDirectory() as work_dir:
+            start = time.perf_counter()
+            executor = LocalCommandLineCodeExecutor(
+                work_dir=work_dir, functions=[function], requirements_cache_dir=cache_dir
+            )
+            result = await executor.execute_code_blocks([code_block], CancellationToken())
+            latencies.append(time.perf_counter() - start)
+            assert result.exit_code == 0, result.output
+    return latencies
+
+
+async def main(packages: List[str], num_executors: int) -> None:
+    print(f"{'mode':<20}{'first s':>10}{'p50 s':>10}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode, directory in (("pip install", None), ("requirements cache", cache_dir)):
+            latencies = await run(packages, num_executors, directory)
+            print(f"{mode:<20}{latencies[0]:>10.2f}{statistics.median(latencies[1:] or latencies):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Function setup benchmark for LocalCommandLineCodeExecutor.")
+    parser.add_argument("--num-executors", type=int, default=5)
+    parser.add_argument("--packages", nargs="+", default=["pytest"])
+    args = parser.parse_args()
+    asyncio.run(main(args.packages, args.num_executors))
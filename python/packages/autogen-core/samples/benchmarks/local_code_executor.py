@@ -0,0 +1,61 @@
+"""Compare the per-block latency of LocalCommandLineCodeExecutor with and without a Python worker pool.
+
+Each code block imports the given modules and prints a short result, as a typical
+generated snippet does. Without a pool, every block starts a new interpreter and
+imports the modules again. With a pool, the modules are preloaded by workers that
+are started ahead of time.
+
+Usage:
+
+    python local_code_executor.py --num-blocks 50 --modules numpy pandas
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import List
+
+from autogen_core.base import CancellationToken
+from autogen_core.components.code_executor import CodeBlock, LocalCommandLineCodeExecutor
+
+
+async def run(executor: LocalCommandLineCodeExecutor, modules: List[str], num_blocks: int) -> List[float]:
+    imports = "".join(f"import {module}\n" for module in modules)
+    latencies: List[float] = []
+    for i in range(num_blocks):
+        code_block = CodeBlock(code=f"{imports}print(sum(range({i})))", language="python")
+        start = time.perf_counter()
+        result = await executor.execute_code_blocks([code_block], CancellationToken())
+        latencies.append(time.perf_counter() - start)
+        assert result.exit_code == 0, result.output
+    return latencies
+
+
+async def main(num_blocks: int, modules: List[str], worker_pool_size: int) -> None:
+    print(f"{'mode':<16}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for mode in ("subprocess", "worker pool"):
+        with tempfile.TemporaryDirectory() as work_dir:
+            executor = LocalCommandLineCodeExecutor(
+                work_dir=work_dir,
+                worker_pool_size=worker_pool_size if mode == "worker pool" else 0,
+                preload_modules=modules,
+            )
+            # Let the workers start, as they would between the turns of an agent.
+            await run(executor, modules, 1)
+            await asyncio.sleep(2)
+            latencies = sorted(await run(executor, modules, num_blocks))
+            await executor.stop()
+        p50 = statistics.median(latencies) * 1e3
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1e3
+        print(f"{mode:<16}{p50:>10.1f}{p95:>10.1f}{sum(latencies):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-block latency benchmark for LocalCommandLineCodeExecutor.")
+    parser.add_argument("--num-blocks", type=int, default=50)
+    parser.add_argument("--modules", nargs="*", default=["json", "decimal", "asyncio"])
+    parser.add_argument("--worker-pool-size", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.num_blocks, args.modules, args.worker_pool_size))
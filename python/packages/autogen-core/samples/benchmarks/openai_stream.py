@@ -0,0 +1,130 @@
+"""Measure the per-chunk overhead of streaming with the OpenAI chat completion client.
+
+A synthetic stream of content chunks, or of tool call argument fragments, is
+served in place of the OpenAI API, so only the client's work is measured. The
+streams are consumed with a cancellation token, as agents do. The reference row
+awaits every chunk in its own linked future and concatenates the tool call
+arguments, which is what the client did before streams were linked to the token
+once.
+
+Usage:
+
+    python openai_stream.py --num-chunks 10000 --repeats 5
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, List
+
+from autogen_core.base import CancellationToken
+from autogen_core.components.models import UserMessage
+from autogen_ext.models import OpenAIChatCompletionClient
+from openai.resources.chat.completions import AsyncCompletions
+from openai.types.chat.chat_completion_chunk import (
+    ChatCompletionChunk,
+    Choice,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+
+
+def make_chunks(num_chunks: int, tool_calls: bool) -> List[ChatCompletionChunk]:
+    chunks: List[ChatCompletionChunk] = []
+    for i in range(num_chunks):
+        if tool_calls:
+            function = ChoiceDeltaToolCallFunction(name="search" if i == 0 else None, arguments=f'"{i}",')
+            delta = ChoiceDelta(
+                tool_calls=[ChoiceDeltaToolCall(index=0, id="call" if i == 0 else None, function=function)]
+            )
+        else:
+            delta = ChoiceDelta(content=f" token{i}")
+        last = i == num_chunks - 1
+        finish_reason = ("tool_calls" if tool_calls else "stop") if last else None
+        chunks.append(
+            ChatCompletionChunk(
+                id="id",
+                choices=[Choice(index=0, delta=delta, finish_reason=finish_reason)],
+                created=0,
+                model="gpt-4o-2024-08-06",
+                object="chat.completion.chunk",
+            )
+        )
+    return chunks
+
+
+async def replay(chunks: List[ChatCompletionChunk]) -> AsyncGenerator[ChatCompletionChunk, None]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def reference(chunks: List[ChatCompletionChunk], cancellation_token: CancellationToken) -> None:
+    stream: AsyncIterator[ChatCompletionChunk] = replay(chunks)
+    content: List[str] = []
+    arguments = ""
+    while True:
+        future = asyncio.ensure_future(anext(stream))
+        cancellation_token.link_future(future)
+        try:
+            chunk = await future
+        except StopAsyncIteration:
+            break
+        delta = chunk.choices[0].delta
+        if delta.content is not None:
+            content.append(delta.content)
+        elif delta.tool_calls is not None:
+            for tool_call in delta.tool_calls:
+                if tool_call.function is not None and tool_call.function.arguments is not None:
+                    arguments += tool_call.function.arguments
+
+
+async def measure(consume: Callable[[], Any], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await consume()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(client: OpenAIChatCompletionClient, kind: str, chunks: List[ChatCompletionChunk], repeats: int) -> None:
+    async def create(*args: Any, **kwargs: Any) -> AsyncGenerator[ChatCompletionChunk, None]:
+        return replay(chunks)
+
+    AsyncCompletions.create = create  # type: ignore
+    messages = [UserMessage(content="Hello", source="user")]
+
+    async def consume_reference() -> None:
+        await reference(chunks, CancellationToken())
+
+    async def consume_stream() -> None:
+        async for _ in client.create_stream(messages, cancellation_token=CancellationToken()):
+            pass
+
+    async def consume_raw_stream() -> None:
+        async for _ in client.create_raw_stream(messages, cancellation_token=CancellationToken()):
+            pass
+
+    for mode, consume in (
+        ("per-chunk futures", consume_reference),
+        ("create_stream", consume_stream),
+        ("create_raw_stream", consume_raw_stream),
+    ):
+        seconds = await measure(consume, repeats)
+        print(f"{kind:<10}{mode:<24}{seconds * 1e3:>10.1f}{seconds * 1e6 / len(chunks):>10.2f}")
+
+
+async def main(num_chunks: int, repeats: int) -> None:
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    print(f"{'stream':<10}{'mode':<24}{'ms':>10}{'us/chunk':>10}")
+    await run(client, "content", make_chunks(num_chunks, tool_calls=False), repeats)
+    await run(client, "tools", make_chunks(num_chunks, tool_calls=True), repeats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming overhead benchmark for the OpenAI chat completion client.")
+    parser.add_argument("--num-chunks", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.num_chunks, args.repeats))
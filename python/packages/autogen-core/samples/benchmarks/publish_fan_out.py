@@ -0,0 +1,78 @@
+"""Measure the cost of delivering one published message to many subscribers.
+
+For each subscriber count, agents are registered and instantiated up front,
+then messages are published one at a time and the runtime is run until idle
+after each, so the measurement covers a single fan-out: resolving recipients,
+building contexts and running every handler. Reports the mean time per
+publish, deliveries/sec and the peak memory allocated while delivering.
+
+Usage:
+
+    python publish_fan_out.py --num-subscribers 10 1000 10000 --num-messages 20
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.base import MessageContext
+from autogen_core.components import DefaultTopicId, RoutedAgent, default_subscription, message_handler
+
+
+@dataclass
+class Ping:
+    index: int
+
+
+@default_subscription
+class Receiver(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("A receiver agent.")
+
+    @message_handler
+    async def on_ping(self, message: Ping, ctx: MessageContext) -> None:
+        pass
+
+
+async def run(
+    num_subscribers: int, num_messages: int, max_concurrent_deliveries: int | None
+) -> Tuple[float, float, int]:
+    runtime = SingleThreadedAgentRuntime(max_concurrent_deliveries=max_concurrent_deliveries)
+    for i in range(num_subscribers):
+        await Receiver.register(runtime, f"receiver_{i}", Receiver)
+
+    # Warm up: instantiate every agent and populate the subscription cache.
+    runtime.start()
+    await runtime.publish_message(Ping(index=-1), DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(num_messages):
+        runtime.start()
+        await runtime.publish_message(Ping(index=i), DefaultTopicId())
+        await runtime.stop_when_idle()
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / num_messages, num_subscribers * num_messages / elapsed, peak_memory
+
+
+async def main(num_subscribers: List[int], num_messages: int, max_concurrent_deliveries: int | None) -> None:
+    print(f"{'subscribers':>12}{'ms/publish':>14}{'deliveries/sec':>18}{'peak memory':>14}")
+    for count in num_subscribers:
+        seconds, rate, peak_memory = await run(count, num_messages, max_concurrent_deliveries)
+        print(f"{count:>12,}{seconds * 1e3:>14.2f}{rate:>18,.0f}{peak_memory / 2**20:>11.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish fan-out benchmark for SingleThreadedAgentRuntime.")
+    parser.add_argument("--num-subscribers", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--num-messages", type=int, default=20)
+    parser.add_argument("--max-concurrent-deliveries", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.num_subscribers, args.num_messages, args.max_concurrent_deliveries))
@@ -0,0 +1,97 @@
+"""Measure the per-message cost of runtime logging when INFO is disabled.
+
+Compares the eager pattern the runtime used previously (an f-string with the
+message's ``__dict__`` passed to ``logger.info``) against the level-gated,
+deferred-formatting calls it uses now, and reports end-to-end send/publish
+throughput with logging at WARNING and at INFO.
+
+Usage:
+
+    python runtime_logging.py --num-calls 100000 --num-messages 5000
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import timeit
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application._message_logging import LazyMessageContent, log_message_event
+from autogen_core.application.logging.events import DeliveryStage, MessageKind
+from autogen_core.base import AgentId, MessageContext
+from autogen_core.components import DefaultTopicId, RoutedAgent, default_subscription, message_handler
+
+logger = logging.getLogger("autogen_core")
+
+
+@dataclass
+class Payload:
+    content: str = "x" * 2000
+    history: List[str] = field(default_factory=lambda: [f"turn {i}" for i in range(50)])
+    metadata: Dict[str, int] = field(default_factory=lambda: {f"key_{i}": i for i in range(50)})
+
+
+@default_subscription
+class Echo(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An echo agent.")
+
+    @message_handler
+    async def on_payload(self, message: Payload, ctx: MessageContext) -> Payload:
+        return message
+
+
+def eager(message: Payload, recipient: AgentId) -> None:
+    content = message.__dict__ if hasattr(message, "__dict__") else message
+    logger.info(f"Sending message of type {type(message).__name__} to {recipient.type}: {content}")
+
+
+def gated(message: Payload, recipient: AgentId) -> None:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Sending message of type %s to %s: %s", type(message).__name__, recipient.type, LazyMessageContent(message)
+        )
+    log_message_event(
+        payload=message, sender=None, receiver=recipient, kind=MessageKind.DIRECT, delivery_stage=DeliveryStage.SEND
+    )
+
+
+async def throughput(num_messages: int) -> float:
+    runtime = SingleThreadedAgentRuntime()
+    await Echo.register(runtime, "echo", Echo)
+    runtime.start()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(num_messages):
+        await runtime.send_message(Payload(), AgentId("echo", "default"))
+        await runtime.publish_message(Payload(), DefaultTopicId())
+    await runtime.stop_when_idle()
+    return 2 * num_messages / (loop.time() - start)
+
+
+def main(num_calls: int, num_messages: int) -> None:
+    message = Payload()
+    recipient = AgentId("echo", "default")
+    with open(os.devnull, "w") as devnull:
+        logging.basicConfig(level=logging.WARNING, stream=devnull)
+        for name, fn in [("eager f-string", eager), ("gated + deferred", gated)]:
+            seconds = timeit.timeit(functools.partial(fn, message, recipient), number=num_calls)
+            print(f"{name:<20}{seconds / num_calls * 1e9:>10,.0f} ns/call at WARNING")
+
+        warning_rate = asyncio.run(throughput(num_messages))
+        logging.getLogger().setLevel(logging.INFO)
+        info_rate = asyncio.run(throughput(num_messages))
+    print(f"runtime at WARNING: {warning_rate:>10,.0f} messages/sec")
+    print(f"runtime at INFO:    {info_rate:>10,.0f} messages/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Logging overhead benchmark for SingleThreadedAgentRuntime.")
+    parser.add_argument("--num-calls", type=int, default=100000)
+    parser.add_argument("--num-messages", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.num_calls, args.num_messages)
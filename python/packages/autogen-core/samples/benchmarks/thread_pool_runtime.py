@@ -0,0 +1,72 @@
+"""Compare SingleThreadedAgentRuntime and ThreadPoolAgentRuntime on CPU-heavy handlers.
+
+Each handler hashes a large buffer, standing in for tokenization, parsing or
+image conversion done in native code that releases the GIL. Messages are sent
+to many agents concurrently and the total wall time is reported.
+
+Usage:
+
+    python thread_pool_runtime.py --num-agents 32 --num-messages 256 --num-workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import List
+
+from autogen_core.application import SingleThreadedAgentRuntime, ThreadPoolAgentRuntime
+from autogen_core.base import AgentId, MessageContext
+from autogen_core.components import RoutedAgent, message_handler
+
+PAYLOAD = b"x" * (4 * 2**20)
+
+
+@dataclass
+class Work:
+    rounds: int
+
+
+class Hasher(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that does CPU-heavy work.")
+
+    @message_handler
+    async def on_work(self, message: Work, ctx: MessageContext) -> str:
+        digest = b""
+        for _ in range(message.rounds):
+            digest = hashlib.sha256(PAYLOAD).digest()
+        return digest.hex()
+
+
+async def run(
+    runtime: SingleThreadedAgentRuntime | ThreadPoolAgentRuntime, num_agents: int, num_messages: int
+) -> float:
+    await Hasher.register(runtime, "hasher", Hasher)
+    runtime.start()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[runtime.send_message(Work(rounds=2), AgentId("hasher", str(i % num_agents))) for i in range(num_messages)]
+    )
+    elapsed = time.perf_counter() - start
+    await runtime.stop()
+    return elapsed
+
+
+async def main(num_agents: int, num_messages: int, num_workers: List[int]) -> None:
+    baseline = await run(SingleThreadedAgentRuntime(), num_agents, num_messages)
+    print(f"{'runtime':<24}{'seconds':>10}{'speedup':>10}")
+    print(f"{'single-threaded':<24}{baseline:>10.2f}{1.0:>10.2f}")
+    for workers in num_workers:
+        seconds = await run(ThreadPoolAgentRuntime(num_workers=workers), num_agents, num_messages)
+        print(f"{f'thread pool ({workers})':<24}{seconds:>10.2f}{baseline / seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU-heavy handler benchmark for ThreadPoolAgentRuntime.")
+    parser.add_argument("--num-agents", type=int, default=32)
+    parser.add_argument("--num-messages", type=int, default=256)
+    parser.add_argument("--num-workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    asyncio.run(main(args.num_agents, args.num_messages, args.num_workers))
@@ -2,8 +2,26 @@
 The :mod:`autogen_core.application` module provides implementations of core components that are used to compose an application
 """
 
+from ._agent_instance_cache import (
+    AgentEvictionPolicy,
+    AgentInstanceMetrics,
+    InMemoryPassivatedStateStore,
+    PassivatedStateStore,
+)
+from ._intervention_pipeline import LatencyHistogram
 from ._single_threaded_agent_runtime import SingleThreadedAgentRuntime
+from ._thread_pool_agent_runtime import ThreadPoolAgentRuntime
 from ._worker_runtime import WorkerAgentRuntime
 from ._worker_runtime_host import WorkerAgentRuntimeHost
 
-__all__ = ["SingleThreadedAgentRuntime", "WorkerAgentRuntime", "WorkerAgentRuntimeHost"]
+__all__ = [
+    "AgentEvictionPolicy",
+    "AgentInstanceMetrics",
+    "InMemoryPassivatedStateStore",
+    "PassivatedStateStore",
+    "LatencyHistogram",
+    "SingleThreadedAgentRuntime",
+    "ThreadPoolAgentRuntime",
+    "WorkerAgentRuntime",
+    "WorkerAgentRuntimeHost",
+]
@@ -0,0 +1,234 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Generator, Iterable, Iterator, List, Mapping, Protocol, Tuple
+
+from ..base import Agent, AgentId
+
+logger = logging.getLogger("autogen_core")
+
+
+class PassivatedStateStore(Protocol):
+    """Holds the saved state of evicted agents until they are re-activated.
+
+    A store may spill states to other storage, or discard them to bound its size. Discarded agents start
+    from a new instance without their state on their next message.
+    """
+
+    def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> List[AgentId]:
+        """Store the state of an evicted agent, and return the agents whose states were discarded to make room."""
+        ...
+
+    def pop(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        """Remove and return the state of the agent, or ``None`` if it is not stored."""
+        ...
+
+    def items(self) -> Iterable[Tuple[AgentId, Mapping[str, Any]]]:
+        """The stored states, for saving the state of the runtime."""
+        ...
+
+    def __len__(self) -> int: ...
+
+
+class InMemoryPassivatedStateStore:
+    """Keeps the saved state of evicted agents in memory.
+
+    Args:
+        max_agents (int | None, optional): The maximum number of states kept. When it is reached, the state of
+            the agent that was evicted the longest time ago is discarded. Defaults to None, which means no limit.
+    """
+
+    def __init__(self, max_agents: int | None = None) -> None:
+        if max_agents is not None and max_agents < 1:
+            raise ValueError("max_agents must be at least 1.")
+        self._max_agents = max_agents
+        # Agent id -> state, in order of eviction.
+        self._states: OrderedDict[AgentId, Mapping[str, Any]] = OrderedDict()
+
+    def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> List[AgentId]:
+        self._states[agent_id] = state
+        self._states.move_to_end(agent_id)
+        discarded: List[AgentId] = []
+        while self._max_agents is not None and len(self._states) > self._max_agents:
+            discarded.append(self._states.popitem(last=False)[0])
+        return discarded
+
+    def pop(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        return self._states.pop(agent_id, None)
+
+    def items(self) -> Iterable[Tuple[AgentId, Mapping[str, Any]]]:
+        return list(self._states.items())
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+@dataclass(kw_only=True)
+class AgentEvictionPolicy:
+    """Policy for evicting idle agent instances from a runtime.
+
+    When an agent is evicted, its :meth:`~autogen_core.base.Agent.save_state` result is kept in the
+    ``state_store`` and the instance is dropped. The next message for the agent creates a new instance through its
+    registered factory and restores the state with :meth:`~autogen_core.base.Agent.load_state`.
+    Agents that are handling a message are never evicted, and agents whose ``save_state`` raises are kept resident.
+
+    .. note::
+
+        Only use eviction with agents that fully capture their state in ``save_state`` and ``load_state``.
+
+    Args:
+        max_resident_agents (int | None, optional): The maximum number of agent instances kept in memory.
+            The least recently used agents are evicted first. Defaults to None, which means no limit.
+        idle_timeout (float | None, optional): Evict agents that have not been used for this many seconds.
+            Defaults to None, which means agents are not evicted based on idle time.
+        state_store (PassivatedStateStore | None, optional): Holds the state of evicted agents. Defaults to None,
+            which keeps every state in an :class:`InMemoryPassivatedStateStore` without a limit.
+    """
+
+    max_resident_agents: int | None = None
+    idle_timeout: float | None = None
+    state_store: PassivatedStateStore | None = None
+
+    def __post_init__(self) -> None:
+        if self.max_resident_agents is not None and self.max_resident_agents < 1:
+            raise ValueError("max_resident_agents must be at least 1.")
+        if self.idle_timeout is not None and self.idle_timeout <= 0:
+            raise ValueError("idle_timeout must be greater than 0.")
+
+
+@dataclass(kw_only=True)
+class AgentInstanceMetrics:
+    """Counters describing agent instance activity in a runtime."""
+
+    resident_agents: int
+    """Number of agent instances currently in memory."""
+
+    passivated_agents: int
+    """Number of evicted agents whose state is held for re-activation."""
+
+    activations: int
+    """Number of agent instances created, including re-activations."""
+
+    reactivations: int
+    """Number of activations that restored previously evicted state."""
+
+    evictions: int
+    """Number of agent instances evicted."""
+
+    discarded_states: int
+    """Number of evicted agents whose state was discarded by the state store."""
+
+
+class AgentInstanceCache:
+    """Holds instantiated agents in least recently used order and applies an :class:`AgentEvictionPolicy`."""
+
+    def __init__(
+        self, policy: AgentEvictionPolicy | None = None, *, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._policy = policy or AgentEvictionPolicy()
+        self._clock = clock
+        # Agent id -> (agent, last used time), least recently used first.
+        self._agents: OrderedDict[AgentId, tuple[Agent, float]] = OrderedDict()
+        self._passivated: PassivatedStateStore = (
+            self._policy.state_store if self._policy.state_store is not None else InMemoryPassivatedStateStore()
+        )
+        self._pinned: Counter[AgentId] = Counter()
+        self._activations = 0
+        self._reactivations = 0
+        self._evictions = 0
+        self._discarded_states = 0
+
+    def __contains__(self, agent_id: AgentId) -> bool:
+        return agent_id in self._agents
+
+    def __iter__(self) -> Iterator[AgentId]:
+        return iter(list(self._agents))
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    @property
+    def passivated_states(self) -> Iterable[Tuple[AgentId, Mapping[str, Any]]]:
+        return self._passivated.items()
+
+    @property
+    def metrics(self) -> AgentInstanceMetrics:
+        return AgentInstanceMetrics(
+            resident_agents=len(self._agents),
+            passivated_agents=len(self._passivated),
+            activations=self._activations,
+            reactivations=self._reactivations,
+            evictions=self._evictions,
+            discarded_states=self._discarded_states,
+        )
+
+    def get(self, agent_id: AgentId) -> Agent | None:
+        """Return the resident agent and mark it as used, or ``None`` if it is not resident."""
+        self._evict_idle()
+        entry = self._agents.get(agent_id)
+        if entry is None:
+            return None
+        self._agents[agent_id] = (entry[0], self._clock())
+        self._agents.move_to_end(agent_id)
+        return entry[0]
+
+    def pop_passivated_state(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        return self._passivated.pop(agent_id)
+
+    def add(self, agent_id: AgentId, agent: Agent, *, reactivated: bool = False) -> None:
+        self._agents[agent_id] = (agent, self._clock())
+        self._activations += 1
+        if reactivated:
+            self._reactivations += 1
+        self._evict_over_capacity()
+
+    @contextmanager
+    def pin(self, agent_id: AgentId) -> Generator[None, None, None]:
+        """Prevent the agent from being evicted while it handles a message."""
+        self._pinned[agent_id] += 1
+        try:
+            yield
+        finally:
+            self._pinned[agent_id] -= 1
+            if self._pinned[agent_id] == 0:
+                del self._pinned[agent_id]
+            self._evict_over_capacity()
+
+    def _evict_idle(self) -> None:
+        if self._policy.idle_timeout is None:
+            return
+        deadline = self._clock() - self._policy.idle_timeout
+        for agent_id, (_, last_used) in list(self._agents.items()):
+            if last_used > deadline:
+                # Entries are ordered by last use, so the rest are more recent.
+                break
+            self._evict(agent_id)
+
+    def _evict_over_capacity(self) -> None:
+        max_resident_agents = self._policy.max_resident_agents
+        if max_resident_agents is None or len(self._agents) <= max_resident_agents:
+            return
+        for agent_id in list(self._agents):
+            if len(self._agents) <= max_resident_agents:
+                break
+            self._evict(agent_id)
+
+    def _evict(self, agent_id: AgentId) -> None:
+        if agent_id in self._pinned:
+            return
+        agent, _ = self._agents[agent_id]
+        try:
+            state = dict(agent.save_state())
+        except Exception:
+            logger.warning("Failed to save state of agent %s, keeping it resident.", agent_id, exc_info=True)
+            # Mark it as used so that it is not retried on every eviction pass.
+            self._agents[agent_id] = (agent, self._clock())
+            self._agents.move_to_end(agent_id)
+            return
+        del self._agents[agent_id]
+        self._evictions += 1
+        for discarded_id in self._passivated.put(agent_id, state):
+            logger.info("Discarded the passivated state of agent %s.", discarded_id)
+            self._discarded_states += 1
@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, Dict, Tuple
+
+from ..base import AgentId
+
+
+class MailboxDelivery:
+    """Identifies a delivery that holds the mailbox of an agent."""
+
+
+# The mailboxes held by the handler that runs in the current context and the handlers waiting on it.
+mailboxes_held: ContextVar[Tuple[Tuple[AgentId, MailboxDelivery], ...]] = ContextVar("mailboxes_held", default=())
+
+
+class AgentMailboxes:
+    """Serializes message delivery per agent.
+
+    Deliveries to the same agent wait in the order they enter :meth:`deliver` and run one at a time.
+    Deliveries to different agents are independent. A mailbox only exists while an agent has deliveries
+    running or waiting, so idle agents cost nothing.
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[AgentId, asyncio.Lock] = {}
+        self._users: Dict[AgentId, int] = {}
+        self._holders: Dict[AgentId, MailboxDelivery] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def is_held_by(self, agent_id: AgentId, delivery: MailboxDelivery) -> bool:
+        """Whether the mailbox of the agent is held by the delivery."""
+        return self._holders.get(agent_id) is delivery
+
+    @asynccontextmanager
+    async def deliver(self, agent_id: AgentId) -> AsyncGenerator[MailboxDelivery, None]:
+        lock = self._locks.get(agent_id)
+        if lock is None:
+            lock = self._locks[agent_id] = asyncio.Lock()
+        self._users[agent_id] = self._users.get(agent_id, 0) + 1
+        try:
+            async with lock:
+                delivery = self._holders[agent_id] = MailboxDelivery()
+                try:
+                    yield delivery
+                finally:
+                    del self._holders[agent_id]
+        finally:
+            self._users[agent_id] -= 1
+            if self._users[agent_id] == 0:
+                del self._users[agent_id]
+                del self._locks[agent_id]
+
+
+@asynccontextmanager
+async def hold_mailbox(
+    mailboxes: AgentMailboxes | None,
+    recipient: AgentId,
+    sender: AgentId | None,
+    held: Tuple[Tuple[AgentId, MailboxDelivery], ...] = (),
+) -> AsyncGenerator[None, None]:
+    """Hold the mailbox of the recipient, if mailboxes are enabled, while a handler runs.
+
+    ``held`` are the mailboxes held by the chain of handlers that waits on the message. A message to an
+    agent whose mailbox is held by that chain would wait forever, so it raises instead."""
+    # An agent sending to itself from a handler would otherwise wait on its own mailbox forever.
+    if mailboxes is None or recipient == sender:
+        token = mailboxes_held.set(held)
+        try:
+            yield
+        finally:
+            mailboxes_held.reset(token)
+        return
+    for agent_id, delivery in held:
+        if agent_id == recipient and mailboxes.is_held_by(agent_id, delivery):
+            raise RuntimeError(
+                f"Message to {recipient} would deadlock, as its mailbox is held by a handler that waits on it."
+            )
+    async with mailboxes.deliver(recipient) as delivery:
+        token = mailboxes_held.set((*held, (recipient, delivery)))
+        try:
+            yield
+        finally:
+            mailboxes_held.reset(token)
@@ -1,11 +1,14 @@
-from collections import defaultdict
-from typing import Awaitable, Callable, DefaultDict, List, Set
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, DefaultDict, Dict, List, Set, Tuple
+
+from typing_extensions import TypeGuard
 
 from ..base._agent import Agent
 from ..base._agent_id import AgentId
 from ..base._agent_type import AgentType
 from ..base._subscription import Subscription
 from ..base._topic import TopicId
+from ..components._type_subscription import TypeSubscription
 
 
 async def get_impl(
@@ -30,45 +33,122 @@ async def get_impl(
 
 
 class SubscriptionManager:
-    def __init__(self) -> None:
+    """Tracks subscriptions and resolves the recipients of a topic.
+
+    :class:`~autogen_core.components.TypeSubscription` instances are indexed by topic type so that
+    resolving the recipients of a topic only considers subscriptions for that topic type. Other
+    subscriptions are matched with :meth:`~autogen_core.base.Subscription.is_match`.
+
+    Resolved recipients are cached per topic in a bounded LRU cache. Adding or removing a
+    subscription only updates the cached topics it affects.
+
+    Args:
+        max_cached_topics (int, optional): The maximum number of topics whose recipients are cached. Defaults to 10000.
+    """
+
+    def __init__(self, *, max_cached_topics: int = 10000) -> None:
+        if max_cached_topics < 1:
+            raise ValueError("max_cached_topics must be at least 1.")
+        self._max_cached_topics = max_cached_topics
         self._subscriptions: List[Subscription] = []
-        self._seen_topics: Set[TopicId] = set()
-        self._subscribed_recipients: DefaultDict[TopicId, List[AgentId]] = defaultdict(list)
+        # Subscription id -> insertion sequence number, used to keep recipients in subscription order.
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        # Topic type -> type subscriptions for that topic type.
+        self._type_index: DefaultDict[str, List[TypeSubscription]] = defaultdict(list)
+        self._type_keys: Set[Tuple[str, str]] = set()
+        # Subscriptions that cannot be indexed by topic type.
+        self._unindexed: List[Subscription] = []
+        self._subscribed_recipients: OrderedDict[TopicId, List[AgentId]] = OrderedDict()
+        self._cached_topics_by_type: DefaultDict[str, Set[TopicId]] = defaultdict(set)
 
     async def add_subscription(self, subscription: Subscription) -> None:
         # Check if the subscription already exists
-        if any(sub == subscription for sub in self._subscriptions):
+        if self._is_duplicate(subscription):
             raise ValueError("Subscription already exists")
 
         self._subscriptions.append(subscription)
-        self._rebuild_subscriptions(self._seen_topics)
+        self._sequence[subscription.id] = self._next_sequence
+        self._next_sequence += 1
+
+        if _is_indexable(subscription):
+            self._type_index[subscription.topic_type].append(subscription)
+            self._type_keys.add((subscription.topic_type, subscription.agent_type))
+            affected_topics = list(self._cached_topics_by_type.get(subscription.topic_type, ()))
+        else:
+            self._unindexed.append(subscription)
+            affected_topics = [topic for topic in self._subscribed_recipients if subscription.is_match(topic)]
+
+        # The new subscription is the most recent, so its recipient goes last. Lists are replaced
+        # rather than mutated because callers may be iterating over a previously returned list.
+        for topic in affected_topics:
+            self._subscribed_recipients[topic] = [
+                *self._subscribed_recipients[topic],
+                subscription.map_to_agent(topic),
+            ]
 
     async def remove_subscription(self, id: str) -> None:
         # Check if the subscription exists
-        if not any(sub.id == id for sub in self._subscriptions):
+        if id not in self._sequence:
             raise ValueError("Subscription does not exist")
 
-        def is_not_sub(x: Subscription) -> bool:
-            return x.id != id
-
-        self._subscriptions = list(filter(is_not_sub, self._subscriptions))
-
-        # Rebuild the subscriptions
-        self._rebuild_subscriptions(self._seen_topics)
+        subscription = next(sub for sub in self._subscriptions if sub.id == id)
+        self._subscriptions.remove(subscription)
+        del self._sequence[id]
+
+        if _is_indexable(subscription):
+            type_subscriptions = self._type_index[subscription.topic_type]
+            type_subscriptions.remove(subscription)
+            if not type_subscriptions:
+                del self._type_index[subscription.topic_type]
+            self._type_keys.discard((subscription.topic_type, subscription.agent_type))
+            affected_topics = list(self._cached_topics_by_type.get(subscription.topic_type, ()))
+        else:
+            self._unindexed.remove(subscription)
+            affected_topics = [topic for topic in self._subscribed_recipients if subscription.is_match(topic)]
+
+        # Recompute lazily on the next lookup.
+        for topic in affected_topics:
+            self._evict(topic)
 
     async def get_subscribed_recipients(self, topic: TopicId) -> List[AgentId]:
-        if topic not in self._seen_topics:
-            self._build_for_new_topic(topic)
-        return self._subscribed_recipients[topic]
-
-    # TODO: optimize this...
-    def _rebuild_subscriptions(self, topics: Set[TopicId]) -> None:
-        self._subscribed_recipients.clear()
-        for topic in topics:
-            self._build_for_new_topic(topic)
-
-    def _build_for_new_topic(self, topic: TopicId) -> None:
-        self._seen_topics.add(topic)
-        for subscription in self._subscriptions:
-            if subscription.is_match(topic):
-                self._subscribed_recipients[topic].append(subscription.map_to_agent(topic))
+        recipients = self._subscribed_recipients.get(topic)
+        if recipients is not None:
+            self._subscribed_recipients.move_to_end(topic)
+            return recipients
+
+        recipients = self._build_for_new_topic(topic)
+        self._subscribed_recipients[topic] = recipients
+        self._cached_topics_by_type[topic.type].add(topic)
+        if len(self._subscribed_recipients) > self._max_cached_topics:
+            self._evict(next(iter(self._subscribed_recipients)))
+        return recipients
+
+    def _is_duplicate(self, subscription: Subscription) -> bool:
+        if subscription.id in self._sequence:
+            return True
+        if _is_indexable(subscription):
+            if (subscription.topic_type, subscription.agent_type) in self._type_keys:
+                return True
+            return any(sub == subscription for sub in self._unindexed)
+        return any(sub == subscription for sub in self._subscriptions)
+
+    def _evict(self, topic: TopicId) -> None:
+        del self._subscribed_recipients[topic]
+        topics = self._cached_topics_by_type[topic.type]
+        topics.discard(topic)
+        if not topics:
+            del self._cached_topics_by_type[topic.type]
+
+    def _build_for_new_topic(self, topic: TopicId) -> List[AgentId]:
+        matches: List[Subscription] = list(self._type_index.get(topic.type, ()))
+        unindexed_matches = [sub for sub in self._unindexed if sub.is_match(topic)]
+        if unindexed_matches:
+            matches.extend(unindexed_matches)
+            matches.sort(key=lambda sub: self._sequence[sub.id])
+        return [subscription.map_to_agent(topic) for subscription in matches]
+
+
+def _is_indexable(subscription: Subscription) -> TypeGuard[TypeSubscription]:
+    # Subclasses that override matching cannot be resolved by topic type alone.
+    return isinstance(subscription, TypeSubscription) and type(subscription).is_match is TypeSubscription.is_match
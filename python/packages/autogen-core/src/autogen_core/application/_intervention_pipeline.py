@@ -0,0 +1,139 @@
+import bisect
+import time
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from ..base import AgentId
+from ..base.intervention import DefaultInterventionHandler, DropMessage, InterventionHandler
+from .telemetry import EnvelopeMetadata, MessageRuntimeTracingConfig, TraceHelper
+
+
+class LatencyHistogram:
+    """A fixed-bucket histogram of latencies in seconds.
+
+    Args:
+        boundaries (Sequence[float], optional): Upper bounds of the buckets in seconds, in increasing order.
+            Latencies above the last boundary are counted in an overflow bucket.
+    """
+
+    DEFAULT_BOUNDARIES: Tuple[float, ...] = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, boundaries: Sequence[float] = DEFAULT_BOUNDARIES) -> None:
+        if list(boundaries) != sorted(boundaries):
+            raise ValueError("boundaries must be in increasing order.")
+        self._boundaries = tuple(boundaries)
+        self._counts = [0] * (len(self._boundaries) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self._counts[bisect.bisect_left(self._boundaries, seconds)] += 1
+        self._sum += seconds
+        self._max = max(self._max, seconds)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def max(self) -> float:
+        return self._max
+
+    @property
+    def mean(self) -> float:
+        count = self.count
+        return self._sum / count if count > 0 else 0.0
+
+    @property
+    def buckets(self) -> List[Tuple[float, int]]:
+        """The ``(upper bound, count)`` pairs of the histogram. The last bucket has an upper bound of ``inf``."""
+        return list(zip([*self._boundaries, float("inf")], self._counts, strict=True))
+
+
+def _overrides(handler: InterventionHandler, hook: str) -> bool:
+    return getattr(type(handler), hook) is not getattr(DefaultInterventionHandler, hook)
+
+
+class InterventionPipeline:
+    """Runs intervention handlers for a message, skipping handlers that do not override a hook.
+
+    Each hook is compiled once into the list of handlers that override it, so messages for hooks
+    with no interested handlers skip the pipeline entirely. The latency of each handler call is
+    recorded in a :class:`LatencyHistogram` keyed by ``"<handler class name>.<hook>"``.
+    """
+
+    def __init__(
+        self,
+        handlers: Sequence[InterventionHandler],
+        trace_helper: TraceHelper[Any, Any, Any] | None = None,
+    ) -> None:
+        self._send_handlers = [handler for handler in handlers if _overrides(handler, "on_send")]
+        self._publish_handlers = [handler for handler in handlers if _overrides(handler, "on_publish")]
+        self._response_handlers = [handler for handler in handlers if _overrides(handler, "on_response")]
+        self._trace_helper = trace_helper or TraceHelper(None, MessageRuntimeTracingConfig("InterventionPipeline"))
+        self._latencies: Dict[str, LatencyHistogram] = {}
+
+    @property
+    def has_send_handlers(self) -> bool:
+        return len(self._send_handlers) > 0
+
+    @property
+    def has_publish_handlers(self) -> bool:
+        return len(self._publish_handlers) > 0
+
+    @property
+    def has_response_handlers(self) -> bool:
+        return len(self._response_handlers) > 0
+
+    @property
+    def latencies(self) -> Mapping[str, LatencyHistogram]:
+        return self._latencies
+
+    async def on_send(
+        self, message: Any, *, sender: AgentId | None, recipient: AgentId, metadata: EnvelopeMetadata | None
+    ) -> Any | type[DropMessage]:
+        for handler in self._send_handlers:
+            with self._trace_helper.trace_block("intercept", handler.__class__.__name__, parent=metadata):
+                start = time.perf_counter()
+                try:
+                    message = await handler.on_send(message, sender=sender, recipient=recipient)
+                finally:
+                    self._record(handler, "on_send", time.perf_counter() - start)
+            if message is DropMessage or isinstance(message, DropMessage):
+                return DropMessage
+        return message
+
+    async def on_publish(
+        self, message: Any, *, sender: AgentId | None, metadata: EnvelopeMetadata | None
+    ) -> Any | type[DropMessage]:
+        for handler in self._publish_handlers:
+            with self._trace_helper.trace_block("intercept", handler.__class__.__name__, parent=metadata):
+                start = time.perf_counter()
+                try:
+                    message = await handler.on_publish(message, sender=sender)
+                finally:
+                    self._record(handler, "on_publish", time.perf_counter() - start)
+            if message is DropMessage or isinstance(message, DropMessage):
+                return DropMessage
+        return message
+
+    async def on_response(self, message: Any, *, sender: AgentId, recipient: AgentId | None) -> Any | type[DropMessage]:
+        for handler in self._response_handlers:
+            start = time.perf_counter()
+            try:
+                message = await handler.on_response(message, sender=sender, recipient=recipient)
+            finally:
+                self._record(handler, "on_response", time.perf_counter() - start)
+            if message is DropMessage or isinstance(message, DropMessage):
+                return DropMessage
+        return message
+
+    def _record(self, handler: InterventionHandler, hook: str, seconds: float) -> None:
+        key = f"{handler.__class__.__name__}.{hook}"
+        histogram = self._latencies.get(key)
+        if histogram is None:
+            histogram = self._latencies[key] = LatencyHistogram()
+        histogram.record(seconds)
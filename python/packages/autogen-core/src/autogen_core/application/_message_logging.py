@@ -0,0 +1,43 @@
+import logging
+from typing import Any
+
+from ..base import AgentId
+from .logging import EVENT_LOGGER_NAME, ROOT_LOGGER_NAME
+from .logging.events import DeliveryStage, MessageEvent, MessageKind
+
+logger = logging.getLogger(ROOT_LOGGER_NAME)
+event_logger = logging.getLogger(EVENT_LOGGER_NAME)
+
+
+class LazyMessageContent:
+    """Defers rendering a message payload until a log record is actually formatted."""
+
+    __slots__ = ("_message",)
+
+    def __init__(self, message: Any) -> None:
+        self._message = message
+
+    def __str__(self) -> str:
+        content = self._message.__dict__ if hasattr(self._message, "__dict__") else self._message
+        return str(content)
+
+
+def log_message_event(
+    *,
+    payload: Any,
+    sender: AgentId | None,
+    receiver: AgentId | None,
+    kind: MessageKind,
+    delivery_stage: DeliveryStage,
+) -> None:
+    """Emit a :class:`MessageEvent` to the event logger only if it is enabled for INFO."""
+    if event_logger.isEnabledFor(logging.INFO):
+        event_logger.info(
+            MessageEvent(
+                payload=payload,
+                sender=sender,
+                receiver=receiver,
+                kind=kind,
+                delivery_stage=delivery_stage,
+            )
+        )
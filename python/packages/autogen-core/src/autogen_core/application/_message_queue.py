@@ -0,0 +1,93 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class MessageQueue(Generic[T]):
+    """A FIFO message queue with an optional priority lane and a bounded depth.
+
+    Items for which ``is_priority`` returns ``True`` are placed in a separate lane
+    that is always drained before the regular lane. Both lanes are :class:`collections.deque`
+    so enqueue and dequeue are O(1).
+
+    When ``maxsize`` is greater than zero, :meth:`put` waits until there is room in the
+    queue, providing backpressure to producers. :meth:`force_put` bypasses the bound and is
+    intended for messages that must never block, such as responses to in-flight requests.
+
+    Args:
+        maxsize (int, optional): The maximum number of queued items. ``0`` means unbounded. Defaults to 0.
+        is_priority (Callable[[T], bool] | None, optional): Predicate selecting items for the priority lane.
+            If ``None``, all items share a single FIFO lane. Defaults to None.
+    """
+
+    def __init__(self, *, maxsize: int = 0, is_priority: Callable[[T], bool] | None = None) -> None:
+        if maxsize < 0:
+            raise ValueError("maxsize must be greater than or equal to 0.")
+        self._maxsize = maxsize
+        self._is_priority = is_priority
+        self._priority: Deque[T] = deque()
+        self._regular: Deque[T] = deque()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    def __len__(self) -> int:
+        return len(self._priority) + len(self._regular)
+
+    def __iter__(self) -> Iterator[T]:
+        yield from self._priority
+        yield from self._regular
+
+    def empty(self) -> bool:
+        return not self._priority and not self._regular
+
+    def full(self) -> bool:
+        return self._maxsize > 0 and len(self) >= self._maxsize
+
+    async def put(self, item: T) -> None:
+        """Put an item into the queue, waiting while the queue is full."""
+        while self.full():
+            self._not_full.clear()
+            await self._not_full.wait()
+        self._append(item)
+
+    def put_nowait(self, item: T) -> None:
+        """Put an item into the queue without waiting.
+
+        Raises:
+            asyncio.QueueFull: If the queue is full.
+        """
+        if self.full():
+            raise asyncio.QueueFull
+        self._append(item)
+
+    def force_put(self, item: T) -> None:
+        """Put an item into the queue regardless of ``maxsize``."""
+        self._append(item)
+
+    def get_nowait(self) -> T:
+        """Remove and return the next item, taking from the priority lane first.
+
+        Raises:
+            asyncio.QueueEmpty: If the queue is empty.
+        """
+        if self._priority:
+            item = self._priority.popleft()
+        elif self._regular:
+            item = self._regular.popleft()
+        else:
+            raise asyncio.QueueEmpty
+        if not self.full():
+            self._not_full.set()
+        return item
+
+    def _append(self, item: T) -> None:
+        if self._is_priority is not None and self._is_priority(item):
+            self._priority.append(item)
+        else:
+            self._regular.append(item)
@@ -9,7 +9,20 @@
 from collections.abc import Sequence
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Awaitable, Callable, Dict, List, Mapping, ParamSpec, Set, Type, TypeVar, cast
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    ParamSpec,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
 
 from opentelemetry.trace import TracerProvider
 from typing_extensions import deprecated
@@ -32,7 +45,13 @@
 )
 from ..base.exceptions import MessageDroppedException
 from ..base.intervention import DropMessage, InterventionHandler
+from ._agent_instance_cache import AgentEvictionPolicy, AgentInstanceCache, AgentInstanceMetrics
+from ._agent_mailboxes import AgentMailboxes, MailboxDelivery, hold_mailbox, mailboxes_held
 from ._helpers import SubscriptionManager, get_impl
+from ._intervention_pipeline import InterventionPipeline, LatencyHistogram
+from ._message_logging import LazyMessageContent, log_message_event
+from ._message_queue import MessageQueue
+from .logging.events import DeliveryStage, MessageKind
 from .telemetry import EnvelopeMetadata, MessageRuntimeTracingConfig, TraceHelper, get_telemetry_envelope_metadata
 
 logger = logging.getLogger("autogen_core")
@@ -66,6 +85,8 @@ class SendMessageEnvelope:
     future: Future[Any]
     cancellation_token: CancellationToken
     metadata: EnvelopeMetadata | None = None
+    mailboxes_held: Tuple[Tuple[AgentId, MailboxDelivery], ...] = ()
+    """The mailboxes held by the chain of handlers that waits on this message."""
 
 
 @dataclass(kw_only=True)
@@ -79,6 +100,10 @@ class ResponseMessageEnvelope:
     metadata: EnvelopeMetadata | None = None
 
 
+def _is_response_envelope(envelope: PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope) -> bool:
+    return isinstance(envelope, ResponseMessageEnvelope)
+
+
 P = ParamSpec("P")
 T = TypeVar("T", bound=Agent)
 
@@ -112,7 +137,10 @@ def __init__(self, runtime: SingleThreadedAgentRuntime) -> None:
         self._runtime = runtime
         self._run_state = RunContext.RunState.RUNNING
         self._end_condition: Callable[[], bool] = self._stop_when_cancelled
-        self._run_task = asyncio.create_task(self._run())
+        if runtime._dispatch_batch_size is None:
+            self._run_task = asyncio.create_task(self._run())
+        else:
+            self._run_task = asyncio.create_task(self._run_batched(runtime._dispatch_batch_size))
         self._lock = asyncio.Lock()
 
     async def _run(self) -> None:
@@ -123,21 +151,37 @@ async def _run(self) -> None:
 
                 await self._runtime.process_next()
 
+    async def _run_batched(self, batch_size: int) -> None:
+        while True:
+            # Clear before checking for work so that a wakeup arriving in between is not lost.
+            self._runtime._wakeup_event.clear()
+            async with self._lock:
+                if self._end_condition():
+                    return
+
+                num_processed = await self._runtime._process_batch(batch_size)
+            if num_processed == 0:
+                # Park until a message is enqueued, a task completes, or a stop is requested.
+                await self._runtime._wakeup_event.wait()
+
     async def stop(self) -> None:
         async with self._lock:
             self._run_state = RunContext.RunState.CANCELLED
             self._end_condition = self._stop_when_cancelled
+        self._runtime._wakeup_event.set()
         await self._run_task
 
     async def stop_when_idle(self) -> None:
         async with self._lock:
             self._run_state = RunContext.RunState.UNTIL_IDLE
             self._end_condition = self._stop_when_idle
+        self._runtime._wakeup_event.set()
         await self._run_task
 
     async def stop_when(self, condition: Callable[[], bool]) -> None:
         async with self._lock:
             self._end_condition = condition
+        self._runtime._wakeup_event.set()
         await self._run_task
 
     def _stop_when_cancelled(self) -> bool:
@@ -148,36 +192,106 @@ def _stop_when_idle(self) -> bool:
 
 
 class SingleThreadedAgentRuntime(AgentRuntime):
+    """A single-threaded agent runtime that processes all messages using a single asyncio queue.
+
+    Args:
+        intervention_handlers (List[InterventionHandler] | None, optional): A list of intervention handlers
+            that can intercept messages before they are sent or published. Handlers run in the task that processes
+            the message, not in the message loop, and are skipped for hooks they do not override. Defaults to None.
+        tracer_provider (TracerProvider | None, optional): The tracer provider to use for tracing. Defaults to None.
+        max_queue_size (int, optional): The maximum number of queued messages. When the queue is full,
+            :meth:`send_message` and :meth:`publish_message` wait until there is room. Responses to
+            in-flight requests are never blocked. ``0`` means unbounded. Defaults to 0.
+        prioritize_responses (bool, optional): If ``True``, queued responses are processed ahead of
+            queued sends and publishes so that pending requests resolve first. Defaults to False.
+        dispatch_batch_size (int | None, optional): If set, the message loop started by :meth:`start`
+            dispatches up to this many queued messages per iteration and waits for new messages
+            instead of polling while the queue is empty. In this mode, conditions passed to
+            :meth:`stop_when` are re-evaluated when a message is enqueued or a message handler completes.
+            If ``None``, the loop dispatches one message per iteration. Defaults to None.
+        agent_eviction_policy (AgentEvictionPolicy | None, optional): Policy for evicting idle agent instances.
+            Evicted agents are passivated with ``save_state`` and re-activated through their factory with
+            ``load_state`` on their next message. Defaults to None, which keeps all agent instances in memory.
+        per_agent_mailboxes (bool, optional): If ``True``, messages to the same agent are delivered one at a time,
+            so agents do not need their own locks. Messages to different agents are still handled concurrently.
+            Messages are not guaranteed to be delivered in the order they are dispatched, as intervention
+            handlers run before a message waits for the mailbox. An agent that sends a message to itself
+            bypasses its mailbox, while a chain of sends that leads back to an agent whose handler waits on it
+            fails with a :class:`RuntimeError` instead of deadlocking. Defaults to False.
+        max_concurrent_deliveries (int | None, optional): The maximum number of published message deliveries
+            handled at the same time across all topics. Handlers for further subscribers are started as
+            earlier ones finish, which keeps the number of tasks flat under large fan-outs. Direct messages
+            are not limited, so that handlers waiting on :meth:`send_message` cannot exhaust the limit.
+            Defaults to None, which means no limit.
+    """
+
     def __init__(
         self,
         *,
         intervention_handlers: List[InterventionHandler] | None = None,
         tracer_provider: TracerProvider | None = None,
+        max_queue_size: int = 0,
+        prioritize_responses: bool = False,
+        dispatch_batch_size: int | None = None,
+        agent_eviction_policy: AgentEvictionPolicy | None = None,
+        per_agent_mailboxes: bool = False,
+        max_concurrent_deliveries: int | None = None,
     ) -> None:
+        if dispatch_batch_size is not None and dispatch_batch_size < 1:
+            raise ValueError("dispatch_batch_size must be at least 1.")
+        if max_concurrent_deliveries is not None and max_concurrent_deliveries < 1:
+            raise ValueError("max_concurrent_deliveries must be at least 1.")
         self._tracer_helper = TraceHelper(tracer_provider, MessageRuntimeTracingConfig("SingleThreadedAgentRuntime"))
-        self._message_queue: List[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope] = []
+        self._message_queue: MessageQueue[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope] = (
+            MessageQueue(
+                maxsize=max_queue_size,
+                is_priority=_is_response_envelope if prioritize_responses else None,
+            )
+        )
         # (namespace, type) -> List[AgentId]
         self._agent_factories: Dict[
             str, Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]]
         ] = {}
-        self._instantiated_agents: Dict[AgentId, Agent] = {}
-        self._intervention_handlers = intervention_handlers
+        # Number of parameters of each factory, resolved once at registration.
+        self._agent_factory_num_parameters: Dict[str, int] = {}
+        self._instantiated_agents = AgentInstanceCache(agent_eviction_policy)
+        self._intervention_pipeline = InterventionPipeline(intervention_handlers or [], self._tracer_helper)
         self._outstanding_tasks = Counter()
         self._background_tasks: Set[Task[Any]] = set()
         self._subscription_manager = SubscriptionManager()
         self._run_context: RunContext | None = None
         self._serialization_registry = SerializationRegistry()
+        self._dispatch_batch_size = dispatch_batch_size
+        self._wakeup_event = asyncio.Event()
+        self._agent_mailboxes = AgentMailboxes() if per_agent_mailboxes else None
+        self._delivery_slots = (
+            asyncio.Semaphore(max_concurrent_deliveries) if max_concurrent_deliveries is not None else None
+        )
 
     @property
     def unprocessed_messages(
         self,
     ) -> Sequence[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope]:
-        return self._message_queue
+        return list(self._message_queue)
 
     @property
     def outstanding_tasks(self) -> int:
         return self._outstanding_tasks.get()
 
+    @property
+    def agent_instance_metrics(self) -> AgentInstanceMetrics:
+        """Counters for resident agent instances, activations and evictions."""
+        return self._instantiated_agents.metrics
+
+    @property
+    def intervention_latencies(self) -> Mapping[str, LatencyHistogram]:
+        """Latency histograms of intervention handler calls, keyed by ``"<handler class name>.<hook>"``.
+
+        Handlers that do not override a hook of :class:`~autogen_core.base.intervention.DefaultInterventionHandler`
+        are not called for it and have no histogram for it.
+        """
+        return self._intervention_pipeline.latencies
+
     @property
     def _known_agent_names(self) -> Set[str]:
         return set(self._agent_factories.keys())
@@ -194,15 +308,13 @@ async def send_message(
         if cancellation_token is None:
             cancellation_token = CancellationToken()
 
-        # event_logger.info(
-        #     MessageEvent(
-        #         payload=message,
-        #         sender=sender,
-        #         receiver=recipient,
-        #         kind=MessageKind.DIRECT,
-        #         delivery_stage=DeliveryStage.SEND,
-        #     )
-        # )
+        log_message_event(
+            payload=message,
+            sender=sender,
+            receiver=recipient,
+            kind=MessageKind.DIRECT,
+            delivery_stage=DeliveryStage.SEND,
+        )
 
         with self._tracer_helper.trace_block(
             "create",
@@ -211,13 +323,18 @@ async def send_message(
             extraAttributes={"message_type": type(message).__name__},
         ):
             future = asyncio.get_event_loop().create_future()
-            if recipient.type not in self._known_agent_names:
+            if recipient.type not in self._agent_factories:
                 future.set_exception(Exception("Recipient not found"))
 
-            content = message.__dict__ if hasattr(message, "__dict__") else message
-            logger.info(f"Sending message of type {type(message).__name__} to {recipient.type}: {content}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Sending message of type %s to %s: %s",
+                    type(message).__name__,
+                    recipient.type,
+                    LazyMessageContent(message),
+                )
 
-            self._message_queue.append(
+            await self._message_queue.put(
                 SendMessageEnvelope(
                     message=message,
                     recipient=recipient,
@@ -225,8 +342,10 @@ async def send_message(
                     cancellation_token=cancellation_token,
                     sender=sender,
                     metadata=get_telemetry_envelope_metadata(),
+                    mailboxes_held=mailboxes_held.get(),
                 )
             )
+            self._wakeup_event.set()
 
             cancellation_token.link_future(future)
 
@@ -248,20 +367,22 @@ async def publish_message(
         ):
             if cancellation_token is None:
                 cancellation_token = CancellationToken()
-            content = message.__dict__ if hasattr(message, "__dict__") else message
-            logger.info(f"Publishing message of type {type(message).__name__} to all subscribers: {content}")
-
-            # event_logger.info(
-            #     MessageEvent(
-            #         payload=message,
-            #         sender=sender,
-            #         receiver=None,
-            #         kind=MessageKind.PUBLISH,
-            #         delivery_stage=DeliveryStage.SEND,
-            #     )
-            # )
-
-            self._message_queue.append(
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Publishing message of type %s to all subscribers: %s",
+                    type(message).__name__,
+                    LazyMessageContent(message),
+                )
+
+            log_message_event(
+                payload=message,
+                sender=sender,
+                receiver=None,
+                kind=MessageKind.PUBLISH,
+                delivery_stage=DeliveryStage.SEND,
+            )
+
+            await self._message_queue.put(
                 PublishMessageEnvelope(
                     message=message,
                     cancellation_token=cancellation_token,
@@ -270,9 +391,12 @@ async def publish_message(
                     metadata=get_telemetry_envelope_metadata(),
                 )
             )
+            self._wakeup_event.set()
 
     async def save_state(self) -> Mapping[str, Any]:
         state: Dict[str, Dict[str, Any]] = {}
+        for agent_id, agent_state in self._instantiated_agents.passivated_states:
+            state[str(agent_id)] = dict(agent_state)
         for agent_id in self._instantiated_agents:
             state[str(agent_id)] = dict((await self._get_agent(agent_id)).save_state())
         return state
@@ -280,42 +404,66 @@ async def save_state(self) -> Mapping[str, Any]:
     async def load_state(self, state: Mapping[str, Any]) -> None:
         for agent_id_str in state:
             agent_id = AgentId.from_str(agent_id_str)
-            if agent_id.type in self._known_agent_names:
+            if agent_id.type in self._agent_factories:
                 (await self._get_agent(agent_id)).load_state(state[str(agent_id)])
 
     async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
+        if self._intervention_pipeline.has_send_handlers:
+            try:
+                message = await self._intervention_pipeline.on_send(
+                    message_envelope.message,
+                    sender=message_envelope.sender,
+                    recipient=message_envelope.recipient,
+                    metadata=message_envelope.metadata,
+                )
+            except BaseException as e:
+                message_envelope.future.set_exception(e)
+                self._outstanding_tasks.decrement()
+                return
+            if message is DropMessage:
+                message_envelope.future.set_exception(MessageDroppedException())
+                self._outstanding_tasks.decrement()
+                return
+            message_envelope.message = message
+
         with self._tracer_helper.trace_block("send", message_envelope.recipient, parent=message_envelope.metadata):
             recipient = message_envelope.recipient
             # todo: check if recipient is in the known namespaces
             # assert recipient in self._agents
 
             try:
-                # TODO use id
-                sender_name = message_envelope.sender.type if message_envelope.sender is not None else "Unknown"
-                logger.info(
-                    f"Calling message handler for {recipient} with message type {type(message_envelope.message).__name__} sent by {sender_name}"
-                )
-                # event_logger.info(
-                #     MessageEvent(
-                #         payload=message_envelope.message,
-                #         sender=message_envelope.sender,
-                #         receiver=recipient,
-                #         kind=MessageKind.DIRECT,
-                #         delivery_stage=DeliveryStage.DELIVER,
-                #     )
-                # )
-                recipient_agent = await self._get_agent(recipient)
-                message_context = MessageContext(
+                if logger.isEnabledFor(logging.INFO):
+                    # TODO use id
+                    sender_name = message_envelope.sender.type if message_envelope.sender is not None else "Unknown"
+                    logger.info(
+                        "Calling message handler for %s with message type %s sent by %s",
+                        recipient,
+                        type(message_envelope.message).__name__,
+                        sender_name,
+                    )
+                log_message_event(
+                    payload=message_envelope.message,
                     sender=message_envelope.sender,
-                    topic_id=None,
-                    is_rpc=True,
-                    cancellation_token=message_envelope.cancellation_token,
+                    receiver=recipient,
+                    kind=MessageKind.DIRECT,
+                    delivery_stage=DeliveryStage.DELIVER,
                 )
-                with MessageHandlerContext.populate_context(recipient_agent.id):
-                    response = await recipient_agent.on_message(
-                        message_envelope.message,
-                        ctx=message_context,
+                async with hold_mailbox(
+                    self._agent_mailboxes, recipient, message_envelope.sender, message_envelope.mailboxes_held
+                ):
+                    message_context = MessageContext(
+                        sender=message_envelope.sender,
+                        topic_id=None,
+                        is_rpc=True,
+                        cancellation_token=message_envelope.cancellation_token,
                     )
+                    with self._instantiated_agents.pin(recipient):
+                        recipient_agent = await self._get_agent(recipient)
+                        with MessageHandlerContext.populate_context(recipient_agent.id):
+                            response = await recipient_agent.on_message(
+                                message_envelope.message,
+                                ctx=message_context,
+                            )
             except CancelledError as e:
                 if not message_envelope.future.cancelled():
                     message_envelope.future.set_exception(e)
@@ -326,7 +474,7 @@ async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
                 self._outstanding_tasks.decrement()
                 return
 
-            self._message_queue.append(
+            self._message_queue.force_put(
                 ResponseMessageEnvelope(
                     message=response,
                     future=message_envelope.future,
@@ -335,54 +483,90 @@ async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
                     metadata=get_telemetry_envelope_metadata(),
                 )
             )
+            self._wakeup_event.set()
             self._outstanding_tasks.decrement()
 
     async def _process_publish(self, message_envelope: PublishMessageEnvelope) -> None:
-        with self._tracer_helper.trace_block("publish", message_envelope.topic_id, parent=message_envelope.metadata):
+        if self._intervention_pipeline.has_publish_handlers:
             try:
-                responses: List[Awaitable[Any]] = []
-                recipients = await self._subscription_manager.get_subscribed_recipients(message_envelope.topic_id)
-                for agent_id in recipients:
-                    # Avoid sending the message back to the sender
-                    if message_envelope.sender is not None and agent_id == message_envelope.sender:
-                        continue
+                message = await self._intervention_pipeline.on_publish(
+                    message_envelope.message, sender=message_envelope.sender, metadata=message_envelope.metadata
+                )
+            except BaseException as e:
+                # TODO: we should raise the intervention exception to the publisher.
+                logger.error("Exception raised in in intervention handler: %s", e, exc_info=True)
+                self._outstanding_tasks.decrement()
+                return
+            if message is DropMessage:
+                # TODO log message dropped
+                self._outstanding_tasks.decrement()
+                return
+            message_envelope.message = message
 
-                    sender_agent = (
-                        await self._get_agent(message_envelope.sender) if message_envelope.sender is not None else None
-                    )
-                    sender_name = str(sender_agent.id) if sender_agent is not None else "Unknown"
-                    logger.info(
-                        f"Calling message handler for {agent_id.type} with message type {type(message_envelope.message).__name__} published by {sender_name}"
-                    )
-                    # event_logger.info(
-                    #     MessageEvent(
-                    #         payload=message_envelope.message,
-                    #         sender=message_envelope.sender,
-                    #         receiver=agent,
-                    #         kind=MessageKind.PUBLISH,
-                    #         delivery_stage=DeliveryStage.DELIVER,
-                    #     )
-                    # )
-                    message_context = MessageContext(
-                        sender=message_envelope.sender,
-                        topic_id=message_envelope.topic_id,
-                        is_rpc=False,
-                        cancellation_token=message_envelope.cancellation_token,
+        with self._tracer_helper.trace_block("publish", message_envelope.topic_id, parent=message_envelope.metadata):
+            try:
+                recipients = [
+                    agent_id
+                    for agent_id in await self._subscription_manager.get_subscribed_recipients(
+                        message_envelope.topic_id
                     )
-                    agent = await self._get_agent(agent_id)
-
-                    async def _on_message(agent: Agent, message_context: MessageContext) -> Any:
-                        with self._tracer_helper.trace_block("process", agent.id, parent=None):
-                            with MessageHandlerContext.populate_context(agent.id):
-                                return await agent.on_message(
-                                    message_envelope.message,
-                                    ctx=message_context,
-                                )
-
-                    future = _on_message(agent, message_context)
-                    responses.append(future)
-
-                await asyncio.gather(*responses)
+                    # Avoid sending the message back to the sender
+                    if agent_id != message_envelope.sender
+                ]
+                if logger.isEnabledFor(logging.INFO):
+                    sender_name = str(message_envelope.sender) if message_envelope.sender is not None else "Unknown"
+                    message_type = type(message_envelope.message).__name__
+                    for agent_id in recipients:
+                        logger.info(
+                            "Calling message handler for %s with message type %s published by %s",
+                            agent_id.type,
+                            message_type,
+                            sender_name,
+                        )
+                if event_logger.isEnabledFor(logging.INFO):
+                    for agent_id in recipients:
+                        log_message_event(
+                            payload=message_envelope.message,
+                            sender=message_envelope.sender,
+                            receiver=agent_id,
+                            kind=MessageKind.PUBLISH,
+                            delivery_stage=DeliveryStage.DELIVER,
+                        )
+                deliveries: List[Awaitable[Any]] = []
+                try:
+                    for agent_id in recipients:
+                        # Each recipient gets its own context, as handlers may change it.
+                        message_context = MessageContext(
+                            sender=message_envelope.sender,
+                            topic_id=message_envelope.topic_id,
+                            is_rpc=False,
+                            cancellation_token=message_envelope.cancellation_token,
+                        )
+                        if self._delivery_slots is None:
+                            deliveries.append(
+                                self._deliver_published_message(agent_id, message_envelope, message_context)
+                            )
+                            continue
+                        # Only start a handler when a slot is free, so that a large fan-out does not create
+                        # a task per subscriber up front.
+                        await self._delivery_slots.acquire()
+                        task = asyncio.create_task(
+                            self._deliver_published_message(agent_id, message_envelope, message_context)
+                        )
+                        task.add_done_callback(self._release_delivery_slot)
+                        deliveries.append(task)
+                except BaseException:
+                    # The publish was cancelled while it waited for a slot, so the handlers it started are too.
+                    tasks = [delivery for delivery in deliveries if isinstance(delivery, Task)]
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+
+                results = await asyncio.gather(*deliveries, return_exceptions=True)
+                for agent_id, result in zip(recipients, results, strict=True):
+                    if isinstance(result, BaseException) and not isinstance(result, CancelledError):
+                        logger.error("Error processing publish message for %s", agent_id, exc_info=result)
             except BaseException as e:
                 # Ignore cancelled errors from logs
                 if isinstance(e, CancelledError):
@@ -392,25 +576,50 @@ async def _on_message(agent: Agent, message_context: MessageContext) -> Any:
                 self._outstanding_tasks.decrement()
             # TODO if responses are given for a publish
 
+    async def _deliver_published_message(
+        self, agent_id: AgentId, message_envelope: PublishMessageEnvelope, message_context: MessageContext
+    ) -> Any:
+        async with hold_mailbox(self._agent_mailboxes, agent_id, message_envelope.sender):
+            # The agent is pinned before it is fetched, so that fetching other recipients cannot evict it.
+            with self._instantiated_agents.pin(agent_id):
+                agent = await self._get_agent(agent_id)
+                with self._tracer_helper.trace_block("process", agent.id, parent=None):
+                    with MessageHandlerContext.populate_context(agent.id):
+                        return await agent.on_message(message_envelope.message, ctx=message_context)
+
     async def _process_response(self, message_envelope: ResponseMessageEnvelope) -> None:
+        if self._intervention_pipeline.has_response_handlers:
+            try:
+                message = await self._intervention_pipeline.on_response(
+                    message_envelope.message, sender=message_envelope.sender, recipient=message_envelope.recipient
+                )
+            except BaseException as e:
+                # TODO: should we raise the exception to sender of the response instead?
+                message_envelope.future.set_exception(e)
+                self._outstanding_tasks.decrement()
+                return
+            if message is DropMessage:
+                message_envelope.future.set_exception(MessageDroppedException())
+                self._outstanding_tasks.decrement()
+                return
+            message_envelope.message = message
+
         with self._tracer_helper.trace_block("ack", message_envelope.recipient, parent=message_envelope.metadata):
-            content = (
-                message_envelope.message.__dict__
-                if hasattr(message_envelope.message, "__dict__")
-                else message_envelope.message
-            )
-            logger.info(
-                f"Resolving response with message type {type(message_envelope.message).__name__} for recipient {message_envelope.recipient} from {message_envelope.sender.type}: {content}"
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Resolving response with message type %s for recipient %s from %s: %s",
+                    type(message_envelope.message).__name__,
+                    message_envelope.recipient,
+                    message_envelope.sender.type,
+                    LazyMessageContent(message_envelope.message),
+                )
+            log_message_event(
+                payload=message_envelope.message,
+                sender=message_envelope.sender,
+                receiver=message_envelope.recipient,
+                kind=MessageKind.RESPOND,
+                delivery_stage=DeliveryStage.DELIVER,
             )
-            # event_logger.info(
-            #     MessageEvent(
-            #         payload=message_envelope.message,
-            #         sender=message_envelope.sender,
-            #         receiver=message_envelope.recipient,
-            #         kind=MessageKind.RESPOND,
-            #         delivery_stage=DeliveryStage.DELIVER,
-            #     )
-            # )
             self._outstanding_tasks.decrement()
             if not message_envelope.future.cancelled():
                 message_envelope.future.set_result(message_envelope.message)
@@ -418,81 +627,53 @@ async def _process_response(self, message_envelope: ResponseMessageEnvelope) ->
     async def process_next(self) -> None:
         """Process the next message in the queue."""
 
-        if len(self._message_queue) == 0:
+        if self._message_queue.empty():
             # Yield control to the event loop to allow other tasks to run
             await asyncio.sleep(0)
             return
-        message_envelope = self._message_queue.pop(0)
+        self._dispatch(self._message_queue.get_nowait())
+
+        # Yield control to the message loop to allow other tasks to run
+        await asyncio.sleep(0)
+
+    async def _process_batch(self, batch_size: int) -> int:
+        """Dispatch up to ``batch_size`` queued messages and return the number dispatched."""
+        num_processed = 0
+        while num_processed < batch_size and not self._message_queue.empty():
+            self._dispatch(self._message_queue.get_nowait())
+            num_processed += 1
+        if num_processed > 0:
+            # Yield control to the event loop once per batch to let the dispatched tasks run.
+            await asyncio.sleep(0)
+        return num_processed
 
+    def _dispatch(
+        self, message_envelope: PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope
+    ) -> None:
+        # Intervention handlers run in the per-message task so that a slow handler does not stall the loop.
+        self._outstanding_tasks.increment()
         match message_envelope:
-            case SendMessageEnvelope(message=message, sender=sender, recipient=recipient, future=future):
-                if self._intervention_handlers is not None:
-                    for handler in self._intervention_handlers:
-                        with self._tracer_helper.trace_block(
-                            "intercept", handler.__class__.__name__, parent=message_envelope.metadata
-                        ):
-                            try:
-                                temp_message = await handler.on_send(message, sender=sender, recipient=recipient)
-                            except BaseException as e:
-                                future.set_exception(e)
-                                return
-                            if temp_message is DropMessage or isinstance(temp_message, DropMessage):
-                                future.set_exception(MessageDroppedException())
-                                return
-
-                        message_envelope.message = temp_message
-                self._outstanding_tasks.increment()
+            case SendMessageEnvelope():
                 task = asyncio.create_task(self._process_send(message_envelope))
-                self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
-            case PublishMessageEnvelope(
-                message=message,
-                sender=sender,
-            ):
-                if self._intervention_handlers is not None:
-                    for handler in self._intervention_handlers:
-                        with self._tracer_helper.trace_block(
-                            "intercept", handler.__class__.__name__, parent=message_envelope.metadata
-                        ):
-                            try:
-                                temp_message = await handler.on_publish(message, sender=sender)
-                            except BaseException as e:
-                                # TODO: we should raise the intervention exception to the publisher.
-                                logger.error(f"Exception raised in in intervention handler: {e}", exc_info=True)
-                                return
-                            if temp_message is DropMessage or isinstance(temp_message, DropMessage):
-                                # TODO log message dropped
-                                return
-
-                        message_envelope.message = temp_message
-                self._outstanding_tasks.increment()
+            case PublishMessageEnvelope():
                 task = asyncio.create_task(self._process_publish(message_envelope))
-                self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
-            case ResponseMessageEnvelope(message=message, sender=sender, recipient=recipient, future=future):
-                if self._intervention_handlers is not None:
-                    for handler in self._intervention_handlers:
-                        try:
-                            temp_message = await handler.on_response(message, sender=sender, recipient=recipient)
-                        except BaseException as e:
-                            # TODO: should we raise the exception to sender of the response instead?
-                            future.set_exception(e)
-                            return
-                        if temp_message is DropMessage or isinstance(temp_message, DropMessage):
-                            future.set_exception(MessageDroppedException())
-                            return
-                        message_envelope.message = temp_message
-                self._outstanding_tasks.increment()
+            case ResponseMessageEnvelope():
                 task = asyncio.create_task(self._process_response(message_envelope))
-                self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
 
-        # Yield control to the message loop to allow other tasks to run
-        await asyncio.sleep(0)
+    def _release_delivery_slot(self, task: Task[Any]) -> None:
+        assert self._delivery_slots is not None
+        self._delivery_slots.release()
+
+    def _on_background_task_done(self, task: Task[Any]) -> None:
+        self._background_tasks.discard(task)
+        # Wake the message loop so that it re-evaluates its end condition.
+        self._wakeup_event.set()
 
     @property
     def idle(self) -> bool:
-        return len(self._message_queue) == 0 and self._outstanding_tasks.get() == 0
+        return self._message_queue.empty() and self._outstanding_tasks.get() == 0
 
     def start(self) -> None:
         """Start the runtime message processing loop."""
@@ -560,6 +741,7 @@ async def register(
                 await self.add_subscription(subscription)
 
         self._agent_factories[type] = agent_factory
+        self._agent_factory_num_parameters[type] = len(inspect.signature(agent_factory).parameters)
         return AgentType(type)
 
     async def register_factory(
@@ -579,12 +761,13 @@ async def factory_wrapper() -> T:
             else:
                 agent_instance = maybe_agent_instance
 
-            if type_func_alias(agent_instance) != expected_class:
+            if type_func_alias(agent_instance) is not expected_class:
                 raise ValueError("Factory registered using the wrong type.")
 
             return agent_instance
 
         self._agent_factories[type.type] = factory_wrapper
+        self._agent_factory_num_parameters[type.type] = 0
 
         return type
 
@@ -592,12 +775,15 @@ async def _invoke_agent_factory(
         self,
         agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
         agent_id: AgentId,
+        num_parameters: int | None = None,
     ) -> T:
+        if num_parameters is None:
+            num_parameters = len(inspect.signature(agent_factory).parameters)
         with AgentInstantiationContext.populate_context((self, agent_id)):
-            if len(inspect.signature(agent_factory).parameters) == 0:
+            if num_parameters == 0:
                 factory_one = cast(Callable[[], T], agent_factory)
                 agent = factory_one()
-            elif len(inspect.signature(agent_factory).parameters) == 2:
+            elif num_parameters == 2:
                 warnings.warn(
                     "Agent factories that take two arguments are deprecated. Use AgentInstantiationContext instead. Two arg factories will be removed in a future version.",
                     stacklevel=2,
@@ -613,15 +799,21 @@ async def _invoke_agent_factory(
             return agent
 
     async def _get_agent(self, agent_id: AgentId) -> Agent:
-        if agent_id in self._instantiated_agents:
-            return self._instantiated_agents[agent_id]
+        agent = self._instantiated_agents.get(agent_id)
+        if agent is not None:
+            return agent
 
         if agent_id.type not in self._agent_factories:
             raise LookupError(f"Agent with name {agent_id.type} not found.")
 
         agent_factory = self._agent_factories[agent_id.type]
-        agent = await self._invoke_agent_factory(agent_factory, agent_id)
-        self._instantiated_agents[agent_id] = agent
+        agent = await self._invoke_agent_factory(
+            agent_factory, agent_id, self._agent_factory_num_parameters[agent_id.type]
+        )
+        passivated_state = self._instantiated_agents.pop_passivated_state(agent_id)
+        if passivated_state is not None:
+            agent.load_state(passivated_state)
+        self._instantiated_agents.add(agent_id, agent, reactivated=passivated_state is not None)
         return agent
 
     # TODO: uncomment out the following type ignore when this is fixed in mypy: https://github.com/python/mypy/issues/3737
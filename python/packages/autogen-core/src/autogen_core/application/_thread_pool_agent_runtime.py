@@ -0,0 +1,703 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import warnings
+from collections import defaultdict
+from concurrent.futures import Future as ConcurrentFuture
+from contextlib import AbstractAsyncContextManager
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    DefaultDict,
+    Dict,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
+
+from opentelemetry.trace import TracerProvider
+from typing_extensions import deprecated
+
+from ..base import (
+    Agent,
+    AgentId,
+    AgentInstantiationContext,
+    AgentMetadata,
+    AgentRuntime,
+    AgentType,
+    CancellationToken,
+    MessageContext,
+    MessageHandlerContext,
+    Subscription,
+    SubscriptionInstantiationContext,
+    TopicId,
+)
+from ..base._serialization import MessageSerializer, SerializationRegistry
+from ..base.exceptions import MessageDroppedException
+from ..base.intervention import DropMessage, InterventionHandler
+from ._agent_mailboxes import AgentMailboxes, MailboxDelivery, hold_mailbox, mailboxes_held
+from ._helpers import SubscriptionManager, get_impl
+from ._intervention_pipeline import InterventionPipeline, LatencyHistogram
+from ._message_logging import LazyMessageContent, log_message_event
+from .logging.events import DeliveryStage, MessageKind
+from .telemetry import EnvelopeMetadata, MessageRuntimeTracingConfig, TraceHelper, get_telemetry_envelope_metadata
+
+logger = logging.getLogger("autogen_core")
+event_logger = logging.getLogger("autogen_core.events")
+
+# We use a type parameter in some functions which shadows the built-in `type` function.
+# This is a workaround to avoid shadowing the built-in `type` function.
+type_func_alias = type
+
+T = TypeVar("T", bound=Agent)
+R = TypeVar("R")
+
+
+class _Worker:
+    """An event loop running in its own thread, and the agents pinned to it."""
+
+    def __init__(self, index: int, per_agent_mailboxes: bool) -> None:
+        self.index = index
+        self.agents: Dict[AgentId, Agent] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._per_agent_mailboxes = per_agent_mailboxes
+        self._mailboxes: AgentMailboxes | None = None
+
+    def is_current(self) -> bool:
+        return self._thread is not None and self._thread.ident == threading.get_ident()
+
+    def start(self) -> None:
+        loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, args=(loop,), name=f"ThreadPoolAgentRuntime-{self.index}", daemon=True
+        )
+        self._thread.start()
+        self.loop = loop
+
+    def _run(self, loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        # Mailboxes hold asyncio primitives, so they are created on the loop that uses them.
+        self._mailboxes = AgentMailboxes() if self._per_agent_mailboxes else None
+        loop.run_forever()
+
+    async def stop(self) -> None:
+        loop, thread = self.loop, self._thread
+        assert loop is not None and thread is not None
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_cancel_all_tasks(), loop))
+        loop.call_soon_threadsafe(loop.stop)
+        await asyncio.to_thread(thread.join)
+        loop.close()
+        self.loop = None
+        self._thread = None
+
+    def mailbox(
+        self,
+        recipient: AgentId,
+        sender: AgentId | None,
+        held: Tuple[Tuple[AgentId, MailboxDelivery], ...] = (),
+    ) -> AbstractAsyncContextManager[None]:
+        # Agents are pinned to one worker, so the mailbox of the recipient is always in this worker.
+        return hold_mailbox(self._mailboxes, recipient, sender, held)
+
+
+async def _cancel_all_tasks() -> None:
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ThreadPoolAgentRuntime(AgentRuntime):
+    """An agent runtime that runs agents on a pool of worker threads, each with its own event loop.
+
+    Every :class:`~autogen_core.base.AgentId` is pinned to one worker by its hash, so an agent's handlers always
+    run on the same thread and loop, and messages from one sender to an agent start in the order they were sent.
+    Agents on different workers run in parallel, which lets handlers that spend their time in code that releases
+    the GIL, such as tokenizers, image codecs, parsers or I/O, use more than one core. Pure Python
+    computation still contends for the GIL.
+
+    Handlers call back into the runtime as usual: a message sent to an agent on another worker is handed to that
+    worker's loop and the result is returned to the caller's loop.
+
+    .. note::
+
+        Agents on different workers share nothing but the runtime. State shared between agents, and
+        intervention handlers, which are called from the worker threads, must be thread-safe.
+
+    Args:
+        num_workers (int | None, optional): The number of worker threads. Defaults to None, which uses
+            the number of CPUs.
+        intervention_handlers (List[InterventionHandler] | None, optional): A list of intervention handlers that
+            can intercept messages. Send and response handlers run on the recipient's worker. Publish handlers
+            run in :meth:`publish_message` before the message is handed to the workers. Defaults to None.
+        per_agent_mailboxes (bool, optional): If ``True``, messages to the same agent are delivered one at a time.
+            See :class:`~autogen_core.application.SingleThreadedAgentRuntime`. Defaults to False.
+        tracer_provider (TracerProvider | None, optional): The tracer provider to use for tracing. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        *,
+        num_workers: int | None = None,
+        intervention_handlers: List[InterventionHandler] | None = None,
+        per_agent_mailboxes: bool = False,
+        tracer_provider: TracerProvider | None = None,
+    ) -> None:
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1.")
+        self._workers = [_Worker(index, per_agent_mailboxes) for index in range(num_workers)]
+        self._agent_factories: Dict[
+            str, Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]]
+        ] = {}
+        # Number of parameters of each factory, resolved once at registration.
+        self._agent_factory_num_parameters: Dict[str, int] = {}
+        self._tracer_helper = TraceHelper(tracer_provider, MessageRuntimeTracingConfig("ThreadPoolAgentRuntime"))
+        self._intervention_pipeline = InterventionPipeline(intervention_handlers or [], self._tracer_helper)
+        self._subscription_manager = SubscriptionManager()
+        # The subscription manager is not thread-safe and is used from every worker.
+        self._subscription_lock = threading.Lock()
+        self._serialization_registry = SerializationRegistry()
+        self._started = asyncio.Event()
+        # Publishes made before the runtime is started, waiting to be handed to the workers.
+        self._pending_publishes: Set[asyncio.Task[None]] = set()
+        self._outstanding_lock = threading.Lock()
+        self._outstanding = 0
+        # Loops and events of callers waiting in stop_when, notified whenever a message is done.
+        self._waiters: List[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._workers)
+
+    @property
+    def idle(self) -> bool:
+        return self._outstanding == 0
+
+    @property
+    def intervention_latencies(self) -> Mapping[str, LatencyHistogram]:
+        """Latency histograms of intervention handler calls, keyed by ``"<handler class name>.<hook>"``."""
+        return self._intervention_pipeline.latencies
+
+    def _worker_for(self, agent_id: AgentId) -> _Worker:
+        return self._workers[hash(agent_id) % len(self._workers)]
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        if self._started.is_set():
+            raise RuntimeError("Runtime is already started")
+        for worker in self._workers:
+            worker.start()
+        self._started.set()
+
+    async def stop(self) -> None:
+        """Stop the worker threads. Messages that are still being processed are cancelled."""
+        if not self._started.is_set():
+            raise RuntimeError("Runtime is not started")
+        if any(worker.is_current() for worker in self._workers):
+            raise RuntimeError("The runtime cannot be stopped from one of its own workers.")
+        self._started.clear()
+        for task in self._pending_publishes:
+            task.cancel()
+        await asyncio.gather(*self._pending_publishes, return_exceptions=True)
+        await asyncio.gather(*[worker.stop() for worker in self._workers])
+
+    async def stop_when_idle(self) -> None:
+        """Stop the worker threads when there is no outstanding message being processed."""
+        await self.stop_when(lambda: self.idle)
+
+    async def stop_when(self, condition: Callable[[], bool]) -> None:
+        """Stop the worker threads when the condition is met.
+
+        The condition is evaluated on the calling loop when this method is called and whenever a message
+        finishes processing.
+        """
+        if not self._started.is_set():
+            raise RuntimeError("Runtime is not started")
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._outstanding_lock:
+            self._waiters.append(waiter)
+        try:
+            while True:
+                event.clear()
+                if condition():
+                    break
+                await event.wait()
+        finally:
+            with self._outstanding_lock:
+                self._waiters.remove(waiter)
+        await self.stop()
+
+    def _submit(self, worker: _Worker, coro: Coroutine[Any, Any, R]) -> ConcurrentFuture[R]:
+        assert worker.loop is not None
+        with self._outstanding_lock:
+            self._outstanding += 1
+        future = asyncio.run_coroutine_threadsafe(coro, worker.loop)
+        future.add_done_callback(self._on_message_done)
+        return future
+
+    def _on_message_done(self, future: ConcurrentFuture[Any]) -> None:
+        self._message_done()
+
+    def _message_done(self) -> None:
+        with self._outstanding_lock:
+            self._outstanding -= 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    async def _run_on_worker(self, agent_id: AgentId, coro: Coroutine[Any, Any, R]) -> R:
+        """Run ``coro`` on the worker of ``agent_id``, or on the calling loop if the workers are not running."""
+        worker = self._worker_for(agent_id)
+        if worker.loop is None or worker.is_current():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, worker.loop))
+
+    # Returns the response of the message
+    async def send_message(
+        self,
+        message: Any,
+        recipient: AgentId,
+        *,
+        sender: AgentId | None = None,
+        cancellation_token: CancellationToken | None = None,
+    ) -> Any:
+        if cancellation_token is None:
+            cancellation_token = CancellationToken()
+
+        log_message_event(
+            payload=message,
+            sender=sender,
+            receiver=recipient,
+            kind=MessageKind.DIRECT,
+            delivery_stage=DeliveryStage.SEND,
+        )
+        with self._tracer_helper.trace_block(
+            "create",
+            recipient,
+            parent=None,
+            extraAttributes={"message_type": type(message).__name__},
+        ):
+            if recipient.type not in self._agent_factories:
+                raise Exception("Recipient not found")
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Sending message of type %s to %s: %s",
+                    type(message).__name__,
+                    recipient.type,
+                    LazyMessageContent(message),
+                )
+
+            if not self._started.is_set():
+                await self._started.wait()
+            worker = self._worker_for(recipient)
+            # The context of the caller does not follow the message to the worker, so the chain of mailboxes
+            # and the trace context are passed along.
+            held = mailboxes_held.get()
+            metadata = get_telemetry_envelope_metadata()
+            worker_token = self._worker_token(worker, cancellation_token)
+            future = asyncio.wrap_future(
+                self._submit(
+                    worker, self._process_send(worker, message, recipient, sender, held, metadata, worker_token)
+                )
+            )
+            loop = asyncio.get_running_loop()
+
+            def _cancel() -> None:
+                # The token may be cancelled from any thread, but the future belongs to this loop.
+                loop.call_soon_threadsafe(future.cancel)
+
+            cancellation_token.add_callback(_cancel)
+            response, response_metadata = await future
+            with self._tracer_helper.trace_block("ack", sender, parent=response_metadata):
+                log_message_event(
+                    payload=response,
+                    sender=recipient,
+                    receiver=sender,
+                    kind=MessageKind.RESPOND,
+                    delivery_stage=DeliveryStage.DELIVER,
+                )
+            return response
+
+    async def publish_message(
+        self,
+        message: Any,
+        topic_id: TopicId,
+        *,
+        sender: AgentId | None = None,
+        cancellation_token: CancellationToken | None = None,
+    ) -> None:
+        if cancellation_token is None:
+            cancellation_token = CancellationToken()
+        # The span only covers creating the message, the workers process it in spans of their own.
+        with self._tracer_helper.trace_block(
+            "create",
+            topic_id,
+            parent=None,
+            extraAttributes={"message_type": type(message).__name__},
+        ):
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Publishing message of type %s to all subscribers: %s",
+                    type(message).__name__,
+                    LazyMessageContent(message),
+                )
+
+            log_message_event(
+                payload=message,
+                sender=sender,
+                receiver=None,
+                kind=MessageKind.PUBLISH,
+                delivery_stage=DeliveryStage.SEND,
+            )
+            metadata = get_telemetry_envelope_metadata()
+
+        if self._started.is_set():
+            await self._dispatch_publish(message, topic_id, sender, metadata, cancellation_token)
+            return
+        # Like SingleThreadedAgentRuntime, publishing before the runtime is started does not block.
+        with self._outstanding_lock:
+            self._outstanding += 1
+        task = asyncio.create_task(
+            self._dispatch_publish_when_started(message, topic_id, sender, metadata, cancellation_token)
+        )
+        self._pending_publishes.add(task)
+        task.add_done_callback(self._pending_publishes.discard)
+
+    async def _dispatch_publish_when_started(
+        self,
+        message: Any,
+        topic_id: TopicId,
+        sender: AgentId | None,
+        metadata: EnvelopeMetadata,
+        cancellation_token: CancellationToken,
+    ) -> None:
+        try:
+            await self._started.wait()
+            await self._dispatch_publish(message, topic_id, sender, metadata, cancellation_token)
+        finally:
+            self._message_done()
+
+    async def _dispatch_publish(
+        self,
+        message: Any,
+        topic_id: TopicId,
+        sender: AgentId | None,
+        metadata: EnvelopeMetadata,
+        cancellation_token: CancellationToken,
+    ) -> None:
+        if self._intervention_pipeline.has_publish_handlers:
+            try:
+                message = await self._intervention_pipeline.on_publish(message, sender=sender, metadata=metadata)
+            except BaseException as e:
+                logger.error("Exception raised in in intervention handler: %s", e, exc_info=True)
+                return
+            if message is DropMessage:
+                return
+
+        with self._subscription_lock:
+            # The subscription manager never suspends, so the lock is not held across a suspension point.
+            recipients = await self._subscription_manager.get_subscribed_recipients(topic_id)
+        recipients_by_worker: DefaultDict[int, List[AgentId]] = defaultdict(list)
+        for agent_id in recipients:
+            # Avoid sending the message back to the sender
+            if agent_id != sender:
+                recipients_by_worker[self._worker_for(agent_id).index].append(agent_id)
+
+        for index, agent_ids in recipients_by_worker.items():
+            worker = self._workers[index]
+            worker_token = self._worker_token(worker, cancellation_token)
+            self._submit(
+                worker, self._process_publish(worker, message, agent_ids, sender, topic_id, metadata, worker_token)
+            )
+
+    def _worker_token(self, worker: _Worker, cancellation_token: CancellationToken) -> CancellationToken:
+        """A token for the handlers on the worker, cancelled on the worker's loop when ``cancellation_token`` is.
+
+        Handlers link their own futures to the token, and those may only be cancelled from the worker's thread."""
+        loop = worker.loop
+        assert loop is not None
+        worker_token = CancellationToken()
+
+        def _cancel() -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(worker_token.cancel)
+
+        cancellation_token.add_callback(_cancel)
+        return worker_token
+
+    async def _process_send(
+        self,
+        worker: _Worker,
+        message: Any,
+        recipient: AgentId,
+        sender: AgentId | None,
+        held: Tuple[Tuple[AgentId, MailboxDelivery], ...],
+        metadata: EnvelopeMetadata,
+        cancellation_token: CancellationToken,
+    ) -> Tuple[Any, EnvelopeMetadata]:
+        """Return the response, and the trace context that the caller acknowledges it in."""
+        if self._intervention_pipeline.has_send_handlers:
+            message = await self._intervention_pipeline.on_send(
+                message, sender=sender, recipient=recipient, metadata=metadata
+            )
+            if message is DropMessage:
+                raise MessageDroppedException()
+
+        with self._tracer_helper.trace_block("send", recipient, parent=metadata):
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Calling message handler for %s with message type %s sent by %s",
+                    recipient,
+                    type(message).__name__,
+                    sender.type if sender is not None else "Unknown",
+                )
+            log_message_event(
+                payload=message,
+                sender=sender,
+                receiver=recipient,
+                kind=MessageKind.DIRECT,
+                delivery_stage=DeliveryStage.DELIVER,
+            )
+            async with worker.mailbox(recipient, sender, held):
+                agent = await self._get_agent(recipient)
+                message_context = MessageContext(
+                    sender=sender, topic_id=None, is_rpc=True, cancellation_token=cancellation_token
+                )
+                with MessageHandlerContext.populate_context(agent.id):
+                    response = await agent.on_message(message, ctx=message_context)
+            response_metadata = get_telemetry_envelope_metadata()
+
+        if self._intervention_pipeline.has_response_handlers:
+            response = await self._intervention_pipeline.on_response(response, sender=recipient, recipient=sender)
+            if response is DropMessage:
+                raise MessageDroppedException()
+        return response, response_metadata
+
+    async def _process_publish(
+        self,
+        worker: _Worker,
+        message: Any,
+        recipients: List[AgentId],
+        sender: AgentId | None,
+        topic_id: TopicId,
+        metadata: EnvelopeMetadata,
+        cancellation_token: CancellationToken,
+    ) -> None:
+        with self._tracer_helper.trace_block("publish", topic_id, parent=metadata):
+            if logger.isEnabledFor(logging.INFO):
+                sender_name = str(sender) if sender is not None else "Unknown"
+                for agent_id in recipients:
+                    logger.info(
+                        "Calling message handler for %s with message type %s published by %s",
+                        agent_id.type,
+                        type(message).__name__,
+                        sender_name,
+                    )
+            if event_logger.isEnabledFor(logging.INFO):
+                for agent_id in recipients:
+                    log_message_event(
+                        payload=message,
+                        sender=sender,
+                        receiver=agent_id,
+                        kind=MessageKind.PUBLISH,
+                        delivery_stage=DeliveryStage.DELIVER,
+                    )
+
+            async def _on_message(agent_id: AgentId) -> None:
+                # Each recipient gets its own context, as handlers may change it.
+                message_context = MessageContext(
+                    sender=sender, topic_id=topic_id, is_rpc=False, cancellation_token=cancellation_token
+                )
+                async with worker.mailbox(agent_id, sender):
+                    agent = await self._get_agent(agent_id)
+                    with self._tracer_helper.trace_block("process", agent.id, parent=None):
+                        with MessageHandlerContext.populate_context(agent.id):
+                            await agent.on_message(message, ctx=message_context)
+
+            results = await asyncio.gather(*[_on_message(agent_id) for agent_id in recipients], return_exceptions=True)
+            for agent_id, result in zip(recipients, results, strict=True):
+                if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                    logger.error("Error processing publish message for %s", agent_id, exc_info=result)
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state: Dict[str, Dict[str, Any]] = {}
+        for worker in self._workers:
+            for agent_id in list(worker.agents):
+                state[str(agent_id)] = dict(await self.agent_save_state(agent_id))
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        for agent_id_str in state:
+            agent_id = AgentId.from_str(agent_id_str)
+            if agent_id.type in self._agent_factories:
+                await self.agent_load_state(agent_id, state[agent_id_str])
+
+    async def agent_metadata(self, agent: AgentId) -> AgentMetadata:
+        return (await self._run_on_worker(agent, self._get_agent(agent))).metadata
+
+    async def agent_save_state(self, agent: AgentId) -> Mapping[str, Any]:
+        async def _save_state() -> Mapping[str, Any]:
+            return (await self._get_agent(agent)).save_state()
+
+        return await self._run_on_worker(agent, _save_state())
+
+    async def agent_load_state(self, agent: AgentId, state: Mapping[str, Any]) -> None:
+        async def _load_state() -> None:
+            (await self._get_agent(agent)).load_state(state)
+
+        await self._run_on_worker(agent, _load_state())
+
+    @deprecated(
+        "Use your agent's `register` method directly instead of this method. See documentation for latest usage."
+    )
+    async def register(
+        self,
+        type: str,
+        agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
+        subscriptions: Callable[[], list[Subscription] | Awaitable[list[Subscription]]]
+        | list[Subscription]
+        | None = None,
+    ) -> AgentType:
+        if type in self._agent_factories:
+            raise ValueError(f"Agent with type {type} already exists.")
+
+        if subscriptions is not None:
+            if callable(subscriptions):
+                with SubscriptionInstantiationContext.populate_context(AgentType(type)):
+                    subscriptions_list_result = subscriptions()
+                    if inspect.isawaitable(subscriptions_list_result):
+                        subscriptions_list = await subscriptions_list_result
+                    else:
+                        subscriptions_list = subscriptions_list_result
+            else:
+                subscriptions_list = subscriptions
+
+            for subscription in subscriptions_list:
+                await self.add_subscription(subscription)
+
+        self._agent_factories[type] = agent_factory
+        self._agent_factory_num_parameters[type] = len(inspect.signature(agent_factory).parameters)
+        return AgentType(type)
+
+    async def register_factory(
+        self,
+        *,
+        type: AgentType,
+        agent_factory: Callable[[], T | Awaitable[T]],
+        expected_class: type[T],
+    ) -> AgentType:
+        if type.type in self._agent_factories:
+            raise ValueError(f"Agent with type {type} already exists.")
+
+        async def factory_wrapper() -> T:
+            maybe_agent_instance = agent_factory()
+            if inspect.isawaitable(maybe_agent_instance):
+                agent_instance = await maybe_agent_instance
+            else:
+                agent_instance = maybe_agent_instance
+
+            if type_func_alias(agent_instance) is not expected_class:
+                raise ValueError("Factory registered using the wrong type.")
+
+            return agent_instance
+
+        self._agent_factories[type.type] = factory_wrapper
+        self._agent_factory_num_parameters[type.type] = 0
+
+        return type
+
+    async def _invoke_agent_factory(
+        self,
+        agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
+        agent_id: AgentId,
+        num_parameters: int,
+    ) -> T:
+        with AgentInstantiationContext.populate_context((self, agent_id)):
+            if num_parameters == 0:
+                factory_one = cast(Callable[[], T], agent_factory)
+                agent = factory_one()
+            elif num_parameters == 2:
+                warnings.warn(
+                    "Agent factories that take two arguments are deprecated. Use AgentInstantiationContext instead. Two arg factories will be removed in a future version.",
+                    stacklevel=2,
+                )
+                factory_two = cast(Callable[[AgentRuntime, AgentId], T], agent_factory)
+                agent = factory_two(self, agent_id)
+            else:
+                raise ValueError("Agent factory must take 0 or 2 arguments.")
+
+            if inspect.isawaitable(agent):
+                return cast(T, await agent)
+
+            return agent
+
+    async def _get_agent(self, agent_id: AgentId) -> Agent:
+        """Return the agent, creating it if needed. Must run on the agent's worker, or while workers are stopped."""
+        worker = self._worker_for(agent_id)
+        agent = worker.agents.get(agent_id)
+        if agent is not None:
+            return agent
+
+        if agent_id.type not in self._agent_factories:
+            raise LookupError(f"Agent with name {agent_id.type} not found.")
+
+        agent = await self._invoke_agent_factory(
+            self._agent_factories[agent_id.type], agent_id, self._agent_factory_num_parameters[agent_id.type]
+        )
+        # Another message may have created the agent while an async factory was running.
+        return worker.agents.setdefault(agent_id, agent)
+
+    # TODO: uncomment out the following type ignore when this is fixed in mypy: https://github.com/python/mypy/issues/3737
+    async def try_get_underlying_agent_instance(self, id: AgentId, type: Type[T] = Agent) -> T:  # type: ignore[assignment]
+        if id.type not in self._agent_factories:
+            raise LookupError(f"Agent with name {id.type} not found.")
+
+        agent_instance = await self._run_on_worker(id, self._get_agent(id))
+
+        if not isinstance(agent_instance, type):
+            raise TypeError(
+                f"Agent with name {id.type} is not of type {type.__name__}. It is of type {type_func_alias(agent_instance).__name__}"
+            )
+
+        return agent_instance
+
+    async def add_subscription(self, subscription: Subscription) -> None:
+        with self._subscription_lock:
+            await self._subscription_manager.add_subscription(subscription)
+
+    async def remove_subscription(self, id: str) -> None:
+        with self._subscription_lock:
+            await self._subscription_manager.remove_subscription(id)
+
+    async def get(
+        self, id_or_type: AgentId | AgentType | str, /, key: str = "default", *, lazy: bool = True
+    ) -> AgentId:
+        async def _instantiate(agent_id: AgentId) -> Agent:
+            return await self._run_on_worker(agent_id, self._get_agent(agent_id))
+
+        return await get_impl(
+            id_or_type=id_or_type,
+            key=key,
+            lazy=lazy,
+            instance_getter=_instantiate,
+        )
+
+    def add_message_serializer(self, serializer: MessageSerializer[Any] | Sequence[MessageSerializer[Any]]) -> None:
+        self._serialization_registry.add_serializer(serializer)
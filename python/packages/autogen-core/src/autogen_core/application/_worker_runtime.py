@@ -51,6 +51,7 @@
     TopicId,
 )
 from ..components import TypeSubscription
+from ._agent_instance_cache import AgentEvictionPolicy, AgentInstanceCache, AgentInstanceMetrics
 from ._helpers import SubscriptionManager, get_impl
 from .protos import agent_worker_pb2, agent_worker_pb2_grpc
 from .telemetry import MessageRuntimeTracingConfig, TraceHelper, get_telemetry_grpc_metadata
@@ -152,12 +153,12 @@ async def _connect(  # type: ignore
                 logger.info("EOF")
                 break
             message = cast(agent_worker_pb2.Message, message)
-            logger.info(f"Received a message from host: {message}")
+            logger.info("Received a message from host: %s", message)
             await receive_queue.put(message)
             logger.info("Put message in receive queue")
 
     async def send(self, message: agent_worker_pb2.Message) -> None:
-        logger.info(f"Send message to host: {message}")
+        logger.info("Send message to host: %s", message)
         await self._send_queue.put(message)
         logger.info("Put message in send queue")
 
@@ -172,6 +173,7 @@ def __init__(
         host_address: str,
         tracer_provider: TracerProvider | None = None,
         extra_grpc_config: ChannelArgumentType | None = None,
+        agent_eviction_policy: AgentEvictionPolicy | None = None,
     ) -> None:
         self._host_address = host_address
         self._trace_helper = TraceHelper(tracer_provider, MessageRuntimeTracingConfig("Worker Runtime"))
@@ -179,7 +181,9 @@ def __init__(
         self._agent_factories: Dict[
             str, Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]]
         ] = {}
-        self._instantiated_agents: Dict[AgentId, Agent] = {}
+        # Number of parameters of each factory, resolved once at registration.
+        self._agent_factory_num_parameters: Dict[str, int] = {}
+        self._instantiated_agents = AgentInstanceCache(agent_eviction_policy)
         self._known_namespaces: set[str] = set()
         self._read_task: None | Task[None] = None
         self._running = False
@@ -196,7 +200,7 @@ def start(self) -> None:
         """Start the runtime in a background task."""
         if self._running:
             raise ValueError("Runtime is already running.")
-        logger.info(f"Connecting to host: {self._host_address}")
+        logger.info("Connecting to host: %s", self._host_address)
         self._host_connection = HostConnection.from_host_address(
             self._host_address, extra_grpc_config=self._extra_grpc_config
         )
@@ -219,7 +223,7 @@ async def _run_read_loop(self) -> None:
                 oneofcase = agent_worker_pb2.Message.WhichOneof(message, "message")
                 match oneofcase:
                     case "registerAgentTypeRequest" | "addSubscriptionRequest":
-                        logger.warning(f"Cant handle {oneofcase}, skipping.")
+                        logger.warning("Cant handle %s, skipping.", oneofcase)
                     case "request":
                         task = asyncio.create_task(self._process_request(message.request))
                         self._background_tasks.add(task)
@@ -252,7 +256,7 @@ async def _run_read_loop(self) -> None:
                     case None:
                         logger.warning("No message")
                     case other:
-                        logger.error(f"Unknown message type: {other}")
+                        logger.error("Unknown message type: %s", other)
             except Exception as e:
                 logger.error("Error in read loop", exc_info=e)
 
@@ -302,6 +306,11 @@ def signal_handler() -> None:
     def _known_agent_names(self) -> Set[str]:
         return set(self._agent_factories.keys())
 
+    @property
+    def agent_instance_metrics(self) -> AgentInstanceMetrics:
+        """Counters for resident agent instances, activations and evictions."""
+        return self._instantiated_agents.metrics
+
     async def _send_message(
         self,
         runtime_message: agent_worker_pb2.Message,
@@ -424,9 +433,9 @@ async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
         sender: AgentId | None = None
         if request.HasField("source"):
             sender = AgentId(request.source.type, request.source.key)
-            logging.info(f"Processing request from {sender} to {recipient}")
+            logger.info("Processing request from %s to %s", sender, recipient)
         else:
-            logging.info(f"Processing request from unknown source to {recipient}")
+            logger.info("Processing request from unknown source to %s", recipient)
 
         # Deserialize the message.
         message = self._serialization_registry.deserialize(
@@ -435,37 +444,39 @@ async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
             data_content_type=request.payload.data_content_type,
         )
 
-        # Get the receiving agent and prepare the message context.
-        rec_agent = await self._get_agent(recipient)
-        message_context = MessageContext(
-            sender=sender,
-            topic_id=None,
-            is_rpc=True,
-            cancellation_token=CancellationToken(),
-        )
-
-        # Call the receiving agent.
-        try:
-            with MessageHandlerContext.populate_context(rec_agent.id):
-                with self._trace_helper.trace_block(
-                    "process",
-                    rec_agent.id,
-                    parent=request.metadata,
-                    attributes={"request_id": request.request_id},
-                    extraAttributes={"message_type": request.payload.data_type},
-                ):
-                    result = await rec_agent.on_message(message, ctx=message_context)
-        except BaseException as e:
-            response_message = agent_worker_pb2.Message(
-                response=agent_worker_pb2.RpcResponse(
-                    request_id=request.request_id,
-                    error=str(e),
-                    metadata=get_telemetry_grpc_metadata(),
-                ),
+        # The receiving agent is pinned before it is fetched, so that it is not evicted before it handles the message.
+        with self._instantiated_agents.pin(recipient):
+            # Get the receiving agent and prepare the message context.
+            rec_agent = await self._get_agent(recipient)
+            message_context = MessageContext(
+                sender=sender,
+                topic_id=None,
+                is_rpc=True,
+                cancellation_token=CancellationToken(),
             )
-            # Send the error response.
-            await self._host_connection.send(response_message)
-            return
+
+            # Call the receiving agent.
+            try:
+                with MessageHandlerContext.populate_context(rec_agent.id):
+                    with self._trace_helper.trace_block(
+                        "process",
+                        rec_agent.id,
+                        parent=request.metadata,
+                        attributes={"request_id": request.request_id},
+                        extraAttributes={"message_type": request.payload.data_type},
+                    ):
+                        result = await rec_agent.on_message(message, ctx=message_context)
+            except BaseException as e:
+                response_message = agent_worker_pb2.Message(
+                    response=agent_worker_pb2.RpcResponse(
+                        request_id=request.request_id,
+                        error=str(e),
+                        metadata=get_telemetry_grpc_metadata(),
+                    ),
+                )
+                # Send the error response.
+                await self._host_connection.send(response_message)
+                return
 
         # Serialize the result.
         result_type = self._serialization_registry.type_name(result)
@@ -519,37 +530,42 @@ async def _process_event(self, event: agent_worker_pb2.Event) -> None:
             sender = AgentId(event.source.type, event.source.key)
         topic_id = TopicId(event.topic_type, event.topic_source)
         # Get the recipients for the topic.
-        recipients = await self._subscription_manager.get_subscribed_recipients(topic_id)
+        recipients = [
+            agent_id
+            for agent_id in await self._subscription_manager.get_subscribed_recipients(topic_id)
+            if agent_id != sender
+        ]
         # Send the message to each recipient.
-        responses: List[Awaitable[Any]] = []
+        deliveries: List[Awaitable[Any]] = []
         for agent_id in recipients:
-            if agent_id == sender:
-                continue
+            # Each recipient gets its own context, so that cancelling one handler does not cancel the others.
             message_context = MessageContext(
                 sender=sender,
                 topic_id=topic_id,
                 is_rpc=False,
                 cancellation_token=CancellationToken(),
             )
-            agent = await self._get_agent(agent_id)
-            with MessageHandlerContext.populate_context(agent.id):
-
-                async def send_message(agent: Agent, message_context: MessageContext) -> Any:
-                    with self._trace_helper.trace_block(
-                        "process",
-                        agent.id,
-                        parent=event.metadata,
-                        extraAttributes={"message_type": event.payload.data_type},
-                    ):
-                        await agent.on_message(message, ctx=message_context)
-
-                future = send_message(agent, message_context)
-            responses.append(future)
+            deliveries.append(self._deliver_event(agent_id, message, message_context, event))
         # Wait for all responses.
-        try:
-            await asyncio.gather(*responses)
-        except BaseException as e:
-            logger.error("Error handling event", exc_info=e)
+        results = await asyncio.gather(*deliveries, return_exceptions=True)
+        for agent_id, result in zip(recipients, results, strict=True):
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                logger.error("Error handling event for %s", agent_id, exc_info=result)
+
+    async def _deliver_event(
+        self, agent_id: AgentId, message: Any, message_context: MessageContext, event: agent_worker_pb2.Event
+    ) -> None:
+        # The agent is pinned before it is fetched, so that fetching other recipients cannot evict it.
+        with self._instantiated_agents.pin(agent_id):
+            agent = await self._get_agent(agent_id)
+            with self._trace_helper.trace_block(
+                "process",
+                agent.id,
+                parent=event.metadata,
+                extraAttributes={"message_type": event.payload.data_type},
+            ):
+                with MessageHandlerContext.populate_context(agent.id):
+                    await agent.on_message(message, ctx=message_context)
 
     @deprecated(
         "Use your agent's `register` method directly instead of this method. See documentation for latest usage."
@@ -565,6 +581,7 @@ async def register(
         if type in self._agent_factories:
             raise ValueError(f"Agent with type {type} already exists.")
         self._agent_factories[type] = agent_factory
+        self._agent_factory_num_parameters[type] = len(inspect.signature(agent_factory).parameters)
 
         if self._host_connection is None:
             raise RuntimeError("Host connection is not set.")
@@ -618,12 +635,13 @@ async def factory_wrapper() -> T:
             else:
                 agent_instance = maybe_agent_instance
 
-            if type_func_alias(agent_instance) != expected_class:
+            if type_func_alias(agent_instance) is not expected_class:
                 raise ValueError("Factory registered using the wrong type.")
 
             return agent_instance
 
         self._agent_factories[type.type] = factory_wrapper
+        self._agent_factory_num_parameters[type.type] = 0
 
         # Create a future for the registration response.
         future = asyncio.get_event_loop().create_future()
@@ -652,12 +670,15 @@ async def _invoke_agent_factory(
         self,
         agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
         agent_id: AgentId,
+        num_parameters: int | None = None,
     ) -> T:
+        if num_parameters is None:
+            num_parameters = len(inspect.signature(agent_factory).parameters)
         with AgentInstantiationContext.populate_context((self, agent_id)):
-            if len(inspect.signature(agent_factory).parameters) == 0:
+            if num_parameters == 0:
                 factory_one = cast(Callable[[], T], agent_factory)
                 agent = factory_one()
-            elif len(inspect.signature(agent_factory).parameters) == 2:
+            elif num_parameters == 2:
                 warnings.warn(
                     "Agent factories that take two arguments are deprecated. Use AgentInstantiationContext instead. Two arg factories will be removed in a future version.",
                     stacklevel=2,
@@ -673,15 +694,21 @@ async def _invoke_agent_factory(
         return agent
 
     async def _get_agent(self, agent_id: AgentId) -> Agent:
-        if agent_id in self._instantiated_agents:
-            return self._instantiated_agents[agent_id]
+        agent = self._instantiated_agents.get(agent_id)
+        if agent is not None:
+            return agent
 
         if agent_id.type not in self._agent_factories:
             raise ValueError(f"Agent with name {agent_id.type} not found.")
 
         agent_factory = self._agent_factories[agent_id.type]
-        agent = await self._invoke_agent_factory(agent_factory, agent_id)
-        self._instantiated_agents[agent_id] = agent
+        agent = await self._invoke_agent_factory(
+            agent_factory, agent_id, self._agent_factory_num_parameters[agent_id.type]
+        )
+        passivated_state = self._instantiated_agents.pop_passivated_state(agent_id)
+        if passivated_state is not None:
+            agent.load_state(passivated_state)
+        self._instantiated_agents.add(agent_id, agent, reactivated=passivated_state is not None)
         return agent
 
     # TODO: uncomment out the following type ignore when this is fixed in mypy: https://github.com/python/mypy/issues/3737
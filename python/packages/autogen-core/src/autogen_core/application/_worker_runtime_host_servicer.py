@@ -42,7 +42,7 @@ async def OpenChannel(  # type: ignore
         # Register the client with the server and create a send queue for the client.
         send_queue: asyncio.Queue[agent_worker_pb2.Message] = asyncio.Queue()
         self._send_queues[client_id] = send_queue
-        logger.info(f"Client {client_id} connected.")
+        logger.info("Client %s connected.", client_id)
 
         try:
             # Concurrently handle receiving messages from the client and sending messages to the client.
@@ -56,9 +56,9 @@ async def OpenChannel(  # type: ignore
                 try:
                     yield message
                 except Exception as e:
-                    logger.error(f"Failed to send message to client {client_id}: {e}", exc_info=True)
+                    logger.error("Failed to send message to client %s: %s", client_id, e, exc_info=True)
                     break
-                logger.info(f"Sent message to client {client_id}: {message}")
+                logger.info("Sent message to client %s: %s", client_id, message)
             # Wait for the receiving task to finish.
             await receiving_task
 
@@ -92,7 +92,7 @@ async def _receive_messages(
     ) -> None:
         # Receive messages from the client and process them.
         async for message in request_iterator:
-            logger.info(f"Received message from client {client_id}: {message}")
+            logger.info("Received message from client %s: %s", client_id, message)
             oneofcase = message.WhichOneof("message")
             match oneofcase:
                 case "request":
@@ -128,22 +128,22 @@ async def _receive_messages(
                     task.add_done_callback(self._raise_on_exception)
                     task.add_done_callback(self._background_tasks.discard)
                 case "registerAgentTypeResponse" | "addSubscriptionResponse":
-                    logger.warning(f"Received unexpected message type: {oneofcase}")
+                    logger.warning("Received unexpected message type: %s", oneofcase)
                 case None:
                     logger.warning("Received empty message")
                 case other:
-                    logger.error(f"Received unexpected message: {other}")
+                    logger.error("Received unexpected message: %s", other)
 
     async def _process_request(self, request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
         # Deliver the message to a client given the target agent type.
         async with self._agent_type_to_client_id_lock:
             target_client_id = self._agent_type_to_client_id.get(request.target.type)
         if target_client_id is None:
-            logger.error(f"Agent {request.target.type} not found, failed to deliver message.")
+            logger.error("Agent %s not found, failed to deliver message.", request.target.type)
             return
         target_send_queue = self._send_queues.get(target_client_id)
         if target_send_queue is None:
-            logger.error(f"Client {target_client_id} not found, failed to deliver message.")
+            logger.error("Client %s not found, failed to deliver message.", target_client_id)
             return
         await target_send_queue.put(agent_worker_pb2.Message(request=request))
 
@@ -162,7 +162,7 @@ async def _wait_and_send_response(self, future: Future[agent_worker_pb2.RpcRespo
         message = agent_worker_pb2.Message(response=response)
         send_queue = self._send_queues.get(client_id)
         if send_queue is None:
-            logger.error(f"Client {client_id} not found, failed to send response message.")
+            logger.error("Client %s not found, failed to send response message.", client_id)
             return
         await send_queue.put(message)
 
@@ -182,7 +182,7 @@ async def _process_event(self, event: agent_worker_pb2.Event) -> None:
                 if client_id is not None:
                     client_ids.add(client_id)
                 else:
-                    logger.error(f"Agent {recipient.type} and its client not found for topic {topic_id}.")
+                    logger.error("Agent %s and its client not found for topic %s.", recipient.type, topic_id)
         # Deliver the event to clients.
         for client_id in client_ids:
             await self._send_queues[client_id].put(agent_worker_pb2.Message(event=event))
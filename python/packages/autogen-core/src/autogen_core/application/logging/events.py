@@ -81,4 +81,5 @@ def completion_tokens(self) -> int:
 
     # This must output the event in a json serializable format
     def __str__(self) -> str:
-        return json.dumps(self.kwargs)
+        # The payload and enums are not json serializable, so fall back to their string form.
+        return json.dumps(self.kwargs, default=str)
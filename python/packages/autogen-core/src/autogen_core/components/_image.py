@@ -13,10 +13,66 @@
 from pydantic_core import core_schema
 from typing_extensions import Literal
 
+# Encoded formats that are passed on as they are instead of being re-encoded as PNG.
+_PASSTHROUGH_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "GIF": "image/gif", "WEBP": "image/webp"}
+
 
 class Image:
+    """An image that can be sent to a model.
+
+    The PNG or original encoding, its base64 string and the data URI are computed on first use
+    and cached, so an image that is sent with every request is only encoded once. Images created
+    from encoded data (:meth:`from_base64`, :meth:`from_uri`, :meth:`from_file` and :meth:`from_url`)
+    keep the original bytes when they are PNG, JPEG, GIF or WebP, and are only decoded when
+    :attr:`image` is accessed.
+
+    An image should not be modified in place after it is created, because the cached encodings
+    would no longer match it. Assign a new PIL image to :attr:`image` instead.
+    """
+
     def __init__(self, image: PILImage.Image):
-        self.image: PILImage.Image = image.convert("RGB")
+        rgb = image.convert("RGB")
+        self._reset(rgb, rgb)
+
+    def _reset(
+        self,
+        source: PILImage.Image,
+        rgb: PILImage.Image | None,
+        encoded: bytes | None = None,
+        mime_type: str = "image/png",
+    ) -> None:
+        self._source = source
+        self._rgb = rgb
+        self._encoded = encoded
+        self._mime_type = mime_type
+        self._base64: str | None = None
+
+    @classmethod
+    def _from_bytes(cls, data: bytes) -> Image:
+        source = PILImage.open(BytesIO(data))
+        image = cls.__new__(cls)
+        if source.format in _PASSTHROUGH_MIME_TYPES:
+            image._reset(source, None, data, _PASSTHROUGH_MIME_TYPES[source.format])
+        else:
+            image._reset(source, None)
+        return image
+
+    @property
+    def image(self) -> PILImage.Image:
+        """The image as an RGB PIL image."""
+        if self._rgb is None:
+            self._rgb = self._source.convert("RGB")
+        return self._rgb
+
+    @image.setter
+    def image(self, image: PILImage.Image) -> None:
+        rgb = image.convert("RGB")
+        self._reset(rgb, rgb)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """The width and height of the image, read without decoding it."""
+        return self._source.size
 
     @classmethod
     def from_pil(cls, pil_image: PILImage.Image) -> Image:
@@ -24,11 +80,11 @@ def from_pil(cls, pil_image: PILImage.Image) -> Image:
 
     @classmethod
     def from_uri(cls, uri: str) -> Image:
-        if not re.match(r"data:image/(?:png|jpeg);base64,", uri):
+        if not re.match(r"data:image/(?:png|jpeg|gif|webp);base64,", uri):
             raise ValueError("Invalid URI format. It should be a base64 encoded image URI.")
 
         # A URI. Remove the prefix and decode the base64 string.
-        base64_data = re.sub(r"data:image/(?:png|jpeg);base64,", "", uri)
+        base64_data = re.sub(r"data:image/(?:png|jpeg|gif|webp);base64,", "", uri)
         return cls.from_base64(base64_data)
 
     @classmethod
@@ -36,21 +92,28 @@ async def from_url(cls, url: str) -> Image:
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as response:
                 content = await response.read()
-                return cls(PILImage.open(content))
+                return cls._from_bytes(content)
 
     @classmethod
     def from_base64(cls, base64_str: str) -> Image:
-        return cls(PILImage.open(BytesIO(base64.b64decode(base64_str))))
+        return cls._from_bytes(base64.b64decode(base64_str))
+
+    def to_bytes(self) -> bytes:
+        """Return the encoded image, in its original format if it was kept and as PNG otherwise."""
+        if self._encoded is None:
+            buffered = BytesIO()
+            self.image.save(buffered, format="PNG")
+            self._encoded = buffered.getvalue()
+        return self._encoded
 
     def to_base64(self) -> str:
-        buffered = BytesIO()
-        self.image.save(buffered, format="PNG")
-        content = buffered.getvalue()
-        return base64.b64encode(content).decode("utf-8")
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.to_bytes()).decode("utf-8")
+        return self._base64
 
     @classmethod
     def from_file(cls, file_path: Path) -> Image:
-        return cls(PILImage.open(file_path))
+        return cls._from_bytes(Path(file_path).read_bytes())
 
     def _repr_html_(self) -> str:
         # Show the image in Jupyter notebook
@@ -58,7 +121,8 @@ def _repr_html_(self) -> str:
 
     @property
     def data_uri(self) -> str:
-        return _convert_base64_to_data_uri(self.to_base64())
+        base64_image = self.to_base64()
+        return f"data:{self._mime_type};base64,{base64_image}"
 
     def to_openai_format(self, detail: Literal["auto", "low", "high"] = "auto") -> ChatCompletionContentPartImageParam:
         return {"type": "image_url", "image_url": {"url": self.data_uri, "detail": detail}}
@@ -86,23 +150,3 @@ def serialize(value: Image) -> dict[str, Any]:
             core_schema.any_schema(),  # Accept any type; adjust if needed
             serialization=core_schema.plain_serializer_function_ser_schema(serialize),
         )
-
-
-def _convert_base64_to_data_uri(base64_image: str) -> str:
-    def _get_mime_type_from_data_uri(base64_image: str) -> str:
-        # Decode the base64 string
-        image_data = base64.b64decode(base64_image)
-        # Check the first few bytes for known signatures
-        if image_data.startswith(b"\xff\xd8\xff"):
-            return "image/jpeg"
-        elif image_data.startswith(b"\x89PNG\r\n\x1a\n"):
-            return "image/png"
-        elif image_data.startswith(b"GIF87a") or image_data.startswith(b"GIF89a"):
-            return "image/gif"
-        elif image_data.startswith(b"RIFF") and image_data[8:12] == b"WEBP":
-            return "image/webp"
-        return "image/jpeg"  # use jpeg for unknown formats, best guess.
-
-    mime_type = _get_mime_type_from_data_uri(base64_image)
-    data_uri = f"data:{mime_type};base64,{base64_image}"
-    return data_uri
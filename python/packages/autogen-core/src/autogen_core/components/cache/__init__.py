@@ -0,0 +1,7 @@
+from ._cache_store import CacheStore, InMemoryCacheStore, SQLiteCacheStore
+
+__all__ = [
+    "CacheStore",
+    "InMemoryCacheStore",
+    "SQLiteCacheStore",
+]
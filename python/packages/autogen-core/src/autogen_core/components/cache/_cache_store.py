@@ -0,0 +1,107 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Mapping, Protocol, runtime_checkable
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@runtime_checkable
+class CacheStore(Protocol):
+    """A key-value store for cached results, such as the results of code blocks or chat completions.
+
+    Keys are hex digests and values are JSON-compatible mappings. Implementations must not
+    return a value that the caller can mutate to change the stored entry.
+    """
+
+    async def get(self, key: str) -> Mapping[str, Any] | None: ...
+
+    async def set(self, key: str, value: Mapping[str, Any]) -> None: ...
+
+
+class InMemoryCacheStore:
+    """An in-memory cache that evicts the least recently used entries.
+
+    Args:
+        max_entries (int, optional): The maximum number of entries to keep. Defaults to 1024.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        value = self._entries.get(key)
+        if value is None:
+            return None
+        self._entries.move_to_end(key)
+        result: Dict[str, Any] = json.loads(value)
+        return result
+
+    async def set(self, key: str, value: Mapping[str, Any]) -> None:
+        # Entries are kept as JSON so that callers cannot mutate them.
+        self._entries[key] = json.dumps(value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class SQLiteCacheStore:
+    """A persistent cache stored in a table of a SQLite database file.
+
+    The database can be shared between processes and runs, and caches with different tables
+    can share one file. Reads and writes run in a worker thread so that they do not block the event loop.
+
+    Args:
+        path (str | Path): The path of the database file. It is created if it does not exist.
+        table (str, optional): The name of the table that holds the entries. It is created if it does not exist.
+            Defaults to ``"cache"``.
+    """
+
+    def __init__(self, path: str | Path, table: str = "cache") -> None:
+        if not _TABLE_NAME.match(table):
+            raise ValueError(f"Invalid table name: {table!r}.")
+        self._table = table
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(f"SELECT value FROM {self._table} WHERE key = ?", (key,)).fetchone()
+        return None if row is None else str(row[0])
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        value = await asyncio.to_thread(self._get, key)
+        if value is None:
+            return None
+        result: Dict[str, Any] = json.loads(value)
+        return result
+
+    async def set(self, key: str, value: Mapping[str, Any]) -> None:
+        await asyncio.to_thread(self._set, key, json.dumps(value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -9,9 +9,22 @@
     to_stub,
     with_requirements,
 )
+from ._impl.code_result_cache import (
+    CodeResultCache,
+    InMemoryCodeResultCache,
+    SQLiteCodeResultCache,
+    code_result_cache_key,
+)
 from ._impl.command_line_code_result import CommandLineCodeResult
 from ._impl.local_commandline_code_executor import LocalCommandLineCodeExecutor
-from ._impl.utils import get_file_name_from_content, get_required_packages, lang_to_cmd, silence_pip
+from ._impl.utils import (
+    find_code_block_dependencies,
+    get_file_name_from_content,
+    get_required_packages,
+    lang_to_cmd,
+    run_code_blocks_concurrently,
+    silence_pip,
+)
 from ._utils import extract_markdown_code_blocks
 
 __all__ = [
@@ -34,4 +47,10 @@
     "lang_to_cmd",
     "get_file_name_from_content",
     "silence_pip",
+    "find_code_block_dependencies",
+    "run_code_blocks_concurrently",
+    "CodeResultCache",
+    "InMemoryCodeResultCache",
+    "SQLiteCodeResultCache",
+    "code_result_cache_key",
 ]
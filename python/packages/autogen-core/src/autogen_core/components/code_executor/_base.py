@@ -11,10 +11,16 @@
 
 @dataclass
 class CodeBlock:
-    """A code block extracted fromm an agent message."""
+    """A code block extracted fromm an agent message.
+
+    A code block marked as ``pure`` always produces the same output from the same code, and does
+    not change anything that other code depends on, so executors that cache results can reuse the
+    result of an earlier run instead of running it again.
+    """
 
     code: str
     language: str
+    pure: bool = False
 
 
 @dataclass
@@ -0,0 +1,50 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, List, Mapping, Optional
+
+from ...cache import CacheStore, InMemoryCacheStore, SQLiteCacheStore
+from .._base import CodeBlock
+
+# Bump when the key or entry format changes so that existing persistent caches are not misread.
+_CACHE_FORMAT_VERSION = 1
+
+
+CodeResultCache = CacheStore
+"""A store for the results of code blocks marked as ``pure``, used by the command line code executors."""
+
+InMemoryCodeResultCache = InMemoryCacheStore
+
+
+class SQLiteCodeResultCache(SQLiteCacheStore):
+    """A persistent cache of code block results stored in a SQLite database file.
+
+    Args:
+        path (str | Path): The path of the database file. It is created if it does not exist.
+        table (str, optional): The name of the table that holds the entries. Defaults to ``"code_result_cache"``.
+    """
+
+    def __init__(self, path: str | Path, table: str = "code_result_cache") -> None:
+        super().__init__(path, table=table)
+
+
+def code_result_cache_key(code_blocks: List[CodeBlock], config: Mapping[str, Any]) -> Optional[str]:
+    """The cache key of the result of running ``code_blocks`` with an executor configured by ``config``,
+    or None if any of the code blocks is not marked as ``pure``.
+
+    Args:
+        code_blocks (List[CodeBlock]): The code blocks.
+        config (Mapping[str, Any]): The JSON-compatible settings of the executor that can change the result,
+            including a hash of its functions module.
+    """
+    if not code_blocks or not all(code_block.pure for code_block in code_blocks):
+        return None
+    payload = {
+        "version": _CACHE_FORMAT_VERSION,
+        "code_blocks": [
+            [code_block.language.lower(), hashlib.sha256(code_block.code.encode()).hexdigest()]
+            for code_block in code_blocks
+        ],
+        "config": config,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
@@ -2,13 +2,14 @@
 # Credit to original authors
 
 import asyncio
+import codecs
 import logging
 import sys
 import warnings
 from hashlib import sha256
 from pathlib import Path
 from string import Template
-from typing import Any, Callable, ClassVar, List, Sequence, Union
+from typing import Any, AsyncGenerator, Callable, ClassVar, List, Mapping, Optional, Sequence, Tuple, Union
 
 from typing_extensions import ParamSpec
 
@@ -20,13 +21,109 @@
     build_python_functions_file,
     to_stub,
 )
+from .code_result_cache import CodeResultCache, code_result_cache_key
 from .command_line_code_result import CommandLineCodeResult
-from .utils import PYTHON_VARIANTS, get_file_name_from_content, lang_to_cmd, silence_pip  # type: ignore
+from .python_worker_pool import PythonWorkerPool
+from .requirements_venv import get_requirements_venv
+from .utils import (  # type: ignore
+    PYTHON_VARIANTS,
+    find_code_block_dependencies,
+    get_file_name_from_content,
+    kill_process_group,
+    lang_to_cmd,
+    run_code_blocks_concurrently,
+    silence_pip,
+)
 
 __all__ = ("LocalCommandLineCodeExecutor",)
 
 A = ParamSpec("A")
 
+_READ_SIZE = 2**16
+
+
+class _OutputCapture:
+    """Collects the output of code blocks up to ``max_output_size`` bytes, and passes it to
+    ``on_output`` as it arrives. Output beyond the limit is read and discarded, so that a process
+    that writes too much is not blocked."""
+
+    def __init__(self, max_output_size: Optional[int], on_output: Optional[Callable[[str], None]]) -> None:
+        self._remaining = max_output_size
+        self._on_output = on_output
+        self._blocks: List[_BlockOutput] = []
+        self._num_truncated = 0
+
+    def begin_block(self) -> "_BlockOutput":
+        """Start collecting the output of the next code block. The output of code blocks is kept in the
+        order they begin, even if they run at the same time."""
+        block = _BlockOutput(self)
+        self._blocks.append(block)
+        return block
+
+    def output(self, num_blocks: Optional[int] = None) -> str:
+        """The output of the first ``num_blocks`` code blocks, or of all of them if it is None."""
+        output = "".join(block.output() for block in self._blocks[:num_blocks])
+        if self._num_truncated > 0:
+            notice = f"\n[Output truncated: {self._num_truncated} bytes were not captured]"
+            self.emit(notice)
+            output += notice
+        return output
+
+    def accept(self, data: bytes) -> bytes:
+        """Return the part of ``data`` that fits in the limit."""
+        if self._remaining is not None:
+            if len(data) > self._remaining:
+                self._num_truncated += len(data) - self._remaining
+                data = data[: self._remaining]
+            self._remaining -= len(data)
+        return data
+
+    def emit(self, text: str) -> None:
+        if self._on_output is not None:
+            self._on_output(text)
+
+
+class _BlockOutput:
+    def __init__(self, capture: _OutputCapture) -> None:
+        self._capture = capture
+        self._stdout: List[str] = []
+        self._stderr: List[str] = []
+        self._messages: List[str] = []
+        self._stdout_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._stderr_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def write_stdout(self, data: bytes) -> None:
+        self._write(data, self._stdout, self._stdout_decoder)
+
+    def write_stderr(self, data: bytes) -> None:
+        self._write(data, self._stderr, self._stderr_decoder)
+
+    def end(self) -> None:
+        self._stdout.append(self._stdout_decoder.decode(b"", final=True))
+        self._stderr.append(self._stderr_decoder.decode(b"", final=True))
+
+    def write_message(self, message: str) -> None:
+        self._messages.append(message)
+        self._capture.emit(message)
+
+    def output(self) -> str:
+        # The output of a code block is its stderr followed by its stdout.
+        return "".join(self._stderr + self._stdout + self._messages)
+
+    def _write(self, data: bytes, parts: List[str], decoder: codecs.IncrementalDecoder) -> None:
+        data = self._capture.accept(data)
+        if not data:
+            return
+        text = decoder.decode(data)
+        if text:
+            parts.append(text)
+            self._capture.emit(text)
+
+
+async def _read_stream(stream: asyncio.StreamReader, on_data: Callable[[bytes], None]) -> None:
+    while chunk := await stream.read(_READ_SIZE):
+        on_data(chunk)
+
 
 class LocalCommandLineCodeExecutor(CodeExecutor):
     """A code executor class that executes code through a local command line
@@ -39,7 +136,8 @@ class LocalCommandLineCodeExecutor(CodeExecutor):
     Each code block is saved as a file and executed in a separate process in
     the working directory, and a unique file is generated and saved in the
     working directory for each code block.
-    The code blocks are executed in the order they are received.
+    The code blocks are executed in the order they are received, unless
+    ``max_concurrent_code_blocks`` is greater than 1.
     Command line code is sanitized using regular expression match against a list of dangerous commands in order to prevent self-destructive
     commands from being executed which may potentially affect the users environment.
     Currently the only supported languages is Python and shell scripts.
@@ -47,6 +145,47 @@ class LocalCommandLineCodeExecutor(CodeExecutor):
     For shell scripts, use the language "bash", "shell", or "sh" for the code
     block.
 
+    If ``worker_pool_size`` is greater than 0, Python code blocks run in a pool of
+    Python processes that are started ahead of time and reused, instead of a new
+    process per code block. The modules in ``preload_modules`` and the functions
+    module are imported when a worker starts, so code blocks do not wait for the
+    interpreter to start or for heavy libraries to be imported. Each code block
+    still runs in a fresh ``__main__`` namespace, but it shares the process with
+    the code blocks that ran before it in the same worker, so changes to the
+    interpreter state, such as patched modules, can carry over. A worker is
+    replaced after ``max_runs_per_worker`` code blocks, or after a code block
+    that fails or times out. Call :meth:`stop` to stop the workers.
+
+    When a code block times out or is cancelled, its process and the processes
+    it started are killed. Output is read as it is produced, and at most
+    ``max_output_size`` bytes of it are kept. Use :meth:`execute_code_blocks_stream`
+    to receive the output while the code blocks run.
+
+    If ``max_concurrent_code_blocks`` is greater than 1, code blocks that do not
+    depend on each other run at the same time. A code block is assumed to depend
+    on an earlier one if either is a shell script, if they are saved to the same
+    file, or if either mentions the file of the other or a file name that the
+    other uses. The result is the same as if the code blocks ran in order:
+    the output of each code block follows the output of the one before it, and
+    the result ends with the first code block that fails. Code blocks after it
+    that were already running are not stopped, but their output is left out.
+    Streamed output of code blocks that run at the same time can interleave.
+
+    If a ``result_cache`` is given, the results of calls whose code blocks are all
+    marked as :attr:`~autogen_core.components.code_executor.CodeBlock.pure` are
+    cached by the hash of the code, its language, the functions module and the
+    settings of the executor, and reused instead of running the code again. Only
+    successful results are cached.
+
+    The packages required by the functions are installed with pip into the
+    current Python environment when the first code block runs. If a
+    ``requirements_cache_dir`` is given, they are instead installed into a
+    virtual environment in that directory, one per set of requirements, and
+    Python code blocks run in it. The virtual environment is created once and
+    found by the hash of the requirements afterwards, so executors with the same
+    functions do not run pip again. It has access to the packages of the
+    current environment, so only missing packages are installed.
+
     Args:
         timeout (int): The timeout for the execution of any single code block. Default is 60.
         work_dir (str): The working directory for the code execution. If None,
@@ -54,6 +193,13 @@ class LocalCommandLineCodeExecutor(CodeExecutor):
             directory is the current directory ".".
         functions (List[Union[FunctionWithRequirements[Any, A], Callable[..., Any]]]): A list of functions that are available to the code executor. Default is an empty list.
         functions_module (str, optional): The name of the module that will be created to store the functions. Defaults to "functions".
+        worker_pool_size (int, optional): The number of Python worker processes to keep ready. Defaults to 0, which runs each Python code block in a new process.
+        max_runs_per_worker (int, optional): The number of code blocks a Python worker runs before it is replaced. Defaults to 50.
+        preload_modules (Sequence[str], optional): Modules that Python workers import when they start, for example ``["numpy", "pandas"]``. Defaults to an empty list.
+        max_output_size (int | None, optional): The maximum number of bytes of output kept from the code blocks of one call. Output beyond it is discarded, and a note of how much was discarded is added. Defaults to 10 MiB. None keeps all output.
+        max_concurrent_code_blocks (int, optional): The maximum number of independent code blocks that run at the same time. Defaults to 1, which runs the code blocks one after another.
+        result_cache (CodeResultCache | None, optional): The cache for the results of pure code blocks, for example :class:`~autogen_core.components.code_executor.InMemoryCodeResultCache`. Defaults to None, which runs all code blocks.
+        requirements_cache_dir (str | Path | None, optional): The directory of the virtual environments with the packages required by the functions. Defaults to None, which installs the packages into the current environment.
 
     """
 
@@ -86,10 +232,29 @@ def __init__(
             ]
         ] = [],
         functions_module: str = "functions",
+        worker_pool_size: int = 0,
+        max_runs_per_worker: int = 50,
+        preload_modules: Sequence[str] = [],
+        max_output_size: Optional[int] = 10 * 2**20,
+        max_concurrent_code_blocks: int = 1,
+        result_cache: Optional[CodeResultCache] = None,
+        requirements_cache_dir: Optional[Union[Path, str]] = None,
     ):
         if timeout < 1:
             raise ValueError("Timeout must be greater than or equal to 1.")
 
+        if worker_pool_size < 0:
+            raise ValueError("Worker pool size must be greater than or equal to 0.")
+
+        if max_runs_per_worker < 1:
+            raise ValueError("Max runs per worker must be greater than or equal to 1.")
+
+        if max_output_size is not None and max_output_size < 0:
+            raise ValueError("Max output size must be greater than or equal to 0.")
+
+        if max_concurrent_code_blocks < 1:
+            raise ValueError("Max concurrent code blocks must be greater than or equal to 1.")
+
         if isinstance(work_dir, str):
             work_dir = Path(work_dir)
 
@@ -110,6 +275,18 @@ def __init__(
         else:
             self._setup_functions_complete = True
 
+        self._worker_pool_size = worker_pool_size
+        self._max_runs_per_worker = max_runs_per_worker
+        self._preload_modules = list(preload_modules)
+        self._worker_pool: Optional[PythonWorkerPool] = None
+        self._max_output_size = max_output_size
+        self._max_concurrent_code_blocks = max_concurrent_code_blocks
+        self._result_cache = result_cache
+        self._functions_hash: Optional[str] = None
+        # Code blocks run in the working directory, so the interpreter of an environment needs an absolute path.
+        self._requirements_cache_dir = Path(requirements_cache_dir).absolute() if requirements_cache_dir else None
+        self._python_executable = sys.executable
+
     def format_functions_for_prompt(self, prompt_template: str = FUNCTION_PROMPT_TEMPLATE) -> str:
         """(Experimental) Format the functions for a prompt.
 
@@ -158,7 +335,16 @@ async def _setup_functions(self, cancellation_token: CancellationToken) -> None:
         lists_of_packages = [x.python_packages for x in self._functions if isinstance(x, FunctionWithRequirements)]
         flattened_packages = [item for sublist in lists_of_packages for item in sublist]
         required_packages = list(set(flattened_packages))
-        if len(required_packages) > 0:
+        if len(required_packages) > 0 and self._requirements_cache_dir is not None:
+            venv_task = asyncio.ensure_future(get_requirements_venv(self._requirements_cache_dir, required_packages))
+            cancellation_token.link_future(venv_task)
+            try:
+                self._python_executable = str(await asyncio.wait_for(venv_task, self._timeout))
+            except asyncio.TimeoutError as e:
+                raise ValueError("Pip install timed out") from e
+            except asyncio.CancelledError as e:
+                raise ValueError("Pip install was cancelled") from e
+        elif len(required_packages) > 0:
             logging.info("Ensuring packages are installed in executor.")
 
             cmd_args = ["-m", "pip", "install"]
@@ -212,88 +398,273 @@ async def execute_code_blocks(
 
         return await self._execute_code_dont_check_setup(code_blocks, cancellation_token)
 
-    async def _execute_code_dont_check_setup(
+    async def execute_code_blocks_stream(
         self, code_blocks: List[CodeBlock], cancellation_token: CancellationToken
+    ) -> AsyncGenerator[Union[str, CommandLineCodeResult], None]:
+        """(Experimental) Execute the code blocks, yield their output as it is produced, and yield the
+        result last.
+
+        If the generator is closed before the result, the running code block is killed.
+
+        Args:
+            code_blocks (List[CodeBlock]): The code blocks to execute.
+            cancellation_token (CancellationToken): a token to cancel the operation
+
+        Yields:
+            str | CommandLineCodeResult: Output of the code blocks, then the result of the code execution."""
+
+        if not self._setup_functions_complete:
+            await self._setup_functions(cancellation_token)
+
+        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self._execute_code_dont_check_setup(code_blocks, cancellation_token, on_output=queue.put_nowait)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+            yield await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _execute_code_dont_check_setup(
+        self,
+        code_blocks: List[CodeBlock],
+        cancellation_token: CancellationToken,
+        on_output: Optional[Callable[[str], None]] = None,
+    ) -> CommandLineCodeResult:
+        key = self._result_cache_key(code_blocks)
+        if key is not None:
+            assert self._result_cache is not None
+            cached = await self._result_cache.get(key)
+            if cached is not None:
+                return self._load_cached_result(code_blocks, cached, on_output)
+
+        capture = _OutputCapture(self._max_output_size, on_output)
+        if self._max_concurrent_code_blocks > 1 and len(code_blocks) > 1:
+            result = await self._execute_code_blocks_concurrently(code_blocks, cancellation_token, capture)
+        else:
+            result = await self._execute_code_blocks_serially(code_blocks, cancellation_token, capture)
+
+        # Failures are not cached, as they can come from the environment, such as a missing package.
+        if key is not None and result.exit_code == 0:
+            assert self._result_cache is not None
+            await self._result_cache.set(key, {"exit_code": result.exit_code, "output": result.output})
+        return result
+
+    def _result_cache_key(self, code_blocks: List[CodeBlock]) -> Optional[str]:
+        if self._result_cache is None:
+            return None
+        if self._functions_hash is None:
+            functions_file = build_python_functions_file(self._functions) if len(self._functions) > 0 else ""
+            self._functions_hash = sha256(functions_file.encode()).hexdigest()
+        config = {
+            "executor": type(self).__name__,
+            "python": self._python_executable,
+            "timeout": self._timeout,
+            "functions_module": self._functions_module,
+            "functions": self._functions_hash,
+            "max_output_size": self._max_output_size,
+        }
+        return code_result_cache_key(code_blocks, config)
+
+    def _load_cached_result(
+        self, code_blocks: List[CodeBlock], cached: Mapping[str, Any], on_output: Optional[Callable[[str], None]]
+    ) -> CommandLineCodeResult:
+        # The code files are written as if the code blocks ran, so that the result refers to existing files.
+        file_names: List[Path] = []
+        for code_block in code_blocks:
+            lang, code = self._normalize_code_block(code_block)
+            file = self._get_code_file(lang, code)
+            with file.open("w", encoding="utf-8") as f:
+                f.write(code)
+            file_names.append(file)
+        output: str = cached["output"]
+        if on_output is not None and output:
+            on_output(output)
+        return CommandLineCodeResult(exit_code=cached["exit_code"], output=output, code_file=str(file_names[0]))
+
+    async def _execute_code_blocks_serially(
+        self, code_blocks: List[CodeBlock], cancellation_token: CancellationToken, capture: _OutputCapture
     ) -> CommandLineCodeResult:
-        logs_all: str = ""
         file_names: List[Path] = []
         exitcode = 0
         for code_block in code_blocks:
-            lang, code = code_block.language, code_block.code
-            lang = lang.lower()
-
-            code = silence_pip(code, lang)
-
-            if lang in PYTHON_VARIANTS:
-                lang = "python"
+            lang, code = self._normalize_code_block(code_block)
 
             if lang not in self.SUPPORTED_LANGUAGES:
                 # In case the language is not supported, we return an error message.
                 exitcode = 1
-                logs_all += "\n" + f"unknown language {lang}"
+                capture.begin_block().write_message("\n" + f"unknown language {lang}")
                 break
 
             try:
-                # Check if there is a filename comment
-                filename = get_file_name_from_content(code, self._work_dir)
+                written_file = self._get_code_file(lang, code)
             except ValueError:
                 return CommandLineCodeResult(
                     exit_code=1,
                     output="Filename is not in the workspace",
                     code_file=None,
                 )
-
-            if filename is None:
-                # create a file with an automatically generated name
-                code_hash = sha256(code.encode()).hexdigest()
-                filename = f"tmp_code_{code_hash}.{'py' if lang.startswith('python') else lang}"
-
-            written_file = (self._work_dir / filename).resolve()
-            with written_file.open("w", encoding="utf-8") as f:
-                f.write(code)
             file_names.append(written_file)
 
-            program = sys.executable if lang.startswith("python") else lang_to_cmd(lang)
-            # Wrap in a task to make it cancellable
-            task = asyncio.create_task(
-                asyncio.create_subprocess_exec(
-                    program,
-                    str(written_file.absolute()),
-                    cwd=self._work_dir,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-            )
-            cancellation_token.link_future(task)
-            try:
-                proc = await task
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), self._timeout)
-                exitcode = proc.returncode or 0
-
-            except asyncio.TimeoutError:
-                logs_all += "\n Timeout"
-                # Same exit code as the timeout command on linux.
-                exitcode = 124
-                break
-            except asyncio.CancelledError:
-                logs_all += "\n Cancelled"
-                # TODO: which exit code? 125 is Operation Canceled
-                exitcode = 125
+            exitcode = await self._run_code_block(lang, code, written_file, capture.begin_block(), cancellation_token)
+            if exitcode != 0:
                 break
 
-            self._running_cmd_task = None
-
-            logs_all += stderr.decode()
-            logs_all += stdout.decode()
+        code_file = str(file_names[0]) if len(file_names) > 0 else None
+        return CommandLineCodeResult(exit_code=exitcode, output=capture.output(), code_file=code_file)
 
-            if exitcode != 0:
+    async def _execute_code_blocks_concurrently(
+        self, code_blocks: List[CodeBlock], cancellation_token: CancellationToken, capture: _OutputCapture
+    ) -> CommandLineCodeResult:
+        # The code blocks after the first one in an unsupported language would not run.
+        prepared: List[Tuple[str, str, Optional[Path]]] = []
+        for code_block in code_blocks:
+            lang, code = self._normalize_code_block(code_block)
+            if lang not in self.SUPPORTED_LANGUAGES:
+                prepared.append((lang, code, None))
                 break
+            try:
+                prepared.append((lang, code, self._get_code_file(lang, code)))
+            except ValueError:
+                return CommandLineCodeResult(
+                    exit_code=1,
+                    output="Filename is not in the workspace",
+                    code_file=None,
+                )
 
-        code_file = str(file_names[0]) if len(file_names) > 0 else None
-        return CommandLineCodeResult(exit_code=exitcode, output=logs_all, code_file=code_file)
+        dependencies = find_code_block_dependencies(
+            code_blocks[: len(prepared)],
+            [str(file.relative_to(self._work_dir.resolve())) if file is not None else "" for _, _, file in prepared],
+        )
+        outputs = [capture.begin_block() for _ in prepared]
+
+        async def run_code_block(index: int) -> int:
+            lang, code, file = prepared[index]
+            if file is None:
+                outputs[index].write_message("\n" + f"unknown language {lang}")
+                return 1
+            return await self._run_code_block(lang, code, file, outputs[index], cancellation_token)
+
+        exit_codes = await run_code_blocks_concurrently(dependencies, run_code_block, self._max_concurrent_code_blocks)
+        # The result is the same as if the code blocks ran one after another: it ends with the first one that failed.
+        num_blocks = next((i + 1 for i, exitcode in enumerate(exit_codes) if exitcode != 0), len(exit_codes))
+        exitcode = exit_codes[num_blocks - 1]
+        assert exitcode is not None
+        code_file = prepared[0][2]
+        return CommandLineCodeResult(
+            exit_code=exitcode,
+            output=capture.output(num_blocks),
+            code_file=str(code_file) if code_file is not None else None,
+        )
+
+    def _normalize_code_block(self, code_block: CodeBlock) -> Tuple[str, str]:
+        lang = code_block.language.lower()
+        code = silence_pip(code_block.code, lang)
+        if lang in PYTHON_VARIANTS:
+            lang = "python"
+        return lang, code
+
+    def _get_code_file(self, lang: str, code: str) -> Path:
+        # Check if there is a filename comment. Raises ValueError if the file is not in the workspace.
+        filename = get_file_name_from_content(code, self._work_dir)
+        if filename is None:
+            # create a file with an automatically generated name
+            code_hash = sha256(code.encode()).hexdigest()
+            filename = f"tmp_code_{code_hash}.{'py' if lang.startswith('python') else lang}"
+        return (self._work_dir / filename).resolve()
+
+    async def _run_code_block(
+        self, lang: str, code: str, file: Path, output: _BlockOutput, cancellation_token: CancellationToken
+    ) -> int:
+        with file.open("w", encoding="utf-8") as f:
+            f.write(code)
+
+        if lang == "python" and self._worker_pool_size > 0 and self._setup_functions_complete:
+            run = asyncio.ensure_future(self._run_in_worker(file, output))
+        else:
+            program = self._python_executable if lang.startswith("python") else lang_to_cmd(lang)
+            run = asyncio.ensure_future(self._run_in_subprocess(program, file, output))
+        cancellation_token.link_future(run)
+        try:
+            exitcode = await asyncio.wait_for(run, self._timeout)
+        except asyncio.TimeoutError:
+            output.end()
+            output.write_message("\n Timeout")
+            # Same exit code as the timeout command on linux.
+            return 124
+        except asyncio.CancelledError:
+            output.end()
+            output.write_message("\n Cancelled")
+            # TODO: which exit code? 125 is Operation Canceled
+            return 125
+        output.end()
+        return exitcode
+
+    async def _run_in_subprocess(self, program: str, file: Path, output: _BlockOutput) -> int:
+        process = await asyncio.create_subprocess_exec(
+            program,
+            str(file.absolute()),
+            cwd=self._work_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        assert process.stdout is not None and process.stderr is not None
+        try:
+            await asyncio.gather(
+                _read_stream(process.stdout, output.write_stdout), _read_stream(process.stderr, output.write_stderr)
+            )
+            return await process.wait()
+        except BaseException:
+            # The code block timed out or was cancelled.
+            kill_process_group(process)
+            await process.wait()
+            raise
+
+    async def _run_in_worker(self, file: Path, output: _BlockOutput) -> int:
+        if self._worker_pool is not None and self._worker_pool.loop is not asyncio.get_running_loop():
+            # The workers were started in an event loop that is no longer running.
+            self._worker_pool.kill()
+            self._worker_pool = None
+        if self._worker_pool is None:
+            preload_modules = list(self._preload_modules)
+            if len(self._functions) > 0:
+                preload_modules.append(self._functions_module)
+            self._worker_pool = PythonWorkerPool(
+                self._work_dir,
+                self._worker_pool_size,
+                self._max_runs_per_worker,
+                preload_modules,
+                executable=self._python_executable,
+            )
+            self._worker_pool.start()
+        pool = self._worker_pool
+        worker = await pool.acquire()
+        try:
+            exitcode = await worker.run(file, output.write_stdout, output.write_stderr)
+        except BaseException:
+            # The code block did not complete, so the worker is killed.
+            await pool.release(worker, reuse=False)
+            raise
+        await pool.release(worker, reuse=exitcode == 0)
+        return exitcode
+
+    async def stop(self) -> None:
+        """(Experimental) Stop the Python workers. New workers are started for the next Python code block."""
+        if self._worker_pool is not None:
+            worker_pool = self._worker_pool
+            self._worker_pool = None
+            await worker_pool.close()
 
     async def restart(self) -> None:
         """(Experimental) Restart the code executor."""
+        if self._worker_pool_size > 0:
+            await self.stop()
+            return
         warnings.warn(
             "Restarting local command line code executor is not supported. No action is taken.",
             stacklevel=2,
@@ -0,0 +1,81 @@
+"""The program run by each process of a Python worker pool.
+
+It is passed to ``python -c`` with the modules to preload as arguments, and reads a marker from the
+first line of stdin and then the path of one script per line. The marker is not passed as an argument,
+so that scripts cannot see it in ``sys.argv``. Each script runs in a fresh ``__main__`` namespace, as
+``python <script>`` would run it, with ``sys.argv`` set to ``[script]`` and its output going to the
+stdout and stderr of the process. When a script finishes, the marker is written to stdout, and the
+marker followed by the exit code and a newline is written to stderr, so that the pool knows where the
+output of the script ends.
+
+Only the standard library is imported here, so that a worker starts with nothing but its preloaded
+modules imported.
+"""
+
+import os
+import runpy
+import sys
+import traceback
+from typing import List
+
+
+def run_script(path: str, work_dir: str) -> int:
+    os.chdir(work_dir)
+    sys.path[0] = os.path.dirname(path)
+    sys.argv = [path]
+    modules = set(sys.modules)
+    try:
+        runpy.run_path(path, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        sys.stderr.write(f"{e.code}\n")
+        return 1
+    except BaseException as e:
+        # Leave out the frames of this program, as the interpreter does for a script.
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        return 1
+    finally:
+        sys.stdout = sys.__stdout__
+        sys.stderr = sys.__stderr__
+        # Modules imported from the working directory can change before the next script runs.
+        prefix = work_dir + os.sep
+        for name in set(sys.modules) - modules:
+            file = getattr(sys.modules[name], "__file__", None)
+            if isinstance(file, str) and os.path.realpath(file).startswith(prefix):
+                del sys.modules[name]
+
+
+def main(preload_modules: List[str]) -> None:
+    # Scripts must not read the requests, so stdin is replaced with an empty stream.
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    marker = requests.readline().rstrip("\n")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    for module in preload_modules:
+        try:
+            __import__(module)
+        except Exception:
+            # A script that imports the module reports the error.
+            pass
+
+    work_dir = os.path.realpath(os.getcwd())
+    for line in requests:
+        exit_code = run_script(line.rstrip("\n"), work_dir)
+        for stream in (sys.stdout, sys.stderr):
+            if stream is not None:
+                stream.flush()
+        os.write(1, marker.encode())
+        os.write(2, f"{marker}{exit_code}\n".encode())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,226 @@
+import asyncio
+import sys
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Optional, Sequence, Set
+
+from . import python_worker
+from .utils import kill_process_group
+
+_READ_SIZE = 2**16
+
+_WORKER_SOURCE: Optional[str] = None
+
+
+def _worker_source() -> str:
+    global _WORKER_SOURCE
+    if _WORKER_SOURCE is None:
+        _WORKER_SOURCE = Path(python_worker.__file__).read_text(encoding="utf-8")
+    return _WORKER_SOURCE
+
+
+async def _read_until(
+    stream: asyncio.StreamReader, separator: bytes, on_data: Callable[[bytes], None]
+) -> Optional[bytes]:
+    """Pass the data before ``separator`` to ``on_data`` as it arrives. Returns the data read after the
+    separator, or None if the stream ended before it."""
+    pending = b""
+    while True:
+        chunk = await stream.read(_READ_SIZE)
+        if not chunk:
+            if pending:
+                on_data(pending)
+            return None
+        pending += chunk
+        index = pending.find(separator)
+        if index >= 0:
+            if index > 0:
+                on_data(pending[:index])
+            return pending[index + len(separator) :]
+        # Hold back the end of the data if it could be the start of the separator.
+        keep = next(
+            (k for k in range(min(len(separator) - 1, len(pending)), 0, -1) if pending.endswith(separator[:k])), 0
+        )
+        if len(pending) > keep:
+            on_data(pending[: len(pending) - keep])
+            pending = pending[len(pending) - keep :]
+
+
+class PythonWorker:
+    """A Python process that runs scripts one at a time, with its preloaded modules already imported."""
+
+    def __init__(self, process: asyncio.subprocess.Process, marker: str) -> None:
+        self._process = process
+        self._marker = marker.encode()
+        self.num_runs = 0
+
+    @classmethod
+    async def start(
+        cls, work_dir: Path, preload_modules: Sequence[str], executable: str = sys.executable
+    ) -> "PythonWorker":
+        marker = f"<<autogen-worker-{uuid.uuid4().hex}>>"
+        process = await asyncio.create_subprocess_exec(
+            executable,
+            "-u",
+            "-c",
+            _worker_source(),
+            *preload_modules,
+            cwd=work_dir,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        assert process.stdin is not None
+        # The marker is sent over stdin, as the scripts can see the arguments of the process.
+        process.stdin.write(f"{marker}\n".encode())
+        return cls(process, marker)
+
+    @property
+    def alive(self) -> bool:
+        return self._process.returncode is None
+
+    async def run(self, path: Path, on_stdout: Callable[[bytes], None], on_stderr: Callable[[bytes], None]) -> int:
+        """Run the script at ``path``, pass its output to ``on_stdout`` and ``on_stderr`` as it arrives, and
+        return its exit code. If the script ends the process, the exit code of the process is returned
+        and the worker cannot be used again."""
+        process = self._process
+        assert process.stdin is not None and process.stdout is not None and process.stderr is not None
+        self.num_runs += 1
+        process.stdin.write(f"{path}\n".encode())
+        await process.stdin.drain()
+        stdout_rest, stderr_rest = await asyncio.gather(
+            _read_until(process.stdout, self._marker, on_stdout), _read_until(process.stderr, self._marker, on_stderr)
+        )
+        if stdout_rest is not None and stderr_rest is not None:
+            # The exit code follows the marker on stderr.
+            while b"\n" not in stderr_rest:
+                chunk = await process.stderr.read(_READ_SIZE)
+                if not chunk:
+                    break
+                stderr_rest += chunk
+            if b"\n" in stderr_rest:
+                try:
+                    return int(stderr_rest.split(b"\n", 1)[0])
+                except ValueError:
+                    # The script wrote the marker itself, so its output and that of later scripts
+                    # cannot be told apart and the worker cannot be used again.
+                    self.kill()
+                    await process.wait()
+                    on_stderr(b"The output of the script could not be read from the Python worker.\n")
+                    return 1
+        return await process.wait()
+
+    def kill(self) -> None:
+        """Kill the worker and any processes its scripts started."""
+        kill_process_group(self._process)
+
+    async def stop(self) -> None:
+        if self.alive:
+            assert self._process.stdin is not None
+            # The worker exits when its requests end.
+            self._process.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.kill()
+        await self._process.wait()
+
+
+class PythonWorkerPool:
+    """Keeps ``size`` Python workers started ahead of time and reuses them, so that scripts do not wait
+    for the interpreter to start and the preloaded modules to be imported.
+
+    A worker is replaced after ``max_runs_per_worker`` scripts, or after a script that fails, since a
+    script can leave state behind in the process. When more than ``size`` scripts run at once, the
+    extra workers are started on demand and stopped when their script completes."""
+
+    def __init__(
+        self,
+        work_dir: Path,
+        size: int,
+        max_runs_per_worker: int,
+        preload_modules: Sequence[str] = (),
+        executable: str = sys.executable,
+    ) -> None:
+        self._work_dir = work_dir
+        self._executable = executable
+        self._size = size
+        self._max_runs_per_worker = max_runs_per_worker
+        self._preload_modules = list(preload_modules)
+        self._idle: Deque[asyncio.Future[PythonWorker]] = deque()
+        self._num_busy = 0
+        self._workers: Set[PythonWorker] = set()
+        # Workers can only be awaited in the event loop that started them.
+        self._loop = asyncio.get_running_loop()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def start(self) -> None:
+        """Start workers until the pool has ``size`` workers."""
+        while len(self._idle) + self._num_busy < self._size:
+            self._idle.append(asyncio.ensure_future(self._start_worker()))
+
+    async def acquire(self) -> PythonWorker:
+        future = self._idle.popleft() if self._idle else asyncio.ensure_future(self._start_worker())
+        try:
+            worker = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self._idle.appendleft(future)
+            raise
+        if not worker.alive:
+            self._workers.discard(worker)
+            worker = await self._start_worker()
+        self._num_busy += 1
+        return worker
+
+    async def release(self, worker: PythonWorker, reuse: bool) -> None:
+        """Return a worker to the pool. A worker that is not reused is stopped, or killed if ``reuse``
+        is False, and replaced."""
+        self._num_busy -= 1
+        if (
+            reuse
+            and worker.alive
+            and worker.num_runs < self._max_runs_per_worker
+            and len(self._idle) + self._num_busy < self._size
+        ):
+            future: asyncio.Future[PythonWorker] = asyncio.get_running_loop().create_future()
+            future.set_result(worker)
+            self._idle.appendleft(future)
+            return
+        self._workers.discard(worker)
+        self.start()
+        if not reuse:
+            worker.kill()
+        await worker.stop()
+
+    async def close(self) -> None:
+        """Stop all workers, including those that are running a script."""
+        if asyncio.get_running_loop() is not self._loop:
+            self.kill()
+            return
+        idle = list(self._idle)
+        self._idle.clear()
+        await asyncio.gather(*idle, return_exceptions=True)
+        workers = list(self._workers)
+        self._workers.clear()
+        for worker in workers:
+            worker.kill()
+        await asyncio.gather(*[worker.stop() for worker in workers])
+
+    def kill(self) -> None:
+        """Kill all workers without waiting for them to exit."""
+        for future in self._idle:
+            future.cancel()
+        self._idle.clear()
+        for worker in self._workers:
+            worker.kill()
+        self._workers.clear()
+
+    async def _start_worker(self) -> PythonWorker:
+        worker = await PythonWorker.start(self._work_dir, self._preload_modules, self._executable)
+        self._workers.add(worker)
+        return worker
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import site
+import sys
+import sysconfig
+import uuid
+from pathlib import Path
+from typing import List, Sequence
+
+from .utils import kill_process_group
+
+
+def _host_site_dirs() -> List[str]:
+    """The site-packages directories of the current environment, including those of the base interpreter
+    if the current environment is a virtual environment that uses them."""
+    site_dirs = list(site.getsitepackages())
+    if site.ENABLE_USER_SITE:
+        site_dirs.append(site.getusersitepackages())
+    return site_dirs
+
+
+def requirements_key(packages: Sequence[str]) -> str:
+    """The name of the virtual environment for a set of requirements, which also depends on the Python
+    interpreter that creates it and the environment it extends."""
+    payload = {
+        "python": sys.executable,
+        "version": sys.version,
+        "site_dirs": _host_site_dirs(),
+        "packages": sorted(set(packages)),
+    }
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()[:32]
+
+
+def venv_python(venv_dir: Path) -> Path:
+    if sys.platform == "win32":
+        return venv_dir / "Scripts" / "python.exe"
+    return venv_dir / "bin" / "python"
+
+
+def _venv_site_packages(venv_dir: Path) -> Path:
+    scheme = "nt" if sys.platform == "win32" else "posix_prefix"
+    return Path(sysconfig.get_path("purelib", scheme, vars={"base": str(venv_dir), "platbase": str(venv_dir)}))
+
+
+def _extend_host_environment(venv_dir: Path) -> None:
+    """Make the packages of the current environment importable in a virtual environment, after its own.
+
+    ``--system-site-packages`` only gives access to the packages of the base interpreter, not to those of
+    the virtual environment the current interpreter may run in. The directories are added with
+    :func:`site.addsitedir`, so that their ``.pth`` files, such as those of editable installs, are processed."""
+    lines = [f"import site; site.addsitedir({site_dir!r})\n" for site_dir in _host_site_dirs()]
+    site_packages = _venv_site_packages(venv_dir)
+    site_packages.mkdir(parents=True, exist_ok=True)
+    (site_packages / "_autogen_host_environment.pth").write_text("".join(lines), encoding="utf-8")
+
+
+async def _run(args: List[str]) -> None:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except BaseException:
+        kill_process_group(process)
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise ValueError(f"Pip install failed. {stdout.decode()}, {stderr.decode()}")
+
+
+async def get_requirements_venv(cache_dir: Path, packages: Sequence[str]) -> Path:
+    """Return the Python interpreter of a virtual environment in ``cache_dir`` with ``packages`` installed,
+    and create the environment if there is none for these packages yet.
+
+    The environment is created with access to the packages of the current environment, whether or not
+    it is a virtual environment, so only missing packages are installed, by the pip of the current
+    environment, which must be 22.3 or later. It is built in a temporary directory and renamed when it is
+    complete, so executors in other processes never use a partial environment, and the first one
+    to finish wins. Code blocks run the interpreter directly, so the scripts that packages install
+    in the environment are not used."""
+    venv_dir = cache_dir / requirements_key(packages)
+    if venv_dir.is_dir():
+        return venv_python(venv_dir)
+
+    logging.info(f"Creating a virtual environment for {', '.join(sorted(set(packages)))}.")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    build_dir = cache_dir / f".{venv_dir.name}-{uuid.uuid4().hex}"
+    try:
+        # The environment is created without pip, which takes most of the time, and the pip of the current
+        # environment installs the packages into it.
+        await _run([sys.executable, "-m", "venv", "--without-pip", str(build_dir)])
+        _extend_host_environment(build_dir)
+        await _run([sys.executable, "-m", "pip", "--python", str(venv_python(build_dir)), "install", "-qqq", *packages])
+        try:
+            os.rename(build_dir, venv_dir)
+        except OSError:
+            # Another executor created the environment first.
+            if not venv_dir.is_dir():
+                raise
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return venv_python(venv_dir)
@@ -2,9 +2,15 @@
 # Credit to original authors
 
 # Will return the filename relative to the workspace path
+import asyncio
+import os
 import re
+import signal
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+from .._base import CodeBlock
 
 
 # Raises ValueError if the file is not in the workspace
@@ -30,7 +36,7 @@ def silence_pip(code: str, lang: str) -> str:
     """Apply -qqq flag to pip install commands."""
     if lang == "python":
         regex = r"^! ?pip install"
-    elif lang in ["bash", "shell", "sh", "pwsh", "powershell", "ps1"]:
+    elif lang in SHELL_LANGUAGES:
         regex = r"^pip install"
     else:
         return code
@@ -66,6 +72,11 @@ def get_required_packages(code: str, lang: str) -> set[str]:
 
 PYTHON_VARIANTS = ["python", "Python", "py"]
 
+SHELL_LANGUAGES = ["bash", "shell", "sh", "pwsh", "powershell", "ps1"]
+
+# A string literal that looks like a file name, such as "data.csv" or 'out/plot.png'.
+_FILE_NAME_LITERAL = re.compile(r"""["']([\w./-]+\.[A-Za-z]\w*)["']""")
+
 
 def lang_to_cmd(lang: str) -> str:
     if lang in PYTHON_VARIANTS:
@@ -104,3 +115,106 @@ def infer_lang(code: str) -> str:
     except SyntaxError:
         # not a valid python code
         return "unknown"
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kill a process started with ``start_new_session=True`` and the processes it started, even if the
+    process itself has exited. On Windows only the process itself is killed."""
+    try:
+        if sys.platform == "win32":
+            if process.returncode is None:
+                process.kill()
+        else:
+            # The process group outlives its leader for as long as any of its processes runs.
+            os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _mentions(code: str, name: str) -> bool:
+    return re.search(rf"(?<![\w.]){re.escape(name)}(?!\w)", code) is not None
+
+
+def find_code_block_dependencies(code_blocks: Sequence[CodeBlock], file_names: Sequence[str]) -> List[Set[int]]:
+    """Find, for each code block, the earlier code blocks that it must run after.
+
+    Two code blocks are treated as independent unless one of them is a shell script, which can change
+    anything in its environment, they are saved to the same file, or one of them mentions a file of the
+    other: the file it is saved to, the module name of that file if it is a Python file, or a file name
+    that appears in a string literal of the other, such as ``"data.csv"``.
+
+    Args:
+        code_blocks (Sequence[CodeBlock]): The code blocks, in the order they are received.
+        file_names (Sequence[str]): The file each code block is saved to, relative to the working directory.
+
+    Returns:
+        List[Set[int]]: The indices of the code blocks that each code block depends on.
+    """
+    names: List[Set[str]] = []
+    for code_block, file_name in zip(code_blocks, file_names, strict=True):
+        path = Path(file_name)
+        block_names = {file_name, path.name, *_FILE_NAME_LITERAL.findall(code_block.code)}
+        if path.suffix == ".py":
+            block_names.add(path.stem)
+        names.append({name for name in block_names if name})
+
+    dependencies: List[Set[int]] = []
+    for index, code_block in enumerate(code_blocks):
+        is_shell = code_block.language.lower() in SHELL_LANGUAGES
+        dependencies.append(
+            {
+                earlier
+                for earlier in range(index)
+                if is_shell
+                or code_blocks[earlier].language.lower() in SHELL_LANGUAGES
+                or file_names[earlier] == file_names[index]
+                or any(_mentions(code_block.code, name) for name in names[earlier])
+                or any(_mentions(code_blocks[earlier].code, name) for name in names[index])
+            }
+        )
+    return dependencies
+
+
+async def run_code_blocks_concurrently(
+    dependencies: Sequence[Set[int]], run_code_block: Callable[[int], Awaitable[int]], max_concurrency: int
+) -> List[Optional[int]]:
+    """Run code blocks concurrently, each after the code blocks it depends on, and at most
+    ``max_concurrency`` at a time.
+
+    As when the code blocks run one after another, the code blocks after the first one that fails do not
+    start, but those that are already running complete. The code blocks before it all run.
+
+    Args:
+        dependencies (Sequence[Set[int]]): The dependencies of each code block, as returned by
+            :func:`find_code_block_dependencies`.
+        run_code_block (Callable[[int], Awaitable[int]]): Runs the code block at an index and returns its exit code.
+        max_concurrency (int): The maximum number of code blocks that run at once.
+
+    Returns:
+        List[Optional[int]]: The exit code of each code block, or None for the code blocks that did not run.
+    """
+    exit_codes: List[Optional[int]] = [None] * len(dependencies)
+    pending = list(range(len(dependencies)))
+    running: Dict[asyncio.Future[int], int] = {}
+    first_failure = len(dependencies)
+    try:
+        while True:
+            for index in list(pending):
+                if len(running) >= max_concurrency or index > first_failure:
+                    break
+                if all(exit_codes[dependency] == 0 for dependency in dependencies[index]):
+                    pending.remove(index)
+                    running[asyncio.ensure_future(run_code_block(index))] = index
+            if not running:
+                return exit_codes
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                exit_codes[index] = future.result()
+                if exit_codes[index] != 0:
+                    first_failure = min(first_failure, index)
+    except BaseException:
+        for future in running:
+            future.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        raise
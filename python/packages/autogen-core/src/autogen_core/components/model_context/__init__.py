@@ -1,9 +1,11 @@
 from ._buffered_chat_completion_context import BufferedChatCompletionContext
 from ._chat_completion_context import ChatCompletionContext
 from ._head_and_tail_chat_completion_context import HeadAndTailChatCompletionContext
+from ._token_budget_chat_completion_context import TokenBudgetChatCompletionContext
 
 __all__ = [
     "ChatCompletionContext",
     "BufferedChatCompletionContext",
     "HeadAndTailChatCompletionContext",
+    "TokenBudgetChatCompletionContext",
 ]
@@ -0,0 +1,131 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Mapping, Optional, Sequence, Tuple
+
+from ..models import ChatCompletionClient, FunctionExecutionResultMessage, LLMMessage
+from ._chat_completion_context import ChatCompletionContext
+
+Summarizer = Callable[[Sequence[LLMMessage]], Awaitable[LLMMessage]]
+
+
+class TokenBudgetChatCompletionContext(ChatCompletionContext):
+    """A chat completion context that keeps the most recent messages that fit in a token budget.
+
+    Each message is counted once with the model client's ``count_tokens`` when it is added, without the
+    tokens that the client counts for every request, and a running total is kept. The tokens of a request
+    are counted once in the total. When the total exceeds the budget, the oldest
+    messages are evicted until it fits again, so reading the messages does not count or copy the
+    evicted history. A function execution result is never kept without the call that requested it.
+    The most recent message is always kept, even if it alone exceeds the budget, and if it is a function
+    execution result, so is the call that requested it.
+
+    If a summarizer is given, the evicted messages are summarized into one message that is kept
+    before the retained messages and counts against the budget.
+
+    Args:
+        model_client (ChatCompletionClient): The client whose token counting is used.
+        token_budget (int): The maximum number of tokens of the messages returned by :meth:`get_messages`.
+        summarizer (Callable[[Sequence[LLMMessage]], Awaitable[LLMMessage]] | None, optional): Summarizes
+            evicted messages into one message. It receives the previous summary, if any, followed by the
+            messages evicted since. Defaults to None, which drops evicted messages.
+        initial_messages (List[LLMMessage] | None, optional): Messages to start with.
+    """
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        token_budget: int,
+        summarizer: Optional[Summarizer] = None,
+        initial_messages: List[LLMMessage] | None = None,
+    ) -> None:
+        if token_budget < 1:
+            raise ValueError("token_budget must be at least 1.")
+        self._model_client = model_client
+        self._token_budget = token_budget
+        self._summarizer = summarizer
+        # The tokens that the client counts for a request without messages, such as reply priming.
+        self._request_tokens = model_client.count_tokens([])
+        self._messages: Deque[Tuple[LLMMessage, int]] = deque()
+        self._total_tokens = 0
+        self._summary: Optional[LLMMessage] = None
+        self._summary_tokens = 0
+        # Initial messages are trimmed on the first call that can await the summarizer.
+        for message in initial_messages or []:
+            self._append(message)
+
+    @property
+    def total_tokens(self) -> int:
+        """The number of tokens of the messages returned by :meth:`get_messages`, including the summary."""
+        return self._request_tokens + self._total_tokens + self._summary_tokens
+
+    async def add_message(self, message: LLMMessage) -> None:
+        """Add a message to the memory, and evict the oldest messages that no longer fit."""
+        self._append(message)
+        await self._trim()
+
+    async def get_messages(self) -> List[LLMMessage]:
+        """Get the summary of the evicted messages, if any, followed by the retained messages."""
+        await self._trim()
+        messages = [message for message, _ in self._messages]
+        if self._summary is not None:
+            messages.insert(0, self._summary)
+        return messages
+
+    async def clear(self) -> None:
+        """Clear the message memory."""
+        self._messages.clear()
+        self._total_tokens = 0
+        self._summary = None
+        self._summary_tokens = 0
+
+    def save_state(self) -> Mapping[str, Any]:
+        return {
+            "messages": [message for message, _ in self._messages],
+            "token_counts": [tokens for _, tokens in self._messages],
+            "summary": self._summary,
+            "summary_tokens": self._summary_tokens,
+            "token_budget": self._token_budget,
+        }
+
+    def load_state(self, state: Mapping[str, Any]) -> None:
+        self._token_budget = state["token_budget"]
+        self._messages = deque(zip(state["messages"], state["token_counts"], strict=True))
+        self._total_tokens = sum(state["token_counts"])
+        self._summary = state["summary"]
+        self._summary_tokens = state["summary_tokens"]
+
+    def _count_tokens(self, message: LLMMessage) -> int:
+        return self._model_client.count_tokens([message]) - self._request_tokens
+
+    def _append(self, message: LLMMessage) -> None:
+        tokens = self._count_tokens(message)
+        self._messages.append((message, tokens))
+        self._total_tokens += tokens
+
+    def _evict(self) -> List[LLMMessage]:
+        # The messages from the last one that is not a function execution result are always kept, so that
+        # trailing results keep their call.
+        min_kept = 0
+        for message, _ in reversed(self._messages):
+            min_kept += 1
+            if not isinstance(message, FunctionExecutionResultMessage):
+                break
+        else:
+            # Results without any call are all evicted.
+            min_kept = 0
+        evicted: List[LLMMessage] = []
+        while len(self._messages) > min_kept and (
+            self.total_tokens > self._token_budget or isinstance(self._messages[0][0], FunctionExecutionResultMessage)
+        ):
+            message, tokens = self._messages.popleft()
+            self._total_tokens -= tokens
+            evicted.append(message)
+        return evicted
+
+    async def _trim(self) -> None:
+        # A new summary can be longer than the previous one, so summarizing may evict more messages.
+        evicted = self._evict()
+        while evicted and self._summarizer is not None:
+            summarized = evicted if self._summary is None else [self._summary, *evicted]
+            self._summary = await self._summarizer(summarized)
+            self._summary_tokens = self._count_tokens(self._summary)
+            evicted = self._evict()
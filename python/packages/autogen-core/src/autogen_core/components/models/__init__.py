@@ -2,10 +2,11 @@
 import warnings
 from typing import TYPE_CHECKING, Any
 
-from ._model_client import ChatCompletionClient, ModelCapabilities
+from ._model_client import ChatCompletionClient, ModelCapabilities, create_batch
 from ._types import (
     AssistantMessage,
     ChatCompletionTokenLogprob,
+    CreateRequest,
     CreateResult,
     FinishReasons,
     FunctionExecutionResult,
@@ -34,9 +35,11 @@
     "LLMMessage",
     "RequestUsage",
     "FinishReasons",
+    "CreateRequest",
     "CreateResult",
     "TopLogprob",
     "ChatCompletionTokenLogprob",
+    "create_batch",
 ]
 
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Mapping, Optional, Sequence, runtime_checkable
+import asyncio
+from typing import List, Mapping, Optional, Sequence, runtime_checkable
 
 from typing_extensions import (
     Any,
@@ -13,7 +14,7 @@
 
 from ...base import CancellationToken
 from ..tools import Tool, ToolSchema
-from ._types import CreateResult, LLMMessage, RequestUsage
+from ._types import CreateRequest, CreateResult, LLMMessage, RequestUsage
 
 
 class ModelCapabilities(TypedDict, total=False):
@@ -57,3 +58,43 @@ def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool
 
     @property
     def capabilities(self) -> ModelCapabilities: ...
+
+
+async def create_batch(
+    client: ChatCompletionClient,
+    requests: Sequence[CreateRequest],
+    *,
+    max_concurrency: int = 8,
+    cancellation_token: Optional[CancellationToken] = None,
+) -> List[CreateResult | Exception]:
+    """Run a batch of requests with a client and return their results in the order of the requests.
+
+    A request that fails has its exception in place of its result and does not stop the others.
+    :meth:`ChatCompletionClient.create` is called for each request, with at most ``max_concurrency``
+    requests in flight, so this works with any client. Clients can also offer their own batch method,
+    such as ``OpenAIChatCompletionClient.create_batch``, which can use the batch endpoint of the provider.
+
+    Args:
+        client (ChatCompletionClient): The client to run the requests with.
+        requests (Sequence[CreateRequest]): The requests to run.
+        max_concurrency (int, optional): The maximum number of requests in flight. Defaults to 8.
+        cancellation_token (CancellationToken | None, optional): A token to cancel the requests.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(request: CreateRequest) -> CreateResult | Exception:
+        async with semaphore:
+            try:
+                return await client.create(
+                    request.messages,
+                    tools=request.tools,
+                    json_output=request.json_output,
+                    extra_create_args=request.extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*[run(request) for request in requests]))
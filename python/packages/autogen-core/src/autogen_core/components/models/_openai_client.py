@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import inspect
 import json
 import logging
@@ -6,15 +7,21 @@
 import re
 import warnings
 from asyncio import Task
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import (
     Any,
     AsyncGenerator,
+    Awaitable,
+    Callable,
     Dict,
+    Hashable,
     List,
     Mapping,
     Optional,
     Sequence,
     Set,
+    Tuple,
     Type,
     Union,
     cast,
@@ -43,6 +50,7 @@
 from pydantic import BaseModel
 from typing_extensions import Unpack
 
+from ...application import LatencyHistogram
 from ...application.logging import EVENT_LOGGER_NAME, TRACE_LOGGER_NAME
 from ...application.logging.events import LLMCallEvent
 from ...base import CancellationToken
@@ -53,6 +61,7 @@
 from ..tools import Tool, ToolSchema
 from . import _model_info
 from ._model_client import ChatCompletionClient, ModelCapabilities
+from ._request_limiter import RequestLimiter
 from ._types import (
     AssistantMessage,
     ChatCompletionTokenLogprob,
@@ -78,6 +87,16 @@
 # Only single choice allowed
 disallowed_create_args = set(["stream", "messages", "function_call", "functions", "n"])
 required_create_args: Set[str] = set(["model"])
+# Options of the client itself rather than of the OpenAI client or the request.
+request_limit_kwargs = set(["max_concurrent_requests", "requests_per_minute", "tokens_per_minute", "coalesce_requests"])
+
+_ChatCompletionResponse = Union[ParsedChatCompletion[BaseModel], ChatCompletion]
+
+
+@dataclass
+class _InFlightRequest:
+    task: Task[_ChatCompletionResponse]
+    waiters: int = 0
 
 
 def _azure_openai_client_from_config(config: Mapping[str, Any]) -> AsyncAzureOpenAI:
@@ -101,6 +120,10 @@ def _openai_client_from_config(config: Mapping[str, Any]) -> AsyncOpenAI:
     return AsyncOpenAI(**openai_config)
 
 
+def _request_limits_from_config(config: Mapping[str, Any]) -> Dict[str, Any]:
+    return {k: config[k] for k in request_limit_kwargs if k in config}
+
+
 def _create_args_from_config(config: Mapping[str, Any]) -> Dict[str, Any]:
     create_args = {k: v for k, v in config.items() if k in create_kwargs}
     create_args_keys = set(create_args.keys())
@@ -224,7 +247,7 @@ def calculate_vision_tokens(image: Image, detail: str = "auto") -> int:
     if detail == "low":
         return BASE_TOKEN_COUNT
 
-    width, height = image.image.size
+    width, height = image.size
 
     # Scale down to fit within a MAX_LONG_EDGE x MAX_LONG_EDGE square if necessary
 
@@ -321,12 +344,131 @@ def assert_valid_name(name: str) -> str:
     return name
 
 
+# Number of per-message token counts kept by each client, enough for several long conversations.
+_MAX_CACHED_MESSAGE_TOKEN_COUNTS = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _message_token_cache_key(message: LLMMessage) -> Hashable:
+    """Return a key that identifies everything the token count of a message depends on.
+
+    Strings are used as they are, so that hashing them is cheap after the first time. Images only
+    contribute their size.
+    """
+    content: Hashable
+    if isinstance(message.content, str):
+        content = message.content
+    else:
+        parts: List[Hashable] = []
+        for part in message.content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, Image):
+                parts.append(("image", part.size))
+            elif isinstance(part, FunctionCall):
+                parts.append(("call", part.id, part.arguments, part.name))
+            else:
+                parts.append(("result", part.content, part.call_id))
+        content = tuple(parts)
+    return (type(message), content, getattr(message, "source", None))
+
+
+def _count_message_tokens(message: LLMMessage, encoding: tiktoken.Encoding) -> int:
+    tokens_per_message = 3
+    tokens_per_name = 1
+    num_tokens = tokens_per_message
+    oai_message = to_oai_type(message)
+    for oai_message_part in oai_message:
+        for key, value in oai_message_part.items():
+            if value is None:
+                continue
+
+            if isinstance(message, UserMessage) and isinstance(value, list):
+                typed_message_value = cast(List[ChatCompletionContentPartParam], value)
+
+                assert len(typed_message_value) == len(
+                    message.content
+                ), "Mismatch in message content and typed message value"
+
+                # We need image properties that are only in the original message
+                for part, content_part in zip(typed_message_value, message.content, strict=False):
+                    if isinstance(content_part, Image):
+                        # TODO: add detail parameter
+                        num_tokens += calculate_vision_tokens(content_part)
+                    elif isinstance(part, str):
+                        num_tokens += len(encoding.encode(part))
+                    else:
+                        try:
+                            serialized_part = json.dumps(part)
+                            num_tokens += len(encoding.encode(serialized_part))
+                        except TypeError:
+                            trace_logger.warning(f"Could not convert {part} to string, skipping.")
+            else:
+                if not isinstance(value, str):
+                    try:
+                        value = json.dumps(value)
+                    except TypeError:
+                        trace_logger.warning(f"Could not convert {value} to string, skipping.")
+                        continue
+                num_tokens += len(encoding.encode(value))
+                if key == "name":
+                    num_tokens += tokens_per_name
+    return num_tokens
+
+
+def _count_tool_tokens(tool: ChatCompletionToolParam, encoding: tiktoken.Encoding) -> int:
+    function = tool["function"]
+    tool_tokens = len(encoding.encode(function["name"]))
+    if "description" in function:
+        tool_tokens += len(encoding.encode(function["description"]))
+    tool_tokens -= 2
+    if "parameters" in function:
+        parameters = function["parameters"]
+        if "properties" in parameters:
+            assert isinstance(parameters["properties"], dict)
+            for propertiesKey in parameters["properties"]:  # pyright: ignore
+                assert isinstance(propertiesKey, str)
+                tool_tokens += len(encoding.encode(propertiesKey))
+                v = parameters["properties"][propertiesKey]  # pyright: ignore
+                for field in v:  # pyright: ignore
+                    if field == "type":
+                        tool_tokens += 2
+                        tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
+                    elif field == "description":
+                        tool_tokens += 2
+                        tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
+                    elif field == "enum":
+                        tool_tokens -= 3
+                        for o in v["enum"]:  # pyright: ignore
+                            tool_tokens += 3
+                            tool_tokens += len(encoding.encode(o))  # pyright: ignore
+                    else:
+                        trace_logger.warning(f"Not supported field {field}")
+            tool_tokens += 11
+            if len(parameters["properties"]) == 0:  # pyright: ignore
+                tool_tokens -= 2
+    return tool_tokens
+
+
 class BaseOpenAIChatCompletionClient(ChatCompletionClient):
     def __init__(
         self,
         client: Union[AsyncOpenAI, AsyncAzureOpenAI],
         create_args: Dict[str, Any],
         model_capabilities: Optional[ModelCapabilities] = None,
+        *,
+        max_concurrent_requests: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        coalesce_requests: bool = False,
     ):
         self._client = client
         if model_capabilities is None and isinstance(client, AsyncAzureOpenAI):
@@ -350,6 +492,16 @@ def __init__(
         self._create_args = create_args
         self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
         self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._message_token_counts: OrderedDict[Hashable, int] = OrderedDict()
+        self._tool_token_counts: Dict[str, int] = {}
+        self._request_limiter = RequestLimiter(
+            max_concurrent_requests=max_concurrent_requests,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        self._coalesce_requests = coalesce_requests
+        self._in_flight_requests: Dict[str, _InFlightRequest] = {}
+        self._num_shared_requests = 0
 
     @classmethod
     def create_from_config(cls, config: Dict[str, Any]) -> ChatCompletionClient:
@@ -415,70 +567,27 @@ async def create(
 
         if self.capabilities["function_calling"] is False and len(tools) > 0:
             raise ValueError("Model does not support function calling")
-        future: Union[Task[ParsedChatCompletion[BaseModel]], Task[ChatCompletion]]
+        request_kwargs: Dict[str, Any] = {"messages": oai_messages}
         if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            if use_beta_client:
-                # Pass response_format_value if it's not None
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            tools=converted_tools,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
-                        )
-                    )
-                else:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            tools=converted_tools,
-                            **create_args_no_response_format,
-                        )
-                    )
-            else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        tools=converted_tools,
-                        **create_args,
-                    )
-                )
+            request_kwargs["tools"] = convert_tools(tools)
+        create_request: Callable[..., Awaitable[_ChatCompletionResponse]]
+        if use_beta_client:
+            # Pass response_format_value if it's not None
+            if response_format_value is not None:
+                request_kwargs["response_format"] = response_format_value
+            request_kwargs.update(create_args_no_response_format)
+            create_request = self._client.beta.chat.completions.parse
         else:
-            if use_beta_client:
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
-                        )
-                    )
-                else:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            **create_args_no_response_format,
-                        )
-                    )
-            else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        **create_args,
-                    )
-                )
+            request_kwargs.update(stream=False, **create_args)
+            create_request = self._client.chat.completions.create
 
-        if cancellation_token is not None:
-            cancellation_token.link_future(future)
-        result: Union[ParsedChatCompletion[BaseModel], ChatCompletion] = await future
+        result, shared = await self._send_request(
+            create_request, request_kwargs, messages, tools, use_beta_client, cancellation_token
+        )
         if use_beta_client:
             result = cast(ParsedChatCompletion[Any], result)
 
-        if result.usage is not None:
+        if result.usage is not None and not shared:
             logger.info(
                 LLMCallEvent(
                     prompt_tokens=result.usage.prompt_tokens,
@@ -537,12 +646,14 @@ async def create(
             finish_reason=finish_reason,  # type: ignore
             content=content,
             usage=usage,
-            cached=False,
+            # A response shared with an identical request in flight did not cost anything.
+            cached=shared,
             logprobs=logprobs,
         )
 
-        _add_usage(self._actual_usage, usage)
-        _add_usage(self._total_usage, usage)
+        if not shared:
+            _add_usage(self._actual_usage, usage)
+            _add_usage(self._total_usage, usage)
 
         # TODO - why is this cast needed?
         return response
@@ -584,75 +695,77 @@ async def create_stream(
             else:
                 create_args["response_format"] = {"type": "text"}
 
-        if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(
-                    messages=oai_messages,
-                    stream=True,
-                    tools=converted_tools,
-                    **create_args,
+        estimated_tokens = self._estimate_request_tokens(messages, tools, create_args)
+        async with self._request_limiter.reserve(estimated_tokens):
+            if len(tools) > 0:
+                converted_tools = convert_tools(tools)
+                stream_future = asyncio.ensure_future(
+                    self._client.chat.completions.create(
+                        messages=oai_messages,
+                        stream=True,
+                        tools=converted_tools,
+                        **create_args,
+                    )
                 )
-            )
-        else:
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(messages=oai_messages, stream=True, **create_args)
-            )
-        if cancellation_token is not None:
-            cancellation_token.link_future(stream_future)
-        stream = await stream_future
-
-        stop_reason = None
-        maybe_model = None
-        content_deltas: List[str] = []
-        full_tool_calls: Dict[int, FunctionCall] = {}
-        completion_tokens = 0
-        logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
-        while True:
-            try:
-                chunk_future = asyncio.ensure_future(anext(stream))
-                if cancellation_token is not None:
-                    cancellation_token.link_future(chunk_future)
-                chunk = await chunk_future
-                choice = chunk.choices[0]
-                stop_reason = choice.finish_reason
-                maybe_model = chunk.model
-                # First try get content
-                if choice.delta.content is not None:
-                    content_deltas.append(choice.delta.content)
-                    if len(choice.delta.content) > 0:
-                        yield choice.delta.content
-                    continue
-
-                # Otherwise, get tool calls
-                if choice.delta.tool_calls is not None:
-                    for tool_call_chunk in choice.delta.tool_calls:
-                        idx = tool_call_chunk.index
-                        if idx not in full_tool_calls:
-                            # We ignore the type hint here because we want to fill in type when the delta provides it
-                            full_tool_calls[idx] = FunctionCall(id="", arguments="", name="")
-
-                        if tool_call_chunk.id is not None:
-                            full_tool_calls[idx].id += tool_call_chunk.id
-
-                        if tool_call_chunk.function is not None:
-                            if tool_call_chunk.function.name is not None:
-                                full_tool_calls[idx].name += tool_call_chunk.function.name
-                            if tool_call_chunk.function.arguments is not None:
-                                full_tool_calls[idx].arguments += tool_call_chunk.function.arguments
-                if choice.logprobs and choice.logprobs.content:
-                    logprobs = [
-                        ChatCompletionTokenLogprob(
-                            token=x.token,
-                            logprob=x.logprob,
-                            top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
-                            bytes=x.bytes,
-                        )
-                        for x in choice.logprobs.content
-                    ]
-
-            except StopAsyncIteration:
-                break
+            else:
+                stream_future = asyncio.ensure_future(
+                    self._client.chat.completions.create(messages=oai_messages, stream=True, **create_args)
+                )
+            if cancellation_token is not None:
+                cancellation_token.link_future(stream_future)
+            stream = await stream_future
+
+            stop_reason = None
+            maybe_model = None
+            content_deltas: List[str] = []
+            full_tool_calls: Dict[int, FunctionCall] = {}
+            completion_tokens = 0
+            logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
+            while True:
+                try:
+                    chunk_future = asyncio.ensure_future(anext(stream))
+                    if cancellation_token is not None:
+                        cancellation_token.link_future(chunk_future)
+                    chunk = await chunk_future
+                    choice = chunk.choices[0]
+                    stop_reason = choice.finish_reason
+                    maybe_model = chunk.model
+                    # First try get content
+                    if choice.delta.content is not None:
+                        content_deltas.append(choice.delta.content)
+                        if len(choice.delta.content) > 0:
+                            yield choice.delta.content
+                        continue
+
+                    # Otherwise, get tool calls
+                    if choice.delta.tool_calls is not None:
+                        for tool_call_chunk in choice.delta.tool_calls:
+                            idx = tool_call_chunk.index
+                            if idx not in full_tool_calls:
+                                # We ignore the type hint here because we want to fill in type when the delta provides it
+                                full_tool_calls[idx] = FunctionCall(id="", arguments="", name="")
+
+                            if tool_call_chunk.id is not None:
+                                full_tool_calls[idx].id += tool_call_chunk.id
+
+                            if tool_call_chunk.function is not None:
+                                if tool_call_chunk.function.name is not None:
+                                    full_tool_calls[idx].name += tool_call_chunk.function.name
+                                if tool_call_chunk.function.arguments is not None:
+                                    full_tool_calls[idx].arguments += tool_call_chunk.function.arguments
+                    if choice.logprobs and choice.logprobs.content:
+                        logprobs = [
+                            ChatCompletionTokenLogprob(
+                                token=x.token,
+                                logprob=x.logprob,
+                                top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
+                                bytes=x.bytes,
+                            )
+                            for x in choice.logprobs.content
+                        ]
+
+                except StopAsyncIteration:
+                    break
 
         model = maybe_model or create_args["model"]
         model = model.replace("gpt-35", "gpt-3.5")  # hack for Azure API
@@ -699,6 +812,80 @@ async def create_stream(
 
         yield result
 
+    @property
+    def queue_wait_time(self) -> LatencyHistogram:
+        """The time requests waited for a concurrency slot and rate limit budget before being sent, in seconds."""
+        return self._request_limiter.queue_wait
+
+    @property
+    def num_shared_requests(self) -> int:
+        """The number of :meth:`create` calls answered by an identical request that was already in flight."""
+        return self._num_shared_requests
+
+    def _estimate_request_tokens(
+        self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema], create_args: Mapping[str, Any]
+    ) -> int:
+        if not self._request_limiter.counts_tokens:
+            return 0
+        return self.count_tokens(messages, tools) + (create_args.get("max_tokens") or 0)
+
+    async def _send_request(
+        self,
+        create_request: Callable[..., Awaitable[_ChatCompletionResponse]],
+        request_kwargs: Dict[str, Any],
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        use_beta_client: bool,
+        cancellation_token: Optional[CancellationToken],
+    ) -> Tuple[_ChatCompletionResponse, bool]:
+        """Send a request within the limits of the client. Returns the response and whether it was
+        shared with an identical request that was already in flight."""
+
+        async def send() -> _ChatCompletionResponse:
+            estimated_tokens = self._estimate_request_tokens(messages, tools, request_kwargs)
+            async with self._request_limiter.reserve(estimated_tokens) as reservation:
+                result = await create_request(**request_kwargs)
+                if result.usage is not None:
+                    self._request_limiter.record_usage(reservation, result.usage.total_tokens)
+                return result
+
+        if not self._coalesce_requests:
+            future = asyncio.ensure_future(send())
+            if cancellation_token is not None:
+                cancellation_token.link_future(future)
+            return await future, False
+
+        key = json.dumps([use_beta_client, request_kwargs], sort_keys=True, default=repr)
+        in_flight = self._in_flight_requests.get(key)
+        shared = in_flight is not None
+        if in_flight is None:
+            in_flight = _InFlightRequest(asyncio.ensure_future(send()))
+            self._in_flight_requests[key] = in_flight
+
+            def remove(_: Task[_ChatCompletionResponse]) -> None:
+                if self._in_flight_requests.get(key) is in_flight:
+                    del self._in_flight_requests[key]
+
+            in_flight.task.add_done_callback(remove)
+        else:
+            self._num_shared_requests += 1
+
+        # Each caller waits on its own future, so that cancelling one caller does not cancel the
+        # others. The request is cancelled once every caller waiting on it is cancelled.
+        in_flight.waiters += 1
+        waiter = asyncio.ensure_future(asyncio.shield(in_flight.task))
+        if cancellation_token is not None:
+            cancellation_token.link_future(waiter)
+        try:
+            result: _ChatCompletionResponse = await waiter
+        except asyncio.CancelledError:
+            in_flight.waiters -= 1
+            if in_flight.waiters == 0:
+                in_flight.task.cancel()
+            raise
+        in_flight.waiters -= 1
+        return result, shared
+
     def actual_usage(self) -> RequestUsage:
         return self._actual_usage
 
@@ -706,90 +893,33 @@ def total_usage(self) -> RequestUsage:
         return self._total_usage
 
     def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
-        model = self._create_args["model"]
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-        tokens_per_message = 3
-        tokens_per_name = 1
+        # Counts are cached per message and per tool, so checking the budget of a growing
+        # conversation only encodes the messages added since the last call.
+        encoding = _encoding_for_model(self._create_args["model"])
         num_tokens = 0
 
         # Message tokens.
         for message in messages:
-            num_tokens += tokens_per_message
-            oai_message = to_oai_type(message)
-            for oai_message_part in oai_message:
-                for key, value in oai_message_part.items():
-                    if value is None:
-                        continue
-
-                    if isinstance(message, UserMessage) and isinstance(value, list):
-                        typed_message_value = cast(List[ChatCompletionContentPartParam], value)
-
-                        assert len(typed_message_value) == len(
-                            message.content
-                        ), "Mismatch in message content and typed message value"
-
-                        # We need image properties that are only in the original message
-                        for part, content_part in zip(typed_message_value, message.content, strict=False):
-                            if isinstance(content_part, Image):
-                                # TODO: add detail parameter
-                                num_tokens += calculate_vision_tokens(content_part)
-                            elif isinstance(part, str):
-                                num_tokens += len(encoding.encode(part))
-                            else:
-                                try:
-                                    serialized_part = json.dumps(part)
-                                    num_tokens += len(encoding.encode(serialized_part))
-                                except TypeError:
-                                    trace_logger.warning(f"Could not convert {part} to string, skipping.")
-                    else:
-                        if not isinstance(value, str):
-                            try:
-                                value = json.dumps(value)
-                            except TypeError:
-                                trace_logger.warning(f"Could not convert {value} to string, skipping.")
-                                continue
-                        num_tokens += len(encoding.encode(value))
-                        if key == "name":
-                            num_tokens += tokens_per_name
+            key = _message_token_cache_key(message)
+            message_tokens = self._message_token_counts.get(key)
+            if message_tokens is None:
+                message_tokens = _count_message_tokens(message, encoding)
+                self._message_token_counts[key] = message_tokens
+                if len(self._message_token_counts) > _MAX_CACHED_MESSAGE_TOKEN_COUNTS:
+                    self._message_token_counts.popitem(last=False)
+            else:
+                self._message_token_counts.move_to_end(key)
+            num_tokens += message_tokens
         num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
 
         # Tool tokens.
         oai_tools = convert_tools(tools)
         for tool in oai_tools:
-            function = tool["function"]
-            tool_tokens = len(encoding.encode(function["name"]))
-            if "description" in function:
-                tool_tokens += len(encoding.encode(function["description"]))
-            tool_tokens -= 2
-            if "parameters" in function:
-                parameters = function["parameters"]
-                if "properties" in parameters:
-                    assert isinstance(parameters["properties"], dict)
-                    for propertiesKey in parameters["properties"]:  # pyright: ignore
-                        assert isinstance(propertiesKey, str)
-                        tool_tokens += len(encoding.encode(propertiesKey))
-                        v = parameters["properties"][propertiesKey]  # pyright: ignore
-                        for field in v:  # pyright: ignore
-                            if field == "type":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
-                            elif field == "description":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
-                            elif field == "enum":
-                                tool_tokens -= 3
-                                for o in v["enum"]:  # pyright: ignore
-                                    tool_tokens += 3
-                                    tool_tokens += len(encoding.encode(o))  # pyright: ignore
-                            else:
-                                trace_logger.warning(f"Not supported field {field}")
-                    tool_tokens += 11
-                    if len(parameters["properties"]) == 0:  # pyright: ignore
-                        tool_tokens -= 2
+            tool_key = json.dumps(tool, sort_keys=True)
+            tool_tokens = self._tool_token_counts.get(tool_key)
+            if tool_tokens is None:
+                tool_tokens = _count_tool_tokens(tool, encoding)
+                self._tool_token_counts[tool_key] = tool_tokens
             num_tokens += tool_tokens
         num_tokens += 12
         return num_tokens
@@ -817,11 +947,12 @@ def __init__(self, **kwargs: Unpack[OpenAIClientConfiguration]):
         client = _openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, **_request_limits_from_config(copied_args))
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        state["_in_flight_requests"] = {}
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
@@ -843,11 +974,12 @@ def __init__(self, **kwargs: Unpack[AzureOpenAIClientConfiguration]):
         client = _azure_openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, **_request_limits_from_config(copied_args))
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        state["_in_flight_requests"] = {}
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
-from typing import List, Literal, Optional, Union
+from dataclasses import dataclass, field
+from typing import Any, List, Literal, Mapping, Optional, Sequence, Union
 
 from .. import FunctionCall, Image
+from ..tools import Tool, ToolSchema
 
 
 @dataclass
@@ -69,3 +70,13 @@ class CreateResult:
     usage: RequestUsage
     cached: bool
     logprobs: Optional[List[ChatCompletionTokenLogprob] | None] = None
+
+
+@dataclass
+class CreateRequest:
+    """The arguments of one :meth:`ChatCompletionClient.create` call, for use in a batch."""
+
+    messages: Sequence[LLMMessage]
+    tools: Sequence[Tool | ToolSchema] = field(default_factory=list)
+    json_output: Optional[bool] = None
+    extra_create_args: Mapping[str, Any] = field(default_factory=dict)
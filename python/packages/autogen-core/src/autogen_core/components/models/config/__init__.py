@@ -31,6 +31,11 @@ class BaseOpenAIClientConfiguration(CreateArguments, total=False):
     api_key: str
     timeout: Union[float, None]
     max_retries: int
+    # Limits applied by the client before requests are sent
+    max_concurrent_requests: int
+    requests_per_minute: int
+    tokens_per_minute: int
+    coalesce_requests: bool
 
 
 # See OpenAI docs for explanation of these parameters
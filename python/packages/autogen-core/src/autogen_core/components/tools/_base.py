@@ -1,7 +1,7 @@
 import json
 from abc import ABC, abstractmethod
 from collections.abc import Sequence
-from typing import Any, Dict, Generic, Mapping, Protocol, Type, TypedDict, TypeVar, runtime_checkable
+from typing import Any, Dict, Generic, Mapping, Protocol, Tuple, Type, TypedDict, TypeVar, runtime_checkable
 
 from pydantic import BaseModel
 from typing_extensions import NotRequired
@@ -68,9 +68,20 @@ def __init__(
         self._return_type = normalize_annotated_type(return_type)
         self._name = name
         self._description = description
+        self._schema: ToolSchema | None = None
+        self._schema_key: Tuple[Type[ArgsT], str, str] | None = None
 
     @property
     def schema(self) -> ToolSchema:
+        """The schema of the tool. It is generated once and shared between calls, so it must not be modified.
+        It is generated again if the name, description or argument type of the tool change."""
+        schema_key = (self._args_type, self._name, self._description)
+        if self._schema is None or self._schema_key != schema_key:
+            self._schema = self._build_schema()
+            self._schema_key = schema_key
+        return self._schema
+
+    def _build_schema(self) -> ToolSchema:
         model_schema = self._args_type.model_json_schema()
 
         tool_schema = ToolSchema(
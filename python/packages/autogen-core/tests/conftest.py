@@ -0,0 +1,39 @@
+from typing import Any
+
+import pytest
+from autogen_core.application import SingleThreadedAgentRuntime, ThreadPoolAgentRuntime
+from test_utils import RuntimeFactory, RuntimeUnderTest
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "thread_pool_gap(reason): the test uses a feature that ThreadPoolAgentRuntime does not have, "
+        "so it is expected to fail against it.",
+    )
+
+
+@pytest.fixture(params=["single_threaded", "thread_pool"])
+def runtime_factory(request: pytest.FixtureRequest) -> RuntimeFactory:
+    """Creates runtimes of the kind under test. Keyword arguments are passed to the runtime."""
+    if request.param == "thread_pool":
+        marker = request.node.get_closest_marker("thread_pool_gap")
+        if marker is not None:
+            request.applymarker(pytest.mark.xfail(reason=marker.args[0], strict=True))
+
+        def create_thread_pool_runtime(**kwargs: Any) -> RuntimeUnderTest:
+            # More than one worker, so that messages cross threads.
+            return ThreadPoolAgentRuntime(num_workers=2, **kwargs)
+
+        return create_thread_pool_runtime
+
+    def create_single_threaded_runtime(**kwargs: Any) -> RuntimeUnderTest:
+        return SingleThreadedAgentRuntime(**kwargs)
+
+    return create_single_threaded_runtime
+
+
+@pytest.fixture
+def runtime(runtime_factory: RuntimeFactory) -> RuntimeUnderTest:
+    """A runtime of the kind under test, not started."""
+    return runtime_factory()
@@ -2,8 +2,10 @@
 # Credit to original authors
 
 import asyncio
+import os
 import sys
 import tempfile
+import time
 from pathlib import Path
 from typing import AsyncGenerator, TypeAlias
 
@@ -11,22 +13,34 @@
 import pytest_asyncio
 from aiofiles import open
 from autogen_core.base import CancellationToken
-from autogen_core.components.code_executor import CodeBlock, LocalCommandLineCodeExecutor
+from autogen_core.components.code_executor import (
+    CodeBlock,
+    CommandLineCodeResult,
+    InMemoryCodeResultCache,
+    LocalCommandLineCodeExecutor,
+    SQLiteCodeResultCache,
+    find_code_block_dependencies,
+)
+from autogen_core.components.code_executor._impl.python_worker_pool import PythonWorker
 
 
-@pytest_asyncio.fixture(scope="function")  # type: ignore
+# The workers of an executor must be stopped in the event loop of the test that started them.
+@pytest_asyncio.fixture(scope="function", loop_scope="function")  # type: ignore
 async def executor_and_temp_dir(
     request: pytest.FixtureRequest,
 ) -> AsyncGenerator[tuple[LocalCommandLineCodeExecutor, str], None]:
     with tempfile.TemporaryDirectory() as temp_dir:
-        yield LocalCommandLineCodeExecutor(work_dir=temp_dir), temp_dir
+        worker_pool_size = 2 if request.param == "local_pool" else 0
+        executor = LocalCommandLineCodeExecutor(work_dir=temp_dir, worker_pool_size=worker_pool_size)
+        yield executor, temp_dir
+        await executor.stop()
 
 
 ExecutorFixture: TypeAlias = tuple[LocalCommandLineCodeExecutor, str]
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize("executor_and_temp_dir", ["local"], indirect=True)
+@pytest.mark.parametrize("executor_and_temp_dir", ["local", "local_pool"], indirect=True)
 async def test_execute_code(executor_and_temp_dir: ExecutorFixture) -> None:
     executor, _temp_dir = executor_and_temp_dir
     cancellation_token = CancellationToken()
@@ -85,10 +99,11 @@ async def test_commandline_code_executor_timeout(executor_and_temp_dir: Executor
 
 
 @pytest.mark.asyncio
-async def test_commandline_code_executor_cancellation() -> None:
+@pytest.mark.parametrize("worker_pool_size", [0, 1])
+async def test_commandline_code_executor_cancellation(worker_pool_size: int) -> None:
     with tempfile.TemporaryDirectory() as temp_dir:
         cancellation_token = CancellationToken()
-        executor = LocalCommandLineCodeExecutor(work_dir=temp_dir)
+        executor = LocalCommandLineCodeExecutor(work_dir=temp_dir, worker_pool_size=worker_pool_size)
         code_blocks = [CodeBlock(code="import time; time.sleep(10); print('hello world!')", language="python")]
 
         coro = executor.execute_code_blocks(code_blocks, cancellation_token)
@@ -98,6 +113,7 @@ async def test_commandline_code_executor_cancellation() -> None:
         code_result = await coro
 
         assert code_result.exit_code and "Cancelled" in code_result.output
+        await executor.stop()
 
 
 @pytest.mark.asyncio
@@ -123,7 +139,7 @@ async def test_invalid_relative_path(executor_and_temp_dir: ExecutorFixture) ->
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize("executor_and_temp_dir", ["local"], indirect=True)
+@pytest.mark.parametrize("executor_and_temp_dir", ["local", "local_pool"], indirect=True)
 async def test_valid_relative_path(executor_and_temp_dir: ExecutorFixture) -> None:
     executor, temp_dir_str = executor_and_temp_dir
 
@@ -143,3 +159,273 @@ async def test_valid_relative_path(executor_and_temp_dir: ExecutorFixture) -> No
     assert "test.py" in result.code_file
     assert (temp_dir / Path("test.py")).resolve() == Path(result.code_file).resolve()
     assert (temp_dir / Path("test.py")).exists()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_reuses_and_replaces_workers() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(
+            timeout=2, work_dir=temp_dir, worker_pool_size=1, max_runs_per_worker=3, preload_modules=["json"]
+        )
+        cancellation_token = CancellationToken()
+
+        async def run(code: str) -> tuple[int, str]:
+            result = await executor.execute_code_blocks([CodeBlock(code=code, language="python")], cancellation_token)
+            return result.exit_code, result.output
+
+        pid_code = "import os, sys; print(os.getpid(), 'json' in sys.modules)"
+        exit_code, output = await run(pid_code)
+        pid, preloaded = output.split()
+        assert exit_code == 0 and preloaded == "True"
+
+        # Each code block has its own namespace, and runs as a script.
+        assert await run("value = 1\nprint(__name__)") == (0, "__main__\n")
+        assert (await run("print(value)"))[0] == 1
+        # The worker that ran a failed code block was replaced.
+        pids = [(await run(pid_code))[1].split()[0] for _ in range(4)]
+        assert pid != pids[0]
+
+        # A worker is replaced after max_runs_per_worker code blocks.
+        assert pids[0] == pids[1] == pids[2] != pids[3]
+
+        # Modules in the working directory are imported again by each code block.
+        for version in range(2):
+            code = f"# filename: helper.py\nVERSION = {version}"
+            assert (await run(code))[0] == 0
+            assert await run("import helper; print(helper.VERSION)") == (0, f"{version}\n")
+
+        assert await run("import sys; sys.exit('failed')") == (1, "failed\n")
+        exit_code, output = await run("import time; time.sleep(10)")
+        assert exit_code == 124 and "Timeout" in output
+        assert await run("print('hello')") == (0, "hello\n")
+        await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_scripts_see_their_own_arguments() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(timeout=5, work_dir=temp_dir, worker_pool_size=1)
+        code_blocks = [
+            CodeBlock(code="import sys; print(len(sys.argv), sys.argv[0].endswith('.py'))", language="python"),
+            CodeBlock(code="import argparse; print(argparse.ArgumentParser().parse_args())", language="python"),
+            CodeBlock(code="print('done')", language="python"),
+        ]
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert result.exit_code == 0
+        assert result.output == "1 True\nNamespace()\ndone\n"
+        await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_python_worker_reports_unreadable_exit_code() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        worker = await PythonWorker.start(Path(temp_dir), [])
+        marker = worker._marker.decode()  # pyright: ignore[reportPrivateUsage]
+        script = Path(temp_dir) / "script.py"
+        # The script ends its own output on stderr, followed by something that is not an exit code.
+        script.write_text(f"import sys; sys.stderr.write({marker!r} + 'not an exit code\\n')")
+        stderr: list[bytes] = []
+        assert await worker.run(script, lambda data: None, stderr.append) == 1
+        assert b"could not be read" in b"".join(stderr)
+        assert not worker.alive
+        await worker.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="Only the process itself is killed on Windows.")
+@pytest.mark.parametrize("worker_pool_size", [0, 1])
+async def test_timeout_kills_started_processes(worker_pool_size: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(timeout=2, work_dir=temp_dir, worker_pool_size=worker_pool_size)
+        code = (
+            "import subprocess, sys, time\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+            "print(child.pid, flush=True)\n"
+            "time.sleep(30)"
+        )
+        result = await executor.execute_code_blocks([CodeBlock(code=code, language="python")], CancellationToken())
+        assert result.exit_code == 124 and "Timeout" in result.output
+        # The output written before the timeout is kept.
+        pid = int(result.output.split()[0])
+        for _ in range(50):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            await asyncio.sleep(0.1)
+        else:
+            pytest.fail("The process started by the code block is still running.")
+        await executor.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_and_temp_dir", ["local", "local_pool"], indirect=True)
+async def test_cancel_running_code_block(executor_and_temp_dir: ExecutorFixture) -> None:
+    executor, _temp_dir = executor_and_temp_dir
+    cancellation_token = CancellationToken()
+    code_blocks = [CodeBlock(code="import time; print('started', flush=True); time.sleep(30)", language="python")]
+    task = asyncio.create_task(executor.execute_code_blocks(code_blocks, cancellation_token))
+    await asyncio.sleep(2)
+    cancellation_token.cancel()
+    result = await asyncio.wait_for(task, 5)
+    assert result.exit_code == 125
+    assert result.output == "started\n\n Cancelled"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("worker_pool_size", [0, 1])
+async def test_max_output_size(worker_pool_size: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(
+            work_dir=temp_dir, worker_pool_size=worker_pool_size, max_output_size=1000
+        )
+        code_blocks = [
+            CodeBlock(code="print('a' * 600)", language="python"),
+            CodeBlock(code="import sys; sys.stdout.write('b' * 1_000_000)", language="python"),
+        ]
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert result.exit_code == 0
+        output, notice = result.output.split("\n[Output truncated: ")
+        assert output == "a" * 600 + "\n" + "b" * 399
+        assert notice == "999601 bytes were not captured]"
+        await executor.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_and_temp_dir", ["local", "local_pool"], indirect=True)
+async def test_execute_code_blocks_stream(executor_and_temp_dir: ExecutorFixture) -> None:
+    executor, temp_dir = executor_and_temp_dir
+    # The code block waits for the test to receive its first output.
+    code = (
+        "import os, time\n"
+        "print('ready', flush=True)\n"
+        "while not os.path.exists('go'):\n"
+        "    time.sleep(0.05)\n"
+        "print('done')"
+    )
+    chunks: list[str] = []
+    result = None
+    async for item in executor.execute_code_blocks_stream(
+        [CodeBlock(code=code, language="python")], CancellationToken()
+    ):
+        if isinstance(item, str):
+            assert result is None
+            chunks.append(item)
+            if "".join(chunks) == "ready\n":
+                (Path(temp_dir) / "go").touch()
+        else:
+            result = item
+    assert result is not None and result.exit_code == 0
+    assert "".join(chunks) == result.output == "ready\ndone\n"
+
+
+def test_find_code_block_dependencies() -> None:
+    code_blocks = [
+        CodeBlock(code="# filename: helper.py\nVALUE = 1", language="python"),
+        CodeBlock(code="import json; json.dump([1], open('data.json', 'w'))", language="python"),
+        CodeBlock(code="print(sum(range(10)))", language="python"),
+        CodeBlock(code="from helper import VALUE; print(VALUE)", language="python"),
+        CodeBlock(code="import json; print(json.load(open('data.json')))", language="python"),
+        CodeBlock(code="# filename: helper.py\nVALUE = 2", language="python"),
+        CodeBlock(code="ls", language="sh"),
+        CodeBlock(code="print('done')", language="python"),
+    ]
+    file_names = ["helper.py", "a.py", "b.py", "c.py", "d.py", "helper.py", "e.sh", "f.py"]
+    assert find_code_block_dependencies(code_blocks, file_names) == [
+        set(),
+        set(),
+        set(),
+        {0},
+        {1},
+        {0, 3},
+        {0, 1, 2, 3, 4, 5},
+        {6},
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("worker_pool_size", [0, 4])
+async def test_execute_independent_code_blocks_concurrently(worker_pool_size: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(
+            work_dir=temp_dir, worker_pool_size=worker_pool_size, max_concurrent_code_blocks=4
+        )
+        code_blocks = [
+            CodeBlock(code=f"import time; time.sleep(1); print({i})", language="python") for i in range(3)
+        ] + [CodeBlock(code="# filename: helper.py\nimport time; time.sleep(1); VALUE = 3", language="python")]
+        code_blocks.append(CodeBlock(code="import helper; print(helper.VALUE)", language="python"))
+        start = time.perf_counter()
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        # The first four code blocks run at the same time, and the last one waits for the fourth.
+        assert time.perf_counter() - start < 3
+        assert result.exit_code == 0
+        assert result.output == "0\n1\n2\n3\n"
+        assert result.code_file is not None and "tmp_code_" in result.code_file
+        await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_code_blocks_stop_at_first_failure() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = LocalCommandLineCodeExecutor(work_dir=temp_dir, max_concurrent_code_blocks=4)
+        code_blocks = [
+            CodeBlock(code="import time; time.sleep(0.5); print('first')", language="python"),
+            CodeBlock(code="import sys; sys.exit('failed')", language="python"),
+            CodeBlock(code="print('third')", language="python"),
+            CodeBlock(code="import time; time.sleep(0.5); print('fourth')", language="python"),
+        ]
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        # The output is the same as when the code blocks run one after another.
+        assert result.exit_code == 1
+        assert result.output == "first\nfailed\n"
+
+
+@pytest.mark.asyncio
+async def test_result_cache() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = InMemoryCodeResultCache()
+        executor = LocalCommandLineCodeExecutor(work_dir=temp_dir, result_cache=cache)
+        cancellation_token = CancellationToken()
+        # The code block counts its runs in a file, so the test can tell whether it ran.
+        code = "with open('runs.txt', 'a') as f: f.write('x')\nprint('hello')"
+
+        async def run(code_block: CodeBlock) -> CommandLineCodeResult:
+            return await executor.execute_code_blocks([code_block], cancellation_token)
+
+        def runs() -> int:
+            return len((Path(temp_dir) / "runs.txt").read_text())
+
+        # Code blocks that are not marked as pure always run.
+        assert (await run(CodeBlock(code=code, language="python"))).output == "hello\n"
+        assert (await run(CodeBlock(code=code, language="python"))).output == "hello\n"
+        assert runs() == 2 and len(cache) == 0
+
+        first = await run(CodeBlock(code=code, language="python", pure=True))
+        second = await run(CodeBlock(code=code, language="python", pure=True))
+        assert runs() == 3 and len(cache) == 1
+        assert first == second and second.exit_code == 0 and second.output == "hello\n"
+        assert second.code_file is not None and Path(second.code_file).read_text() == code
+
+        # The settings of the executor are part of the key.
+        other = LocalCommandLineCodeExecutor(timeout=30, work_dir=temp_dir, result_cache=cache)
+        await other.execute_code_blocks([CodeBlock(code=code, language="python", pure=True)], cancellation_token)
+        assert runs() == 4 and len(cache) == 2
+
+        # Failures are not cached.
+        failing = CodeBlock(code="import sys; sys.exit(1)", language="python", pure=True)
+        assert (await run(failing)).exit_code == 1
+        assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_result_cache_is_shared_between_executors() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        code_blocks = [CodeBlock(code="import random; print(random.random())", language="python", pure=True)]
+        outputs: list[str] = []
+        for _ in range(2):
+            cache = SQLiteCodeResultCache(Path(temp_dir) / "cache.db")
+            executor = LocalCommandLineCodeExecutor(work_dir=temp_dir, result_cache=cache)
+            result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+            outputs.append(result.output)
+            cache.close()
+        assert outputs[0] == outputs[1]
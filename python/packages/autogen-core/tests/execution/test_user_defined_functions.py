@@ -2,7 +2,10 @@
 # Credit to original authors
 
 import os
+import subprocess
+import sys
 import tempfile
+import textwrap
 
 import polars
 import pytest
@@ -76,6 +79,83 @@ async def test_can_load_function_with_reqs() -> None:
         assert result.exit_code == 0
 
 
+@pytest.mark.asyncio
+async def test_requirements_venv_is_reused() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir, tempfile.TemporaryDirectory() as cache_dir:
+        cancellation_token = CancellationToken()
+        code = f"""import sys
+from {LocalCommandLineCodeExecutor().functions_module} import load_data
+print(load_data()['name'][0], sys.prefix)"""
+
+        prefixes = []
+        for worker_pool_size in (0, 1):
+            executor = LocalCommandLineCodeExecutor(
+                work_dir=temp_dir,
+                functions=[load_data],
+                requirements_cache_dir=cache_dir,
+                worker_pool_size=worker_pool_size,
+            )
+            result = await executor.execute_code_blocks([CodeBlock(language="python", code=code)], cancellation_token)
+            await executor.stop()
+            assert result.exit_code == 0
+            name, prefix = result.output.split()
+            assert name == "John"
+            prefixes.append(prefix)
+
+        # Both executors ran the code in the same environment, which was created once.
+        assert prefixes[0] == prefixes[1]
+        assert os.listdir(cache_dir) == [os.path.basename(prefixes[0])]
+
+        # Other requirements get another environment, where a failed installation leaves nothing behind.
+        executor = LocalCommandLineCodeExecutor(
+            work_dir=temp_dir, functions=[function_incorrect_dep], requirements_cache_dir=cache_dir
+        )
+        with pytest.raises(ValueError, match="Pip install failed"):
+            await executor.execute_code_blocks([CodeBlock(language="python", code="print(1)")], cancellation_token)
+        assert os.listdir(cache_dir) == [os.path.basename(prefixes[0])]
+
+
+def test_requirements_venv_extends_the_virtual_environment_it_is_created_from() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # A virtual environment with a module that is not installed in the base interpreter.
+        host_dir = os.path.join(temp_dir, "host")
+        subprocess.run([sys.executable, "-m", "venv", "--system-site-packages", "--without-pip", host_dir], check=True)
+        host_python = (
+            os.path.join(host_dir, "Scripts", "python.exe")
+            if sys.platform == "win32"
+            else os.path.join(host_dir, "bin", "python")
+        )
+        host_site_packages = subprocess.run(
+            [host_python, "-c", "import sysconfig; print(sysconfig.get_path('purelib'))"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        with open(os.path.join(host_site_packages, "host_only_module.py"), "w") as f:
+            f.write("VALUE = 'host'\n")
+
+        # The environment for the requirements is created from the interpreter of that virtual environment.
+        script = textwrap.dedent(
+            f"""
+            import asyncio
+            from pathlib import Path
+            from autogen_core.components.code_executor._impl.requirements_venv import get_requirements_venv
+
+            print(asyncio.run(get_requirements_venv(Path({os.path.join(temp_dir, "cache")!r}), ["pytest"])))
+            """
+        )
+        venv_python = subprocess.run(
+            [host_python, "-c", script], check=True, capture_output=True, text=True
+        ).stdout.strip()
+        output = subprocess.run(
+            [venv_python, "-c", "import host_only_module, pytest; print(host_only_module.VALUE)"],
+            capture_output=True,
+            text=True,
+        )
+        assert output.returncode == 0, output.stderr
+        assert output.stdout == "host\n"
+
+
 def test_local_formatted_prompt() -> None:
     assert_str = '''def add_two_numbers(a: int, b: int) -> int:
     """Add two numbers together."""
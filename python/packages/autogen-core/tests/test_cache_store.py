@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import pytest
+from autogen_core.components.cache import CacheStore, InMemoryCacheStore, SQLiteCacheStore
+from autogen_core.components.code_executor import SQLiteCodeResultCache
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_store_evicts_least_recently_used() -> None:
+    cache = InMemoryCacheStore(max_entries=2)
+    assert isinstance(cache, CacheStore)
+    await cache.set("a", {"value": 1})
+    await cache.set("b", {"value": 2})
+    assert await cache.get("a") == {"value": 1}
+    await cache.set("c", {"value": 3})
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"value": 1}
+    assert len(cache) == 2
+
+    with pytest.raises(ValueError):
+        InMemoryCacheStore(max_entries=0)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_store_tables_share_a_file(tmp_path: Path) -> None:
+    path = tmp_path / "cache.db"
+    cache = SQLiteCacheStore(path, table="first")
+    code_results = SQLiteCodeResultCache(path)
+    assert isinstance(cache, CacheStore)
+    await cache.set("key", {"value": 1})
+    assert await code_results.get("key") is None
+    await code_results.set("key", {"value": 2})
+    cache.close()
+    code_results.close()
+
+    cache = SQLiteCacheStore(path, table="first")
+    assert await cache.get("key") == {"value": 1}
+    cache.close()
+
+    with pytest.raises(ValueError):
+        SQLiteCacheStore(path, table="first; DROP TABLE first")
@@ -1,10 +1,11 @@
 import asyncio
+import threading
 from dataclasses import dataclass
 
 import pytest
-from autogen_core.application import SingleThreadedAgentRuntime
 from autogen_core.base import AgentId, AgentInstantiationContext, CancellationToken, MessageContext
 from autogen_core.components import RoutedAgent, message_handler
+from test_utils import RuntimeUnderTest
 
 
 @dataclass
@@ -36,18 +37,23 @@ async def on_new_message(self, message: MessageType, ctx: MessageContext) -> Mes
 
 
 class NestingLongRunningAgent(RoutedAgent):
-    def __init__(self, nested_agent: AgentId) -> None:
+    def __init__(self, nested_agent: AgentId, gate: threading.Event | None = None) -> None:
         super().__init__("A nesting long running agent")
         self.called = False
         self.cancelled = False
         self._nested_agent = nested_agent
+        self._gate = gate
 
     @message_handler
     async def on_new_message(self, message: MessageType, ctx: MessageContext) -> MessageType:
         self.called = True
-        response = self.send_message(message, self._nested_agent, cancellation_token=ctx.cancellation_token)
         try:
-            val = await response
+            if self._gate is not None:
+                # Wait for the gate to open before sending to the nested agent.
+                gate = asyncio.ensure_future(asyncio.to_thread(self._gate.wait))
+                ctx.cancellation_token.link_future(gate)
+                await gate
+            val = await self.send_message(message, self._nested_agent, cancellation_token=ctx.cancellation_token)
             assert isinstance(val, MessageType)
             return val
         except asyncio.CancelledError:
@@ -56,39 +62,37 @@ async def on_new_message(self, message: MessageType, ctx: MessageContext) -> Mes
 
 
 @pytest.mark.asyncio
-async def test_cancellation_with_token() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_cancellation_with_token(runtime: RuntimeUnderTest) -> None:
     await runtime.register("long_running", LongRunningAgent)
     agent_id = AgentId("long_running", key="default")
     token = CancellationToken()
     response = asyncio.create_task(runtime.send_message(MessageType(), recipient=agent_id, cancellation_token=token))
     assert not response.done()
 
-    while len(runtime.unprocessed_messages) == 0:
+    runtime.start()
+    long_running_agent = await runtime.try_get_underlying_agent_instance(agent_id, type=LongRunningAgent)
+    while not long_running_agent.called:
         await asyncio.sleep(0.01)
 
-    await runtime.process_next()
-
     token.cancel()
 
     with pytest.raises(asyncio.CancelledError):
         await response
 
     assert response.done()
-    long_running_agent = await runtime.try_get_underlying_agent_instance(agent_id, type=LongRunningAgent)
-    assert long_running_agent.called
+    await runtime.stop_when_idle()
     assert long_running_agent.cancelled
 
 
 @pytest.mark.asyncio
-async def test_nested_cancellation_only_outer_called() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_nested_cancellation_only_outer_called(runtime: RuntimeUnderTest) -> None:
+    gate = threading.Event()
     await runtime.register("long_running", LongRunningAgent)
     await runtime.register(
         "nested",
-        lambda: NestingLongRunningAgent(AgentId("long_running", key=AgentInstantiationContext.current_agent_id().key)),
+        lambda: NestingLongRunningAgent(
+            AgentId("long_running", key=AgentInstantiationContext.current_agent_id().key), gate
+        ),
     )
 
     long_running_id = AgentId("long_running", key="default")
@@ -97,18 +101,20 @@ async def test_nested_cancellation_only_outer_called() -> None:
     response = asyncio.create_task(runtime.send_message(MessageType(), nested_id, cancellation_token=token))
     assert not response.done()
 
-    while len(runtime.unprocessed_messages) == 0:
+    runtime.start()
+    # Wait until the outer agent processes the message, which then waits on the gate.
+    nested_agent = await runtime.try_get_underlying_agent_instance(nested_id, type=NestingLongRunningAgent)
+    while not nested_agent.called:
         await asyncio.sleep(0.01)
-
-    await runtime.process_next()
     token.cancel()
 
     with pytest.raises(asyncio.CancelledError):
         await response
 
     assert response.done()
-    nested_agent = await runtime.try_get_underlying_agent_instance(nested_id, type=NestingLongRunningAgent)
-    assert nested_agent.called
+    await runtime.stop_when_idle()
+    # Release the thread that waits on the gate.
+    gate.set()
     assert nested_agent.cancelled
     long_running_agent = await runtime.try_get_underlying_agent_instance(long_running_id, type=LongRunningAgent)
     assert long_running_agent.called is False
@@ -116,9 +122,7 @@ async def test_nested_cancellation_only_outer_called() -> None:
 
 
 @pytest.mark.asyncio
-async def test_nested_cancellation_inner_called() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_nested_cancellation_inner_called(runtime: RuntimeUnderTest) -> None:
     await runtime.register("long_running", LongRunningAgent)
     await runtime.register(
         "nested",
@@ -132,21 +136,19 @@ async def test_nested_cancellation_inner_called() -> None:
     response = asyncio.create_task(runtime.send_message(MessageType(), nested_id, cancellation_token=token))
     assert not response.done()
 
-    while len(runtime.unprocessed_messages) == 0:
+    runtime.start()
+    # Wait until the inner agent processes the message.
+    long_running_agent = await runtime.try_get_underlying_agent_instance(long_running_id, type=LongRunningAgent)
+    while not long_running_agent.called:
         await asyncio.sleep(0.01)
-
-    await runtime.process_next()
-    # allow the inner agent to process
-    await runtime.process_next()
     token.cancel()
 
     with pytest.raises(asyncio.CancelledError):
         await response
 
     assert response.done()
+    await runtime.stop_when_idle()
     nested_agent = await runtime.try_get_underlying_agent_instance(nested_id, type=NestingLongRunningAgent)
     assert nested_agent.called
     assert nested_agent.cancelled
-    long_running_agent = await runtime.try_get_underlying_agent_instance(long_running_id, type=LongRunningAgent)
-    assert long_running_agent.called
     assert long_running_agent.cancelled
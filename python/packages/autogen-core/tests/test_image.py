@@ -0,0 +1,52 @@
+import base64
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+from autogen_core.components import Image
+from PIL import Image as PILImage
+
+
+def _encode(pil_image: PILImage.Image, format: str) -> bytes:
+    buffered = BytesIO()
+    pil_image.save(buffered, format=format)
+    return buffered.getvalue()
+
+
+def test_encodings_are_computed_once() -> None:
+    image = Image(PILImage.new("RGBA", (20, 10), color=(255, 0, 0, 128)))
+    assert image.image.mode == "RGB"
+
+    with patch.object(PILImage.Image, "save", autospec=True, side_effect=PILImage.Image.save) as save:
+        data_uri = image.data_uri
+        assert image.to_base64() == data_uri.removeprefix("data:image/png;base64,")
+        assert image.to_openai_format()["image_url"]["url"] == data_uri
+        assert save.call_count == 1
+
+    # Assigning a new image drops the cached encodings.
+    image.image = PILImage.new("RGB", (5, 5))
+    assert image.size == (5, 5)
+    assert Image.from_base64(image.to_base64()).size == (5, 5)
+
+
+def test_encoded_images_keep_original_bytes(tmp_path: Path) -> None:
+    jpeg = _encode(PILImage.new("RGB", (64, 32), color=(0, 128, 255)), "JPEG")
+    image = Image.from_base64(base64.b64encode(jpeg).decode("utf-8"))
+    assert image.size == (64, 32)
+    assert image.to_bytes() == jpeg
+    assert image.data_uri.startswith("data:image/jpeg;base64,")
+
+    path = tmp_path / "image.png"
+    png = _encode(PILImage.new("L", (8, 8)), "PNG")
+    path.write_bytes(png)
+    image = Image.from_file(path)
+    assert image.to_bytes() == png
+    assert image.image.mode == "RGB"
+    assert Image.from_uri(image.data_uri).to_bytes() == png
+
+
+def test_other_formats_are_encoded_as_png() -> None:
+    image = Image.from_base64(base64.b64encode(_encode(PILImage.new("RGB", (3, 4)), "BMP")).decode("utf-8"))
+    assert image.size == (3, 4)
+    assert image.to_bytes().startswith(b"\x89PNG\r\n\x1a\n")
+    assert image.data_uri.startswith("data:image/png;base64,")
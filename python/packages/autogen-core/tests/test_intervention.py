@@ -1,13 +1,15 @@
+import asyncio
+import threading
+
 import pytest
-from autogen_core.application import SingleThreadedAgentRuntime
 from autogen_core.base import AgentId
 from autogen_core.base.exceptions import MessageDroppedException
 from autogen_core.base.intervention import DefaultInterventionHandler, DropMessage
-from test_utils import LoopbackAgent, MessageType
+from test_utils import LoopbackAgent, MessageType, RuntimeFactory
 
 
 @pytest.mark.asyncio
-async def test_intervention_count_messages() -> None:
+async def test_intervention_count_messages(runtime_factory: RuntimeFactory) -> None:
     class DebugInterventionHandler(DefaultInterventionHandler):
         def __init__(self) -> None:
             self.num_messages = 0
@@ -17,7 +19,7 @@ async def on_send(self, message: MessageType, *, sender: AgentId | None, recipie
             return message
 
     handler = DebugInterventionHandler()
-    runtime = SingleThreadedAgentRuntime(intervention_handlers=[handler])
+    runtime = runtime_factory(intervention_handlers=[handler])
     await runtime.register("name", LoopbackAgent)
     loopback = AgentId("name", key="default")
     runtime.start()
@@ -32,7 +34,7 @@ async def on_send(self, message: MessageType, *, sender: AgentId | None, recipie
 
 
 @pytest.mark.asyncio
-async def test_intervention_drop_send() -> None:
+async def test_intervention_drop_send(runtime_factory: RuntimeFactory) -> None:
     class DropSendInterventionHandler(DefaultInterventionHandler):
         async def on_send(
             self, message: MessageType, *, sender: AgentId | None, recipient: AgentId
@@ -40,7 +42,7 @@ async def on_send(
             return DropMessage
 
     handler = DropSendInterventionHandler()
-    runtime = SingleThreadedAgentRuntime(intervention_handlers=[handler])
+    runtime = runtime_factory(intervention_handlers=[handler])
 
     await runtime.register("name", LoopbackAgent)
     loopback = AgentId("name", key="default")
@@ -56,7 +58,7 @@ async def on_send(
 
 
 @pytest.mark.asyncio
-async def test_intervention_drop_response() -> None:
+async def test_intervention_drop_response(runtime_factory: RuntimeFactory) -> None:
     class DropResponseInterventionHandler(DefaultInterventionHandler):
         async def on_response(
             self, message: MessageType, *, sender: AgentId, recipient: AgentId | None
@@ -64,7 +66,7 @@ async def on_response(
             return DropMessage
 
     handler = DropResponseInterventionHandler()
-    runtime = SingleThreadedAgentRuntime(intervention_handlers=[handler])
+    runtime = runtime_factory(intervention_handlers=[handler])
 
     await runtime.register("name", LoopbackAgent)
     loopback = AgentId("name", key="default")
@@ -77,7 +79,7 @@ async def on_response(
 
 
 @pytest.mark.asyncio
-async def test_intervention_raise_exception_on_send() -> None:
+async def test_intervention_raise_exception_on_send(runtime_factory: RuntimeFactory) -> None:
     class InterventionException(Exception):
         pass
 
@@ -88,7 +90,7 @@ async def on_send(
             raise InterventionException
 
     handler = ExceptionInterventionHandler()
-    runtime = SingleThreadedAgentRuntime(intervention_handlers=[handler])
+    runtime = runtime_factory(intervention_handlers=[handler])
 
     await runtime.register("name", LoopbackAgent)
     loopback = AgentId("name", key="default")
@@ -104,7 +106,7 @@ async def on_send(
 
 
 @pytest.mark.asyncio
-async def test_intervention_raise_exception_on_respond() -> None:
+async def test_intervention_raise_exception_on_respond(runtime_factory: RuntimeFactory) -> None:
     class InterventionException(Exception):
         pass
 
@@ -115,7 +117,7 @@ async def on_response(
             raise InterventionException
 
     handler = ExceptionInterventionHandler()
-    runtime = SingleThreadedAgentRuntime(intervention_handlers=[handler])
+    runtime = runtime_factory(intervention_handlers=[handler])
 
     await runtime.register("name", LoopbackAgent)
     loopback = AgentId("name", key="default")
@@ -127,3 +129,49 @@ async def on_response(
 
     long_running_agent = await runtime.try_get_underlying_agent_instance(loopback, type=LoopbackAgent)
     assert long_running_agent.num_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_intervention_does_not_block_other_messages(runtime_factory: RuntimeFactory) -> None:
+    # The handler may run on another thread than the test.
+    release = threading.Event()
+
+    class SlowInterventionHandler(DefaultInterventionHandler):
+        async def on_send(self, message: MessageType, *, sender: AgentId | None, recipient: AgentId) -> MessageType:
+            if recipient.type == "slow":
+                await asyncio.to_thread(release.wait)
+            return message
+
+    runtime = runtime_factory(intervention_handlers=[SlowInterventionHandler()])
+    await LoopbackAgent.register(runtime, "slow", LoopbackAgent)
+    await LoopbackAgent.register(runtime, "fast", LoopbackAgent)
+    runtime.start()
+
+    slow_response = asyncio.ensure_future(runtime.send_message(MessageType(), recipient=AgentId("slow", "default")))
+    await asyncio.wait_for(runtime.send_message(MessageType(), recipient=AgentId("fast", "default")), timeout=1)
+    assert not slow_response.done()
+
+    release.set()
+    await asyncio.wait_for(slow_response, timeout=1)
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+async def test_intervention_latencies_only_for_overridden_hooks(runtime_factory: RuntimeFactory) -> None:
+    class CountingInterventionHandler(DefaultInterventionHandler):
+        async def on_send(self, message: MessageType, *, sender: AgentId | None, recipient: AgentId) -> MessageType:
+            return message
+
+    runtime = runtime_factory(intervention_handlers=[CountingInterventionHandler(), DefaultInterventionHandler()])
+    await LoopbackAgent.register(runtime, "name", LoopbackAgent)
+    runtime.start()
+
+    for _ in range(3):
+        await runtime.send_message(MessageType(), recipient=AgentId("name", "default"))
+
+    await runtime.stop()
+
+    assert list(runtime.intervention_latencies) == ["CountingInterventionHandler.on_send"]
+    histogram = runtime.intervention_latencies["CountingInterventionHandler.on_send"]
+    assert histogram.count == 3
+    assert sum(count for _, count in histogram.buckets) == 3
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+import pytest
+from autogen_core.base import CancellationToken
+from autogen_core.components.models import (
+    ChatCompletionClient,
+    CreateRequest,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,
+    RequestUsage,
+    UserMessage,
+    create_batch,
+)
+from autogen_core.components.tools import Tool, ToolSchema
+
+
+class EchoChatCompletionClient:
+    """Echoes the last message back, and fails on messages that start with "fail".
+
+    It implements :class:`ChatCompletionClient` structurally, without inheriting from it."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            content = messages[-1].content
+            assert isinstance(content, str)
+            if content.startswith("fail"):
+                raise ValueError(content)
+            return CreateResult(
+                finish_reason="stop",
+                content=content,
+                usage=RequestUsage(prompt_tokens=1, completion_tokens=1),
+                cached=False,
+            )
+        finally:
+            self.in_flight -= 1
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        raise NotImplementedError()
+
+    def actual_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def total_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return ModelCapabilities(vision=False, function_calling=False, json_output=False)
+
+
+@pytest.mark.asyncio
+async def test_create_batch_returns_results_in_order() -> None:
+    client = EchoChatCompletionClient()
+    assert isinstance(client, ChatCompletionClient)
+    contents = [f"fail {i}" if i % 5 == 0 else f"message {i}" for i in range(20)]
+    requests = [CreateRequest(messages=[UserMessage(content=content, source="user")]) for content in contents]
+
+    results = await create_batch(client, requests, max_concurrency=3)
+
+    assert len(results) == 20
+    for content, result in zip(contents, results, strict=True):
+        if content.startswith("fail"):
+            assert isinstance(result, ValueError) and str(result) == content
+        else:
+            assert isinstance(result, CreateResult) and result.content == content
+    assert client.max_in_flight == 3
+
+    with pytest.raises(ValueError):
+        await create_batch(client, requests, max_concurrency=0)
@@ -1,8 +1,75 @@
-from typing import List
+from typing import Any, AsyncGenerator, List, Mapping, Optional, Sequence, Union
 
 import pytest
-from autogen_core.components.model_context import BufferedChatCompletionContext, HeadAndTailChatCompletionContext
-from autogen_core.components.models import AssistantMessage, LLMMessage, UserMessage
+from autogen_core.base import CancellationToken
+from autogen_core.components import FunctionCall
+from autogen_core.components.model_context import (
+    BufferedChatCompletionContext,
+    HeadAndTailChatCompletionContext,
+    TokenBudgetChatCompletionContext,
+)
+from autogen_core.components.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    CreateResult,
+    FunctionExecutionResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    ModelCapabilities,
+    RequestUsage,
+    SystemMessage,
+    UserMessage,
+)
+from autogen_core.components.tools import Tool, ToolSchema
+
+
+class WordCountingChatCompletionClient(ChatCompletionClient):
+    """Counts one token per word of text content, one per function call or result, and ``request_tokens``
+    per request."""
+
+    def __init__(self, request_tokens: int = 0) -> None:
+        self.num_counted = 0
+        self.request_tokens = request_tokens
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        raise NotImplementedError()
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        raise NotImplementedError()
+
+    def actual_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def total_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        self.num_counted += len(messages)
+        return self.request_tokens + sum(
+            len(message.content.split()) if isinstance(message.content, str) else len(message.content)
+            for message in messages
+        )
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return ModelCapabilities(vision=False, function_calling=False, json_output=False)
 
 
 @pytest.mark.asyncio
@@ -48,3 +115,101 @@ async def test_head_and_tail_model_context() -> None:
     await model_context.clear()
     retrieved = await model_context.get_messages()
     assert len(retrieved) == 0
+
+
+@pytest.mark.asyncio
+async def test_token_budget_model_context() -> None:
+    model_client = WordCountingChatCompletionClient()
+    model_context = TokenBudgetChatCompletionContext(model_client, token_budget=6)
+    messages: List[LLMMessage] = [
+        UserMessage(content="What is the weather?", source="user"),
+        AssistantMessage(content=[FunctionCall(id="1", name="weather", arguments="{}")], source="assistant"),
+        FunctionExecutionResultMessage(content=[FunctionExecutionResult(call_id="1", content="Sunny")]),
+        AssistantMessage(content="It is sunny.", source="assistant"),
+    ]
+    for message in messages:
+        await model_context.add_message(message)
+    assert await model_context.get_messages() == messages[1:]
+    assert model_context.total_tokens == 5
+
+    # Evicting the function call also evicts its result.
+    await model_context.add_message(UserMessage(content="Thanks a lot", source="user"))
+    assert await model_context.get_messages() == messages[3:] + [UserMessage(content="Thanks a lot", source="user")]
+    assert model_context.total_tokens == 6
+    assert model_client.num_counted == 5
+
+    # A message larger than the budget is kept on its own.
+    long_message = UserMessage(content="one two three four five six seven", source="user")
+    await model_context.add_message(long_message)
+    assert await model_context.get_messages() == [long_message]
+
+    state = model_context.save_state()
+    restored = TokenBudgetChatCompletionContext(model_client, token_budget=1)
+    restored.load_state(state)
+    assert await restored.get_messages() == [long_message]
+    assert restored.total_tokens == 7
+    assert model_client.num_counted == 6
+
+    await model_context.clear()
+    assert await model_context.get_messages() == []
+    assert model_context.total_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_token_budget_model_context_counts_request_tokens_once() -> None:
+    model_client = WordCountingChatCompletionClient(request_tokens=3)
+    model_context = TokenBudgetChatCompletionContext(model_client, token_budget=8)
+    assert model_context.total_tokens == 3
+
+    messages: List[LLMMessage] = [UserMessage(content=f"Message {i}", source="user") for i in range(3)]
+    for message in messages:
+        await model_context.add_message(message)
+        assert model_context.total_tokens == model_client.count_tokens(await model_context.get_messages())
+    # Two messages and one request fit in the budget.
+    assert await model_context.get_messages() == messages[1:]
+    assert model_context.total_tokens == 7
+
+
+@pytest.mark.asyncio
+async def test_token_budget_model_context_keeps_call_with_trailing_result() -> None:
+    model_context = TokenBudgetChatCompletionContext(WordCountingChatCompletionClient(), token_budget=2)
+    call = AssistantMessage(
+        content=[FunctionCall(id=str(i), name="weather", arguments="{}") for i in range(2)], source="assistant"
+    )
+    result = FunctionExecutionResultMessage(
+        content=[FunctionExecutionResult(call_id=str(i), content="Sunny") for i in range(2)]
+    )
+    await model_context.add_message(UserMessage(content="What is the weather?", source="user"))
+    await model_context.add_message(call)
+    await model_context.add_message(result)
+    # The call and its result exceed the budget, but the result is not kept without its call.
+    assert await model_context.get_messages() == [call, result]
+    assert model_context.total_tokens == 4
+
+    # A result whose call is not in the context is evicted.
+    await model_context.clear()
+    await model_context.add_message(result)
+    assert await model_context.get_messages() == []
+
+
+@pytest.mark.asyncio
+async def test_token_budget_model_context_summarizes_evicted_messages() -> None:
+    summarized: List[Sequence[LLMMessage]] = []
+
+    async def summarize(messages: Sequence[LLMMessage]) -> LLMMessage:
+        summarized.append(messages)
+        return SystemMessage(content=f"Summary of {len(messages)}")
+
+    initial_messages: List[LLMMessage] = [UserMessage(content=f"message {i}", source="user") for i in range(3)]
+    model_context = TokenBudgetChatCompletionContext(
+        WordCountingChatCompletionClient(), token_budget=7, summarizer=summarize, initial_messages=initial_messages
+    )
+    assert await model_context.get_messages() == initial_messages
+    await model_context.add_message(UserMessage(content="message 3", source="user"))
+    # The summary takes 3 tokens, which leaves room for the 2 most recent messages.
+    assert await model_context.get_messages() == [
+        SystemMessage(content="Summary of 2"),
+        UserMessage(content="message 2", source="user"),
+        UserMessage(content="message 3", source="user"),
+    ]
+    assert summarized == [initial_messages[:1], [SystemMessage(content="Summary of 1"), initial_messages[1]]]
@@ -1,12 +1,21 @@
 import asyncio
+import gc
+import inspect
+import json
 import logging
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, List
 
 import pytest
 from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application.logging import EVENT_LOGGER_NAME
+from autogen_core.application.logging.events import DeliveryStage, MessageEvent, MessageKind
 from autogen_core.base import (
     AgentId,
     AgentInstantiationContext,
     AgentType,
+    MessageContext,
     Subscription,
     SubscriptionInstantiationContext,
     TopicId,
@@ -14,7 +23,10 @@
 )
 from autogen_core.components import (
     DefaultTopicId,
+    RoutedAgent,
     TypeSubscription,
+    default_subscription,
+    message_handler,
     type_subscription,
 )
 from opentelemetry.sdk.trace import TracerProvider
@@ -25,6 +37,8 @@
     LoopbackAgentWithDefaultSubscription,
     MessageType,
     NoopAgent,
+    RuntimeFactory,
+    RuntimeUnderTest,
 )
 from test_utils.telemetry_test_utils import TestExporter, get_test_tracer_provider
 
@@ -38,9 +52,7 @@ def tracer_provider() -> TracerProvider:
 
 
 @pytest.mark.asyncio
-async def test_agent_type_must_be_unique() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_agent_type_must_be_unique(runtime: RuntimeUnderTest) -> None:
     def agent_factory() -> NoopAgent:
         id = AgentInstantiationContext.current_agent_id()
         assert id == AgentId("name1", "default")
@@ -59,8 +71,8 @@ def agent_factory() -> NoopAgent:
 
 
 @pytest.mark.asyncio
-async def test_register_receives_publish(tracer_provider: TracerProvider) -> None:
-    runtime = SingleThreadedAgentRuntime(tracer_provider=tracer_provider)
+async def test_register_receives_publish(runtime_factory: RuntimeFactory, tracer_provider: TracerProvider) -> None:
+    runtime = runtime_factory(tracer_provider=tracer_provider)
 
     runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
     await runtime.register_factory(
@@ -93,9 +105,9 @@ async def test_register_receives_publish(tracer_provider: TracerProvider) -> Non
 
 
 @pytest.mark.asyncio
-async def test_register_receives_publish_with_exception(caplog: pytest.LogCaptureFixture) -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_register_receives_publish_with_exception(
+    runtime: RuntimeUnderTest, caplog: pytest.LogCaptureFixture
+) -> None:
     runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
 
     async def agent_factory() -> LoopbackAgent:
@@ -113,7 +125,19 @@ async def agent_factory() -> LoopbackAgent:
 
 
 @pytest.mark.asyncio
-async def test_register_receives_publish_cascade() -> None:
+async def test_send_errors_are_raised_to_sender(runtime: RuntimeUnderTest) -> None:
+    await NoopAgent.register(runtime, "noop", NoopAgent)
+    runtime.start()
+
+    with pytest.raises(NotImplementedError):
+        await runtime.send_message(MessageType(), AgentId("noop", "default"))
+    with pytest.raises(Exception, match="Recipient not found"):
+        await runtime.send_message(MessageType(), AgentId("unknown", "default"))
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+async def test_register_receives_publish_cascade(runtime: RuntimeUnderTest) -> None:
     num_agents = 5
     num_initial_messages = 5
     max_rounds = 5
@@ -121,8 +145,6 @@ async def test_register_receives_publish_cascade() -> None:
     for i in range(0, max_rounds):
         total_num_calls_expected += num_initial_messages * ((num_agents - 1) ** i)
 
-    runtime = SingleThreadedAgentRuntime()
-
     # Register agents
     for i in range(num_agents):
         await CascadingAgent.register(runtime, f"name{i}", lambda: CascadingAgent(max_rounds))
@@ -143,9 +165,7 @@ async def test_register_receives_publish_cascade() -> None:
 
 
 @pytest.mark.asyncio
-async def test_register_factory_explicit_name() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_register_factory_explicit_name(runtime: RuntimeUnderTest) -> None:
     await runtime.register("name", LoopbackAgent, lambda: [TypeSubscription("default", "name")])
     runtime.start()
     agent_id = AgentId("name", key="default")
@@ -166,9 +186,7 @@ async def test_register_factory_explicit_name() -> None:
 
 
 @pytest.mark.asyncio
-async def test_register_factory_context_var_name() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_register_factory_context_var_name(runtime: RuntimeUnderTest) -> None:
     await runtime.register(
         "name", LoopbackAgent, lambda: [TypeSubscription("default", SubscriptionInstantiationContext.agent_type().type)]
     )
@@ -191,9 +209,7 @@ async def test_register_factory_context_var_name() -> None:
 
 
 @pytest.mark.asyncio
-async def test_register_factory_async() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_register_factory_async(runtime: RuntimeUnderTest) -> None:
     async def sub_factory() -> list[Subscription]:
         await asyncio.sleep(0.1)
         return [TypeSubscription("default", SubscriptionInstantiationContext.agent_type().type)]
@@ -218,9 +234,7 @@ async def sub_factory() -> list[Subscription]:
 
 
 @pytest.mark.asyncio
-async def test_register_factory_direct_list() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_register_factory_direct_list(runtime: RuntimeUnderTest) -> None:
     await runtime.register("name", LoopbackAgent, [TypeSubscription("default", "name")])
     runtime.start()
     agent_id = AgentId("name", key="default")
@@ -241,8 +255,7 @@ async def test_register_factory_direct_list() -> None:
 
 
 @pytest.mark.asyncio
-async def test_default_subscription() -> None:
-    runtime = SingleThreadedAgentRuntime()
+async def test_default_subscription(runtime: RuntimeUnderTest) -> None:
     runtime.start()
 
     await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
@@ -264,8 +277,7 @@ async def test_default_subscription() -> None:
 
 
 @pytest.mark.asyncio
-async def test_type_subscription() -> None:
-    runtime = SingleThreadedAgentRuntime()
+async def test_type_subscription(runtime: RuntimeUnderTest) -> None:
     runtime.start()
 
     @type_subscription(topic_type="Other")
@@ -287,8 +299,7 @@ class LoopbackAgentWithSubscription(LoopbackAgent): ...
 
 
 @pytest.mark.asyncio
-async def test_default_subscription_publish_to_other_source() -> None:
-    runtime = SingleThreadedAgentRuntime()
+async def test_default_subscription_publish_to_other_source(runtime: RuntimeUnderTest) -> None:
     runtime.start()
 
     await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
@@ -306,3 +317,343 @@ async def test_default_subscription_publish_to_other_source() -> None:
         AgentId("name", key="other"), type=LoopbackAgentWithDefaultSubscription
     )
     assert other_long_running_agent.num_calls == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime has no message queue options.")
+async def test_max_queue_size_backpressure(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(max_queue_size=2)
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    await runtime.register("name", LoopbackAgent, [TypeSubscription("default", "name")])
+    topic_id = TopicId("default", "default")
+
+    await runtime.publish_message(MessageType(), topic_id=topic_id)
+    await runtime.publish_message(MessageType(), topic_id=topic_id)
+
+    # The queue is full, so the third publish must wait for the runtime to drain it.
+    blocked_publish = asyncio.create_task(runtime.publish_message(MessageType(), topic_id=topic_id))
+    await asyncio.sleep(0.1)
+    assert not blocked_publish.done()
+    assert len(runtime.unprocessed_messages) == 2
+
+    runtime.start()
+    await blocked_publish
+    await runtime.stop_when_idle()
+
+    agent = await runtime.try_get_underlying_agent_instance(AgentId("name", "default"), type=LoopbackAgent)
+    assert agent.num_calls == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime has no message queue options.")
+async def test_prioritize_responses(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(prioritize_responses=True)
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    await runtime.register("name", LoopbackAgent)
+    agent_id = AgentId("name", "default")
+
+    first_send = asyncio.create_task(runtime.send_message(MessageType(), agent_id))
+    await asyncio.sleep(0)
+    second_send = asyncio.create_task(runtime.send_message(MessageType(), agent_id))
+    await asyncio.sleep(0)
+    await runtime.process_next()
+    # Let the handler run so that its response is queued behind the second send.
+    await asyncio.sleep(0.1)
+
+    # The response was queued after the second send but is processed first.
+    assert [type(envelope).__name__ for envelope in runtime.unprocessed_messages] == [
+        "ResponseMessageEnvelope",
+        "SendMessageEnvelope",
+    ]
+    await runtime.process_next()
+    await asyncio.sleep(0.1)
+    assert first_send.done()
+    assert not second_send.done()
+
+    runtime.start()
+    await second_send
+    await runtime.stop_when_idle()
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime has no message queue options.")
+async def test_batched_dispatch_cascade(runtime_factory: RuntimeFactory) -> None:
+    num_agents = 5
+    num_initial_messages = 5
+    max_rounds = 5
+    total_num_calls_expected = 0
+    for i in range(0, max_rounds):
+        total_num_calls_expected += num_initial_messages * ((num_agents - 1) ** i)
+
+    runtime = runtime_factory(dispatch_batch_size=16)
+    for i in range(num_agents):
+        await CascadingAgent.register(runtime, f"name{i}", lambda: CascadingAgent(max_rounds))
+
+    runtime.start()
+    # The loop parks on an empty queue and must wake up when messages are published.
+    await asyncio.sleep(0.1)
+    for _ in range(num_initial_messages):
+        await runtime.publish_message(CascadingMessageType(round=1), DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    for i in range(num_agents):
+        agent = await runtime.try_get_underlying_agent_instance(AgentId(f"name{i}", "default"), CascadingAgent)
+        assert agent.num_calls == total_num_calls_expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime has no message queue options.")
+async def test_batched_dispatch_send_and_stop(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(dispatch_batch_size=4)
+    await runtime.register("name", LoopbackAgent)
+    runtime.start()
+    await asyncio.sleep(0.1)
+    response = await runtime.send_message(MessageType(), AgentId("name", "default"))
+    assert response == MessageType()
+    # Stopping an idle, parked loop must not hang.
+    await asyncio.sleep(0.1)
+    await asyncio.wait_for(runtime.stop(), timeout=1)
+
+    with pytest.raises(ValueError):
+        SingleThreadedAgentRuntime(dispatch_batch_size=0)
+
+
+@pytest.mark.asyncio
+async def test_message_events_logged_only_when_enabled(
+    runtime: RuntimeUnderTest, caplog: pytest.LogCaptureFixture
+) -> None:
+    await runtime.register("name", LoopbackAgent, [TypeSubscription("default", "name")])
+    agent_id = AgentId("name", "default")
+
+    with caplog.at_level(logging.WARNING):
+        runtime.start()
+        await runtime.send_message(MessageType(), agent_id)
+        await runtime.stop_when_idle()
+    assert not any(isinstance(record.msg, MessageEvent) for record in caplog.records)
+
+    with caplog.at_level(logging.INFO, logger=EVENT_LOGGER_NAME):
+        runtime.start()
+        await runtime.send_message(MessageType(), agent_id)
+        await runtime.publish_message(MessageType(), TopicId("default", "default"))
+        await runtime.stop_when_idle()
+    events = [record.msg for record in caplog.records if isinstance(record.msg, MessageEvent)]
+    kinds = [(event.kwargs["kind"], event.kwargs["delivery_stage"]) for event in events]
+    assert kinds == [
+        (MessageKind.DIRECT, DeliveryStage.SEND),
+        (MessageKind.DIRECT, DeliveryStage.DELIVER),
+        (MessageKind.RESPOND, DeliveryStage.DELIVER),
+        (MessageKind.PUBLISH, DeliveryStage.SEND),
+        (MessageKind.PUBLISH, DeliveryStage.DELIVER),
+    ]
+    # Events must render as json.
+    for event in events:
+        assert json.loads(str(event))["type"] == "Message"
+
+
+@pytest.mark.asyncio
+async def test_factory_signature_resolved_at_registration(
+    runtime: RuntimeUnderTest, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    await runtime.register("name1", LoopbackAgent)
+    await LoopbackAgent.register(runtime, "name2", LoopbackAgent)
+
+    num_signature_calls = 0
+    signature = inspect.signature
+
+    def counting_signature(obj: Any) -> inspect.Signature:
+        nonlocal num_signature_calls
+        num_signature_calls += 1
+        return signature(obj)
+
+    monkeypatch.setattr(inspect, "signature", counting_signature)
+    for i in range(10):
+        await runtime.get("name1", key=str(i), lazy=False)
+        await runtime.get("name2", key=str(i), lazy=False)
+    assert num_signature_calls == 0
+
+
+@dataclass
+class Probe:
+    index: int
+
+
+@dataclass
+class ConcurrencyStats:
+    active: int = 0
+    max_active: int = 0
+    received: List[int] = field(default_factory=list)
+
+
+@default_subscription
+class ConcurrencyProbeAgent(RoutedAgent):
+    def __init__(self, stats: ConcurrencyStats) -> None:
+        super().__init__("An agent that records how many of its handlers run at once.")
+        self._stats = stats
+
+    @message_handler
+    async def on_probe(self, message: Probe, ctx: MessageContext) -> int:
+        self._stats.active += 1
+        self._stats.max_active = max(self._stats.max_active, self._stats.active)
+        self._stats.received.append(message.index)
+        await asyncio.sleep(0.01)
+        self._stats.active -= 1
+        return message.index
+
+
+@pytest.mark.asyncio
+async def test_per_agent_mailboxes_serialize_delivery(runtime_factory: RuntimeFactory) -> None:
+    stats = ConcurrencyStats()
+    runtime = runtime_factory(per_agent_mailboxes=True)
+    await ConcurrencyProbeAgent.register(runtime, "probe", lambda: ConcurrencyProbeAgent(stats))
+    runtime.start()
+
+    agent_id = AgentId("probe", "default")
+    responses = await asyncio.gather(*[runtime.send_message(Probe(index=i), agent_id) for i in range(5)])
+    for i in range(5, 10):
+        await runtime.publish_message(Probe(index=i), DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    assert responses == list(range(5))
+    assert stats.received == list(range(10))
+    assert stats.max_active == 1
+
+
+@dataclass
+class Relay:
+    targets: List[str]
+
+
+class RelayAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that relays a message through other agents and waits for the result.")
+
+    @message_handler
+    async def on_relay(self, message: Relay, ctx: MessageContext) -> str:
+        if not message.targets:
+            return "done"
+        try:
+            result = await self.send_message(Relay(targets=message.targets[1:]), AgentId(message.targets[0], "default"))
+        except RuntimeError as e:
+            return str(e)
+        assert isinstance(result, str)
+        return result
+
+
+@pytest.mark.asyncio
+async def test_per_agent_mailboxes_detect_deadlocks(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(per_agent_mailboxes=True)
+    for agent_type in ["a", "b", "c"]:
+        await RelayAgent.register(runtime, agent_type, RelayAgent)
+    runtime.start()
+
+    a = AgentId("a", "default")
+    # Sends to other agents, and to the agent itself, complete.
+    assert await asyncio.wait_for(runtime.send_message(Relay(targets=["b", "c"]), a), 1) == "done"
+    assert await asyncio.wait_for(runtime.send_message(Relay(targets=["a"]), a), 1) == "done"
+    # A chain of sends back to an agent whose handler waits on it fails instead of deadlocking.
+    result = await asyncio.wait_for(runtime.send_message(Relay(targets=["b", "c", "a"]), a), 1)
+    assert "would deadlock" in result
+    # The mailbox is free again afterwards.
+    assert await asyncio.wait_for(runtime.send_message(Relay(targets=["b", "a"]), AgentId("c", "default")), 1) == "done"
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not limit concurrent deliveries.")
+async def test_max_concurrent_deliveries(runtime_factory: RuntimeFactory) -> None:
+    num_agents = 20
+    stats = ConcurrencyStats()
+    runtime = runtime_factory(max_concurrent_deliveries=4)
+    for i in range(num_agents):
+        await ConcurrencyProbeAgent.register(runtime, f"probe{i}", lambda: ConcurrencyProbeAgent(stats))
+    runtime.start()
+
+    await runtime.publish_message(Probe(index=0), DefaultTopicId())
+    await runtime.publish_message(Probe(index=1), DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    assert len(stats.received) == 2 * num_agents
+    assert stats.max_active == 4
+
+    with pytest.raises(ValueError):
+        SingleThreadedAgentRuntime(max_concurrent_deliveries=0)
+
+
+@default_subscription
+class SlowProbeAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that never finishes handling a probe.")
+        self.called = False
+        self.cancelled = False
+
+    @message_handler
+    async def on_probe(self, message: Probe, ctx: MessageContext) -> None:
+        self.called = True
+        try:
+            await asyncio.sleep(100)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not limit concurrent deliveries.")
+async def test_cancelled_publish_cancels_started_deliveries(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(max_concurrent_deliveries=1)
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    for i in range(3):
+        await SlowProbeAgent.register(runtime, f"slow{i}", SlowProbeAgent)
+    runtime.start()
+
+    await runtime.publish_message(Probe(index=0), DefaultTopicId())
+    agents = [
+        await runtime.try_get_underlying_agent_instance(AgentId(f"slow{i}", "default"), SlowProbeAgent)
+        for i in range(3)
+    ]
+    while not any(agent.called for agent in agents):
+        await asyncio.sleep(0.01)
+
+    # The publish waits for a slot for the other recipients. Cancelling it cancels the delivery it started,
+    # and does not leave the deliveries it has not started behind as coroutines that are never awaited.
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        background_tasks = list(runtime._background_tasks)  # type: ignore[reportPrivateUsage]
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        gc.collect()
+    assert not [warning for warning in caught if "never awaited" in str(warning.message)]
+    assert [agent.called for agent in agents].count(True) == 1
+    assert all(agent.cancelled for agent in agents if agent.called)
+    await runtime.stop()
+
+
+@default_subscription
+class FailingProbeAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that fails on every probe.")
+
+    @message_handler
+    async def on_probe(self, message: Probe, ctx: MessageContext) -> None:
+        raise ValueError("probe failed")
+
+
+@pytest.mark.asyncio
+async def test_publish_errors_are_logged_per_recipient(
+    runtime: RuntimeUnderTest, caplog: pytest.LogCaptureFixture
+) -> None:
+    stats = ConcurrencyStats()
+    await FailingProbeAgent.register(runtime, "failing1", FailingProbeAgent)
+    await ConcurrencyProbeAgent.register(runtime, "probe", lambda: ConcurrencyProbeAgent(stats))
+    await FailingProbeAgent.register(runtime, "failing2", FailingProbeAgent)
+
+    with caplog.at_level(logging.ERROR):
+        runtime.start()
+        await runtime.publish_message(Probe(index=0), DefaultTopicId())
+        await runtime.stop_when_idle()
+
+    assert stats.received == [0]
+    messages = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert len(messages) == 2
+    assert any("failing1/default" in message for message in messages)
+    assert any("failing2/default" in message for message in messages)
@@ -1,8 +1,10 @@
 from typing import Any, Mapping
 
 import pytest
-from autogen_core.application import SingleThreadedAgentRuntime
-from autogen_core.base import AgentId, BaseAgent, MessageContext
+from autogen_core.application import AgentEvictionPolicy, InMemoryPassivatedStateStore, SingleThreadedAgentRuntime
+from autogen_core.base import AgentId, BaseAgent, MessageContext, TopicId
+from autogen_core.components import TypeSubscription
+from test_utils import RuntimeFactory, RuntimeUnderTest
 
 
 class StatefulAgent(BaseAgent):
@@ -21,9 +23,7 @@ def load_state(self, state: Mapping[str, Any]) -> None:
 
 
 @pytest.mark.asyncio
-async def test_agent_can_save_state() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_agent_can_save_state(runtime: RuntimeUnderTest) -> None:
     await runtime.register("name1", StatefulAgent)
     agent1_id = AgentId("name1", key="default")
     agent1: StatefulAgent = await runtime.try_get_underlying_agent_instance(agent1_id, type=StatefulAgent)
@@ -41,8 +41,8 @@ async def test_agent_can_save_state() -> None:
 
 
 @pytest.mark.asyncio
-async def test_runtime_can_save_state() -> None:
-    runtime = SingleThreadedAgentRuntime()
+async def test_runtime_can_save_state(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory()
 
     await runtime.register("name1", StatefulAgent)
     agent1_id = AgentId("name1", key="default")
@@ -53,10 +53,136 @@ async def test_runtime_can_save_state() -> None:
 
     runtime_state = await runtime.save_state()
 
-    runtime2 = SingleThreadedAgentRuntime()
+    runtime2 = runtime_factory()
     await runtime2.register("name1", StatefulAgent)
     agent2_id = AgentId("name1", key="default")
     agent2: StatefulAgent = await runtime2.try_get_underlying_agent_instance(agent2_id, type=StatefulAgent)
 
     await runtime2.load_state(runtime_state)
     assert agent2.state == 1
+
+
+class CountingAgent(BaseAgent):
+    def __init__(self) -> None:
+        super().__init__("A counting agent")
+        self.state = 0
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> int:
+        self.state += 1
+        return self.state
+
+    def save_state(self) -> Mapping[str, Any]:
+        return {"state": self.state}
+
+    def load_state(self, state: Mapping[str, Any]) -> None:
+        self.state = state["state"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not evict agents.")
+async def test_evicted_agent_state_is_restored(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(agent_eviction_policy=AgentEvictionPolicy(max_resident_agents=2))
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    for _ in range(3):
+        for key in ["a", "b", "c"]:
+            await runtime.send_message("increment", AgentId("counter", key))
+
+    metrics = runtime.agent_instance_metrics
+    assert metrics.resident_agents == 2
+    assert metrics.passivated_agents == 1
+    # Each of the 9 messages goes to the least recently used agent, so every one triggers an activation.
+    assert metrics.activations == 9
+    assert metrics.reactivations == 6
+    assert metrics.evictions == 7
+
+    # Passivated agents are included in the runtime state.
+    runtime_state = await runtime.save_state()
+    assert {key: value["state"] for key, value in runtime_state.items()} == {
+        "counter/a": 3,
+        "counter/b": 3,
+        "counter/c": 3,
+    }
+    for key in ["a", "b", "c"]:
+        assert await runtime.send_message("increment", AgentId("counter", key)) == 4
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not evict agents.")
+async def test_passivated_states_are_bounded(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(
+        agent_eviction_policy=AgentEvictionPolicy(
+            max_resident_agents=1, state_store=InMemoryPassivatedStateStore(max_agents=1)
+        )
+    )
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    for key in ["a", "b", "c"]:
+        assert await runtime.send_message("increment", AgentId("counter", key)) == 1
+    # Evicting b discarded the state of a, which was evicted before it.
+    metrics = runtime.agent_instance_metrics
+    assert metrics.passivated_agents == 1
+    assert metrics.discarded_states == 1
+    assert set(await runtime.save_state()) == {"counter/b", "counter/c"}
+
+    # An agent whose state was discarded starts from a new instance. Evicting c discards the state of b.
+    assert await runtime.send_message("increment", AgentId("counter", "a")) == 1
+    assert await runtime.send_message("increment", AgentId("counter", "c")) == 2
+    assert runtime.agent_instance_metrics.reactivations == 1
+    assert runtime.agent_instance_metrics.discarded_states == 2
+    await runtime.stop()
+
+    with pytest.raises(ValueError):
+        InMemoryPassivatedStateStore(max_agents=0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not evict agents.")
+async def test_publish_fan_out_larger_than_max_resident_agents(runtime_factory: RuntimeFactory) -> None:
+    runtime = runtime_factory(agent_eviction_policy=AgentEvictionPolicy(max_resident_agents=1))
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    for agent_type in ["a", "b", "c"]:
+        await CountingAgent.register(runtime, agent_type, CountingAgent)
+        await runtime.add_subscription(TypeSubscription("topic", agent_type))
+    runtime.start()
+
+    for _ in range(3):
+        await runtime.publish_message("increment", topic_id=TopicId("topic", "default"))
+    await runtime.stop_when_idle()
+
+    # Every recipient handled every message on the instance whose state was kept.
+    runtime_state = await runtime.save_state()
+    assert {key: value["state"] for key, value in runtime_state.items()} == {
+        "a/default": 3,
+        "b/default": 3,
+        "c/default": 3,
+    }
+    assert runtime.agent_instance_metrics.resident_agents == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.thread_pool_gap("ThreadPoolAgentRuntime does not evict agents.")
+async def test_idle_agents_are_evicted(runtime_factory: RuntimeFactory) -> None:
+    now = 0.0
+    runtime = runtime_factory(agent_eviction_policy=AgentEvictionPolicy(idle_timeout=10))
+    assert isinstance(runtime, SingleThreadedAgentRuntime)
+    runtime._instantiated_agents._clock = lambda: now  # type: ignore[reportPrivateUsage]
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    await runtime.send_message("increment", AgentId("counter", "a"))
+    now = 5.0
+    await runtime.send_message("increment", AgentId("counter", "b"))
+    now = 12.0
+    await runtime.send_message("increment", AgentId("counter", "b"))
+    assert runtime.agent_instance_metrics.resident_agents == 1
+    assert runtime.agent_instance_metrics.evictions == 1
+
+    assert await runtime.send_message("increment", AgentId("counter", "a")) == 2
+    assert runtime.agent_instance_metrics.reactivations == 1
+    await runtime.stop()
@@ -1,9 +1,9 @@
 import pytest
-from autogen_core.application import SingleThreadedAgentRuntime
-from autogen_core.base import AgentId, TopicId
+from autogen_core.application._helpers import SubscriptionManager
+from autogen_core.base import AgentId, Subscription, TopicId
 from autogen_core.base.exceptions import CantHandleException
 from autogen_core.components import DefaultSubscription, DefaultTopicId, TypeSubscription
-from test_utils import LoopbackAgent, MessageType
+from test_utils import LoopbackAgent, MessageType, RuntimeUnderTest
 
 
 def test_type_subscription_match() -> None:
@@ -24,9 +24,7 @@ def test_type_subscription_map() -> None:
 
 
 @pytest.mark.asyncio
-async def test_non_default_default_subscription() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_non_default_default_subscription(runtime: RuntimeUnderTest) -> None:
     await runtime.register("MyAgent", LoopbackAgent)
     runtime.start()
     await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
@@ -83,9 +81,7 @@ async def test_non_default_default_subscription() -> None:
 
 
 @pytest.mark.asyncio
-async def test_skipped_class_subscriptions() -> None:
-    runtime = SingleThreadedAgentRuntime()
-
+async def test_skipped_class_subscriptions(runtime: RuntimeUnderTest) -> None:
     await LoopbackAgent.register(runtime, "MyAgent", LoopbackAgent, skip_class_subscriptions=True)
     runtime.start()
     await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
@@ -99,8 +95,7 @@ async def test_skipped_class_subscriptions() -> None:
 
 
 @pytest.mark.asyncio
-async def test_subscription_deduplication() -> None:
-    runtime = SingleThreadedAgentRuntime()
+async def test_subscription_deduplication(runtime: RuntimeUnderTest) -> None:
     agent_type = "MyAgent"
 
     # Test TypeSubscription
@@ -115,3 +110,69 @@ async def test_subscription_deduplication() -> None:
     default_subscription = DefaultSubscription(agent_type=agent_type)
     with pytest.raises(ValueError, match="Subscription already exists"):
         await runtime.add_subscription(default_subscription)
+
+
+class SourcePrefixSubscription(Subscription):
+    def __init__(self, prefix: str, agent_type: str) -> None:
+        self._prefix = prefix
+        self._agent_type = agent_type
+        self._id = f"prefix-{prefix}-{agent_type}"
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    def is_match(self, topic_id: TopicId) -> bool:
+        return topic_id.source.startswith(self._prefix)
+
+    def map_to_agent(self, topic_id: TopicId) -> AgentId:
+        return AgentId(self._agent_type, topic_id.source)
+
+
+@pytest.mark.asyncio
+async def test_subscription_manager_incremental_updates() -> None:
+    manager = SubscriptionManager()
+    topic = TopicId("t1", "s1")
+    assert await manager.get_subscribed_recipients(topic) == []
+
+    sub_a = TypeSubscription("t1", "a")
+    await manager.add_subscription(sub_a)
+    recipients = await manager.get_subscribed_recipients(topic)
+    assert recipients == [AgentId("a", "s1")]
+
+    with pytest.raises(ValueError):
+        await manager.add_subscription(TypeSubscription("t1", "a"))
+
+    # Custom subscriptions are matched alongside indexed ones, in subscription order.
+    await manager.add_subscription(SourcePrefixSubscription("s", "p"))
+    await manager.add_subscription(TypeSubscription("t1", "b"))
+    await manager.add_subscription(TypeSubscription("t2", "c"))
+    assert await manager.get_subscribed_recipients(topic) == [
+        AgentId("a", "s1"),
+        AgentId("p", "s1"),
+        AgentId("b", "s1"),
+    ]
+    assert await manager.get_subscribed_recipients(TopicId("t2", "x")) == [AgentId("c", "x")]
+    # A previously returned list is not mutated by later updates.
+    assert recipients == [AgentId("a", "s1")]
+
+    await manager.remove_subscription(sub_a.id)
+    assert await manager.get_subscribed_recipients(topic) == [AgentId("p", "s1"), AgentId("b", "s1")]
+    await manager.remove_subscription("prefix-s-p")
+    assert await manager.get_subscribed_recipients(topic) == [AgentId("b", "s1")]
+
+    with pytest.raises(ValueError):
+        await manager.remove_subscription(sub_a.id)
+
+
+@pytest.mark.asyncio
+async def test_subscription_manager_bounded_cache() -> None:
+    manager = SubscriptionManager(max_cached_topics=10)
+    await manager.add_subscription(TypeSubscription("t1", "a"))
+    for i in range(1000):
+        assert await manager.get_subscribed_recipients(TopicId("t1", f"s{i}")) == [AgentId("a", f"s{i}")]
+    assert len(manager._subscribed_recipients) == 10  # type: ignore[reportPrivateUsage]
+
+    # Evicted topics are resolved again on demand.
+    await manager.add_subscription(TypeSubscription("t1", "b"))
+    assert await manager.get_subscribed_recipients(TopicId("t1", "s0")) == [AgentId("a", "s0"), AgentId("b", "s0")]
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Mapping
+
+import pytest
+from autogen_core.application import ThreadPoolAgentRuntime
+from autogen_core.base import AgentId, BaseAgent, MessageContext
+from autogen_core.components import DefaultTopicId, RoutedAgent, default_subscription, message_handler
+from test_utils import LoopbackAgent, LoopbackAgentWithDefaultSubscription, MessageType
+
+
+@dataclass
+class Probe:
+    index: int
+
+
+@default_subscription
+class ThreadRecordingAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that records the threads its handlers run on.")
+        self.threads: List[int] = []
+        self.received: List[int] = []
+
+    @message_handler
+    async def on_probe(self, message: Probe, ctx: MessageContext) -> int:
+        self.threads.append(threading.get_ident())
+        self.received.append(message.index)
+        await asyncio.sleep(0)
+        return message.index
+
+
+class ForwardingAgent(BaseAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that forwards every message to the loopback agent.")
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> Any:
+        return await self.send_message(message, AgentId("loopback", self.id.key))
+
+
+class StatefulAgent(BaseAgent):
+    def __init__(self) -> None:
+        super().__init__("A stateful agent")
+        self.state = 0
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> int:
+        self.state += 1
+        return self.state
+
+    def save_state(self) -> Mapping[str, Any]:
+        return {"state": self.state}
+
+    def load_state(self, state: Mapping[str, Any]) -> None:
+        self.state = state["state"]
+
+
+@pytest.mark.asyncio
+async def test_send_and_receive_across_workers() -> None:
+    runtime = ThreadPoolAgentRuntime(num_workers=4)
+    await LoopbackAgent.register(runtime, "loopback", LoopbackAgent)
+    await ForwardingAgent.register(runtime, "forwarder", ForwardingAgent)
+    runtime.start()
+
+    for i in range(20):
+        response = await runtime.send_message(MessageType(), AgentId("forwarder", str(i)))
+        assert response == MessageType()
+    await runtime.stop_when_idle()
+
+    for i in range(20):
+        loopback = await runtime.try_get_underlying_agent_instance(AgentId("loopback", str(i)), LoopbackAgent)
+        assert loopback.num_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_before_start() -> None:
+    runtime = ThreadPoolAgentRuntime(num_workers=2)
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+    assert not runtime.idle
+
+    runtime.start()
+    await runtime.stop_when_idle()
+
+    agent = await runtime.try_get_underlying_agent_instance(AgentId("name", "default"), LoopbackAgent)
+    assert agent.num_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_agents_are_pinned_to_one_worker() -> None:
+    num_agents = 16
+    runtime = ThreadPoolAgentRuntime(num_workers=4)
+    for i in range(num_agents):
+        await ThreadRecordingAgent.register(runtime, f"probe{i}", ThreadRecordingAgent)
+    runtime.start()
+
+    for i in range(10):
+        await runtime.publish_message(Probe(index=i), DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    threads_used = set()
+    for i in range(num_agents):
+        agent = await runtime.try_get_underlying_agent_instance(AgentId(f"probe{i}", "default"), ThreadRecordingAgent)
+        assert agent.received == list(range(10))
+        assert len(set(agent.threads)) == 1
+        assert agent.threads[0] != threading.get_ident()
+        threads_used.update(agent.threads)
+    assert len(threads_used) > 1
+
+
+@pytest.mark.asyncio
+async def test_per_agent_mailboxes_preserve_order() -> None:
+    runtime = ThreadPoolAgentRuntime(num_workers=2, per_agent_mailboxes=True)
+    await ThreadRecordingAgent.register(runtime, "probe", ThreadRecordingAgent)
+    runtime.start()
+
+    agent_id = AgentId("probe", "default")
+    responses = await asyncio.gather(*[runtime.send_message(Probe(index=i), agent_id) for i in range(20)])
+    await runtime.stop_when_idle()
+
+    assert responses == list(range(20))
+    agent = await runtime.try_get_underlying_agent_instance(agent_id, ThreadRecordingAgent)
+    assert agent.received == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_runtime_can_save_and_load_state() -> None:
+    runtime = ThreadPoolAgentRuntime(num_workers=3)
+    await StatefulAgent.register(runtime, "counter", StatefulAgent)
+    runtime.start()
+    for key in ["a", "b", "c"]:
+        for _ in range(2):
+            await runtime.send_message(MessageType(), AgentId("counter", key))
+    state = await runtime.save_state()
+    await runtime.stop()
+
+    runtime2 = ThreadPoolAgentRuntime(num_workers=2)
+    await StatefulAgent.register(runtime2, "counter", StatefulAgent)
+    await runtime2.load_state(state)
+    runtime2.start()
+    assert await runtime2.send_message(MessageType(), AgentId("counter", "b")) == 3
+    await runtime2.stop()
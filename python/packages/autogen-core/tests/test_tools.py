@@ -49,6 +49,26 @@ def test_tool_schema_generation() -> None:
     assert len(schema["parameters"]["properties"]) == 1
 
 
+def test_tool_schema_is_cached() -> None:
+    tool = MyTool()
+    schema = tool.schema
+    assert tool.schema is schema
+
+    # Changing the tool generates the schema again.
+    tool._description = "New description."  # pyright: ignore[reportPrivateUsage]
+    assert tool.schema is not schema
+    assert tool.schema["description"] == "New description."
+
+
+@pytest.mark.asyncio
+async def test_tool_run_json_validates_args() -> None:
+    tool = MyTool()
+    assert await tool.run_json({"query": "test"}, CancellationToken()) == MyResult(result="value")
+    with pytest.raises(ValueError):
+        await tool.run_json({"other": "test"}, CancellationToken())
+    assert tool.called_count == 1
+
+
 def test_func_tool_schema_generation() -> None:
     def my_function(arg: str, other: Annotated[int, "int arg"], nonrequired: int = 5) -> MyResult:
         return MyResult(result="test")
@@ -1,9 +1,17 @@
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Protocol
 
+from autogen_core.application import SingleThreadedAgentRuntime, ThreadPoolAgentRuntime
 from autogen_core.base import BaseAgent, MessageContext
 from autogen_core.components import DefaultTopicId, RoutedAgent, default_subscription, message_handler
 
+# The runtimes that the runtime test suites run against, see the ``runtime`` fixture in conftest.py.
+RuntimeUnderTest = SingleThreadedAgentRuntime | ThreadPoolAgentRuntime
+
+
+class RuntimeFactory(Protocol):
+    def __call__(self, **kwargs: Any) -> RuntimeUnderTest: ...
+
 
 @dataclass
 class MessageType: ...
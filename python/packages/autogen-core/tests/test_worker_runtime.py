@@ -1,13 +1,15 @@
 import asyncio
 import logging
 import os
-from typing import List
+from typing import Any, List
 
 import pytest
 from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
 from autogen_core.base import (
     AgentId,
     AgentType,
+    BaseAgent,
+    MessageContext,
     TopicId,
     try_get_known_serializers_for_type,
 )
@@ -460,6 +462,64 @@ async def test_grpc_max_message_size() -> None:
         await host.stop()
 
 
+class CancellationRecordingAgent(BaseAgent):
+    def __init__(self, cancel: bool) -> None:
+        super().__init__("An agent that records whether its message was cancelled.")
+        self.cancel = cancel
+        self.contexts: List[MessageContext] = []
+        self.cancelled: List[bool] = []
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> None:
+        self.contexts.append(ctx)
+        if self.cancel:
+            ctx.cancellation_token.cancel()
+        await asyncio.sleep(0.1)
+        self.cancelled.append(ctx.cancellation_token.is_cancelled())
+
+
+@pytest.mark.asyncio
+async def test_publish_recipients_have_separate_contexts() -> None:
+    host_address = "localhost:50062"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+
+    publisher = WorkerAgentRuntime(host_address=host_address)
+    publisher.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    publisher.start()
+    worker = WorkerAgentRuntime(host_address=host_address)
+    worker.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    worker.start()
+
+    await worker.register_factory(
+        type=AgentType("canceller"),
+        agent_factory=lambda: CancellationRecordingAgent(cancel=True),
+        expected_class=CancellationRecordingAgent,
+    )
+    await worker.add_subscription(TypeSubscription("default", "canceller"))
+    await worker.register_factory(
+        type=AgentType("other"),
+        agent_factory=lambda: CancellationRecordingAgent(cancel=False),
+        expected_class=CancellationRecordingAgent,
+    )
+    await worker.add_subscription(TypeSubscription("default", "other"))
+
+    await publisher.publish_message(MessageType(), topic_id=TopicId("default", "default"))
+    await asyncio.sleep(2)
+
+    canceller = await worker.try_get_underlying_agent_instance(
+        AgentId("canceller", "default"), CancellationRecordingAgent
+    )
+    other = await worker.try_get_underlying_agent_instance(AgentId("other", "default"), CancellationRecordingAgent)
+    # Cancelling the token of one handler does not cancel the handlers of the other recipients.
+    assert canceller.cancelled == [True]
+    assert other.cancelled == [False]
+    assert canceller.contexts[0] is not other.contexts[0]
+
+    await worker.stop()
+    await publisher.stop()
+    await host.stop()
+
+
 if __name__ == "__main__":
     os.environ["GRPC_VERBOSITY"] = "DEBUG"
     os.environ["GRPC_TRACE"] = "all"
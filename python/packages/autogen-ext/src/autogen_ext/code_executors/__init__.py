@@ -1,4 +1,5 @@
 from ._azure_container_code_executor import ACADynamicSessionsCodeExecutor, TokenProvider
 from ._docker_code_executor import DockerCommandLineCodeExecutor
+from ._docker_container_pool import DockerContainerPool
 
-__all__ = ["DockerCommandLineCodeExecutor", "TokenProvider", "ACADynamicSessionsCodeExecutor"]
+__all__ = ["DockerCommandLineCodeExecutor", "DockerContainerPool", "TokenProvider", "ACADynamicSessionsCodeExecutor"]
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import shlex
 import sys
@@ -12,18 +13,22 @@
 from hashlib import sha256
 from pathlib import Path
 from types import TracebackType
-from typing import Any, Callable, ClassVar, List, Optional, ParamSpec, Type, Union
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, List, Mapping, Optional, ParamSpec, Tuple, Type, Union
 
 from autogen_core.base import CancellationToken
 from autogen_core.components.code_executor import (
     CodeBlock,
     CodeExecutor,
+    CodeResultCache,
     CommandLineCodeResult,
     FunctionWithRequirements,
     FunctionWithRequirementsStr,
     build_python_functions_file,
+    code_result_cache_key,
+    find_code_block_dependencies,
     get_file_name_from_content,
     lang_to_cmd,
+    run_code_blocks_concurrently,
     silence_pip,
 )
 
@@ -32,6 +37,9 @@
 else:
     from typing_extensions import Self
 
+if TYPE_CHECKING:
+    from ._docker_container_pool import DockerContainerPool, PooledContainer
+
 
 async def _wait_for_ready(container: Any, timeout: int = 60, stop_time: float = 0.1) -> None:
     elapsed_time = 0.0
@@ -46,6 +54,9 @@ async def _wait_for_ready(container: Any, timeout: int = 60, stop_time: float =
 
 A = ParamSpec("A")
 
+# The repository of the images with the packages required by functions installed.
+_REQUIREMENTS_REPOSITORY = "autogen-code-exec-requirements"
+
 
 class DockerCommandLineCodeExecutor(CodeExecutor):
     """Executes code through a command line environment in a Docker container.
@@ -57,7 +68,29 @@ class DockerCommandLineCodeExecutor(CodeExecutor):
 
     The executor first saves each code block in a file in the working
     directory, and then executes the code file in the container.
-    The executor executes the code blocks in the order they are received.
+    The executor executes the code blocks in the order they are received,
+    unless ``max_concurrent_code_blocks`` is greater than 1, in which case code
+    blocks that do not depend on each other run at the same time, as with
+    :class:`~autogen_core.components.code_executor.LocalCommandLineCodeExecutor`.
+    The result is the same as if the code blocks ran in order.
+
+    If a ``result_cache`` is given, the successful results of calls whose code
+    blocks are all marked as ``pure`` are cached and reused, as with
+    :class:`~autogen_core.components.code_executor.LocalCommandLineCodeExecutor`.
+    The image is part of the cache key.
+
+    The packages required by the functions are installed with pip in the
+    container when the first code block runs. If ``cache_requirements`` is True,
+    they are instead installed once into an image derived from ``image``, which
+    is tagged with the hash of the image and the requirements, and containers
+    are started from it. Executors with the same image and functions find the
+    derived image by its tag and do not run pip again.
+
+    If a ``container_pool`` is given, :meth:`start` leases a running container
+    from the :class:`DockerContainerPool` instead of creating one, and :meth:`stop`
+    returns it. The image, container name, working directory and binding
+    directory then come from the pool, and the working directory is restored by
+    the pool before the container is leased again.
     Currently, the executor only supports Python and shell scripts.
     For Python code, use the language "python" for the code block.
     For shell scripts, use the language "bash", "shell", or "sh" for the code
@@ -81,6 +114,10 @@ class DockerCommandLineCodeExecutor(CodeExecutor):
             the Python process exits with atext. Defaults to True.
         functions (List[Union[FunctionWithRequirements[Any, A], Callable[..., Any]]]): A list of functions that are available to the code executor. Default is an empty list.
         functions_module (str, optional): The name of the module that will be created to store the functions. Defaults to "functions".
+        max_concurrent_code_blocks (int, optional): The maximum number of independent code blocks that run at the same time. Defaults to 1, which runs the code blocks one after another.
+        result_cache (CodeResultCache | None, optional): The cache for the results of pure code blocks. Defaults to None, which runs all code blocks.
+        cache_requirements (bool, optional): If true, the packages required by the functions are installed into a derived image that is reused by later executors. Defaults to False.
+        container_pool (DockerContainerPool | None, optional): The pool to lease a container from. Defaults to None, which creates a container for the executor.
     """
 
     SUPPORTED_LANGUAGES: ClassVar[List[str]] = [
@@ -119,10 +156,17 @@ def __init__(
             ]
         ] = [],
         functions_module: str = "functions",
+        max_concurrent_code_blocks: int = 1,
+        result_cache: Optional[CodeResultCache] = None,
+        cache_requirements: bool = False,
+        container_pool: Optional[DockerContainerPool] = None,
     ):
         if timeout < 1:
             raise ValueError("Timeout must be greater than or equal to 1.")
 
+        if max_concurrent_code_blocks < 1:
+            raise ValueError("Max concurrent code blocks must be greater than or equal to 1.")
+
         if isinstance(work_dir, str):
             work_dir = Path(work_dir)
         work_dir.mkdir(exist_ok=True)
@@ -138,12 +182,26 @@ def __init__(
             self.container_name = container_name
 
         self._timeout = timeout
+        self._max_concurrent_code_blocks = max_concurrent_code_blocks
+        self._result_cache = result_cache
+        self._functions_hash: Optional[str] = None
+        self._cache_requirements = cache_requirements
+        self._container_pool = container_pool
+        self._lease: Optional[PooledContainer] = None
+        if container_pool is not None:
+            if cache_requirements:
+                raise ValueError("Requirements cannot be cached in an image when containers come from a pool.")
+        # Set when the container is started from an image that has the required packages installed.
+        self._requirements_installed = False
         self._work_dir: Path = work_dir
         self._bind_dir: Path = bind_dir
 
         self._auto_remove = auto_remove
         self._stop_container = stop_container
-        self._image = image
+        self._image = container_pool.image if container_pool is not None else image
+        # The ID of the image that self._image refers to, resolved when the executor starts. Derived images and
+        # cached results are keyed on it, as the image that a tag refers to can change.
+        self._image_id: Optional[str] = None
 
         if not functions_module.isidentifier():
             raise ValueError("Module name must be a valid Python identifier")
@@ -186,11 +244,8 @@ async def _setup_functions(self, cancellation_token: CancellationToken) -> None:
         func_file = self._work_dir / f"{self._functions_module}.py"
         func_file.write_text(func_file_content)
 
-        # Collect requirements
-        lists_of_packages = [x.python_packages for x in self._functions if isinstance(x, FunctionWithRequirements)]
-        flattened_packages = [item for sublist in lists_of_packages for item in sublist]
-        required_packages = list(set(flattened_packages))
-        if len(required_packages) > 0:
+        required_packages = self._required_packages()
+        if len(required_packages) > 0 and not self._requirements_installed:
             logging.info("Ensuring packages are installed in executor.")
 
             packages = shlex.join(required_packages)
@@ -214,6 +269,38 @@ async def _setup_functions(self, cancellation_token: CancellationToken) -> None:
 
         self._setup_functions_complete = True
 
+    def _required_packages(self) -> List[str]:
+        lists_of_packages = [x.python_packages for x in self._functions if isinstance(x, FunctionWithRequirements)]
+        return sorted({item for sublist in lists_of_packages for item in sublist})
+
+    async def _get_requirements_image(self, client: Any, packages: List[str]) -> str:
+        """Return the tag of the image derived from the executor's image with ``packages`` installed, and build
+        it if it does not exist yet."""
+        from docker.errors import ImageNotFound
+
+        digest = sha256(json.dumps({"image": self._image_id, "packages": packages}).encode()).hexdigest()[:32]
+        tag = f"{_REQUIREMENTS_REPOSITORY}:{digest}"
+        try:
+            await asyncio.to_thread(client.images.get, tag)
+            return tag
+        except ImageNotFound:
+            pass
+
+        logging.info(f"Building image {tag} with {', '.join(packages)}...")
+        container = await asyncio.to_thread(
+            client.containers.create, self._image_id, entrypoint="/bin/sh", tty=True, detach=True
+        )
+        try:
+            await asyncio.to_thread(container.start)
+            await _wait_for_ready(container)
+            result = await asyncio.to_thread(container.exec_run, ["python", "-m", "pip", "install", "-qqq", *packages])
+            if result.exit_code != 0:
+                raise ValueError(f"Pip install failed. {result.output.decode('utf-8')}")
+            await asyncio.to_thread(container.commit, repository=_REQUIREMENTS_REPOSITORY, tag=digest)
+        finally:
+            await asyncio.to_thread(container.remove, force=True)
+        return tag
+
     async def _execute_code_dont_check_setup(
         self, code_blocks: List[CodeBlock], cancellation_token: CancellationToken
     ) -> CommandLineCodeResult:
@@ -223,6 +310,52 @@ async def _execute_code_dont_check_setup(
         if len(code_blocks) == 0:
             raise ValueError("No code blocks to execute.")
 
+        key = self._result_cache_key(code_blocks)
+        if key is not None:
+            assert self._result_cache is not None
+            cached = await self._result_cache.get(key)
+            if cached is not None:
+                return self._load_cached_result(code_blocks, cached)
+
+        if self._max_concurrent_code_blocks > 1 and len(code_blocks) > 1:
+            result = await self._execute_code_blocks_concurrently(code_blocks)
+        else:
+            result = await self._execute_code_blocks_serially(code_blocks)
+
+        # Failures are not cached, as they can come from the environment, such as a missing package.
+        if key is not None and result.exit_code == 0:
+            assert self._result_cache is not None
+            await self._result_cache.set(key, {"exit_code": result.exit_code, "output": result.output})
+        return result
+
+    def _result_cache_key(self, code_blocks: List[CodeBlock]) -> Optional[str]:
+        if self._result_cache is None:
+            return None
+        if self._functions_hash is None:
+            functions_file = build_python_functions_file(self._functions) if len(self._functions) > 0 else ""
+            self._functions_hash = sha256(functions_file.encode()).hexdigest()
+        config = {
+            "executor": type(self).__name__,
+            "image": self._image_id if self._image_id is not None else self._image,
+            "timeout": self._timeout,
+            "functions_module": self._functions_module,
+            "functions": self._functions_hash,
+        }
+        return code_result_cache_key(code_blocks, config)
+
+    def _load_cached_result(self, code_blocks: List[CodeBlock], cached: Mapping[str, Any]) -> CommandLineCodeResult:
+        # The code files are written as if the code blocks ran, so that the result refers to existing files.
+        files: List[Path] = []
+        for code_block in code_blocks:
+            lang = code_block.language.lower()
+            code = silence_pip(code_block.code, lang)
+            code_path = self._work_dir / self._get_code_file_name(lang, code)
+            with code_path.open("w", encoding="utf-8") as fout:
+                fout.write(code)
+            files.append(code_path)
+        return CommandLineCodeResult(exit_code=cached["exit_code"], output=cached["output"], code_file=str(files[0]))
+
+    async def _execute_code_blocks_serially(self, code_blocks: List[CodeBlock]) -> CommandLineCodeResult:
         outputs: List[str] = []
         files: List[Path] = []
         last_exit_code = 0
@@ -230,38 +363,80 @@ async def _execute_code_dont_check_setup(
             lang = code_block.language.lower()
             code = silence_pip(code_block.code, lang)
 
-            # Check if there is a filename comment
             try:
-                filename = get_file_name_from_content(code, self._work_dir)
+                filename = self._get_code_file_name(lang, code)
             except ValueError:
                 outputs.append("Filename is not in the workspace")
                 last_exit_code = 1
                 break
+            files.append(self._work_dir / filename)
 
-            if not filename:
-                filename = f"tmp_code_{sha256(code.encode()).hexdigest()}.{lang}"
-
-            code_path = self._work_dir / filename
-            with code_path.open("w", encoding="utf-8") as fout:
-                fout.write(code)
-            files.append(code_path)
-
-            command = ["timeout", str(self._timeout), lang_to_cmd(lang), filename]
-
-            result = await asyncio.to_thread(self._container.exec_run, command)  # type: ignore
-            exit_code = result.exit_code
-            output = result.output.decode("utf-8")
-            if exit_code == 124:
-                output += "\n Timeout"
+            last_exit_code, output = await self._run_code_block(lang, code, filename)
             outputs.append(output)
-
-            last_exit_code = exit_code
-            if exit_code != 0:
+            if last_exit_code != 0:
                 break
 
         code_file = str(files[0]) if files else None
         return CommandLineCodeResult(exit_code=last_exit_code, output="".join(outputs), code_file=code_file)
 
+    async def _execute_code_blocks_concurrently(self, code_blocks: List[CodeBlock]) -> CommandLineCodeResult:
+        # The code blocks after the first one that is not in the workspace would not run.
+        prepared: List[Tuple[str, str, Optional[str]]] = []
+        for code_block in code_blocks:
+            lang = code_block.language.lower()
+            code = silence_pip(code_block.code, lang)
+            try:
+                prepared.append((lang, code, self._get_code_file_name(lang, code)))
+            except ValueError:
+                prepared.append((lang, code, None))
+                break
+
+        dependencies = find_code_block_dependencies(
+            code_blocks[: len(prepared)], [filename or "" for _, _, filename in prepared]
+        )
+        outputs = [""] * len(prepared)
+
+        async def run_code_block(index: int) -> int:
+            lang, code, filename = prepared[index]
+            if filename is None:
+                outputs[index] = "Filename is not in the workspace"
+                return 1
+            exit_code, outputs[index] = await self._run_code_block(lang, code, filename)
+            return exit_code
+
+        exit_codes = await run_code_blocks_concurrently(dependencies, run_code_block, self._max_concurrent_code_blocks)
+        # The result is the same as if the code blocks ran one after another: it ends with the first one that failed.
+        num_blocks = next((i + 1 for i, exit_code in enumerate(exit_codes) if exit_code != 0), len(exit_codes))
+        last_exit_code = exit_codes[num_blocks - 1]
+        assert last_exit_code is not None
+        first_file = prepared[0][2]
+        code_file = str(self._work_dir / first_file) if first_file is not None else None
+        return CommandLineCodeResult(
+            exit_code=last_exit_code, output="".join(outputs[:num_blocks]), code_file=code_file
+        )
+
+    def _get_code_file_name(self, lang: str, code: str) -> str:
+        # Check if there is a filename comment. Raises ValueError if the file is not in the workspace.
+        filename = get_file_name_from_content(code, self._work_dir)
+        if not filename:
+            filename = f"tmp_code_{sha256(code.encode()).hexdigest()}.{lang}"
+        return filename
+
+    async def _run_code_block(self, lang: str, code: str, filename: str) -> Tuple[int, str]:
+        assert self._container is not None
+        code_path = self._work_dir / filename
+        with code_path.open("w", encoding="utf-8") as fout:
+            fout.write(code)
+
+        command = ["timeout", str(self._timeout), lang_to_cmd(lang), filename]
+
+        result = await asyncio.to_thread(self._container.exec_run, command)  # type: ignore
+        exit_code: int = result.exit_code
+        output: str = result.output.decode("utf-8")
+        if exit_code == 124:
+            output += "\n Timeout"
+        return exit_code, output
+
     async def execute_code_blocks(
         self, code_blocks: List[CodeBlock], cancellation_token: CancellationToken
     ) -> CommandLineCodeResult:
@@ -300,6 +475,14 @@ async def stop(self) -> None:
         if not self._running:
             return
 
+        if self._container_pool is not None and self._lease is not None:
+            lease = self._lease
+            self._lease = None
+            self._container = None
+            self._running = False
+            await self._container_pool.release(lease)
+            return
+
         try:
             import docker
             from docker.errors import NotFound
@@ -318,6 +501,20 @@ async def stop(self) -> None:
             self._running = False
 
     async def start(self) -> None:
+        if self._container_pool is not None:
+            if self._running:
+                return
+            self._lease = await self._container_pool.acquire()
+            self._container = self._lease.container
+            self._image_id = self._container_pool.image_id
+            self.container_name = self._lease.container.name
+            self._work_dir = self._lease.work_dir
+            self._bind_dir = self._lease.work_dir
+            # The functions module is written again, as the pool restored the working directory.
+            self._setup_functions_complete = len(self._functions) == 0
+            self._running = True
+            return
+
         try:
             import asyncio_atexit
             import docker
@@ -332,16 +529,23 @@ async def start(self) -> None:
 
         # Check if the image exists
         try:
-            await asyncio.to_thread(client.images.get, self._image)
+            docker_image = await asyncio.to_thread(client.images.get, self._image)
         except ImageNotFound:
             # TODO logger
             logging.info(f"Pulling image {self._image}...")
             # Let the docker exception escape if this fails.
-            await asyncio.to_thread(client.images.pull, self._image)
+            docker_image = await asyncio.to_thread(client.images.pull, self._image)
+        self._image_id = docker_image.id
+
+        image = self._image_id
+        required_packages = self._required_packages()
+        if self._cache_requirements and len(required_packages) > 0:
+            image = await self._get_requirements_image(client, required_packages)
+            self._requirements_installed = True
 
         self._container = await asyncio.to_thread(
             client.containers.create,
-            self._image,
+            image,
             name=self.container_name,
             entrypoint="/bin/sh",
             tty=True,
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import tempfile
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Optional, Union
+
+from ._docker_code_executor import _wait_for_ready
+
+
+@dataclass
+class PooledContainer:
+    """A running container leased from a :class:`DockerContainerPool`."""
+
+    container: Any
+    """The :class:`docker.models.containers.Container`."""
+    work_dir: Path
+    """The directory that is bound to the working directory of the container, ``/workspace``."""
+
+
+class DockerContainerPool:
+    """Keeps running Docker containers that :class:`DockerCommandLineCodeExecutor` instances lease, so that
+    starting an executor does not wait for a container to be created and started.
+
+    .. note::
+
+        This class requires the :code:`docker` extra for the :code:`autogen-ext` package.
+
+    Each container has its own working directory in ``work_dir``, which is bound to
+    ``/workspace`` in the container. When a container is returned, its working
+    directory is emptied from inside the container, so that files written by the
+    container's user are removed too, and the contents of ``template_dir``, if
+    any, are copied into it. Other changes to the container, such as installed
+    packages, are kept.
+
+    At least ``min_size`` containers, leased or idle, are kept running, and at most
+    ``max_size`` are leased at once; further leases wait for a container to be
+    returned. A container is checked before it is leased and every
+    ``health_check_interval`` seconds while it is idle, and replaced if it is no
+    longer running. Idle containers beyond ``min_size`` are removed by the
+    periodic check.
+
+    Example:
+
+    .. code-block:: python
+
+        pool = DockerContainerPool(min_size=2, max_size=8)
+        await pool.start()
+
+        async with DockerCommandLineCodeExecutor(container_pool=pool) as executor:
+            ...
+
+        await pool.stop()
+
+    Args:
+        image (str, optional): Docker image of the containers. Defaults to "python:3-slim".
+        min_size (int, optional): The number of containers, leased or idle, that are kept running. Defaults to 1.
+        max_size (int, optional): The maximum number of containers leased at once. Defaults to 4.
+        work_dir (Union[Path, str] | None, optional): The directory in which the working directories of the
+            containers are created. Defaults to None, which uses a new temporary directory.
+        bind_dir (Union[Path, str] | None, optional): The path of ``work_dir`` on the Docker host, for when
+            the pool runs in a container itself. Defaults to ``work_dir``.
+        template_dir (Union[Path, str] | None, optional): A directory whose contents are copied into the
+            working directory of a container before each lease. Defaults to None.
+        health_check_interval (float, optional): Seconds between checks of the idle containers. Defaults to 30.
+    """
+
+    def __init__(
+        self,
+        image: str = "python:3-slim",
+        *,
+        min_size: int = 1,
+        max_size: int = 4,
+        work_dir: Optional[Union[Path, str]] = None,
+        bind_dir: Optional[Union[Path, str]] = None,
+        template_dir: Optional[Union[Path, str]] = None,
+        health_check_interval: float = 30,
+    ) -> None:
+        if min_size < 0:
+            raise ValueError("Min size must be greater than or equal to 0.")
+        if max_size < 1 or max_size < min_size:
+            raise ValueError("Max size must be at least 1 and at least min size.")
+        if health_check_interval <= 0:
+            raise ValueError("Health check interval must be greater than 0.")
+
+        try:
+            import docker  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError(
+                "Missing dependecies for DockerContainerPool. Please ensure the autogen-ext package was installed with the 'docker' extra."
+            ) from e
+
+        self._image = image
+        self._min_size = min_size
+        self._max_size = max_size
+        self._work_dir = Path(work_dir) if work_dir is not None else Path(tempfile.mkdtemp(prefix="autogen-pool-"))
+        self._bind_dir = Path(bind_dir) if bind_dir is not None else self._work_dir
+        self._template_dir = Path(template_dir) if template_dir is not None else None
+        self._health_check_interval = health_check_interval
+
+        self._client: Any = None
+        self._image_id: Optional[str] = None
+        self._idle: Deque[PooledContainer] = deque()
+        self._leases = asyncio.Semaphore(max_size)
+        self._num_leased = 0
+        self._health_check_task: Optional[asyncio.Task[None]] = None
+        self._running = False
+
+    @property
+    def image(self) -> str:
+        """The Docker image of the containers."""
+        return self._image
+
+    @property
+    def image_id(self) -> Optional[str]:
+        """The ID of the Docker image of the containers, or None if the pool has not been started."""
+        return self._image_id
+
+    @property
+    def num_idle(self) -> int:
+        """The number of containers that are ready to be leased."""
+        return len(self._idle)
+
+    @property
+    def num_leased(self) -> int:
+        """The number of containers that are leased."""
+        return self._num_leased
+
+    async def start(self) -> None:
+        """Pull the image if needed, and start ``min_size`` containers."""
+        try:
+            import asyncio_atexit
+            import docker
+            from docker.errors import ImageNotFound
+        except ImportError as e:
+            raise RuntimeError(
+                "Missing dependecies for DockerContainerPool. Please ensure the autogen-ext package was installed with the 'docker' extra."
+            ) from e
+
+        if self._running:
+            return
+        self._client = docker.from_env()
+        try:
+            docker_image = await asyncio.to_thread(self._client.images.get, self._image)
+        except ImageNotFound:
+            logging.info(f"Pulling image {self._image}...")
+            docker_image = await asyncio.to_thread(self._client.images.pull, self._image)
+        self._image_id = docker_image.id
+
+        self._work_dir.mkdir(parents=True, exist_ok=True)
+        self._running = True
+        self._idle.extend(await asyncio.gather(*[self._create() for _ in range(self._min_size)]))
+        self._health_check_task = asyncio.create_task(self._check_health_periodically())
+        asyncio_atexit.register(self.stop)  # type: ignore
+
+    async def stop(self) -> None:
+        """Remove the idle containers. Leased containers are removed when they are returned."""
+        if not self._running:
+            return
+        import asyncio_atexit
+
+        self._running = False
+        asyncio_atexit.unregister(self.stop)  # type: ignore
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            await asyncio.gather(self._health_check_task, return_exceptions=True)
+            self._health_check_task = None
+        idle = list(self._idle)
+        self._idle.clear()
+        await asyncio.gather(*[self._remove(pooled) for pooled in idle])
+
+    async def acquire(self) -> PooledContainer:
+        """Lease a running container, and wait for one to be returned if ``max_size`` containers are leased."""
+        if not self._running:
+            raise ValueError("Container pool is not running. Must first be started with start.")
+        await self._leases.acquire()
+        try:
+            pooled = await self._take_idle()
+            if pooled is None:
+                pooled = await self._create()
+        except BaseException:
+            self._leases.release()
+            raise
+        self._num_leased += 1
+        return pooled
+
+    async def release(self, pooled: PooledContainer) -> None:
+        """Return a leased container. Its working directory is restored before it is leased again."""
+        try:
+            if self._running and await self._reset(pooled):
+                self._idle.append(pooled)
+            else:
+                await self._remove(pooled)
+        finally:
+            # A waiting lease takes the returned container.
+            self._num_leased -= 1
+            self._leases.release()
+
+    async def _take_idle(self) -> Optional[PooledContainer]:
+        while self._idle:
+            pooled = self._idle.popleft()
+            if await self._is_healthy(pooled):
+                return pooled
+            await self._remove(pooled)
+        return None
+
+    async def _create(self) -> PooledContainer:
+        name = f"autogen-code-exec-{uuid.uuid4()}"
+        work_dir = self._work_dir / name
+        work_dir.mkdir()
+        if self._template_dir is not None:
+            await asyncio.to_thread(shutil.copytree, self._template_dir, work_dir, dirs_exist_ok=True)
+        container = await asyncio.to_thread(
+            self._client.containers.create,
+            self._image_id,
+            name=name,
+            entrypoint="/bin/sh",
+            tty=True,
+            detach=True,
+            auto_remove=True,
+            volumes={str((self._bind_dir / name).resolve()): {"bind": "/workspace", "mode": "rw"}},
+            working_dir="/workspace",
+        )
+        pooled = PooledContainer(container=container, work_dir=work_dir)
+        try:
+            await asyncio.to_thread(container.start)
+            await _wait_for_ready(container)
+        except BaseException:
+            await self._remove(pooled)
+            raise
+        return pooled
+
+    async def _is_healthy(self, pooled: PooledContainer) -> bool:
+        try:
+            await asyncio.to_thread(pooled.container.reload)
+        except Exception:
+            return False
+        return bool(pooled.container.status == "running")
+
+    async def _reset(self, pooled: PooledContainer) -> bool:
+        # The processes that the code left running, for example in the background, are killed so that they do
+        # not outlive the lease. kill -1 signals every process but PID 1 and the shell, and exits with an error when
+        # there is none, so the container is dropped only when the command cannot run.
+        # The files are removed in the container, as the host may not be allowed to remove files that the
+        # container's user created.
+        try:
+            result = await asyncio.to_thread(pooled.container.exec_run, ["sh", "-c", "kill -9 -1 2>/dev/null; true"])
+            if result.exit_code != 0:
+                return False
+            result = await asyncio.to_thread(pooled.container.exec_run, ["find", ".", "-mindepth", "1", "-delete"])
+            if result.exit_code != 0:
+                return False
+            if self._template_dir is not None:
+                await asyncio.to_thread(shutil.copytree, self._template_dir, pooled.work_dir, dirs_exist_ok=True)
+        except Exception:
+            logging.exception("Failed to reset the working directory of a pooled container.")
+            return False
+        return True
+
+    async def _remove(self, pooled: PooledContainer) -> None:
+        try:
+            await asyncio.to_thread(pooled.container.remove, force=True)
+        except Exception:
+            # The container was already removed, for example by auto_remove when it stopped.
+            pass
+        await asyncio.to_thread(shutil.rmtree, pooled.work_dir, ignore_errors=True)
+
+    async def _check_health_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_check_interval)
+            try:
+                await self._check_health()
+            except Exception:
+                logging.exception("Failed to check the health of the pooled containers.")
+
+    async def _check_health(self) -> None:
+        for pooled in list(self._idle):
+            # A container can be leased while others are checked.
+            if not await self._is_healthy(pooled) and pooled in self._idle:
+                self._idle.remove(pooled)
+                await self._remove(pooled)
+        # The containers that were returned the longest time ago are removed first.
+        while self._idle and len(self._idle) + self._num_leased > self._min_size:
+            await self._remove(self._idle.popleft())
+        while self._running and len(self._idle) + self._num_leased < self._min_size:
+            self._idle.append(await self._create())
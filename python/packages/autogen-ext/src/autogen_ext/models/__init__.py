@@ -1,9 +1,22 @@
+from ._cache._cached_chat_completion_client import CachedChatCompletionClient
+from ._cache._chat_completion_cache import (
+    ChatCompletionCache,
+    InMemoryChatCompletionCache,
+    SQLiteChatCompletionCache,
+)
 from ._openai._openai_client import (
     AzureOpenAIChatCompletionClient,
     OpenAIChatCompletionClient,
 )
+from ._openai._retry import RetryPolicy, RetryStats
 
 __all__ = [
     "AzureOpenAIChatCompletionClient",
+    "CachedChatCompletionClient",
+    "ChatCompletionCache",
+    "InMemoryChatCompletionCache",
     "OpenAIChatCompletionClient",
+    "RetryPolicy",
+    "RetryStats",
+    "SQLiteChatCompletionCache",
 ]
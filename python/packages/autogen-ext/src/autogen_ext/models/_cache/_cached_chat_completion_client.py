@@ -0,0 +1,232 @@
+import dataclasses
+import hashlib
+import json
+from typing import Any, AsyncGenerator, Dict, List, Mapping, Optional, Sequence, Union
+
+from autogen_core.base import CancellationToken
+from autogen_core.components import FunctionCall, Image
+from autogen_core.components.models import (
+    ChatCompletionClient,
+    ChatCompletionTokenLogprob,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,
+    RequestUsage,
+    TopLogprob,
+)
+from autogen_core.components.tools import Tool, ToolSchema
+from pydantic import BaseModel
+
+from ._chat_completion_cache import ChatCompletionCache, InMemoryChatCompletionCache
+
+# Bump when the key or entry format changes so that existing persistent caches are not misread.
+_CACHE_FORMAT_VERSION = 1
+
+
+def _canonicalize(value: Any) -> Any:
+    """Convert a request argument into a JSON-compatible value that is stable across runs."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Image):
+        return {"image": value.to_base64()}
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        fields = {field.name: _canonicalize(getattr(value, field.name)) for field in dataclasses.fields(value)}
+        return {"type": type(value).__name__, **fields}
+    if isinstance(value, Tool):
+        return _canonicalize(value.schema)
+    if isinstance(value, Mapping):
+        return {str(key): _canonicalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(item) for item in value]
+    return repr(value)
+
+
+def _dump_result(result: CreateResult) -> Dict[str, Any]:
+    return dataclasses.asdict(result)
+
+
+def _load_result(data: Mapping[str, Any]) -> CreateResult:
+    content: Union[str, List[FunctionCall]] = data["content"]
+    if not isinstance(content, str):
+        calls: List[Mapping[str, Any]] = data["content"]
+        content = [FunctionCall(**call) for call in calls]
+    logprobs: List[ChatCompletionTokenLogprob] | None = None
+    if data.get("logprobs") is not None:
+        logprobs = [
+            ChatCompletionTokenLogprob(
+                token=logprob["token"],
+                logprob=logprob["logprob"],
+                top_logprobs=[TopLogprob(**top) for top in logprob["top_logprobs"]]
+                if logprob.get("top_logprobs") is not None
+                else None,
+                bytes=logprob.get("bytes"),
+            )
+            for logprob in data["logprobs"]
+        ]
+    return CreateResult(
+        finish_reason=data["finish_reason"],
+        content=content,
+        usage=RequestUsage(**data["usage"]),
+        cached=True,
+        logprobs=logprobs,
+    )
+
+
+class CachedChatCompletionClient:
+    """A :class:`~autogen_core.components.models.ChatCompletionClient` that caches the responses of another client.
+
+    Requests are keyed on a SHA-256 hash of the messages, tools, ``json_output`` and ``extra_create_args``,
+    together with ``namespace``. Results served from the cache have ``cached=True`` and the usage of the
+    request that produced them, and do not count towards the usage of the wrapped client.
+    :meth:`create_stream` replays the chunks of a cached streamed response before the final result.
+
+    .. note::
+
+        The key does not include the arguments the wrapped client was constructed with, such as the model.
+        Use a different ``namespace`` for each client configuration that shares a persistent cache.
+
+    Args:
+        client (ChatCompletionClient): The client to cache responses of.
+        cache (ChatCompletionCache | None, optional): The cache backend. Defaults to None, which uses an
+            :class:`InMemoryChatCompletionCache`.
+        namespace (str, optional): A string added to every key, for example the model name. Defaults to "".
+
+    Example:
+
+        .. code-block:: python
+
+            from autogen_core.components.models import UserMessage
+            from autogen_ext.models import (
+                CachedChatCompletionClient,
+                OpenAIChatCompletionClient,
+                SQLiteChatCompletionCache,
+            )
+
+            client = CachedChatCompletionClient(
+                OpenAIChatCompletionClient(model="gpt-4o"),
+                SQLiteChatCompletionCache("llm_cache.db"),
+                namespace="gpt-4o",
+            )
+            result = await client.create([UserMessage(content="Hello", source="user")])
+            print(result.cached, client.hits, client.misses)
+    """
+
+    def __init__(
+        self, client: ChatCompletionClient, cache: ChatCompletionCache | None = None, *, namespace: str = ""
+    ) -> None:
+        self._client = client
+        self._cache = cache if cache is not None else InMemoryChatCompletionCache()
+        self._namespace = namespace
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """Number of requests served from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of requests forwarded to the wrapped client."""
+        return self._misses
+
+    def cache_key(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+    ) -> str:
+        """Return the cache key of a request."""
+        request = {
+            "version": _CACHE_FORMAT_VERSION,
+            "namespace": self._namespace,
+            "messages": _canonicalize(messages),
+            "tools": _canonicalize(tools),
+            "json_output": json_output,
+            "extra_create_args": _canonicalize(extra_create_args),
+        }
+        encoded = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = self.cache_key(messages, tools, json_output, extra_create_args)
+        entry = await self._cache.get(key)
+        if entry is not None:
+            self._hits += 1
+            return _load_result(entry["result"])
+
+        self._misses += 1
+        result = await self._client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        await self._cache.set(key, {"result": _dump_result(result), "chunks": None})
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = self.cache_key(messages, tools, json_output, extra_create_args)
+        entry = await self._cache.get(key)
+        if entry is not None:
+            self._hits += 1
+            result = _load_result(entry["result"])
+            chunks: List[str] | None = entry["chunks"]
+            if chunks is None:
+                # The entry was stored by create, so replay the whole content as a single chunk.
+                chunks = [result.content] if isinstance(result.content, str) else []
+            for chunk in chunks:
+                yield chunk
+            yield result
+            return
+
+        self._misses += 1
+        recorded_chunks: List[str] = []
+        async for item in self._client.create_stream(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(item, str):
+                recorded_chunks.append(item)
+            else:
+                await self._cache.set(key, {"result": _dump_result(item), "chunks": recorded_chunks})
+            yield item
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return self._client.capabilities
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from autogen_core.components.cache import CacheStore, InMemoryCacheStore, SQLiteCacheStore
+
+ChatCompletionCache = CacheStore
+"""A store for cached chat completion responses used by :class:`CachedChatCompletionClient`."""
+
+InMemoryChatCompletionCache = InMemoryCacheStore
+
+
+class SQLiteChatCompletionCache(SQLiteCacheStore):
+    """A persistent cache of chat completion responses stored in a SQLite database file.
+
+    Args:
+        path (str | Path): The path of the database file. It is created if it does not exist.
+        table (str, optional): The name of the table that holds the entries. Defaults to ``"chat_completion_cache"``.
+    """
+
+    def __init__(self, path: str | Path, table: str = "chat_completion_cache") -> None:
+        super().__init__(path, table=table)
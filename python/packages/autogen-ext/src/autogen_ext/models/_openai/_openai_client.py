@@ -1,26 +1,39 @@
 import asyncio
+import functools
 import inspect
 import json
 import logging
 import math
 import re
+import sys
 import warnings
+import weakref
 from asyncio import Task
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import (
     Any,
     AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
     Dict,
+    Hashable,
     List,
+    Literal,
     Mapping,
     Optional,
     Sequence,
     Set,
+    Tuple,
     Type,
+    TypeVar,
     Union,
     cast,
 )
 
 import tiktoken
+from autogen_core.application import LatencyHistogram
 from autogen_core.application.logging import EVENT_LOGGER_NAME, TRACE_LOGGER_NAME
 from autogen_core.application.logging.events import LLMCallEvent
 from autogen_core.base import CancellationToken
@@ -32,6 +45,7 @@
     AssistantMessage,
     ChatCompletionClient,
     ChatCompletionTokenLogprob,
+    CreateRequest,
     CreateResult,
     FunctionExecutionResultMessage,
     LLMMessage,
@@ -40,12 +54,14 @@
     SystemMessage,
     TopLogprob,
     UserMessage,
+    create_batch,
 )
 from autogen_core.components.tools import Tool, ToolSchema
 from openai import AsyncAzureOpenAI, AsyncOpenAI
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionAssistantMessageParam,
+    ChatCompletionChunk,
     ChatCompletionContentPartParam,
     ChatCompletionContentPartTextParam,
     ChatCompletionMessageParam,
@@ -65,6 +81,8 @@
 from typing_extensions import Unpack
 
 from . import _model_info
+from ._request_limiter import RequestLimiter
+from ._retry import RetryPolicy, RetryRunner, RetryStats
 from .config import AzureOpenAIClientConfiguration, OpenAIClientConfiguration
 
 logger = logging.getLogger(EVENT_LOGGER_NAME)
@@ -79,6 +97,67 @@
 # Only single choice allowed
 disallowed_create_args = set(["stream", "messages", "function_call", "functions", "n"])
 required_create_args: Set[str] = set(["model"])
+# Options of the client itself rather than of the OpenAI client or the request.
+client_option_kwargs = set(
+    ["max_concurrent_requests", "requests_per_minute", "tokens_per_minute", "coalesce_requests", "retry_policy"]
+)
+
+_ChatCompletionResponse = Union[ParsedChatCompletion[BaseModel], ChatCompletion]
+
+
+@dataclass
+class _InFlightRequest:
+    task: Task[_ChatCompletionResponse]
+    waiters: int = 0
+
+
+T = TypeVar("T")
+
+
+class _StreamCancellation:
+    """Links a cancellation token to the task consuming a stream once, instead of wrapping every chunk
+    in a linked future. Cancelling the token cancels the consuming task only while it waits for a chunk."""
+
+    def __init__(self, cancellation_token: Optional[CancellationToken]) -> None:
+        self._task: Optional[Task[Any]] = None
+        self._cancelled = False
+        self._closed = False
+        if cancellation_token is not None:
+            cancellation_token.add_callback(self._cancel)
+
+    def _cancel(self) -> None:
+        if self._closed:
+            return
+        self._cancelled = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def next(self, stream: AsyncIterator[T]) -> T:
+        if self._cancelled:
+            raise asyncio.CancelledError()
+        self._task = asyncio.current_task()
+        try:
+            return await stream.__anext__()
+        except asyncio.CancelledError:
+            # The cancellation came from the token, not from whoever cancelled the task.
+            if self._cancelled and self._task is not None and sys.version_info >= (3, 11):
+                self._task.uncancel()
+            raise
+        finally:
+            self._task = None
+
+    def close(self) -> None:
+        self._closed = True
+
+
+@dataclass
+class _ToolCallBuffer:
+    ids: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    arguments: List[str] = field(default_factory=list)
+
+    def to_function_call(self) -> FunctionCall:
+        return FunctionCall(id="".join(self.ids), name="".join(self.names), arguments="".join(self.arguments))
 
 
 def _azure_openai_client_from_config(config: Mapping[str, Any]) -> AsyncAzureOpenAI:
@@ -102,6 +181,10 @@ def _openai_client_from_config(config: Mapping[str, Any]) -> AsyncOpenAI:
     return AsyncOpenAI(**openai_config)
 
 
+def _client_options_from_config(config: Mapping[str, Any]) -> Dict[str, Any]:
+    return {k: config[k] for k in client_option_kwargs if k in config}
+
+
 def _create_args_from_config(config: Mapping[str, Any]) -> Dict[str, Any]:
     create_args = {k: v for k, v in config.items() if k in create_kwargs}
     create_args_keys = set(create_args.keys())
@@ -225,7 +308,7 @@ def calculate_vision_tokens(image: Image, detail: str = "auto") -> int:
     if detail == "low":
         return BASE_TOKEN_COUNT
 
-    width, height = image.image.size
+    width, height = image.size
 
     # Scale down to fit within a MAX_LONG_EDGE x MAX_LONG_EDGE square if necessary
 
@@ -271,32 +354,56 @@ def _add_usage(usage1: RequestUsage, usage2: RequestUsage) -> RequestUsage:
     )
 
 
+@dataclass
+class _ConvertedTool:
+    schema: ToolSchema
+    param: ChatCompletionToolParam
+    # Token counts of the tool keyed by encoding name.
+    token_counts: Dict[str, int] = field(default_factory=dict)
+
+
+# Tools are converted once and the result is reused for as long as the tool returns the same schema
+# object, which BaseTool does until the tool changes.
+_converted_tools: "weakref.WeakKeyDictionary[Tool, _ConvertedTool]" = weakref.WeakKeyDictionary()
+
+
+def _convert_tool_schema(tool_schema: ToolSchema) -> ChatCompletionToolParam:
+    tool_param = ChatCompletionToolParam(
+        type="function",
+        function=FunctionDefinition(
+            name=tool_schema["name"],
+            description=(tool_schema["description"] if "description" in tool_schema else ""),
+            parameters=(cast(FunctionParameters, tool_schema["parameters"]) if "parameters" in tool_schema else {}),
+        ),
+    )
+    # Check if the tool has a valid name.
+    assert_valid_name(tool_param["function"]["name"])
+    return tool_param
+
+
+def _convert_tool(tool: Tool) -> _ConvertedTool:
+    tool_schema = tool.schema
+    try:
+        converted = _converted_tools.get(tool)
+    except TypeError:
+        # The tool cannot be hashed or weakly referenced, so it is not cached.
+        return _ConvertedTool(schema=tool_schema, param=_convert_tool_schema(tool_schema))
+    if converted is None or converted.schema is not tool_schema:
+        converted = _ConvertedTool(schema=tool_schema, param=_convert_tool_schema(tool_schema))
+        _converted_tools[tool] = converted
+    return converted
+
+
 def convert_tools(
     tools: Sequence[Tool | ToolSchema],
 ) -> List[ChatCompletionToolParam]:
     result: List[ChatCompletionToolParam] = []
     for tool in tools:
         if isinstance(tool, Tool):
-            tool_schema = tool.schema
+            result.append(_convert_tool(tool).param)
         else:
             assert isinstance(tool, dict)
-            tool_schema = tool
-
-        result.append(
-            ChatCompletionToolParam(
-                type="function",
-                function=FunctionDefinition(
-                    name=tool_schema["name"],
-                    description=(tool_schema["description"] if "description" in tool_schema else ""),
-                    parameters=(
-                        cast(FunctionParameters, tool_schema["parameters"]) if "parameters" in tool_schema else {}
-                    ),
-                ),
-            )
-        )
-    # Check if all tools have valid names.
-    for tool_param in result:
-        assert_valid_name(tool_param["function"]["name"])
+            result.append(_convert_tool_schema(tool))
     return result
 
 
@@ -322,13 +429,138 @@ def assert_valid_name(name: str) -> str:
     return name
 
 
+# Number of per-message token counts kept by each client, enough for several long conversations.
+_MAX_CACHED_MESSAGE_TOKEN_COUNTS = 4096
+# Number of per-schema tool token counts kept by each client.
+_MAX_CACHED_TOOL_TOKEN_COUNTS = 256
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _message_token_cache_key(message: LLMMessage) -> Hashable:
+    """Return a key that identifies everything the token count of a message depends on.
+
+    Strings are used as they are, so that hashing them is cheap after the first time. Images only
+    contribute their size.
+    """
+    content: Hashable
+    if isinstance(message.content, str):
+        content = message.content
+    else:
+        parts: List[Hashable] = []
+        for part in message.content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, Image):
+                parts.append(("image", part.size))
+            elif isinstance(part, FunctionCall):
+                parts.append(("call", part.id, part.arguments, part.name))
+            else:
+                parts.append(("result", part.content, part.call_id))
+        content = tuple(parts)
+    return (type(message), content, getattr(message, "source", None))
+
+
+def _count_message_tokens(message: LLMMessage, encoding: tiktoken.Encoding) -> int:
+    tokens_per_message = 3
+    tokens_per_name = 1
+    num_tokens = tokens_per_message
+    oai_message = to_oai_type(message)
+    for oai_message_part in oai_message:
+        for key, value in oai_message_part.items():
+            if value is None:
+                continue
+
+            if isinstance(message, UserMessage) and isinstance(value, list):
+                typed_message_value = cast(List[ChatCompletionContentPartParam], value)
+
+                assert len(typed_message_value) == len(
+                    message.content
+                ), "Mismatch in message content and typed message value"
+
+                # We need image properties that are only in the original message
+                for part, content_part in zip(typed_message_value, message.content, strict=False):
+                    if isinstance(content_part, Image):
+                        # TODO: add detail parameter
+                        num_tokens += calculate_vision_tokens(content_part)
+                    elif isinstance(part, str):
+                        num_tokens += len(encoding.encode(part))
+                    else:
+                        try:
+                            serialized_part = json.dumps(part)
+                            num_tokens += len(encoding.encode(serialized_part))
+                        except TypeError:
+                            trace_logger.warning(f"Could not convert {part} to string, skipping.")
+            else:
+                if not isinstance(value, str):
+                    try:
+                        value = json.dumps(value)
+                    except TypeError:
+                        trace_logger.warning(f"Could not convert {value} to string, skipping.")
+                        continue
+                num_tokens += len(encoding.encode(value))
+                if key == "name":
+                    num_tokens += tokens_per_name
+    return num_tokens
+
+
+def _count_tool_tokens(tool: ChatCompletionToolParam, encoding: tiktoken.Encoding) -> int:
+    function = tool["function"]
+    tool_tokens = len(encoding.encode(function["name"]))
+    if "description" in function:
+        tool_tokens += len(encoding.encode(function["description"]))
+    tool_tokens -= 2
+    if "parameters" in function:
+        parameters = function["parameters"]
+        if "properties" in parameters:
+            assert isinstance(parameters["properties"], dict)
+            for propertiesKey in parameters["properties"]:  # pyright: ignore
+                assert isinstance(propertiesKey, str)
+                tool_tokens += len(encoding.encode(propertiesKey))
+                v = parameters["properties"][propertiesKey]  # pyright: ignore
+                for field in v:  # pyright: ignore
+                    if field == "type":
+                        tool_tokens += 2
+                        tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
+                    elif field == "description":
+                        tool_tokens += 2
+                        tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
+                    elif field == "enum":
+                        tool_tokens -= 3
+                        for o in v["enum"]:  # pyright: ignore
+                            tool_tokens += 3
+                            tool_tokens += len(encoding.encode(o))  # pyright: ignore
+                    else:
+                        trace_logger.warning(f"Not supported field {field}")
+            tool_tokens += 11
+            if len(parameters["properties"]) == 0:  # pyright: ignore
+                tool_tokens -= 2
+    return tool_tokens
+
+
 class BaseOpenAIChatCompletionClient(ChatCompletionClient):
     def __init__(
         self,
         client: Union[AsyncOpenAI, AsyncAzureOpenAI],
         create_args: Dict[str, Any],
         model_capabilities: Optional[ModelCapabilities] = None,
+        *,
+        max_concurrent_requests: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        coalesce_requests: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
+        if retry_policy is not None:
+            # The policy replaces the retries of the SDK.
+            client = client.with_options(max_retries=0)
         self._client = client
         if model_capabilities is None and isinstance(client, AsyncAzureOpenAI):
             raise ValueError("AzureOpenAIChatCompletionClient requires explicit model capabilities")
@@ -351,6 +583,18 @@ def __init__(
         self._create_args = create_args
         self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
         self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._message_token_counts: OrderedDict[Hashable, int] = OrderedDict()
+        # Keyed on the identity of the schema, which the entry keeps alive so that the id is not reused.
+        self._tool_token_counts: OrderedDict[int, Tuple[ToolSchema, int]] = OrderedDict()
+        self._request_limiter = RequestLimiter(
+            max_concurrent_requests=max_concurrent_requests,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        self._coalesce_requests = coalesce_requests
+        self._in_flight_requests: Dict[str, _InFlightRequest] = {}
+        self._num_shared_requests = 0
+        self._retry_runner = RetryRunner(retry_policy) if retry_policy is not None else None
 
     @classmethod
     def create_from_config(cls, config: Dict[str, Any]) -> ChatCompletionClient:
@@ -364,6 +608,127 @@ async def create(
         extra_create_args: Mapping[str, Any] = {},
         cancellation_token: Optional[CancellationToken] = None,
     ) -> CreateResult:
+        request_kwargs, use_beta_client = self._prepare_request(messages, tools, json_output, extra_create_args)
+        create_request: Callable[..., Awaitable[_ChatCompletionResponse]]
+        if use_beta_client:
+            create_request = self._client.beta.chat.completions.parse
+        else:
+            create_request = self._client.chat.completions.create
+
+        result, shared = await self._send_request(
+            create_request, request_kwargs, messages, tools, use_beta_client, cancellation_token
+        )
+        # A response shared with an identical request in flight did not cost anything.
+        return self._to_create_result(result, cached=shared)
+
+    async def create_batch(
+        self,
+        requests: Sequence[CreateRequest],
+        *,
+        max_concurrency: int = 8,
+        cancellation_token: Optional[CancellationToken] = None,
+        use_batch_api: bool = False,
+        poll_interval: float = 30.0,
+    ) -> List[CreateResult | Exception]:
+        """Run a batch of requests and return their results in the order of the requests.
+
+        A request that fails has its exception in place of its result and does not stop the others.
+
+        By default the requests are sent through :meth:`create`, with at most ``max_concurrency`` in
+        flight, as :func:`~autogen_core.components.models.create_batch` does. With ``use_batch_api=True`` they are uploaded as one JSONL file to the batch endpoint
+        of the provider instead, which is cheaper for large offline runs but can take up to 24 hours.
+        The batch is polled every ``poll_interval`` seconds, and is cancelled if the cancellation token
+        is. Requests with a Pydantic ``response_format`` are not supported by the batch endpoint.
+
+        Args:
+            requests (Sequence[CreateRequest]): The requests to run.
+            max_concurrency (int, optional): The maximum number of requests in flight when the batch
+                endpoint is not used. Defaults to 8.
+            cancellation_token (CancellationToken | None, optional): A token to cancel the batch.
+            use_batch_api (bool, optional): Whether to use the batch endpoint. Defaults to False.
+            poll_interval (float, optional): Seconds between checks of the batch status. Defaults to 30.
+        """
+        if not use_batch_api:
+            return await create_batch(
+                self, requests, max_concurrency=max_concurrency, cancellation_token=cancellation_token
+            )
+
+        async def cancellable(awaitable: Awaitable[T]) -> T:
+            future = asyncio.ensure_future(awaitable)
+            if cancellation_token is not None:
+                cancellation_token.link_future(future)
+            return await future
+
+        results: List[CreateResult | Exception | None] = [None] * len(requests)
+        url = "/chat/completions" if isinstance(self._client, AsyncAzureOpenAI) else "/v1/chat/completions"
+        lines: List[str] = []
+        for index, request in enumerate(requests):
+            try:
+                request_kwargs, use_beta_client = self._prepare_request(
+                    request.messages, request.tools, request.json_output, request.extra_create_args
+                )
+                if use_beta_client:
+                    raise ValueError("A Pydantic response_format is not supported by the batch API.")
+            except Exception as e:
+                results[index] = e
+                continue
+            # The batch endpoint takes the request body only, without client-side options.
+            body = {k: v for k, v in request_kwargs.items() if k not in ("stream", "timeout")}
+            lines.append(json.dumps({"custom_id": str(index), "method": "POST", "url": url, "body": body}))
+
+        if lines:
+            input_file = await cancellable(
+                self._client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+            )
+            batch = await cancellable(
+                self._client.batches.create(
+                    input_file_id=input_file.id,
+                    # Azure OpenAI takes the path without the API version, which the SDK types do not list.
+                    endpoint=cast(Literal["/v1/chat/completions"], url),
+                    completion_window="24h",
+                )
+            )
+            try:
+                while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                    await cancellable(asyncio.sleep(poll_interval))
+                    batch = await cancellable(self._client.batches.retrieve(batch.id))
+            except asyncio.CancelledError:
+                await self._client.batches.cancel(batch.id)
+                raise
+
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is None:
+                    continue
+                output = await cancellable(self._client.files.content(file_id))
+                for line in output.text.splitlines():
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    index = int(item["custom_id"])
+                    response = item.get("response") or {}
+                    if item.get("error") is None and response.get("status_code") == 200:
+                        completion = ChatCompletion.model_validate(response["body"])
+                        results[index] = self._to_create_result(completion, cached=False)
+                    else:
+                        error = item.get("error") or response.get("body", {}).get("error")
+                        results[index] = RuntimeError(f"Batch request failed: {error}")
+
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = RuntimeError(
+                        f"Batch {batch.id} ended with status {batch.status} without a result for this request."
+                    )
+        return [cast(CreateResult | Exception, result) for result in results]
+
+    def _prepare_request(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        json_output: Optional[bool],
+        extra_create_args: Mapping[str, Any],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Validate a request and return the keyword arguments of the SDK call, and whether it has to
+        be made with the beta client because the response format is a Pydantic model."""
         # Make sure all extra_create_args are valid
         extra_create_args_keys = set(extra_create_args.keys())
         if not create_kwargs.issuperset(extra_create_args_keys):
@@ -416,70 +781,21 @@ async def create(
 
         if self.capabilities["function_calling"] is False and len(tools) > 0:
             raise ValueError("Model does not support function calling")
-        future: Union[Task[ParsedChatCompletion[BaseModel]], Task[ChatCompletion]]
+        request_kwargs: Dict[str, Any] = {"messages": oai_messages}
         if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            if use_beta_client:
-                # Pass response_format_value if it's not None
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            tools=converted_tools,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
-                        )
-                    )
-                else:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            tools=converted_tools,
-                            **create_args_no_response_format,
-                        )
-                    )
-            else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        tools=converted_tools,
-                        **create_args,
-                    )
-                )
-        else:
-            if use_beta_client:
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
-                        )
-                    )
-                else:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            **create_args_no_response_format,
-                        )
-                    )
-            else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        **create_args,
-                    )
-                )
-
-        if cancellation_token is not None:
-            cancellation_token.link_future(future)
-        result: Union[ParsedChatCompletion[BaseModel], ChatCompletion] = await future
+            request_kwargs["tools"] = convert_tools(tools)
         if use_beta_client:
-            result = cast(ParsedChatCompletion[Any], result)
+            # Pass response_format_value if it's not None
+            if response_format_value is not None:
+                request_kwargs["response_format"] = response_format_value
+            request_kwargs.update(create_args_no_response_format)
+        else:
+            request_kwargs.update(stream=False, **create_args)
+        return request_kwargs, use_beta_client
 
-        if result.usage is not None:
+    def _to_create_result(self, result: _ChatCompletionResponse, *, cached: bool) -> CreateResult:
+        """Convert a response to a result, and add its usage to the client's unless it is cached."""
+        if result.usage is not None and not cached:
             logger.info(
                 LLMCallEvent(
                     prompt_tokens=result.usage.prompt_tokens,
@@ -497,7 +813,7 @@ async def create(
             if self._resolved_model != result.model:
                 warnings.warn(
                     f"Resolved model mismatch: {self._resolved_model} != {result.model}. Model mapping may be incorrect.",
-                    stacklevel=2,
+                    stacklevel=3,
                 )
 
         # Limited to a single choice currently.
@@ -538,17 +854,18 @@ async def create(
             finish_reason=finish_reason,  # type: ignore
             content=content,
             usage=usage,
-            cached=False,
+            cached=cached,
             logprobs=logprobs,
         )
 
-        _add_usage(self._actual_usage, usage)
-        _add_usage(self._total_usage, usage)
+        if not cached:
+            _add_usage(self._actual_usage, usage)
+            _add_usage(self._total_usage, usage)
 
         # TODO - why is this cast needed?
         return response
 
-    async def create_stream(
+    def create_stream(
         self,
         messages: Sequence[LLMMessage],
         tools: Sequence[Tool | ToolSchema] = [],
@@ -556,6 +873,37 @@ async def create_stream(
         extra_create_args: Mapping[str, Any] = {},
         cancellation_token: Optional[CancellationToken] = None,
     ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return cast(
+            AsyncGenerator[Union[str, CreateResult], None],
+            self._create_stream(messages, tools, json_output, extra_create_args, cancellation_token, raw_chunks=False),
+        )
+
+    def create_raw_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[ChatCompletionChunk, CreateResult], None]:
+        """Like :meth:`create_stream`, but yields the chunks received from the API as they are, followed
+        by the aggregated :class:`CreateResult`. This lets a UI forward tokens without the client building
+        a value for each chunk."""
+        return cast(
+            AsyncGenerator[Union[ChatCompletionChunk, CreateResult], None],
+            self._create_stream(messages, tools, json_output, extra_create_args, cancellation_token, raw_chunks=True),
+        )
+
+    async def _create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        json_output: Optional[bool],
+        extra_create_args: Mapping[str, Any],
+        cancellation_token: Optional[CancellationToken],
+        *,
+        raw_chunks: bool,
+    ) -> AsyncGenerator[Union[str, ChatCompletionChunk, CreateResult], None]:
         # Make sure all extra_create_args are valid
         extra_create_args_keys = set(extra_create_args.keys())
         if not create_kwargs.issuperset(extra_create_args_keys):
@@ -585,75 +933,74 @@ async def create_stream(
             else:
                 create_args["response_format"] = {"type": "text"}
 
-        if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(
-                    messages=oai_messages,
-                    stream=True,
-                    tools=converted_tools,
-                    **create_args,
+        estimated_tokens = self._estimate_request_tokens(messages, tools, create_args)
+        async with self._request_limiter.reserve(estimated_tokens):
+            stream_kwargs: Dict[str, Any] = {"messages": oai_messages, "stream": True, **create_args}
+            if len(tools) > 0:
+                stream_kwargs["tools"] = convert_tools(tools)
+            if self._retry_runner is None:
+                stream_future = asyncio.ensure_future(self._client.chat.completions.create(**stream_kwargs))
+            else:
+                # Only opening the stream is retried, as chunks that were yielded cannot be taken back.
+                stream_future = asyncio.ensure_future(
+                    self._retry_runner.run(lambda: self._client.chat.completions.create(**stream_kwargs))
                 )
-            )
-        else:
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(messages=oai_messages, stream=True, **create_args)
-            )
-        if cancellation_token is not None:
-            cancellation_token.link_future(stream_future)
-        stream = await stream_future
-
-        stop_reason = None
-        maybe_model = None
-        content_deltas: List[str] = []
-        full_tool_calls: Dict[int, FunctionCall] = {}
-        completion_tokens = 0
-        logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
-        while True:
+            if cancellation_token is not None:
+                cancellation_token.link_future(stream_future)
+            stream = await stream_future
+
+            stop_reason = None
+            maybe_model = None
+            content_deltas: List[str] = []
+            tool_call_buffers: Dict[int, _ToolCallBuffer] = {}
+            completion_tokens = 0
+            logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
+            cancellation = _StreamCancellation(cancellation_token)
             try:
-                chunk_future = asyncio.ensure_future(anext(stream))
-                if cancellation_token is not None:
-                    cancellation_token.link_future(chunk_future)
-                chunk = await chunk_future
-                choice = chunk.choices[0]
-                stop_reason = choice.finish_reason
-                maybe_model = chunk.model
-                # First try get content
-                if choice.delta.content is not None:
-                    content_deltas.append(choice.delta.content)
-                    if len(choice.delta.content) > 0:
-                        yield choice.delta.content
-                    continue
+                while True:
+                    try:
+                        chunk = await cancellation.next(stream)
+                    except StopAsyncIteration:
+                        break
+                    if raw_chunks:
+                        yield chunk
+                    choice = chunk.choices[0]
+                    stop_reason = choice.finish_reason
+                    maybe_model = chunk.model
+                    delta = choice.delta
+                    # First try get content
+                    if delta.content is not None:
+                        content_deltas.append(delta.content)
+                        if not raw_chunks and len(delta.content) > 0:
+                            yield delta.content
+                        continue
 
-                # Otherwise, get tool calls
-                if choice.delta.tool_calls is not None:
-                    for tool_call_chunk in choice.delta.tool_calls:
-                        idx = tool_call_chunk.index
-                        if idx not in full_tool_calls:
-                            # We ignore the type hint here because we want to fill in type when the delta provides it
-                            full_tool_calls[idx] = FunctionCall(id="", arguments="", name="")
-
-                        if tool_call_chunk.id is not None:
-                            full_tool_calls[idx].id += tool_call_chunk.id
-
-                        if tool_call_chunk.function is not None:
-                            if tool_call_chunk.function.name is not None:
-                                full_tool_calls[idx].name += tool_call_chunk.function.name
-                            if tool_call_chunk.function.arguments is not None:
-                                full_tool_calls[idx].arguments += tool_call_chunk.function.arguments
-                if choice.logprobs and choice.logprobs.content:
-                    logprobs = [
-                        ChatCompletionTokenLogprob(
-                            token=x.token,
-                            logprob=x.logprob,
-                            top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
-                            bytes=x.bytes,
-                        )
-                        for x in choice.logprobs.content
-                    ]
-
-            except StopAsyncIteration:
-                break
+                    # Otherwise, get tool calls
+                    if delta.tool_calls is not None:
+                        for tool_call_chunk in delta.tool_calls:
+                            buffer = tool_call_buffers.get(tool_call_chunk.index)
+                            if buffer is None:
+                                buffer = tool_call_buffers[tool_call_chunk.index] = _ToolCallBuffer()
+                            if tool_call_chunk.id is not None:
+                                buffer.ids.append(tool_call_chunk.id)
+                            function = tool_call_chunk.function
+                            if function is not None:
+                                if function.name is not None:
+                                    buffer.names.append(function.name)
+                                if function.arguments is not None:
+                                    buffer.arguments.append(function.arguments)
+                    if choice.logprobs and choice.logprobs.content:
+                        logprobs = [
+                            ChatCompletionTokenLogprob(
+                                token=x.token,
+                                logprob=x.logprob,
+                                top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
+                                bytes=x.bytes,
+                            )
+                            for x in choice.logprobs.content
+                        ]
+            finally:
+                cancellation.close()
 
         model = maybe_model or create_args["model"]
         model = model.replace("gpt-35", "gpt-3.5")  # hack for Azure API
@@ -676,7 +1023,7 @@ async def create_stream(
             #     # value = json.dumps(tool_call)
             #     # completion_tokens += count_token(value, model=model)
             #     completion_tokens += 0
-            content = list(full_tool_calls.values())
+            content = [buffer.to_function_call() for buffer in tool_call_buffers.values()]
 
         usage = RequestUsage(
             prompt_tokens=prompt_tokens,
@@ -700,6 +1047,88 @@ async def create_stream(
 
         yield result
 
+    @property
+    def queue_wait_time(self) -> LatencyHistogram:
+        """The time requests waited for a concurrency slot and rate limit budget before being sent, in seconds."""
+        return self._request_limiter.queue_wait
+
+    @property
+    def num_shared_requests(self) -> int:
+        """The number of :meth:`create` calls answered by an identical request that was already in flight."""
+        return self._num_shared_requests
+
+    @property
+    def retry_stats(self) -> Optional[RetryStats]:
+        """Counters of attempts, retries and hedged requests, or None if the client has no retry policy."""
+        return None if self._retry_runner is None else self._retry_runner.stats
+
+    def _estimate_request_tokens(
+        self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema], create_args: Mapping[str, Any]
+    ) -> int:
+        if not self._request_limiter.counts_tokens:
+            return 0
+        return self.count_tokens(messages, tools) + (create_args.get("max_tokens") or 0)
+
+    async def _send_request(
+        self,
+        create_request: Callable[..., Awaitable[_ChatCompletionResponse]],
+        request_kwargs: Dict[str, Any],
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        use_beta_client: bool,
+        cancellation_token: Optional[CancellationToken],
+    ) -> Tuple[_ChatCompletionResponse, bool]:
+        """Send a request within the limits of the client. Returns the response and whether it was
+        shared with an identical request that was already in flight."""
+
+        async def send() -> _ChatCompletionResponse:
+            estimated_tokens = self._estimate_request_tokens(messages, tools, request_kwargs)
+            async with self._request_limiter.reserve(estimated_tokens) as reservation:
+                if self._retry_runner is None:
+                    result = await create_request(**request_kwargs)
+                else:
+                    result = await self._retry_runner.run(lambda: create_request(**request_kwargs), hedge=True)
+                if result.usage is not None:
+                    self._request_limiter.record_usage(reservation, result.usage.total_tokens)
+                return result
+
+        if not self._coalesce_requests:
+            future = asyncio.ensure_future(send())
+            if cancellation_token is not None:
+                cancellation_token.link_future(future)
+            return await future, False
+
+        key = json.dumps([use_beta_client, request_kwargs], sort_keys=True, default=repr)
+        in_flight = self._in_flight_requests.get(key)
+        shared = in_flight is not None
+        if in_flight is None:
+            in_flight = _InFlightRequest(asyncio.ensure_future(send()))
+            self._in_flight_requests[key] = in_flight
+
+            def remove(_: Task[_ChatCompletionResponse]) -> None:
+                if self._in_flight_requests.get(key) is in_flight:
+                    del self._in_flight_requests[key]
+
+            in_flight.task.add_done_callback(remove)
+        else:
+            self._num_shared_requests += 1
+
+        # Each caller waits on its own future, so that cancelling one caller does not cancel the
+        # others. The request is cancelled once every caller waiting on it is cancelled.
+        in_flight.waiters += 1
+        waiter = asyncio.ensure_future(asyncio.shield(in_flight.task))
+        if cancellation_token is not None:
+            cancellation_token.link_future(waiter)
+        try:
+            result: _ChatCompletionResponse = await waiter
+        except asyncio.CancelledError:
+            in_flight.waiters -= 1
+            if in_flight.waiters == 0:
+                in_flight.task.cancel()
+            raise
+        in_flight.waiters -= 1
+        return result, shared
+
     def actual_usage(self) -> RequestUsage:
         return self._actual_usage
 
@@ -707,90 +1136,45 @@ def total_usage(self) -> RequestUsage:
         return self._total_usage
 
     def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
-        model = self._create_args["model"]
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-        tokens_per_message = 3
-        tokens_per_name = 1
+        # Counts are cached per message and per tool, so checking the budget of a growing
+        # conversation only encodes the messages added since the last call.
+        encoding = _encoding_for_model(self._create_args["model"])
         num_tokens = 0
 
         # Message tokens.
         for message in messages:
-            num_tokens += tokens_per_message
-            oai_message = to_oai_type(message)
-            for oai_message_part in oai_message:
-                for key, value in oai_message_part.items():
-                    if value is None:
-                        continue
-
-                    if isinstance(message, UserMessage) and isinstance(value, list):
-                        typed_message_value = cast(List[ChatCompletionContentPartParam], value)
-
-                        assert len(typed_message_value) == len(
-                            message.content
-                        ), "Mismatch in message content and typed message value"
-
-                        # We need image properties that are only in the original message
-                        for part, content_part in zip(typed_message_value, message.content, strict=False):
-                            if isinstance(content_part, Image):
-                                # TODO: add detail parameter
-                                num_tokens += calculate_vision_tokens(content_part)
-                            elif isinstance(part, str):
-                                num_tokens += len(encoding.encode(part))
-                            else:
-                                try:
-                                    serialized_part = json.dumps(part)
-                                    num_tokens += len(encoding.encode(serialized_part))
-                                except TypeError:
-                                    trace_logger.warning(f"Could not convert {part} to string, skipping.")
-                    else:
-                        if not isinstance(value, str):
-                            try:
-                                value = json.dumps(value)
-                            except TypeError:
-                                trace_logger.warning(f"Could not convert {value} to string, skipping.")
-                                continue
-                        num_tokens += len(encoding.encode(value))
-                        if key == "name":
-                            num_tokens += tokens_per_name
+            key = _message_token_cache_key(message)
+            message_tokens = self._message_token_counts.get(key)
+            if message_tokens is None:
+                message_tokens = _count_message_tokens(message, encoding)
+                self._message_token_counts[key] = message_tokens
+                if len(self._message_token_counts) > _MAX_CACHED_MESSAGE_TOKEN_COUNTS:
+                    self._message_token_counts.popitem(last=False)
+            else:
+                self._message_token_counts.move_to_end(key)
+            num_tokens += message_tokens
         num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
 
         # Tool tokens.
-        oai_tools = convert_tools(tools)
-        for tool in oai_tools:
-            function = tool["function"]
-            tool_tokens = len(encoding.encode(function["name"]))
-            if "description" in function:
-                tool_tokens += len(encoding.encode(function["description"]))
-            tool_tokens -= 2
-            if "parameters" in function:
-                parameters = function["parameters"]
-                if "properties" in parameters:
-                    assert isinstance(parameters["properties"], dict)
-                    for propertiesKey in parameters["properties"]:  # pyright: ignore
-                        assert isinstance(propertiesKey, str)
-                        tool_tokens += len(encoding.encode(propertiesKey))
-                        v = parameters["properties"][propertiesKey]  # pyright: ignore
-                        for field in v:  # pyright: ignore
-                            if field == "type":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
-                            elif field == "description":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
-                            elif field == "enum":
-                                tool_tokens -= 3
-                                for o in v["enum"]:  # pyright: ignore
-                                    tool_tokens += 3
-                                    tool_tokens += len(encoding.encode(o))  # pyright: ignore
-                            else:
-                                trace_logger.warning(f"Not supported field {field}")
-                    tool_tokens += 11
-                    if len(parameters["properties"]) == 0:  # pyright: ignore
-                        tool_tokens -= 2
+        for tool in tools:
+            if isinstance(tool, Tool):
+                converted = _convert_tool(tool)
+                tool_tokens = converted.token_counts.get(encoding.name)
+                if tool_tokens is None:
+                    tool_tokens = _count_tool_tokens(converted.param, encoding)
+                    converted.token_counts[encoding.name] = tool_tokens
+            else:
+                assert isinstance(tool, dict)
+                cached = self._tool_token_counts.get(id(tool))
+                if cached is not None and cached[0] is tool:
+                    tool_tokens = cached[1]
+                    self._tool_token_counts.move_to_end(id(tool))
+                else:
+                    tool_tokens = _count_tool_tokens(_convert_tool_schema(tool), encoding)
+                    self._tool_token_counts[id(tool)] = (tool, tool_tokens)
+                    self._tool_token_counts.move_to_end(id(tool))
+                    if len(self._tool_token_counts) > _MAX_CACHED_TOOL_TOKEN_COUNTS:
+                        self._tool_token_counts.popitem(last=False)
             num_tokens += tool_tokens
         num_tokens += 12
         return num_tokens
@@ -818,16 +1202,19 @@ def __init__(self, **kwargs: Unpack[OpenAIClientConfiguration]):
         client = _openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, **_client_options_from_config(copied_args))
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        state["_in_flight_requests"] = {}
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
         self.__dict__.update(state)
         self._client = _openai_client_from_config(state["_raw_config"])
+        if self._retry_runner is not None:
+            self._client = self._client.with_options(max_retries=0)
 
 
 class AzureOpenAIChatCompletionClient(BaseOpenAIChatCompletionClient):
@@ -844,13 +1231,16 @@ def __init__(self, **kwargs: Unpack[AzureOpenAIClientConfiguration]):
         client = _azure_openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, **_client_options_from_config(copied_args))
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        state["_in_flight_requests"] = {}
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
         self.__dict__.update(state)
         self._client = _azure_openai_client_from_config(state["_raw_config"])
+        if self._retry_runner is not None:
+            self._client = self._client.with_options(max_retries=0)
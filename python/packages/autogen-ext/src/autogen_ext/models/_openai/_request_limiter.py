@@ -0,0 +1,138 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from autogen_core.application import LatencyHistogram
+
+# Queue waits range from nothing to the length of a rate limit window.
+_QUEUE_WAIT_BOUNDARIES = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass
+class _Reservation:
+    time: float
+    tokens: int
+    in_window: bool = True
+
+
+class RequestLimiter:
+    """Bounds the requests a model client has in flight and the requests and tokens it sends per window.
+
+    Requests that would exceed a limit wait in the order they arrived. The time each request waits
+    before it is sent is recorded in :attr:`queue_wait`.
+
+    Args:
+        max_concurrent_requests (int | None, optional): The maximum number of requests in flight.
+        requests_per_minute (int | None, optional): The maximum number of requests sent per window.
+        tokens_per_minute (int | None, optional): The maximum number of tokens sent per window. A request
+            reserves its estimated tokens when it is sent, and the reservation is corrected with the
+            actual usage once the response arrives. A request larger than the budget is sent once the
+            window is empty.
+        window (float, optional): The length of the rate limit window in seconds. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent_requests: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        window: float = 60.0,
+    ) -> None:
+        for name, value in (
+            ("max_concurrent_requests", max_concurrent_requests),
+            ("requests_per_minute", requests_per_minute),
+            ("tokens_per_minute", tokens_per_minute),
+        ):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be at least 1.")
+        self._max_concurrent_requests = max_concurrent_requests
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._window = window
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests) if max_concurrent_requests is not None else None
+        self._admission_lock = asyncio.Lock()
+        self._sent: Deque[_Reservation] = deque()
+        self._tokens_in_window = 0
+        self._queue_wait = LatencyHistogram(_QUEUE_WAIT_BOUNDARIES)
+
+    @property
+    def counts_tokens(self) -> bool:
+        """Whether requests need a token estimate."""
+        return self._tokens_per_minute is not None
+
+    @property
+    def queue_wait(self) -> LatencyHistogram:
+        """The time requests waited for a concurrency slot and rate limit budget, in seconds."""
+        return self._queue_wait
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int = 0) -> AsyncIterator[_Reservation]:
+        """Wait until a request of ``tokens`` estimated tokens can be sent, and hold a concurrency slot
+        until the context exits."""
+        start = time.monotonic()
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            if self._requests_per_minute is None and self._tokens_per_minute is None:
+                reservation = _Reservation(time=start, tokens=tokens, in_window=False)
+            else:
+                reservation = await self._admit(tokens)
+            self._queue_wait.record(time.monotonic() - start)
+            yield reservation
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def record_usage(self, reservation: _Reservation, tokens: int) -> None:
+        """Replace the estimated tokens of a sent request with its actual usage."""
+        if reservation.in_window:
+            self._tokens_in_window += tokens - reservation.tokens
+        reservation.tokens = tokens
+
+    async def _admit(self, tokens: int) -> _Reservation:
+        # Holding the lock while waiting keeps requests in arrival order.
+        async with self._admission_lock:
+            while True:
+                now = time.monotonic()
+                while self._sent and self._sent[0].time <= now - self._window:
+                    expired = self._sent.popleft()
+                    expired.in_window = False
+                    self._tokens_in_window -= expired.tokens
+                delay = 0.0
+                if self._requests_per_minute is not None and len(self._sent) >= self._requests_per_minute:
+                    delay = self._sent[0].time + self._window - now
+                if (
+                    self._tokens_per_minute is not None
+                    and self._sent
+                    and self._tokens_in_window + tokens > self._tokens_per_minute
+                ):
+                    # Wait until enough of the window has expired to fit the request, or until
+                    # the window is empty if the request is larger than the budget.
+                    excess = self._tokens_in_window + tokens - self._tokens_per_minute
+                    for sent in self._sent:
+                        excess -= sent.tokens
+                        if excess <= 0:
+                            break
+                    delay = max(delay, sent.time + self._window - now)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            reservation = _Reservation(time=now, tokens=tokens)
+            self._sent.append(reservation)
+            self._tokens_in_window += tokens
+            return reservation
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent_requests": self._max_concurrent_requests,
+            "requests_per_minute": self._requests_per_minute,
+            "tokens_per_minute": self._tokens_per_minute,
+            "window": self._window,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
@@ -0,0 +1,205 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+import httpx
+from autogen_core.application.logging import TRACE_LOGGER_NAME
+from openai import APIConnectionError, APIStatusError
+
+trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+
+T = TypeVar("T")
+
+
+@dataclass(kw_only=True)
+class RetryPolicy:
+    """How an OpenAI client retries and hedges requests.
+
+    Failed requests are retried with exponential backoff when the error is a connection error, a
+    timeout, or a 408, 409, 429 or 5xx response. A ``Retry-After`` or ``retry-after-ms`` header on
+    the response takes precedence over the computed backoff.
+
+    When a policy is set, the retries built into the OpenAI SDK are turned off so that the two do
+    not compound.
+
+    Args:
+        max_retries (int): The maximum number of retries after the first attempt. Defaults to 3.
+        initial_backoff (float): The delay before the first retry in seconds. Defaults to 0.5.
+        backoff_multiplier (float): The factor the delay grows by after each retry. Defaults to 2.
+        max_backoff (float): The maximum computed delay in seconds. Defaults to 30.
+        jitter (float): The fraction by which each computed delay is randomly varied. Defaults to 0.1.
+        timeout (float | None): The deadline of a call in seconds, covering every attempt and the
+            delays between them. Defaults to None, which means no deadline.
+        hedge_percentile (float | None): If set, a second, identical request is sent when the first
+            has taken longer than this percentile of recent successful requests, for example 0.95.
+            The response that arrives first is used and the other request is cancelled. Only
+            :meth:`create` is hedged. Defaults to None.
+        hedge_min_samples (int): The number of successful requests needed before requests are
+            hedged. Defaults to 20.
+        hedge_window (int): The number of recent successful requests the percentile is computed
+            over. Defaults to 100.
+    """
+
+    max_retries: int = 3
+    initial_backoff: float = 0.5
+    backoff_multiplier: float = 2.0
+    max_backoff: float = 30.0
+    jitter: float = 0.1
+    timeout: Optional[float] = None
+    hedge_percentile: Optional[float] = None
+    hedge_min_samples: int = 20
+    hedge_window: int = 100
+
+    def __post_init__(self) -> None:
+        if self.max_retries < 0:
+            raise ValueError("max_retries must not be negative.")
+        if self.hedge_percentile is not None and not 0 < self.hedge_percentile < 1:
+            raise ValueError("hedge_percentile must be between 0 and 1.")
+
+
+@dataclass
+class RetryStats:
+    """Counters of the requests sent under a :class:`RetryPolicy`."""
+
+    attempts: int = 0
+    """Requests sent, including retries and hedged requests."""
+    retries: int = 0
+    """Requests sent again after a retryable error."""
+    hedged: int = 0
+    """Second requests sent because the first was slow."""
+    hedge_wins: int = 0
+    """Hedged requests that completed before the request they hedged."""
+    deadlines_exceeded: int = 0
+    """Calls that failed because they did not complete within the timeout."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the delay in seconds requested by the ``Retry-After`` headers of an error response."""
+    response = getattr(error, "response", None)
+    if not isinstance(response, httpx.Response):
+        return None
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(float(retry_at.timestamp()) - time.time(), 0.0)
+
+
+class RetryRunner:
+    """Runs requests under a :class:`RetryPolicy` and keeps the latencies used for hedging."""
+
+    def __init__(self, policy: RetryPolicy) -> None:
+        self._policy = policy
+        self._stats = RetryStats()
+        self._latencies: Deque[float] = deque(maxlen=policy.hedge_window)
+
+    @property
+    def policy(self) -> RetryPolicy:
+        return self._policy
+
+    @property
+    def stats(self) -> RetryStats:
+        return self._stats
+
+    def backoff(self, retry: int, error: BaseException) -> float:
+        """Return the delay before retry number ``retry``, counting from 0."""
+        requested = retry_after(error)
+        if requested is not None:
+            return requested
+        policy = self._policy
+        delay = min(policy.initial_backoff * policy.backoff_multiplier**retry, policy.max_backoff)
+        return delay * (1 + random.uniform(-policy.jitter, policy.jitter))
+
+    def hedge_threshold(self) -> Optional[float]:
+        percentile = self._policy.hedge_percentile
+        if percentile is None or len(self._latencies) < max(self._policy.hedge_min_samples, 1):
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(percentile * (len(latencies) - 1))]
+
+    async def run(self, call: Callable[[], Awaitable[T]], *, hedge: bool = False) -> T:
+        """Call ``call`` until it succeeds, a non-retryable error is raised, the retries are used up
+        or the deadline passes."""
+        loop = asyncio.get_running_loop()
+        deadline = None if self._policy.timeout is None else loop.time() + self._policy.timeout
+        retry = 0
+        while True:
+            remaining = None if deadline is None else deadline - loop.time()
+            try:
+                attempt = self._attempt_with_hedge(call) if hedge else self._attempt(call)
+                return await asyncio.wait_for(attempt, remaining)
+            except asyncio.TimeoutError as e:
+                if deadline is None or loop.time() < deadline:
+                    raise
+                self._stats.deadlines_exceeded += 1
+                raise TimeoutError(f"Request did not complete within {self._policy.timeout} seconds.") from e
+            except Exception as e:
+                if not is_retryable(e) or retry >= self._policy.max_retries:
+                    raise
+                delay = self.backoff(retry, e)
+                if deadline is not None and loop.time() + delay >= deadline:
+                    self._stats.deadlines_exceeded += 1
+                    raise
+                trace_logger.info(f"Retrying request in {delay:.2f} seconds after error: {e!r}")
+                self._stats.retries += 1
+                retry += 1
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, call: Callable[[], Awaitable[T]]) -> T:
+        self._stats.attempts += 1
+        start = time.monotonic()
+        result = await call()
+        self._latencies.append(time.monotonic() - start)
+        return result
+
+    async def _attempt_with_hedge(self, call: Callable[[], Awaitable[T]]) -> T:
+        threshold = self.hedge_threshold()
+        first = asyncio.ensure_future(self._attempt(call))
+        tasks = [first]
+        try:
+            if threshold is None:
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done:
+                self._stats.hedged += 1
+                tasks.append(asyncio.ensure_future(self._attempt(call)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._stats.hedge_wins += 1
+                        return task.result()
+            # Every request failed. Report the error of the first one.
+            return first.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -3,6 +3,8 @@
 from autogen_core.components.models import ModelCapabilities
 from typing_extensions import Required, TypedDict
 
+from .._retry import RetryPolicy
+
 
 class ResponseFormat(TypedDict):
     type: Literal["text", "json_object"]
@@ -30,6 +32,12 @@ class BaseOpenAIClientConfiguration(CreateArguments, total=False):
     api_key: str
     timeout: Union[float, None]
     max_retries: int
+    # Limits applied by the client before requests are sent
+    max_concurrent_requests: int
+    requests_per_minute: int
+    tokens_per_minute: int
+    coalesce_requests: bool
+    retry_policy: RetryPolicy
 
 
 # See OpenAI docs for explanation of these parameters
@@ -1,16 +1,20 @@
 # mypy: disable-error-code="no-any-unimported"
+import asyncio
 import os
+import subprocess
 import sys
 import tempfile
+import time
 from pathlib import Path
-from typing import AsyncGenerator, TypeAlias
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, TypeAlias
 
 import pytest
 import pytest_asyncio
 from aiofiles import open
 from autogen_core.base import CancellationToken
-from autogen_core.components.code_executor import CodeBlock
-from autogen_ext.code_executors import DockerCommandLineCodeExecutor
+from autogen_core.components.code_executor import CodeBlock, InMemoryCodeResultCache, with_requirements
+from autogen_ext.code_executors import DockerCommandLineCodeExecutor, DockerContainerPool
 
 
 def docker_tests_enabled() -> bool:
@@ -164,3 +168,318 @@ async def test_docker_commandline_code_executor_start_stop_context_manager() ->
     with tempfile.TemporaryDirectory() as temp_dir:
         async with DockerCommandLineCodeExecutor(work_dir=temp_dir) as _exec:
             pass
+
+
+class _LocalContainer:
+    """Stands in for a running container, and runs commands in the working directory on this machine."""
+
+    status = "running"
+
+    def __init__(self, work_dir: str) -> None:
+        self._work_dir = work_dir
+
+    def exec_run(self, command: List[str]) -> SimpleNamespace:
+        result = subprocess.run(command, cwd=self._work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return SimpleNamespace(exit_code=result.returncode, output=result.stdout)
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_execute_independent_code_blocks_concurrently() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        executor = DockerCommandLineCodeExecutor(work_dir=temp_dir, max_concurrent_code_blocks=4)
+        executor._container = _LocalContainer(temp_dir)  # type: ignore
+        executor._running = True
+        code_blocks = [
+            CodeBlock(code=f"import time; time.sleep(1); print({i})", language="python") for i in range(3)
+        ] + [
+            CodeBlock(code="# filename: helper.py\nimport time; time.sleep(1); VALUE = 3", language="python"),
+            CodeBlock(code="import helper; print(helper.VALUE)", language="python"),
+        ]
+        start = time.perf_counter()
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert time.perf_counter() - start < 3
+        assert result.exit_code == 0 and result.output == "0\n1\n2\n3\n"
+
+        code_blocks = [
+            CodeBlock(code="import time; time.sleep(0.5); print('first')", language="python"),
+            CodeBlock(code="import sys; sys.exit('failed')", language="python"),
+            CodeBlock(code="print('third')", language="python"),
+        ]
+        result = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert result.exit_code == 1 and result.output == "first\nfailed\n"
+
+
+@pytest.mark.asyncio
+async def test_result_cache() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = InMemoryCodeResultCache()
+        executor = DockerCommandLineCodeExecutor(work_dir=temp_dir, result_cache=cache)
+        executor._container = _LocalContainer(temp_dir)  # type: ignore
+        executor._running = True
+        code_blocks = [CodeBlock(code="import random; print(random.random())", language="python", pure=True)]
+        first = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        second = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert first == second and first.exit_code == 0 and len(cache) == 1
+
+        # An executor with another image does not reuse the result.
+        executor = DockerCommandLineCodeExecutor("python:3.11-slim", work_dir=temp_dir, result_cache=cache)
+        executor._container = _LocalContainer(temp_dir)  # type: ignore
+        executor._running = True
+        third = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert third.output != first.output and len(cache) == 2
+
+        # Nor does an executor whose image tag refers to another image.
+        executor._image_id = "sha256:other"  # pyright: ignore[reportPrivateUsage]
+        fourth = await executor.execute_code_blocks(code_blocks, CancellationToken())
+        assert fourth.output != third.output and len(cache) == 3
+
+
+class _FakeContainer(_LocalContainer):
+    def __init__(self, client: "_FakeDockerClient", image: str, name: Optional[str], volumes: Dict[str, Any]) -> None:
+        # Commands run in the directory that is bound to the working directory of the container.
+        self.work_dir_path = Path(next(iter(volumes), "."))
+        super().__init__(str(self.work_dir_path))
+        self.status = "created"
+        self.name = name
+        self.image = image
+        self._client = client
+
+    def start(self) -> None:
+        self.status = "running"
+
+    def reload(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        self.status = "exited"
+
+    def remove(self, force: bool = False) -> None:
+        self.status = "removed"
+        self._client.removed.append(self)
+
+    def exec_run(self, command: List[str]) -> SimpleNamespace:
+        self._client.commands.append(command)
+        # The processes of this machine are not killed.
+        if command[:2] == ["sh", "-c"] and "kill" in command[2]:
+            return SimpleNamespace(exit_code=self._client.kill_exit_code, output=b"")
+        if command[:4] == ["python", "-m", "pip", "install"]:
+            return SimpleNamespace(exit_code=0, output=b"")
+        return super().exec_run(command)
+
+    def commit(self, repository: str, tag: str) -> None:
+        self._client.images.tags.add(f"{repository}:{tag}")
+
+
+class _FakeImages:
+    def __init__(self, tags: Set[str]) -> None:
+        self.tags = tags
+        # The images that tags refer to, which can change as an image is pushed again.
+        self.versions: Dict[str, int] = {}
+
+    def get(self, tag: str) -> SimpleNamespace:
+        from docker.errors import ImageNotFound
+
+        if tag not in self.tags:
+            raise ImageNotFound(tag)
+        return SimpleNamespace(id=f"sha256:{tag}@{self.versions.get(tag, 0)}")
+
+
+class _FakeContainers:
+    def __init__(self, client: "_FakeDockerClient") -> None:
+        self._client = client
+
+    def create(
+        self, image: str, name: Optional[str] = None, volumes: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> _FakeContainer:
+        container = _FakeContainer(self._client, image, name, volumes or {})
+        self._client.created.append(container)
+        return container
+
+    def get(self, name: str) -> _FakeContainer:
+        return next(container for container in self._client.created if container.name == name)
+
+
+class _FakeDockerClient:
+    """Stands in for the client of a Docker daemon, with containers that run commands on this machine."""
+
+    def __init__(self, tags: Set[str]) -> None:
+        self.images = _FakeImages(tags)
+        self.containers = _FakeContainers(self)
+        self.created: List[_FakeContainer] = []
+        self.removed: List[_FakeContainer] = []
+        self.commands: List[List[str]] = []
+        self.kill_exit_code = 0
+
+
+@with_requirements(python_packages=["polars", "numpy"])
+def describe() -> str:
+    return "described"
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_cache_requirements(monkeypatch: pytest.MonkeyPatch) -> None:
+    import docker
+
+    client = _FakeDockerClient({"python:3-slim"})
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+
+    code = "from functions import describe; print(describe())"
+    images: List[str] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for _ in range(3):
+            executor = DockerCommandLineCodeExecutor(
+                work_dir=temp_dir, functions=[describe], cache_requirements=True, stop_container=False
+            )
+            await executor.start()
+            result = await executor.execute_code_blocks([CodeBlock(code=code, language="python")], CancellationToken())
+            await executor.stop()
+            assert result.exit_code == 0 and result.output == "described\n"
+            images.append(client.created[-1].image)
+            # The tag now refers to another image, from which the packages are installed again.
+            client.images.versions["python:3-slim"] = len(images) // 2
+
+    # The packages were installed once per image, in a container that was committed as the image of the executors.
+    pip_commands = [command for command in client.commands if "pip" in command]
+    assert pip_commands == [["python", "-m", "pip", "install", "-qqq", "numpy", "polars"]] * 2
+    assert images[0] == images[1] != images[2]
+    assert {images[0], images[2]} <= client.images.tags
+    assert [container.image for container in client.removed] == ["sha256:python:3-slim@0", "sha256:python:3-slim@1"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_container_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    import docker
+
+    client = _FakeDockerClient({"python:3.12-slim"})
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+
+    with tempfile.TemporaryDirectory() as pool_dir, tempfile.TemporaryDirectory() as template_dir:
+        (Path(template_dir) / "data.txt").write_text("data")
+        pool = DockerContainerPool(
+            "python:3.12-slim", min_size=1, max_size=2, work_dir=pool_dir, template_dir=template_dir
+        )
+        await pool.start()
+        assert len(client.created) == 1 and pool.num_idle == 1
+        assert client.created[0].image == "sha256:python:3.12-slim@0"
+
+        code = "print(open('data.txt').read()); open('out.txt', 'w').write('out')"
+        containers: List[str] = []
+        for _ in range(2):
+            async with DockerCommandLineCodeExecutor(container_pool=pool) as executor:
+                assert pool.num_leased == 1
+                # The image of the executor is the image of the pool, whose ID is also part of the result cache key.
+                assert executor._image == "python:3.12-slim"  # pyright: ignore[reportPrivateUsage]
+                assert executor._image_id == pool.image_id == "sha256:python:3.12-slim@0"  # pyright: ignore[reportPrivateUsage]
+                result = await executor.execute_code_blocks(
+                    [CodeBlock(code=code, language="python")], CancellationToken()
+                )
+                assert result.exit_code == 0 and result.output == "data\n"
+                # Only the files of this lease are in the working directory.
+                assert sorted(path.name for path in executor.work_dir.iterdir() if path.suffix == ".txt") == [
+                    "data.txt",
+                    "out.txt",
+                ]
+                containers.append(executor.container_name)
+        # The container was reused, and its working directory was restored in between.
+        assert len(client.created) == 1 and containers[0] == containers[1]
+        assert [path.name for path in client.created[0].work_dir_path.iterdir()] == ["data.txt"]
+        assert client.commands.count(["sh", "-c", "kill -9 -1 2>/dev/null; true"]) == 2
+
+        # A second concurrent lease starts another container, and a third waits for a container to be returned.
+        first, second = await pool.acquire(), await pool.acquire()
+        assert len(client.created) == 2
+        third = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.1)
+        assert not third.done()
+        await pool.release(first)
+        assert (await asyncio.wait_for(third, 1)).container is first.container
+        await pool.release(second)
+        await pool.release(first)
+
+        # A container that stopped is replaced when it would be leased.
+        assert pool.num_idle == 2
+        client.created[0].status = "exited"
+        client.created[1].status = "exited"
+        leased = await pool.acquire()
+        assert leased.container is client.created[2] and len(client.removed) == 2
+        await pool.release(leased)
+
+        await pool.stop()
+        assert pool.num_idle == 0 and len(client.removed) == 3
+        assert list(Path(pool_dir).iterdir()) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_container_pool_health_check(monkeypatch: pytest.MonkeyPatch) -> None:
+    import docker
+
+    client = _FakeDockerClient({"python:3-slim"})
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+
+    with tempfile.TemporaryDirectory() as pool_dir:
+        pool = DockerContainerPool(min_size=1, max_size=3, work_dir=pool_dir, health_check_interval=0.05)
+        await pool.start()
+        leased = [await pool.acquire() for _ in range(3)]
+        for pooled in leased:
+            await pool.release(pooled)
+        assert pool.num_idle == 3
+
+        # The idle containers beyond min_size are removed, and a container that stopped is replaced.
+        await asyncio.sleep(0.2)
+        assert pool.num_idle == 1
+        client.created[-1].status = "exited"
+        client.created[0].status = "exited"
+        await asyncio.sleep(0.2)
+        assert pool.num_idle == 1 and len(client.created) == 4
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_container_pool_drops_container_that_cannot_be_reset(monkeypatch: pytest.MonkeyPatch) -> None:
+    import docker
+
+    client = _FakeDockerClient({"python:3-slim"})
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+
+    with tempfile.TemporaryDirectory() as pool_dir:
+        pool = DockerContainerPool(min_size=0, max_size=1, work_dir=pool_dir)
+        await pool.start()
+        pooled = await pool.acquire()
+        client.kill_exit_code = 1
+        await pool.release(pooled)
+        assert pool.num_idle == 0 and client.removed == [pooled.container]
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="The commands of the container need a POSIX shell.")
+async def test_container_pool_health_check_survives_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    import docker
+
+    client = _FakeDockerClient({"python:3-slim"})
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+
+    with tempfile.TemporaryDirectory() as pool_dir:
+        pool = DockerContainerPool(min_size=1, max_size=2, work_dir=pool_dir, health_check_interval=0.05)
+        await pool.start()
+
+        def fail_create(*args: Any, **kwargs: Any) -> None:
+            raise docker.errors.APIError("The daemon is not reachable.")
+
+        # The container that stopped cannot be replaced while creating containers fails.
+        create = client.containers.create
+        monkeypatch.setattr(client.containers, "create", fail_create)
+        client.created[0].status = "exited"
+        await asyncio.sleep(0.2)
+        assert pool.num_idle == 0
+
+        # The health check keeps running, and replaces the container once creating containers succeeds again.
+        monkeypatch.setattr(client.containers, "create", create)
+        await asyncio.sleep(0.2)
+        assert pool.num_idle == 1 and len(client.created) == 2
+        await pool.stop()
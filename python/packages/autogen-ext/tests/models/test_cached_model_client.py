@@ -0,0 +1,176 @@
+from pathlib import Path
+from typing import Any, AsyncGenerator, List, Mapping, Optional, Sequence, Union
+
+import pytest
+from autogen_core.base import CancellationToken
+from autogen_core.components import FunctionCall
+from autogen_core.components.models import (
+    ChatCompletionClient,
+    CreateRequest,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,
+    RequestUsage,
+    SystemMessage,
+    UserMessage,
+    create_batch,
+)
+from autogen_core.components.tools import Tool, ToolSchema
+from autogen_ext.models import CachedChatCompletionClient, InMemoryChatCompletionCache, SQLiteChatCompletionCache
+
+
+class CountingChatCompletionClient:
+    """Returns a fixed response and counts the calls that reach it."""
+
+    def __init__(self, content: Union[str, List[FunctionCall]] = "Hello world") -> None:
+        self.content = content
+        self.num_calls = 0
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        self.num_calls += 1
+        return CreateResult(
+            finish_reason="stop" if isinstance(self.content, str) else "function_calls",
+            content=self.content,
+            usage=RequestUsage(prompt_tokens=10, completion_tokens=2),
+            cached=False,
+        )
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        self.num_calls += 1
+        assert isinstance(self.content, str)
+        for word in self.content.split(" "):
+            yield word + " "
+        yield CreateResult(
+            finish_reason="stop",
+            content=self.content,
+            usage=RequestUsage(prompt_tokens=10, completion_tokens=2),
+            cached=False,
+        )
+
+    def actual_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def total_usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return ModelCapabilities(vision=False, function_calling=True, json_output=False)
+
+
+messages: List[LLMMessage] = [
+    SystemMessage(content="You are a helpful assistant."),
+    UserMessage(content="Hello", source="user"),
+]
+
+
+@pytest.mark.asyncio
+async def test_create_is_cached() -> None:
+    inner = CountingChatCompletionClient()
+    client = CachedChatCompletionClient(inner)
+    # The wrapper can be used wherever a client is expected.
+    _: ChatCompletionClient = client
+
+    first = await client.create(messages)
+    second = await client.create(messages)
+    assert not first.cached
+    assert second.cached
+    assert second.content == first.content
+    assert second.usage == first.usage
+    assert inner.num_calls == 1
+    assert (client.hits, client.misses) == (1, 1)
+
+    await client.create(messages, extra_create_args={"temperature": 0.5})
+    await client.create([UserMessage(content="Hi", source="user")])
+    assert inner.num_calls == 3
+    assert (client.hits, client.misses) == (1, 3)
+
+
+@pytest.mark.asyncio
+async def test_create_batch_uses_cache() -> None:
+    inner = CountingChatCompletionClient()
+    client = CachedChatCompletionClient(inner)
+    results = await create_batch(client, [CreateRequest(messages=messages)] * 3, max_concurrency=1)
+    assert [isinstance(result, CreateResult) and result.cached for result in results] == [False, True, True]
+    assert inner.num_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_function_calls_round_trip() -> None:
+    calls = [FunctionCall(id="1", arguments='{"x": 1}', name="tool")]
+    client = CachedChatCompletionClient(CountingChatCompletionClient(content=calls))
+    await client.create(messages)
+    result = await client.create(messages)
+    assert result.cached
+    assert result.content == calls
+
+
+@pytest.mark.asyncio
+async def test_create_stream_replays_chunks() -> None:
+    inner = CountingChatCompletionClient(content="one two three")
+    client = CachedChatCompletionClient(inner)
+
+    first = [chunk async for chunk in client.create_stream(messages)]
+    second = [chunk async for chunk in client.create_stream(messages)]
+    assert first[:-1] == second[:-1] == ["one ", "two ", "three "]
+    assert isinstance(second[-1], CreateResult) and second[-1].cached
+    assert inner.num_calls == 1
+
+    # A response cached by create is replayed as a single chunk.
+    await client.create([UserMessage(content="Hi", source="user")])
+    replayed = [chunk async for chunk in client.create_stream([UserMessage(content="Hi", source="user")])]
+    assert replayed[0] == "one two three"
+    assert inner.num_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_evicts_least_recently_used() -> None:
+    cache = InMemoryChatCompletionCache(max_entries=2)
+    await cache.set("a", {"value": 1})
+    await cache.set("b", {"value": 2})
+    assert await cache.get("a") == {"value": 1}
+    await cache.set("c", {"value": 3})
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"value": 1}
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_persists(tmp_path: Path) -> None:
+    path = tmp_path / "cache.db"
+    inner = CountingChatCompletionClient()
+    cache = SQLiteChatCompletionCache(path)
+    await CachedChatCompletionClient(inner, cache, namespace="model-a").create(messages)
+    cache.close()
+
+    cache = SQLiteChatCompletionCache(path)
+    client = CachedChatCompletionClient(inner, cache, namespace="model-a")
+    result = await client.create(messages)
+    assert result.cached
+    assert inner.num_calls == 1
+
+    # Entries are not shared across namespaces.
+    result = await CachedChatCompletionClient(inner, cache, namespace="model-b").create(messages)
+    assert not result.cached
+    assert inner.num_calls == 2
+    cache.close()
@@ -1,5 +1,8 @@
 import asyncio
-from typing import Any, AsyncGenerator, List, Tuple
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List, Tuple
 from unittest.mock import MagicMock
 
 import pytest
@@ -7,6 +10,7 @@
 from autogen_core.components import Image
 from autogen_core.components.models import (
     AssistantMessage,
+    CreateRequest,
     CreateResult,
     FunctionExecutionResult,
     FunctionExecutionResultMessage,
@@ -14,13 +18,23 @@
     SystemMessage,
     UserMessage,
 )
-from autogen_core.components.tools import FunctionTool
+from autogen_core.components.tools import FunctionTool, ParametersSchema, ToolSchema
 from autogen_ext.models import AzureOpenAIChatCompletionClient, OpenAIChatCompletionClient
+from autogen_ext.models._openai import _openai_client
 from autogen_ext.models._openai._model_info import resolve_model
-from autogen_ext.models._openai._openai_client import calculate_vision_tokens
+from autogen_ext.models._openai._openai_client import calculate_vision_tokens, convert_tools
+from autogen_ext.models._openai._request_limiter import RequestLimiter
+from openai.resources.batches import AsyncBatches
 from openai.resources.chat.completions import AsyncCompletions
+from openai.resources.files import AsyncFiles
+from openai.types import Batch, FileObject
 from openai.types.chat.chat_completion import ChatCompletion, Choice
-from openai.types.chat.chat_completion_chunk import ChatCompletionChunk, ChoiceDelta
+from openai.types.chat.chat_completion_chunk import (
+    ChatCompletionChunk,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
 from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from openai.types.completion_usage import CompletionUsage
@@ -121,6 +135,232 @@ async def test_openai_chat_completion_client_create_cancel(monkeypatch: pytest.M
         await task
 
 
+class _ConcurrencyRecorder:
+    """Wraps the mock create and records how many requests were in flight at once."""
+
+    def __init__(self) -> None:
+        self.num_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, *args: Any, **kwargs: Any) -> ChatCompletion | AsyncGenerator[ChatCompletionChunk, None]:
+        self.num_calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await _mock_create(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_coalesces_identical_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    recorder = _ConcurrencyRecorder()
+    monkeypatch.setattr(AsyncCompletions, "create", recorder.create)
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key", coalesce_requests=True)
+    hello = [UserMessage(content="Hello", source="user")]
+
+    results = await asyncio.gather(
+        client.create(hello),
+        client.create(hello),
+        client.create(hello),
+        client.create([UserMessage(content="Hi", source="user")]),
+    )
+    assert [result.content for result in results] == ["Hello"] * 4
+    assert [result.cached for result in results] == [False, True, True, False]
+    assert recorder.num_calls == 2
+    assert client.num_shared_requests == 2
+
+    # Cancelling one caller does not cancel the request shared with another.
+    cancellation_token = CancellationToken()
+    cancelled = asyncio.ensure_future(client.create(hello, cancellation_token=cancellation_token))
+    shared = asyncio.ensure_future(client.create(hello))
+    await asyncio.sleep(0.01)
+    cancellation_token.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert (await shared).content == "Hello"
+    assert recorder.num_calls == 3
+
+    # Requests that are no longer in flight are sent again.
+    assert not (await client.create(hello)).cached
+    assert recorder.num_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_max_concurrent_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    recorder = _ConcurrencyRecorder()
+    monkeypatch.setattr(AsyncCompletions, "create", recorder.create)
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key", max_concurrent_requests=2)
+
+    async def consume_stream() -> None:
+        async for _ in client.create_stream([UserMessage(content="Hello", source="user")]):
+            pass
+
+    await asyncio.gather(*[client.create([UserMessage(content="Hello", source="user")]) for _ in range(5)])
+    assert recorder.num_calls == 5
+    assert recorder.max_in_flight == 2
+    assert client.queue_wait_time.count == 5
+    assert client.queue_wait_time.max >= 0.1
+
+    # A stream holds its slot until it is consumed.
+    started = time.monotonic()
+    await asyncio.gather(*[consume_stream() for _ in range(3)])
+    assert time.monotonic() - started >= 0.6
+
+
+class _FakeBatchService:
+    """Stands in for the files and batches endpoints. The batch completes on the second poll, and
+    the request with custom_id "1" fails."""
+
+    def __init__(self, retrieve_delay: float = 0) -> None:
+        self.lines: List[Dict[str, Any]] = []
+        self.num_retrievals = 0
+        self.retrieve_delay = retrieve_delay
+        self.cancelled: List[str] = []
+        self.endpoint: str | None = None
+
+    async def create_file(self, *, file: Tuple[str, bytes], purpose: str) -> FileObject:
+        self.lines = [json.loads(line) for line in file[1].decode("utf-8").splitlines()]
+        return FileObject.model_construct(id="input", purpose=purpose)
+
+    async def create_batch(self, *, input_file_id: str, endpoint: str, completion_window: str) -> Batch:
+        self.endpoint = endpoint
+        return Batch.model_construct(id="batch", input_file_id=input_file_id, status="validating")
+
+    async def retrieve_batch(self, batch_id: str) -> Batch:
+        self.num_retrievals += 1
+        await asyncio.sleep(self.retrieve_delay)
+        status = "completed" if self.num_retrievals == 2 else "in_progress"
+        return Batch.model_construct(id=batch_id, status=status, output_file_id="output", error_file_id=None)
+
+    async def cancel_batch(self, batch_id: str) -> Batch:
+        self.cancelled.append(batch_id)
+        return Batch.model_construct(id=batch_id, status="cancelling")
+
+    async def content(self, file_id: str) -> SimpleNamespace:
+        outputs: List[str] = []
+        for line in self.lines:
+            if line["custom_id"] == "1":
+                response = {"status_code": 400, "body": {"error": {"message": "Invalid request"}}}
+            else:
+                completion = await _mock_create(**line["body"])
+                assert isinstance(completion, ChatCompletion)
+                completion.choices[0].message.content = line["body"]["messages"][-1]["content"]
+                response = {"status_code": 200, "body": completion.model_dump(mode="json")}
+            outputs.append(json.dumps({"custom_id": line["custom_id"], "response": response, "error": None}))
+        # Results are not in the order of the requests.
+        return SimpleNamespace(text="\n".join(reversed(outputs)))
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_create_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    requests = [CreateRequest(messages=[UserMessage(content=f"Hello {i}", source="user")]) for i in range(4)]
+    requests.append(CreateRequest(messages=requests[0].messages, extra_create_args={"invalid": 1}))
+
+    results = await client.create_batch(requests, max_concurrency=2)
+    assert [result.content for result in results[:4] if isinstance(result, CreateResult)] == ["Hello"] * 4
+    assert isinstance(results[4], ValueError)
+
+    service = _FakeBatchService()
+    monkeypatch.setattr(AsyncFiles, "create", service.create_file)
+    monkeypatch.setattr(AsyncFiles, "content", service.content)
+    monkeypatch.setattr(AsyncBatches, "create", service.create_batch)
+    monkeypatch.setattr(AsyncBatches, "retrieve", service.retrieve_batch)
+    results = await client.create_batch(requests, use_batch_api=True, poll_interval=0.01)
+
+    assert [line["custom_id"] for line in service.lines] == ["0", "1", "2", "3"]
+    assert all(line["url"] == "/v1/chat/completions" and "stream" not in line["body"] for line in service.lines)
+    assert service.endpoint == "/v1/chat/completions"
+    assert isinstance(results[0], CreateResult) and results[0].content == "Hello 0"
+    assert isinstance(results[1], RuntimeError) and "Invalid request" in str(results[1])
+    assert isinstance(results[3], CreateResult) and results[3].content == "Hello 3"
+    assert isinstance(results[4], ValueError)
+    assert service.num_retrievals == 2
+
+
+@pytest.mark.asyncio
+async def test_azure_openai_chat_completion_client_create_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = AzureOpenAIChatCompletionClient(
+        model="gpt-4o",
+        api_key="api_key",
+        api_version="2024-07-01-preview",
+        azure_endpoint="https://dummy.com",
+        model_capabilities={"vision": True, "function_calling": True, "json_output": True},
+    )
+    service = _FakeBatchService()
+    monkeypatch.setattr(AsyncFiles, "create", service.create_file)
+    monkeypatch.setattr(AsyncFiles, "content", service.content)
+    monkeypatch.setattr(AsyncBatches, "create", service.create_batch)
+    monkeypatch.setattr(AsyncBatches, "retrieve", service.retrieve_batch)
+    requests = [CreateRequest(messages=[UserMessage(content=f"Hello {i}", source="user")]) for i in range(2)]
+    results = await client.create_batch(requests, use_batch_api=True, poll_interval=0.01)
+
+    # Azure OpenAI batches take the path of the endpoint without the API version.
+    assert [line["url"] for line in service.lines] == ["/chat/completions"] * 2
+    assert service.endpoint == "/chat/completions"
+    assert isinstance(results[0], CreateResult) and results[0].content == "Hello 0"
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_create_batch_cancellation(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    service = _FakeBatchService(retrieve_delay=10)
+    monkeypatch.setattr(AsyncFiles, "create", service.create_file)
+    monkeypatch.setattr(AsyncBatches, "create", service.create_batch)
+    monkeypatch.setattr(AsyncBatches, "retrieve", service.retrieve_batch)
+    monkeypatch.setattr(AsyncBatches, "cancel", service.cancel_batch)
+    cancellation_token = CancellationToken()
+    task = asyncio.create_task(
+        client.create_batch(
+            [CreateRequest(messages=[UserMessage(content="Hello", source="user")])],
+            use_batch_api=True,
+            poll_interval=0.01,
+            cancellation_token=cancellation_token,
+        )
+    )
+    # Cancelling while the status of the batch is retrieved cancels the request and the batch.
+    while service.num_retrievals == 0:
+        await asyncio.sleep(0.01)
+    cancellation_token.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, 1)
+    assert service.cancelled == ["batch"]
+
+
+@pytest.mark.asyncio
+async def test_request_limiter_rate_limits() -> None:
+    limiter = RequestLimiter(requests_per_minute=2, window=0.2)
+    started = time.monotonic()
+    for _ in range(3):
+        async with limiter.reserve():
+            pass
+    assert time.monotonic() - started >= 0.2
+    assert limiter.queue_wait.count == 3
+
+    limiter = RequestLimiter(tokens_per_minute=100, window=0.2)
+    started = time.monotonic()
+    async with limiter.reserve(60) as reservation:
+        limiter.record_usage(reservation, 10)
+    # The first request used less than it reserved, so the second fits in the budget.
+    async with limiter.reserve(60):
+        pass
+    assert time.monotonic() - started < 0.1
+    async with limiter.reserve(60):
+        pass
+    assert time.monotonic() - started >= 0.2
+
+    # A request larger than the budget is sent once the window is empty.
+    async with limiter.reserve(500):
+        pass
+    assert time.monotonic() - started >= 0.4
+
+    with pytest.raises(ValueError):
+        RequestLimiter(max_concurrent_requests=0)
+
+
 @pytest.mark.asyncio
 async def test_openai_chat_completion_client_create_stream_cancel(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
@@ -136,6 +376,94 @@ async def test_openai_chat_completion_client_create_stream_cancel(monkeypatch: p
             pass
 
 
+async def _mock_create_tool_call_stream(*args: Any, **kwargs: Any) -> AsyncGenerator[ChatCompletionChunk, None]:
+    deltas = [
+        ChoiceDeltaToolCall(index=0, id="call_1", function=ChoiceDeltaToolCallFunction(name="add", arguments="")),
+        ChoiceDeltaToolCall(index=0, function=ChoiceDeltaToolCallFunction(arguments='{"x": ')),
+        ChoiceDeltaToolCall(index=1, id="call_2", function=ChoiceDeltaToolCallFunction(name="sub", arguments="{")),
+        ChoiceDeltaToolCall(index=0, function=ChoiceDeltaToolCallFunction(arguments="1}")),
+        ChoiceDeltaToolCall(index=1, function=ChoiceDeltaToolCallFunction(arguments="}")),
+    ]
+    for i, delta in enumerate(deltas):
+        yield ChatCompletionChunk(
+            id="id",
+            choices=[
+                ChunkChoice(
+                    finish_reason="tool_calls" if i == len(deltas) - 1 else None,
+                    index=0,
+                    delta=ChoiceDelta(tool_calls=[delta], role="assistant"),
+                )
+            ],
+            created=0,
+            model=resolve_model("gpt-4o"),
+            object="chat.completion.chunk",
+        )
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_create_raw_stream(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    chunks = [chunk async for chunk in client.create_raw_stream([UserMessage(content="Hello", source="user")])]
+    assert [chunk.choices[0].delta.content for chunk in chunks[:-1] if isinstance(chunk, ChatCompletionChunk)] == [
+        "Hello",
+        " Another Hello",
+        " Yet Another Hello",
+    ]
+    assert isinstance(chunks[-1], CreateResult)
+    assert chunks[-1].content == "Hello Another Hello Yet Another Hello"
+
+    async def create_tool_call_stream(*args: Any, **kwargs: Any) -> AsyncGenerator[ChatCompletionChunk, None]:
+        return _mock_create_tool_call_stream()
+
+    monkeypatch.setattr(AsyncCompletions, "create", create_tool_call_stream)
+    chunks = [chunk async for chunk in client.create_raw_stream([UserMessage(content="Hello", source="user")])]
+    assert len(chunks) == 6
+    result = chunks[-1]
+    assert isinstance(result, CreateResult) and result.finish_reason == "function_calls"
+    assert isinstance(result.content, list)
+    assert [(call.id, call.name, call.arguments) for call in result.content] == [
+        ("call_1", "add", '{"x": 1}'),
+        ("call_2", "sub", "{}"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_openai_chat_completion_client_create_stream_cancel_while_waiting(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    cancellation_token = CancellationToken()
+    received: List[str | CreateResult] = []
+
+    async def consume() -> bool:
+        try:
+            async for chunk in client.create_stream(
+                [UserMessage(content="Hello", source="user")], cancellation_token=cancellation_token
+            ):
+                received.append(chunk)
+        except asyncio.CancelledError:
+            # The task itself was not cancelled, so it can carry on.
+            current = asyncio.current_task()
+            return current is not None and (not hasattr(current, "cancelling") or current.cancelling() == 0)
+        return False
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.15)
+    cancellation_token.cancel()
+    assert await task
+    assert received == ["Hello"]
+
+    # Cancelling the token after the stream completed has no effect on the consumer.
+    cancellation_token = CancellationToken()
+    received.clear()
+    assert not await asyncio.create_task(consume())
+    cancellation_token.cancel()
+    await asyncio.sleep(0)
+    assert isinstance(received[-1], CreateResult)
+
+
 @pytest.mark.asyncio
 async def test_openai_chat_completion_client_count_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
     client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
@@ -178,6 +506,101 @@ def tool2(test1: int, test2: List[int]) -> str:
     assert remaining_tokens
 
 
+class _WordEncoding:
+    """Stands in for a tiktoken encoding with one token per word, and records what it encodes."""
+
+    name = "words"
+
+    def __init__(self) -> None:
+        self.encoded: List[str] = []
+
+    def encode(self, text: str) -> List[int]:
+        self.encoded.append(text)
+        return [0] * len(text.split())
+
+
+def test_openai_chat_completion_client_count_tokens_is_incremental(monkeypatch: pytest.MonkeyPatch) -> None:
+    encoding = _WordEncoding()
+    encoding_for_model = MagicMock(return_value=encoding)
+    monkeypatch.setattr("tiktoken.encoding_for_model", encoding_for_model)
+    _openai_client._encoding_for_model.cache_clear()  # pyright: ignore[reportPrivateUsage]
+
+    def tool1(test: str, test2: str) -> str:
+        return test + test2
+
+    tools = [FunctionTool(tool1, description="example tool 1")]
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    messages: List[LLMMessage] = [
+        SystemMessage(content="You are a helpful assistant."),
+        UserMessage(content="Hello there", source="user"),
+    ]
+    try:
+        first = client.count_tokens(messages, tools=tools)
+        num_encoded = len(encoding.encoded)
+        assert client.count_tokens(list(messages), tools=tools) == first
+        assert len(encoding.encoded) == num_encoded
+
+        # Only the new message is encoded, and equal messages share a count.
+        messages.append(AssistantMessage(content="General Kenobi", source="assistant"))
+        second = client.count_tokens(messages, tools=tools)
+        assert sorted(encoding.encoded[num_encoded:]) == ["General Kenobi", "assistant", "assistant"]
+        assert second > first
+        assert client.count_tokens([SystemMessage(content="You are a helpful assistant.")]) == client.count_tokens(
+            messages[:1]
+        )
+
+        token_limit = client.remaining_tokens(messages, tools=tools) + second
+        assert token_limit == 128000
+        encoding_for_model.assert_called_once_with("gpt-4o")
+    finally:
+        _openai_client._encoding_for_model.cache_clear()  # pyright: ignore[reportPrivateUsage]
+
+
+def test_openai_chat_completion_client_count_tokens_caches_tool_schemas(monkeypatch: pytest.MonkeyPatch) -> None:
+    encoding = _WordEncoding()
+    monkeypatch.setattr("tiktoken.encoding_for_model", MagicMock(return_value=encoding))
+    monkeypatch.setattr(_openai_client, "_MAX_CACHED_TOOL_TOKEN_COUNTS", 2)
+    _openai_client._encoding_for_model.cache_clear()  # pyright: ignore[reportPrivateUsage]
+
+    schemas = [
+        ToolSchema(
+            name=f"tool{i}", description=f"Tool number {i}", parameters=ParametersSchema(type="object", properties={})
+        )
+        for i in range(3)
+    ]
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+    try:
+        first = client.count_tokens([], tools=schemas[:1])
+        num_encoded = len(encoding.encoded)
+        assert client.count_tokens([], tools=schemas[:1]) == first
+        assert len(encoding.encoded) == num_encoded
+
+        # An equal schema that is a different object is counted again, and the cache is bounded.
+        assert client.count_tokens([], tools=[dict(schemas[0])]) == first  # type: ignore[list-item]
+        assert len(encoding.encoded) > num_encoded
+        client.count_tokens([], tools=schemas)
+        assert len(client._tool_token_counts) == 2  # pyright: ignore[reportPrivateUsage]
+    finally:
+        _openai_client._encoding_for_model.cache_clear()  # pyright: ignore[reportPrivateUsage]
+
+
+def test_convert_tools_reuses_converted_tools() -> None:
+    def tool1(test: str) -> str:
+        return test
+
+    tool = FunctionTool(tool1, description="example tool 1")
+    schema = ToolSchema(
+        name="tool2", description="example tool 2", parameters=ParametersSchema(type="object", properties={})
+    )
+    first = convert_tools([tool, schema])
+    second = convert_tools([tool, schema])
+    assert second[0] is first[0]
+    assert second[1] == first[1]
+
+    tool._name = "renamed"  # pyright: ignore[reportPrivateUsage]
+    assert convert_tools([tool])[0]["function"]["name"] == "renamed"
+
+
 @pytest.mark.parametrize(
     "mock_size, expected_num_tokens",
     [
@@ -189,12 +612,9 @@ def tool2(test1: int, test2: List[int]) -> str:
     ],
 )
 def test_openai_count_image_tokens(mock_size: Tuple[int, int], expected_num_tokens: int) -> None:
-    # Step 1: Mock the Image class with only the 'image' attribute
-    mock_image_attr = MagicMock()
-    mock_image_attr.size = mock_size
-
+    # Step 1: Mock the Image class with only the 'size' attribute
     mock_image = MagicMock()
-    mock_image.image = mock_image_attr
+    mock_image.size = mock_size
 
     # Directly call calculate_vision_tokens and check the result
     calculated_tokens = calculate_vision_tokens(mock_image, detail="auto")
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, List
+
+import httpx
+import openai
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from autogen_core.base import CancellationToken
+from autogen_core.components.models import UserMessage
+from autogen_ext.models import OpenAIChatCompletionClient, RetryPolicy
+from autogen_ext.models._openai._model_info import resolve_model
+from autogen_ext.models._openai._retry import retry_after
+
+
+class StubServer:
+    """A local chat completions endpoint that replays a script of responses.
+
+    Each entry of ``script`` is ``(status, delay)``. Requests beyond the script succeed immediately.
+    """
+
+    def __init__(self, script: List[tuple[int, float]], retry_after: str | None = None) -> None:
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.request_times: List[float] = []
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.request_times.append(time.monotonic())
+        status, delay = self.script.pop(0) if self.script else (200, 0.0)
+        await asyncio.sleep(delay)
+        if status != 200:
+            headers = {"retry-after": self.retry_after} if self.retry_after is not None else {}
+            return web.json_response({"error": {"message": "stub error"}}, status=status, headers=headers)
+        if (await request.json()).get("stream"):
+            return await self.stream(request)
+        return web.json_response(
+            {
+                "id": "id",
+                "object": "chat.completion",
+                "created": 0,
+                "model": resolve_model("gpt-4o"),
+                "choices": [
+                    {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Hello"}}
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        )
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"content-type": "text/event-stream"})
+        await response.prepare(request)
+        for content in ["Hello", " world"]:
+            chunk = {
+                "id": "id",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": resolve_model("gpt-4o"),
+                "choices": [{"index": 0, "finish_reason": "stop", "delta": {"role": "assistant", "content": content}}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+
+@pytest_asyncio.fixture(scope="function")  # type: ignore
+async def serve() -> AsyncGenerator[List[web.AppRunner], None]:
+    runners: List[web.AppRunner] = []
+    yield runners
+    for runner in runners:
+        await runner.cleanup()
+
+
+async def start(stub: StubServer, runners: List[web.AppRunner]) -> str:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", stub.handle)
+    # Do not wait for handlers that are still sleeping after the client gave up on them.
+    runner = web.AppRunner(app, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    runners.append(runner)
+    port = runner.addresses[0][1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def make_client(base_url: str, policy: RetryPolicy) -> OpenAIChatCompletionClient:
+    return OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key", base_url=base_url, retry_policy=policy)
+
+
+messages = [UserMessage(content="Hello", source="user")]
+
+
+@pytest.mark.asyncio
+async def test_retries_honor_retry_after(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(429, 0.0), (503, 0.0)], retry_after="0.3")
+    client = make_client(await start(stub, serve), RetryPolicy(initial_backoff=0.01))
+
+    result = await client.create(messages)
+    assert result.content == "Hello"
+    assert len(stub.request_times) == 3
+    assert stub.request_times[1] - stub.request_times[0] >= 0.3
+    assert client.retry_stats is not None
+    assert (client.retry_stats.attempts, client.retry_stats.retries) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_and_exhausted_retries_are_raised(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(400, 0.0), (500, 0.0), (500, 0.0)])
+    client = make_client(await start(stub, serve), RetryPolicy(max_retries=1, initial_backoff=0.01))
+
+    with pytest.raises(openai.BadRequestError):
+        await client.create(messages)
+    with pytest.raises(openai.InternalServerError):
+        await client.create(messages)
+    assert len(stub.request_times) == 3
+
+
+@pytest.mark.asyncio
+async def test_deadline_covers_all_attempts(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(500, 0.0), (200, 5.0)])
+    client = make_client(await start(stub, serve), RetryPolicy(initial_backoff=0.01, timeout=0.5))
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        await client.create(messages)
+    assert time.monotonic() - started < 2.0
+    assert client.retry_stats is not None and client.retry_stats.deadlines_exceeded == 1
+
+    # A retry that could not start before the deadline is not attempted.
+    stub.script = [(429, 0.0)]
+    stub.retry_after = "10"
+    with pytest.raises(openai.RateLimitError):
+        await client.create(messages)
+    assert client.retry_stats.deadlines_exceeded == 2
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_retries(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(429, 0.0)], retry_after="10")
+    client = make_client(await start(stub, serve), RetryPolicy())
+
+    cancellation_token = CancellationToken()
+    task = asyncio.ensure_future(client.create(messages, cancellation_token=cancellation_token))
+    await asyncio.sleep(0.2)
+    cancellation_token.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert len(stub.request_times) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_hedged(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(200, 0.01)] * 3 + [(200, 5.0)])
+    client = make_client(await start(stub, serve), RetryPolicy(hedge_percentile=0.95, hedge_min_samples=3))
+
+    for _ in range(3):
+        await client.create(messages)
+    started = time.monotonic()
+    result = await client.create(messages)
+    assert result.content == "Hello"
+    assert time.monotonic() - started < 2.0
+    assert client.retry_stats is not None
+    assert (client.retry_stats.hedged, client.retry_stats.hedge_wins) == (1, 1)
+    assert len(stub.request_times) == 5
+
+
+@pytest.mark.asyncio
+async def test_create_stream_retries_opening_the_stream(serve: List[web.AppRunner]) -> None:
+    stub = StubServer([(502, 0.0)])
+    client = make_client(await start(stub, serve), RetryPolicy(initial_backoff=0.01))
+
+    chunks = [chunk async for chunk in client.create_stream(messages)]
+    assert chunks[:2] == ["Hello", " world"]
+    assert len(stub.request_times) == 2
+    assert client.retry_stats is not None and client.retry_stats.retries == 1
+
+
+def test_retry_after_header_formats() -> None:
+    request = httpx.Request("POST", "http://localhost")
+
+    def error(headers: dict[str, str]) -> openai.RateLimitError:
+        response = httpx.Response(429, headers=headers, request=request)
+        return openai.RateLimitError("rate limited", response=response, body=None)
+
+    assert retry_after(error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(error({"retry-after": "2"})) == 2.0
+    assert retry_after(error({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(error({})) is None
+    assert retry_after(ValueError()) is None
+    with pytest.raises(ValueError):
+        RetryPolicy(hedge_percentile=1.5)